@@ -0,0 +1,207 @@
+# almanac_generator.py
+"""
+黄历生成器
+负责按日期区间批量生成每日干支日历（年/月/日柱、月令司令、节气），
+以 NumPy 数组整段计算，并可分块写出 CSV / JSONL
+"""
+
+import csv
+import json
+
+import numpy as np
+
+from bazi_reference import BaziReference
+from jie_calendar import JIE_NAMES, DAY_INDEX_OFFSET, compute_jie_seconds
+
+# 六十甲子名称表（下标即序号）
+JIAZI_NAMES = [BaziReference.get_ganzhi_by_index(index) for index in range(60)]
+
+# 五虎遁：年干序号 -> 寅月月干序号
+WUHU_START = np.array(BaziReference.WUHU_START, dtype=np.int64)
+
+# 司令为空（超出 SILING_TABLE 的天数）时的天干下标
+NO_SILING = 255
+
+# Unix 纪元（1970-01-01）的公历日序数
+_EPOCH_ORDINAL = 719163
+
+
+def _build_siling_lookup():
+    """[月支下标, 距节天数] -> 司令天干下标（与 BaziReference.get_siling_info 同一规则）"""
+    lookup = np.full((12, 32), NO_SILING, dtype=np.uint8)
+    for zhi_index, zhi in enumerate(BaziReference.EARTHLY_BRANCHES):
+        cumulative_days = 0
+        for period in BaziReference.SILING_TABLE.get(zhi, []):
+            stem_index = BaziReference.HEAVENLY_STEMS.index(period["stem"])
+            lookup[zhi_index, cumulative_days:cumulative_days + period["days"]] = stem_index
+            cumulative_days += period["days"]
+    return lookup
+
+
+SILING_LOOKUP = _build_siling_lookup()
+
+
+class AlmanacGenerator:
+    """
+    黄历生成器
+
+    按日取值（黄历惯例，与 lunar_python 的 getYearInGanZhiByLiChun / getMonthInGanZhi 一致）：
+    - 交节当天即算新月令，立春当天即算新年
+    - 日柱按公历日期（不含晚子时换日）
+    - 司令按距交节日的整天数查 SILING_TABLE
+    节气时刻由 compute_jie_seconds 一次性向量化算出，不逐日构造 lunar_python 对象。
+    """
+
+    def build(self, start_date, end_date):
+        """
+        生成 [start_date, end_date] 的每日干支数组
+
+        Args:
+            start_date: "YYYY-MM-DD" 或 date
+            end_date: "YYYY-MM-DD" 或 date（含）
+
+        Returns:
+            {
+                "date": datetime64[D] 数组,
+                "year_index": uint8,     // 年柱六十甲子序号
+                "month_index": uint8,    // 月柱序号
+                "day_index": uint8,      // 日柱序号
+                "siling_stem": uint8,    // 司令天干下标（HEAVENLY_STEMS），无则 NO_SILING
+                "jie_index": uint8,      // 当日所在月令的"节"（JIE_NAMES 下标）
+                "jie_today": int8        // 当日交节的"节"下标，无则 -1
+            }
+        """
+        days = self._date_range(start_date, end_date)
+        return self._build_days(days, self._jie_days(days))
+
+    def iter_chunks(self, start_date, end_date, chunk_days=3650):
+        """
+        分块生成（每块结构同 build()），节气表只算一次
+
+        Yields:
+            build() 格式的字典，每块最多 chunk_days 天
+        """
+        days = self._date_range(start_date, end_date)
+        jie_days = self._jie_days(days)
+        for offset in range(0, len(days), chunk_days):
+            yield self._build_days(days[offset:offset + chunk_days], jie_days)
+
+    # ============================================
+    # 输出
+    # ============================================
+
+    FIELDS = ["date", "year", "month", "day", "siling", "jie", "jie_today"]
+
+    @staticmethod
+    def to_rows(chunk):
+        """数组块 -> 文本行 [[date, year, month, day, siling, jie, jie_today], ...]"""
+        siling_names = dict(enumerate(BaziReference.HEAVENLY_STEMS))
+        siling_names[NO_SILING] = ""
+        return [
+            [
+                str(date),
+                JIAZI_NAMES[year],
+                JIAZI_NAMES[month],
+                JIAZI_NAMES[day],
+                siling_names[siling],
+                JIE_NAMES[jie],
+                JIE_NAMES[today] if today >= 0 else ""
+            ]
+            for date, year, month, day, siling, jie, today in zip(
+                chunk["date"].tolist(),
+                chunk["year_index"].tolist(),
+                chunk["month_index"].tolist(),
+                chunk["day_index"].tolist(),
+                chunk["siling_stem"].tolist(),
+                chunk["jie_index"].tolist(),
+                chunk["jie_today"].tolist()
+            )
+        ]
+
+    def write_csv(self, path, start_date, end_date, chunk_days=3650):
+        """分块写出 CSV（UTF-8，带表头），返回写出的天数"""
+        count = 0
+        with open(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(self.FIELDS)
+            for chunk in self.iter_chunks(start_date, end_date, chunk_days):
+                rows = self.to_rows(chunk)
+                writer.writerows(rows)
+                count += len(rows)
+        return count
+
+    def write_jsonl(self, path, start_date, end_date, chunk_days=3650):
+        """分块写出 JSONL（每行一天），返回写出的天数"""
+        count = 0
+        with open(path, "w", encoding="utf-8") as f:
+            for chunk in self.iter_chunks(start_date, end_date, chunk_days):
+                rows = self.to_rows(chunk)
+                f.write("".join(
+                    json.dumps(dict(zip(self.FIELDS, row)), ensure_ascii=False) + "\n"
+                    for row in rows
+                ))
+                count += len(rows)
+        return count
+
+    # ============================================
+    # 向量化计算
+    # ============================================
+
+    @staticmethod
+    def _date_range(start_date, end_date):
+        start = np.datetime64(str(start_date), "D")
+        end = np.datetime64(str(end_date), "D")
+        if end < start:
+            raise ValueError("end_date must not be earlier than start_date")
+        return np.arange(start, end + 1, dtype="datetime64[D]")
+
+    @staticmethod
+    def _jie_days(days):
+        """
+        覆盖整个区间的"节"（按时间展开）
+
+        Returns:
+            (交节日的纪元日数组, 每个"节"所属公历年数组)
+        """
+        first_year = int(days[0].astype("datetime64[Y]").astype(np.int64)) + 1970 - 1
+        last_year = int(days[-1].astype("datetime64[Y]").astype(np.int64)) + 1970
+        seconds = compute_jie_seconds(first_year, last_year)
+        jie_day = (seconds // 86400).ravel()
+        jie_year = np.repeat(np.arange(first_year, last_year + 1), 12)
+        return jie_day, jie_year
+
+    @staticmethod
+    def _build_days(days, jie_days):
+        jie_day, jie_year = jie_days
+        day_number = days.astype(np.int64)
+
+        # 1. 当日所在月令：最后一个交节日不晚于当天的"节"
+        position = np.searchsorted(jie_day, day_number, side="right") - 1
+        jie_index = position % 12
+        month_zhi = (jie_index + 1) % 12
+
+        # 2. 年柱：小寒所在月份仍属上一年（立春为岁首）
+        bazi_year = jie_year[position] - (jie_index == 0)
+        year_index = (bazi_year - 4) % 60
+
+        # 3. 月柱：五虎遁
+        month_gan = (WUHU_START[year_index % 10] + (month_zhi - 2) % 12) % 10
+        month_index = (6 * month_gan - 5 * month_zhi) % 60
+
+        # 4. 日柱：日序数同余
+        day_index = (day_number + _EPOCH_ORDINAL + DAY_INDEX_OFFSET) % 60
+
+        # 5. 司令与交节日
+        days_since_jie = day_number - jie_day[position]
+        siling_stem = SILING_LOOKUP[month_zhi, np.minimum(days_since_jie, 31)]
+        jie_today = np.where(days_since_jie == 0, jie_index, -1)
+
+        return {
+            "date": days,
+            "year_index": year_index.astype(np.uint8),
+            "month_index": month_index.astype(np.uint8),
+            "day_index": day_index.astype(np.uint8),
+            "siling_stem": siling_stem,
+            "jie_index": jie_index.astype(np.uint8),
+            "jie_today": jie_today.astype(np.int8)
+        }
@@ -0,0 +1,456 @@
+# bazi_batch.py
+"""
+批量排盘命令行（bazi-batch）
+负责读取 CSV / JSONL 出生资料，分块交给预加载了 BaziService 的进程池排盘，
+结果按输入顺序（或完成顺序）流式写出 JSONL，失败项写入单独的错误文件，
+并定期记录断点，崩溃后可从上次完成的位置续跑；
+同一套分块调度也以生成器 iter_charts() 提供给库调用方
+"""
+
+import argparse
+import csv
+import json
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import wait, FIRST_COMPLETED
+
+from bazi_service import normalize_chart_request
+from chart_serializer import dumps
+from fork_launcher import create_fork_pool, create_process_pool
+from metrics_exporter import MetricsExporter, ServingMetrics, enable_worker_metrics, worker_task_done
+
+# CSV 中按布尔值解析的列
+BOOL_FIELDS = ["hour_unknown", "lunar", "is_leap_month"]
+TRUE_TEXTS = {"1", "true", "yes", "y", "是"}
+
+
+# ============================================
+# 工作进程（每个进程一份 BaziService / 时区查找器 / 日历表）
+# ============================================
+
+_worker_service = None
+
+
+def _init_worker(metrics_dir=None):
+    """进程池初始化：构造服务并预加载（时区查找器、日历表，预排一盘）；metrics_dir 非空时开启各步骤埋点"""
+    global _worker_service
+    from bazi_service import BaziService
+
+    _worker_service = BaziService().warmup()
+    if metrics_dir:
+        # 每块结束即写入（块足够大，写文件开销可忽略；任务结束时数据完整）
+        enable_worker_metrics(metrics_dir, interval=0)
+
+
+def _error_line(offset, record, error):
+    return dumps({"offset": offset, "input": record, "error": error}) + b"\n"
+
+
+def _run_chunk(chunk):
+    """
+    在工作进程内排一块（generate_complete_charts 共享时区、分析与参考表），结果直接序列化为 JSONL 行（UTF-8 字节）
+
+    Args:
+        chunk: [(offset, record), ...]，record 为输入行字典（解析失败时见 read_births()）
+
+    Returns:
+        [(offset, 是否成功, JSONL 行), ...]，与 chunk 等长
+    """
+    lines = [None] * len(chunk)
+    requests = []
+    positions = []
+    for position, (offset, record) in enumerate(chunk):
+        if "__parse_error__" in record:
+            lines[position] = (offset, False, _error_line(offset, record["raw"], record["__parse_error__"]))
+            continue
+        try:
+            requests.append(normalize_chart_request(record))
+            positions.append(position)
+        except (ValueError, TypeError) as exc:
+            lines[position] = (offset, False, _error_line(offset, record, f"{type(exc).__name__}: {exc}"))
+
+    for position, result in zip(positions, _worker_service.generate_complete_charts(requests)):
+        offset, record = chunk[position]
+        if isinstance(result, Exception):
+            lines[position] = (offset, False, _error_line(offset, record, f"{type(result).__name__}: {result}"))
+        else:
+            output = {"offset": offset}
+            if "id" in record:
+                output["id"] = record["id"]
+            output["chart"] = result
+            lines[position] = (offset, True, dumps(output) + b"\n")
+    worker_task_done()
+    return lines
+
+
+# ============================================
+# 输入
+# ============================================
+
+def read_births(path, input_format=None):
+    """
+    逐行读取出生资料（流式，不整体载入内存）
+
+    Args:
+        path: CSV（带表头，列名同 generate_complete_chart 参数，可选 id 列）或 JSONL 文件
+        input_format: "csv" / "jsonl"，默认按扩展名判断
+
+    Yields:
+        (offset, record)：offset 为数据行序号（从0开始，不含表头与空行）；
+        JSONL 行解析失败时 record 为 {"raw": 原始行, "__parse_error__": 错误信息}
+    """
+    if input_format is None:
+        input_format = "csv" if path.lower().endswith(".csv") else "jsonl"
+
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        if input_format == "csv":
+            for offset, row in enumerate(csv.DictReader(f)):
+                record = {key: value for key, value in row.items() if key and value not in (None, "")}
+                for key in BOOL_FIELDS:
+                    if key in record:
+                        record[key] = record[key].strip().lower() in TRUE_TEXTS
+                yield offset, record
+            return
+
+        offset = 0
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("JSONL line must be an object")
+            except ValueError as exc:
+                record = {"raw": line.rstrip("\n"), "__parse_error__": f"{type(exc).__name__}: {exc}"}
+            yield offset, record
+            offset += 1
+
+
+# ============================================
+# 分块调度与库接口
+# ============================================
+
+def _iter_chunk_results(executor, function, chunks, max_in_flight, ordered):
+    """
+    按窗口把块提交给进程池，逐块给出结果
+
+    已提交未取走的块（含按序模式下等待前面块的）不超过 max_in_flight；
+    生成器挂起期间不再提交新块，消费者慢时输入端随之停顿（背压）。
+    生成器提前关闭时取消尚未开始的块。
+
+    Yields:
+        (chunk, function(chunk))，ordered=True 时按提交顺序，否则按完成顺序
+    """
+    running = {}       # future -> (序号, chunk)
+    finished = {}      # 序号 -> (chunk, 结果)，按序模式下等待前面的块
+    next_sequence = 0
+    submitted = 0
+    exhausted = False
+
+    try:
+        while True:
+            while not exhausted and len(running) + len(finished) < max_in_flight:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                running[executor.submit(function, chunk)] = (submitted, chunk)
+                submitted += 1
+
+            if not running and not finished:
+                return
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in sorted(done, key=lambda item: running[item][0]):
+                sequence, chunk = running.pop(future)
+                finished[sequence] = (chunk, future.result())
+
+            if ordered:
+                while next_sequence in finished:
+                    yield finished.pop(next_sequence)
+                    next_sequence += 1
+            else:
+                for sequence in sorted(finished):
+                    yield finished.pop(sequence)
+    finally:
+        for future in running:
+            future.cancel()
+
+
+def _run_chart_chunk(chunk):
+    """工作进程内排一块：[(index, request), ...] -> [结果或异常对象, ...]"""
+    results = _worker_service.generate_complete_charts([request for _, request in chunk])
+    worker_task_done()
+    return results
+
+
+def create_pool(workers=None, fork=False, metrics_dir=None):
+    """
+    创建预加载了 BaziService 的进程池，可在多次 iter_charts() 调用间复用
+
+    每个工作进程只在启动时构造一次服务（时区查找器、日历表、节气缓存），之后所有块共用；
+    fork=True 时改为在当前进程预加载一次再 fork 出工作进程，只读数据各进程共享（见 fork_launcher.py）；
+    metrics_dir 非空时各工作进程开启埋点，汇总数据写入该目录（由 metrics_exporter.MetricsExporter 读取）
+    """
+    if fork:
+        return create_fork_pool(workers, _init_worker, (metrics_dir,))
+    return create_process_pool(workers or os.cpu_count() or 1, initializer=_init_worker, initargs=(metrics_dir,))
+
+
+def iter_charts(inputs, workers=None, chunk_size=32, ordered=True, executor=None):
+    """
+    流式批量排盘（生成器）
+
+    输入可以是任意长度的可迭代对象（包括不落地的生成器），只在需要时读取；
+    同时处理的块不超过 workers * 2，内存占用与输入长度无关，
+    消费者处理慢时不再读取新的输入。
+
+    Args:
+        inputs: 可迭代的排盘参数，每项格式同 generate_complete_charts() 的单项
+                {"birth_date", "birth_time", "longitude", "latitude", "gender", ...}
+        workers: 工作进程数（默认 CPU 核数）
+        chunk_size: 每块条数（块内经 generate_complete_charts 共享时区、分析与参考表）
+        ordered: True 按输入顺序给出，False 按完成顺序给出
+        executor: create_pool() 创建的进程池（可选，不传时本次调用内部创建并在结束后关闭）
+
+    Yields:
+        (index, result)：index 为该项在 inputs 中的序号，
+        result 为 generate_complete_chart() 的结果；该项出错时为异常对象
+    """
+    workers = workers or os.cpu_count() or 1
+    own_executor = executor is None
+    if own_executor:
+        executor = create_pool(workers)
+
+    def chunks():
+        chunk = []
+        for index, request in enumerate(inputs):
+            chunk.append((index, request))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    try:
+        for chunk, results in _iter_chunk_results(executor, _run_chart_chunk, chunks(), workers * 2, ordered):
+            for (index, _), result in zip(chunk, results):
+                yield index, result
+    finally:
+        if own_executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+# ============================================
+# 断点
+# ============================================
+
+class Checkpoint:
+    """
+    续跑断点
+
+    记录 next_offset（此前的全部输入均已写出）、next_offset 之后已写出的块区间，
+    以及写断点时输出文件和错误文件的字节数；续跑时把两个文件截断到该长度，
+    跳过已完成的行，从而既不丢行也不重复写出。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.next_offset = 0
+        self.completed = []          # [[start, end), ...]，均不早于 next_offset
+        self.output_bytes = 0
+        self.error_bytes = 0
+
+    def load(self):
+        """读取断点文件，不存在时返回 False"""
+        if not os.path.exists(self.path):
+            return False
+        with open(self.path, encoding="utf-8") as f:
+            state = json.load(f)
+        self.next_offset = state["next_offset"]
+        self.completed = [tuple(span) for span in state["completed"]]
+        self.output_bytes = state["output_bytes"]
+        self.error_bytes = state["error_bytes"]
+        return True
+
+    def is_done(self, offset):
+        return offset < self.next_offset or any(start <= offset < end for start, end in self.completed)
+
+    def save(self, next_offset, completed, output_bytes, error_bytes):
+        """原子写入（先写临时文件再替换）"""
+        self.next_offset = next_offset
+        self.completed = [span for span in completed if span[1] > next_offset]
+        self.output_bytes = output_bytes
+        self.error_bytes = error_bytes
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "next_offset": self.next_offset,
+                "completed": [list(span) for span in self.completed],
+                "output_bytes": output_bytes,
+                "error_bytes": error_bytes
+            }, f)
+        os.replace(temp_path, self.path)
+
+
+# ============================================
+# 批量执行
+# ============================================
+
+class BatchRunner:
+    """
+    批量排盘执行器
+
+    输入按 chunk_size 行分块提交，同时在途（含已完成待写出）的块不超过 workers * 2，
+    内存占用与输入长度无关；ordered=True 时按输入顺序写出，否则按完成顺序写出。
+    metrics_path 非空时开启各步骤埋点，结束后把 Prometheus 文本格式指标写入该文件。
+    """
+
+    def __init__(self, workers=None, chunk_size=64, ordered=True, fork=False, metrics_path=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.ordered = ordered
+        self.fork = fork
+        self.metrics_path = metrics_path
+        self.max_in_flight = self.workers * 2
+        self.serving_metrics = None
+
+    def run(self, input_path, output_path, error_path=None, checkpoint_path=None,
+            resume=False, input_format=None):
+        """
+        执行批量排盘
+
+        Args:
+            input_path: 输入 CSV / JSONL
+            output_path: 结果 JSONL，每行 {"offset", "id"（输入有 id 时）, "chart"}
+            error_path: 错误 JSONL，每行 {"offset", "input", "error"}，默认 output_path + ".errors.jsonl"
+            checkpoint_path: 断点文件，默认 output_path + ".checkpoint"
+            resume: 为True时从断点续跑，否则从头开始（覆盖已有输出）
+            input_format: "csv" / "jsonl"，默认按扩展名判断
+
+        Returns:
+            {"processed": 本次处理行数, "succeeded": ..., "failed": ..., "skipped": 续跑跳过的行数, "seconds": ...}
+        """
+        error_path = error_path or output_path + ".errors.jsonl"
+        checkpoint = Checkpoint(checkpoint_path or output_path + ".checkpoint")
+        if not (resume and checkpoint.load()):
+            checkpoint = Checkpoint(checkpoint.path)
+
+        stats = {"processed": 0, "succeeded": 0, "failed": 0, "skipped": 0}
+        start_time = time.perf_counter()
+
+        metrics_dir = tempfile.mkdtemp(prefix="bazi_metrics_") if self.metrics_path else None
+        self.serving_metrics = ServingMetrics("batch", batch_metric="chunk_size") if self.metrics_path else None
+
+        output = self._open_truncated(output_path, checkpoint.output_bytes)
+        errors = self._open_truncated(error_path, checkpoint.error_bytes)
+        try:
+            with create_pool(self.workers, self.fork, metrics_dir) as executor:
+                self._execute(executor, read_births(input_path, input_format), checkpoint, output, errors, stats)
+        finally:
+            output.close()
+            errors.close()
+
+        stats["seconds"] = round(time.perf_counter() - start_time, 3)
+        if metrics_dir is not None:
+            self._write_metrics(metrics_dir, stats)
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+        return stats
+
+    def _write_metrics(self, metrics_dir, stats):
+        """合并各工作进程的埋点数据，连同本次任务的计数写入 metrics_path"""
+        exporter = MetricsExporter(worker_dir=metrics_dir, serving=self.serving_metrics)
+        for key in ["processed", "succeeded", "failed", "skipped"]:
+            exporter.add_gauge(f"batch_{key}_records", f"Records {key} in this run", lambda key=key: stats[key])
+        exporter.add_gauge("batch_run_seconds", "Wall time of this run", lambda: stats["seconds"])
+        exporter.add_gauge("batch_workers", "Worker processes", lambda: self.workers)
+        exporter.dump(self.metrics_path)
+
+    @staticmethod
+    def _open_truncated(path, size):
+        """以追加方式打开，并截断到断点记录的字节数（丢弃断点之后未确认的内容）"""
+        f = open(path, "ab")
+        f.truncate(size)
+        return f
+
+    def _iter_chunks(self, records, checkpoint, stats):
+        chunk = []
+        for offset, record in records:
+            if checkpoint.is_done(offset):
+                stats["skipped"] += 1
+                continue
+            chunk.append((offset, record))
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _execute(self, executor, records, checkpoint, output, errors, stats):
+        unwritten = []                       # 已提交、尚未写出的块起点（升序）
+        completed = list(checkpoint.completed)
+
+        def submitted_chunks():
+            for chunk in self._iter_chunks(records, checkpoint, stats):
+                unwritten.append(chunk[0][0])
+                yield chunk
+
+        for chunk, lines in _iter_chunk_results(
+                executor, _run_chunk, submitted_chunks(), self.max_in_flight, self.ordered):
+            for _, succeeded, line in lines:
+                (output if succeeded else errors).write(line)
+                stats["succeeded" if succeeded else "failed"] += 1
+            stats["processed"] += len(lines)
+            if self.serving_metrics is not None:
+                self.serving_metrics.observe_batch(len(lines))
+            output.flush()
+            errors.flush()
+
+            start, end = chunk[0][0], chunk[-1][0] + 1
+            unwritten.remove(start)
+            completed.append((start, end))
+            # 断点：最早未写出的块之前全部完成；没有未写出的块时即已读入的全部完成
+            if unwritten:
+                next_offset = unwritten[0]
+            else:
+                next_offset = max([span_end for _, span_end in completed] + [checkpoint.next_offset])
+            completed = [span for span in completed if span[1] > next_offset]
+            checkpoint.save(next_offset, completed, output.tell(), errors.tell())
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="bazi-batch", description="批量排盘（CSV / JSONL -> JSONL）")
+    parser.add_argument("input", help="输入文件（.csv 带表头，或 .jsonl）")
+    parser.add_argument("-o", "--output", required=True, help="结果 JSONL")
+    parser.add_argument("--errors", default=None, help="错误 JSONL（默认 <output>.errors.jsonl）")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default=None, help="输入格式（默认按扩展名）")
+    parser.add_argument("--workers", type=int, default=None, help="工作进程数（默认 CPU 核数）")
+    parser.add_argument("--chunk-size", type=int, default=64, help="每块行数")
+    parser.add_argument("--unordered", action="store_true", help="按完成顺序写出（默认按输入顺序）")
+    parser.add_argument("--resume", action="store_true", help="从断点续跑")
+    parser.add_argument("--checkpoint", default=None, help="断点文件（默认 <output>.checkpoint）")
+    parser.add_argument("--fork", action="store_true", help="预加载一次后 fork 工作进程（共享只读数据）")
+    parser.add_argument("--metrics-file", default=None, help="结束后写入 Prometheus 文本格式指标（各步骤耗时、缓存命中）")
+    args = parser.parse_args()
+
+    runner = BatchRunner(workers=args.workers, chunk_size=args.chunk_size, ordered=not args.unordered,
+                         fork=args.fork, metrics_path=args.metrics_file)
+    stats = runner.run(
+        args.input,
+        args.output,
+        error_path=args.errors,
+        checkpoint_path=args.checkpoint,
+        resume=args.resume,
+        input_format=args.format
+    )
+    rate = stats["processed"] / stats["seconds"] if stats["seconds"] else 0
+    print(
+        f"完成 {stats['processed']} 条（成功 {stats['succeeded']}，失败 {stats['failed']}，"
+        f"续跑跳过 {stats['skipped']}），用时 {stats['seconds']} 秒，{rate:.0f} 条/秒"
+    )
+
+
+if __name__ == "__main__":
+    main()
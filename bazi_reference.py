@@ -4,6 +4,22 @@
 存储所有静态表格数据，供其他模块查询使用
 """
 
+from types import MappingProxyType
+
+
+def freeze(value):
+    """
+    静态表转为只读结构（dict -> MappingProxyType，list -> tuple，逐层转换）
+
+    表在各线程、各请求间共享，只读结构保证调用方拿到的表无法被改写
+    """
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
 class BaziReference:
     """八字系统参考数据库"""
     
@@ -11,35 +27,40 @@ class BaziReference:
     # 基础干支系统
     # ============================================
     
-    HEAVENLY_STEMS = ['甲', '乙', '丙', '丁', '戊', '己', '庚', '辛', '壬', '癸']
-    EARTHLY_BRANCHES = ['子', '丑', '寅', '卯', '辰', '巳', '午', '未', '申', '酉', '戌', '亥']
+    HEAVENLY_STEMS = freeze(['甲', '乙', '丙', '丁', '戊', '己', '庚', '辛', '壬', '癸'])
+    EARTHLY_BRANCHES = freeze(['子', '丑', '寅', '卯', '辰', '巳', '午', '未', '申', '酉', '戌', '亥'])
+    
+    # 五虎遁 / 五鼠遁起始天干序号：按年干 / 日干序号（甲=0）给出寅月月干 / 子时时干的序号
+    # （与 ChartBuilder.wuhu_dun / wushu_dun 的口诀一致，供向量化模块按序号查表）
+    WUHU_START = freeze([2, 4, 6, 8, 0, 2, 4, 6, 8, 0])
+    WUSHU_START = freeze([0, 2, 4, 6, 8, 0, 2, 4, 6, 8])
     
     # 干支对应五行
-    STEM_TO_ELEMENT = {
+    STEM_TO_ELEMENT = freeze({
         '甲': '木', '乙': '木',
         '丙': '火', '丁': '火',
         '戊': '土', '己': '土',
         '庚': '金', '辛': '金',
         '壬': '水', '癸': '水'
-    }
+    })
     
-    BRANCH_TO_ELEMENT = {
+    BRANCH_TO_ELEMENT = freeze({
         '寅': '木', '卯': '木',
         '巳': '火', '午': '火',
         '辰': '土', '未': '土', '戌': '土', '丑': '土',
         '申': '金', '酉': '金',
         '亥': '水', '子': '水'
-    }
+    })
     
     # 阴阳属性
-    YANG_STEMS = ['甲', '丙', '戊', '庚', '壬']
-    YIN_STEMS = ['乙', '丁', '己', '辛', '癸']
+    YANG_STEMS = freeze(['甲', '丙', '戊', '庚', '壬'])
+    YIN_STEMS = freeze(['乙', '丁', '己', '辛', '癸'])
     
     # ============================================
     # 地支藏干表（模块1.7核心数据）
     # ============================================
     
-    HIDDEN_STEMS = {
+    HIDDEN_STEMS = freeze({
         "子": ["癸", "壬"],
         "丑": ["己", "癸", "辛"],
         "寅": ["甲", "丙", "戊"],
@@ -52,14 +73,14 @@ class BaziReference:
         "酉": ["辛"],
         "戌": ["戊", "辛", "丁"],
         "亥": ["壬", "甲"]
-    }
+    })
     
     # ============================================
     # 月令司令表（模块1.14核心数据）
     # 依据《渊海子平》《三命通会》
     # ============================================
     
-    SILING_TABLE = {
+    SILING_TABLE = freeze({
         "寅": [
             {"stem": "戊", "period": "本气", "days": 7},
             {"stem": "丙", "period": "中气", "days": 7},
@@ -117,7 +138,7 @@ class BaziReference:
             {"stem": "癸", "period": "中气", "days": 3},
             {"stem": "辛", "period": "余气", "days": 18}
         ]
-    }
+    })
     
     # ============================================
     # 十神生克关系表（模块1.9核心数据）
@@ -125,7 +146,7 @@ class BaziReference:
     
     # 十神判断：基于五行生克关系
     # 我生者为食伤，生我者为印，克我者为官杀，我克者为财，同类为比劫
-    SHISHEN_RULES = {
+    SHISHEN_RULES = freeze({
         # 格式：(日干五行, 他干五行, 阴阳关系) -> 十神
         # 阴阳关系：same=同性, diff=异性
         
@@ -188,13 +209,13 @@ class BaziReference:
         ('水', '土', 'diff'): '正官',
         ('水', '金', 'same'): '偏印',
         ('水', '金', 'diff'): '正印',
-    }
+    })
     
     # ============================================
     # 十二长生表（模块1.13核心数据）
     # ============================================
     
-    CHANGSHENG_TABLE = {
+    CHANGSHENG_TABLE = freeze({
         '甲': {
             '亥': '长生', '子': '沐浴', '丑': '冠带', '寅': '临官', '卯': '帝旺', '辰': '衰',
             '巳': '病', '午': '死', '未': '墓', '申': '绝', '酉': '胎', '戌': '养'
@@ -235,33 +256,33 @@ class BaziReference:
             '卯': '长生', '寅': '沐浴', '丑': '冠带', '子': '临官', '亥': '帝旺', '戌': '衰',
             '酉': '病', '申': '死', '未': '墓', '午': '绝', '巳': '胎', '辰': '养'
         }
-    }
+    })
     
     # ============================================
     # 旺相休囚死表（模块1.11核心数据）
     # ============================================
     
-    WANGXIANG_TABLE = {
+    WANGXIANG_TABLE = freeze({
         "春季": {"木": "旺", "火": "相", "水": "休", "金": "囚", "土": "死"},
         "夏季": {"火": "旺", "土": "相", "木": "休", "水": "囚", "金": "死"},
         "秋季": {"金": "旺", "水": "相", "土": "休", "火": "囚", "木": "死"},
         "冬季": {"水": "旺", "木": "相", "金": "休", "火": "囚", "土": "死"}
-    }
+    })
     
     # 地支对应季节
-    BRANCH_TO_SEASON = {
+    BRANCH_TO_SEASON = freeze({
         '寅': '春季', '卯': '春季', '辰': '春季',
         '巳': '夏季', '午': '夏季', '未': '夏季',
         '申': '秋季', '酉': '秋季', '戌': '秋季',
         '亥': '冬季', '子': '冬季', '丑': '冬季'
-    }
+    })
     
     # ============================================
     # 调候速查表（模块1.11核心数据）
     # 依据《穷通宝鉴》精简版
     # ============================================
     
-    TIAOHOU_TABLE = {
+    TIAOHOU_TABLE = freeze({
         # 甲木
         "甲寅": "丙火为主，癸水为辅", "甲卯": "庚金为主，丙火为辅",
         "甲辰": "庚金为先，丁火次之", "甲巳": "癸水为先，庚金次之",
@@ -341,13 +362,13 @@ class BaziReference:
         "癸申": "丁火为先，庚金为辅", "癸酉": "辛金为先，丙火为辅",
         "癸戌": "辛金为先，甲木为辅", "癸亥": "庚辛金为先，戊土为辅",
         "癸子": "丙火为先，辛金为辅", "癸丑": "丙火为先，辛金为辅"
-    }
+    })
     
     # ============================================
     # 🆕 开运元素映射表
     # ============================================
     
-    LUCK_ELEMENTS_MAP = {
+    LUCK_ELEMENTS_MAP = freeze({
         "木": {
             "directions": "东方",
             "colors": "绿色、青色、碧绿色",
@@ -383,13 +404,13 @@ class BaziReference:
             "careers": "水产、航运、贸易、旅游、物流快递、水利工程、心理咨询、策划设计",
             "environment": "水边、海滨、潜水场所、池塘、水景园林、洗浴中心"
         }
-    }
+    })
     
     # ============================================
     # 纳音表（模块1.14核心数据）
     # ============================================
     
-    NAYIN_TABLE = {
+    NAYIN_TABLE = freeze({
         "甲子": "海中金", "乙丑": "海中金",
         "丙寅": "炉中火", "丁卯": "炉中火",
         "戊辰": "大林木", "己巳": "大林木",
@@ -420,7 +441,7 @@ class BaziReference:
         "戊午": "天上火", "己未": "天上火",
         "庚申": "石榴木", "辛酉": "石榴木",
         "壬戌": "大海水", "癸亥": "大海水"
-    }
+    })
     
     # ============================================
     # 工具方法
@@ -437,6 +458,25 @@ class BaziReference:
         zhi_index = offset % 12
         return BaziReference.HEAVENLY_STEMS[gan_index] + BaziReference.EARTHLY_BRANCHES[zhi_index]
     
+    @staticmethod
+    def get_jiazi_index(gan, zhi):
+        """
+        获取干支在六十甲子中的序号（甲子=0，癸亥=59）
+        
+        Returns:
+            序号；阴阳不配（如"甲丑"）时返回None
+        """
+        gan_index = BaziReference.HEAVENLY_STEMS.index(gan)
+        zhi_index = BaziReference.EARTHLY_BRANCHES.index(zhi)
+        if gan_index % 2 != zhi_index % 2:
+            return None
+        return (6 * gan_index - 5 * zhi_index) % 60
+    
+    @staticmethod
+    def get_ganzhi_by_index(index):
+        """根据六十甲子序号获取干支"""
+        return BaziReference.HEAVENLY_STEMS[index % 10] + BaziReference.EARTHLY_BRANCHES[index % 12]
+    
     @staticmethod
     def get_stem_element(stem):
         """获取天干对应的五行"""
@@ -450,7 +490,7 @@ class BaziReference:
     @staticmethod
     def get_hidden_stems(branch):
         """获取地支藏干"""
-        return BaziReference.HIDDEN_STEMS.get(branch, [])
+        return BaziReference.HIDDEN_STEMS.get(branch, ())
     
     @staticmethod
     def get_shishen(day_gan, other_gan):
@@ -509,7 +549,7 @@ class BaziReference:
         Returns:
             司令信息字典
         """
-        siling_periods = BaziReference.SILING_TABLE.get(month_branch, [])
+        siling_periods = BaziReference.SILING_TABLE.get(month_branch, ())
     
         cumulative_days = 0
         for period in siling_periods:
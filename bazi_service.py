@@ -9,6 +9,46 @@ from chart_builder import ChartBuilder
 from chart_analyzer import ChartAnalyzer
 from timeline_calculator import TimelineCalculator
 from bazi_reference import BaziReference
+from instrumentation import count, timed
+import copy
+import math
+import threading
+from datetime import datetime, timedelta
+
+
+def normalize_chart_request(payload):
+    """
+    外部输入（HTTP 请求体、批量输入行）-> generate_complete_charts() 的单项参数
+
+    校验必填字段，经纬度统一为浮点数、开关统一为布尔值；HTTP 服务、批量排盘与预热快照共用
+
+    Raises:
+        ValueError: 缺少必填字段或 fields 格式不对
+        TypeError: 经纬度无法转换为浮点数
+    """
+    required = ["birth_date", "longitude", "latitude", "gender"]
+    missing = [key for key in required if key not in payload]
+    if missing:
+        raise ValueError(f"Missing fields: {missing}")
+    if not payload.get("hour_unknown") and not payload.get("birth_time"):
+        raise ValueError("Missing fields: ['birth_time']")
+    fields = payload.get("fields")
+    if fields is not None and not isinstance(fields, str) and not (
+            isinstance(fields, list) and all(isinstance(path, str) for path in fields)):
+        raise ValueError("fields must be a profile name or a list of field paths")
+
+    return {
+        "birth_date": payload["birth_date"],
+        "birth_time": payload.get("birth_time"),
+        "longitude": float(payload["longitude"]),
+        "latitude": float(payload["latitude"]),
+        "gender": payload["gender"],
+        "hour_unknown": bool(payload.get("hour_unknown", False)),
+        "lunar": bool(payload.get("lunar", False)),
+        "is_leap_month": bool(payload.get("is_leap_month", False)),
+        "fields": fields
+    }
+
 
 class BaziService:
     """八字系统总控服务"""
@@ -18,23 +58,85 @@ class BaziService:
         self.chart_builder = ChartBuilder()
         self.chart_analyzer = ChartAnalyzer()
         self.timeline_calculator = TimelineCalculator()
-    
-    def generate_complete_chart(self, birth_date, birth_time, longitude, latitude, gender):
+        self.reverse_lookup = None
+        self.boundary_analyzer = None
+        # 按需创建的组件（反查、边界分析）在多线程下只创建一次
+        self._lazy_lock = threading.Lock()
+        # 预设字段组合的投影树（按预设名缓存，只读）
+        self._profile_trees = {}
+        # 预热快照（load_snapshot() 载入后先查快照中的常见命盘）
+        self.snapshot = None
+        # 单次请求剖析结果（首次 profile_request() 时创建 ProfileStore）
+        self.request_profiles = None
+
+    def warmup(self):
+        """
+        预加载（服务端启动时调用）
+
+        时区查找器、pytz、lunar_python 与日历表默认在首个请求时才加载；
+        这里一次性完成，并预排一盘让各模块完成首次加载，避免首个请求承担冷启动耗时
+        """
+        from calendar_table import get_lunar_month_table
+
+        self.time_processor.warmup()
+        get_lunar_month_table()
+        self.generate_complete_chart("2000-01-01", "12:00", 116.4, 39.9, "男")
+        return self
+
+    def load_snapshot(self, path):
+        """
+        载入预热快照（见 warm_snapshot.py）：已解析的时区、"节"表与常见命盘结果
+
+        Returns:
+            是否载入；文件不存在、损坏或已失效（代码 / 数据变化）时返回 False，照常冷启动
+        """
+        from warm_snapshot import WarmSnapshot
+
+        try:
+            snapshot = WarmSnapshot.open(path)
+        except (OSError, ValueError):
+            return False
+        snapshot.install(self)
+        return True
+
+    @timed("service.generate_complete_chart")
+    def generate_complete_chart(self, birth_date, birth_time, longitude, latitude, gender, hour_unknown=False,
+                                lunar=False, is_leap_month=False, fields=None):
         """
         生成完整八字分析
         
         这是对外的唯一接口
         
         Args:
-            birth_date: "YYYY-MM-DD"
-            birth_time: "HH:MM"
+            birth_date: "YYYY-MM-DD"（lunar=True 时为农历年月日，如 "1984-10-13"）
+            birth_time: "HH:MM"（hour_unknown=True 时可传 None）
             longitude: 经度
             latitude: 纬度
             gender: "男" 或 "女"
+            hour_unknown: 出生时辰未知时为True，返回出生当日各时辰的候选命盘
+            lunar: birth_date 为农历日期时为True（经预计算农历月表转为公历）
+            is_leap_month: 农历闰月时为True
+            fields: 只输出部分字段：预设名（见 FIELD_PROFILES，如 "minimal"）
+                    或字段路径列表（如 ["pillars", "dayun.dayun_list", "analysis.wuxing_count.*.count"]）；
+                    未请求的段落不计算。默认输出全部
         
         Returns:
             完整的八字分析JSON（给LLM的最终数据）
+            hour_unknown=True 时返回结构见 _generate_hour_candidates()
         """
+        cached = self._snapshot_chart(birth_date, birth_time, longitude, latitude, gender, hour_unknown,
+                                      lunar, is_leap_month, fields)
+        if cached is not None:
+            return cached
+        
+        projection = self._resolve_fields(fields)
+        
+        if lunar:
+            birth_date = self._lunar_to_solar_date(birth_date, is_leap_month)
+        
+        if hour_unknown:
+            return self._generate_hour_candidates(birth_date, longitude, latitude, gender, projection)
+        
         # ========================================
         # Step 1: 时间处理（模块1.5）
         # ========================================
@@ -45,28 +147,45 @@ class BaziService:
             latitude
         )
         
-        # ========================================
-        # Step 2: 排盘（模块1.6 + 1.7 + 1.14）
-        # ========================================
-        chart_data = self.chart_builder.build_chart(solar_data, gender)
+        return self._chart_from_solar_data(solar_data, gender, projection)
+    
+    def generate_chart_from_solar_data(self, solar_data, gender, fields=None):
+        """
+        由已有的时间处理结果排盘（跳过时区查找与节气查找），ChartCodec 解码时从这里重建命盘
         
-        # ========================================
-        # Step 3: 特征分析（模块1.8 + 1.9 + 1.12 + 1.13 + 1.10）
-        # ========================================
-        analysis_result = self.chart_analyzer.analyze(chart_data)
+        Args:
+            solar_data: BaziTimeProcessor.get_solar_data() 格式的字典
+            gender: "男" 或 "女"
+            fields: 同 generate_complete_chart()
+        
+        Returns:
+            同 generate_complete_chart()；特征分析、参考表与大运按当前代码计算
+        """
+        return self._chart_from_solar_data(solar_data, gender, self._resolve_fields(fields))
+    
+    def _chart_from_solar_data(self, solar_data, gender, projection=None):
+        """
+        由时间处理结果继续排盘（Step 2-6）
+        
+        Args:
+            solar_data: BaziTimeProcessor.get_solar_data() 的输出
+            gender: "男" 或 "女"
+            projection: _resolve_fields() 的结果，默认输出全部
+        
+        Returns:
+            同 generate_complete_chart()
+        """
+        plan = self._plan_stages(projection)
         
         # ========================================
-        # Step 4: 参考表准备（模块1.11）
+        # Step 2: 排盘（模块1.6 + 1.7 + 1.14）
         # ========================================
-        reference_tables = self._prepare_reference_tables(chart_data)
+        chart_data = self.chart_builder.build_chart(solar_data, gender)
         
         # ========================================
-        # Step 5: 大运计算（模块3.1）
+        # Step 3-5: 特征分析、参考表、大运
         # ========================================
-        dayun_info = self.timeline_calculator.calculate_dayun(
-            chart_data,
-            chart_data["solar_terms_data"]
-        )
+        analysis_result, reference_tables, dayun_info, _ = self._enrich(chart_data, plan)
         
         # ========================================
         # Step 6: 组装最终JSON
@@ -75,9 +194,526 @@ class BaziService:
             chart_data,
             analysis_result,
             reference_tables,
-            dayun_info
+            dayun_info,
+            projection
         )
     
+    def _enrich(self, chart_data, plan, analysis_cache=None, reference_cache=None, fields_key=None):
+        """
+        排盘结果 -> 特征分析、参考表、大运（Step 3-5）
+        
+        一次排多个命盘时（批量、时辰未知的候选、时间校正的各段）传入缓存字典：
+        特征分析只依赖四柱干支（及 fields），参考表只依赖日干与月支，命中时直接沿用
+        
+        Args:
+            chart_data: ChartBuilder.build_chart() 的输出
+            plan: _plan_stages() 的结果
+            analysis_cache: {(四柱干支, fields_key): 特征分析}，为 None 时不缓存
+            reference_cache: {(日干, 月支): 参考表}，为 None 时不缓存
+            fields_key: 区分不同 fields 的特征分析（可哈希）
+        
+        Returns:
+            (analysis_result, reference_tables, dayun_info, reused)：未请求的段落为 None，
+            reused 为命中缓存而沿用的段落名
+        """
+        pillars = chart_data["pillars"]
+        reused = []
+        
+        # Step 3: 特征分析（模块1.8 + 1.9 + 1.12 + 1.13 + 1.10）
+        if analysis_cache is None:
+            analysis_result = self.chart_analyzer.analyze(chart_data, **plan["analysis"])
+        else:
+            signature = (tuple(pillars[key]["ganzhi"] for key in ["year", "month", "day", "time"]), fields_key)
+            if signature in analysis_cache:
+                count("batch.analysis_cache.hit")
+                reused.append("analysis")
+            else:
+                count("batch.analysis_cache.miss")
+                analysis_cache[signature] = self.chart_analyzer.analyze(chart_data, **plan["analysis"])
+            analysis_result = analysis_cache[signature]
+        
+        # Step 4: 参考表准备（模块1.11）
+        reference_tables = None
+        if plan["reference_tables"] and reference_cache is None:
+            reference_tables = self._prepare_reference_tables(chart_data)
+        elif plan["reference_tables"]:
+            reference_key = (pillars["day"]["gan"], pillars["month"]["zhi"])
+            if reference_key in reference_cache:
+                count("batch.reference_cache.hit")
+                reused.append("reference_tables")
+            else:
+                count("batch.reference_cache.miss")
+                reference_cache[reference_key] = self._prepare_reference_tables(chart_data)
+            reference_tables = reference_cache[reference_key]
+        
+        # Step 5: 大运计算（模块3.1）
+        dayun_info = None
+        if plan["dayun"]:
+            dayun_info = self.timeline_calculator.calculate_dayun(
+                chart_data,
+                chart_data["solar_terms_data"]
+            )
+        
+        return analysis_result, reference_tables, dayun_info, reused
+    
+    def _snapshot_chart(self, birth_date, birth_time, longitude, latitude, gender, hour_unknown=False,
+                        lunar=False, is_leap_month=False, fields=None):
+        """预热快照中与 generate_complete_chart() 同参数的结果；未载入快照或未命中时为 None"""
+        if self.snapshot is None:
+            return None
+        from warm_snapshot import chart_key
+        
+        cached = self.snapshot.get_chart(chart_key(
+            birth_date, birth_time, longitude, latitude, gender, hour_unknown, lunar, is_leap_month, fields
+        ))
+        count("snapshot.hit" if cached is not None else "snapshot.miss")
+        return cached
+    
+    # ========================================
+    # 字段投影
+    # ========================================
+    
+    # 顶层段落（generate_complete_chart 输出顺序）
+    CHART_SECTIONS = ["basic_info", "solar_terms_detail", "pillars", "analysis", "reference_tables", "dayun"]
+    
+    # 预设字段组合
+    FIELD_PROFILES = {
+        # 移动端：四柱 + 大运列表
+        "minimal": ["pillars", "dayun.dayun_list"],
+        # 常规展示：不含节气明细与参考表
+        "standard": ["basic_info", "pillars", "analysis", "dayun"],
+        # ReasoningOrchestrator 所需：除五行 sources 外的全部字段
+        "llm": [
+            "basic_info", "solar_terms_detail", "pillars",
+            "analysis.wuxing_count.*.count", "analysis.wuxing_count.*.ratio",
+            "analysis.root_analysis", "analysis.tougan_check", "analysis.internal_interactions",
+            "analysis.special_flags", "analysis.month_siling", "analysis.wangxiang_stats",
+            "analysis.interaction_context",
+            "reference_tables", "dayun"
+        ]
+    }
+    
+    def _resolve_fields(self, fields):
+        """
+        fields 参数 -> 投影树
+        
+        Returns:
+            None（输出全部）或嵌套字典：{"pillars": True, "dayun": {"dayun_list": True}}；
+            True 表示整段保留，"*" 匹配任意键，列表按元素逐个投影
+        
+        Raises:
+            ValueError: 未知的预设名或顶层段落
+        """
+        if fields is None:
+            return None
+        if isinstance(fields, str):
+            if fields not in self._profile_trees:
+                if fields not in self.FIELD_PROFILES:
+                    raise ValueError(f"Unknown field profile: {fields}")
+                self._profile_trees[fields] = self._resolve_fields(self.FIELD_PROFILES[fields])
+            return self._profile_trees[fields]
+        
+        tree = {}
+        for path in fields:
+            parts = path.split(".")
+            if parts[0] not in self.CHART_SECTIONS:
+                raise ValueError(f"Unknown field: {path}")
+            node = tree
+            for part in parts[:-1]:
+                if node.get(part) is True:
+                    break
+                node = node.setdefault(part, {})
+            else:
+                node[parts[-1]] = True
+        return tree
+    
+    def _plan_stages(self, projection):
+        """
+        由投影树决定各计算步骤是否执行
+        
+        Returns:
+            {
+                "analysis": ChartAnalyzer.analyze() 的 sections / with_sources / with_notes 参数,
+                "reference_tables": bool,
+                "dayun": bool
+            }
+        """
+        if projection is None:
+            return {
+                "analysis": {"sections": None, "with_sources": True, "with_notes": True},
+                "reference_tables": True,
+                "dayun": True
+            }
+        
+        analysis_tree = projection.get("analysis")
+        all_sections = [key for key in self.chart_analyzer.SECTIONS if key != "shishen_map"]
+        if analysis_tree is True or (analysis_tree and "*" in analysis_tree):
+            sections = set(all_sections)
+        else:
+            sections = set(analysis_tree or {}) & set(all_sections)
+        # 四柱的十神标注依赖 shishen_map
+        if "pillars" in projection:
+            sections.add("shishen_map")
+        
+        wuxing_tree = self._subtree(analysis_tree, "wuxing_count")
+        return {
+            "analysis": {
+                "sections": sections,
+                "with_sources": wuxing_tree is True or any(
+                    self._subtree(element, "sources") for element in (wuxing_tree or {}).values()
+                ),
+                "with_notes": bool(self._subtree(self._subtree(analysis_tree, "internal_interactions"), "note"))
+            },
+            "reference_tables": "reference_tables" in projection,
+            "dayun": "dayun" in projection
+        }
+    
+    @staticmethod
+    def _subtree(tree, key):
+        """投影树中 key 对应的子树（整段保留时为 True，未请求时为 None）"""
+        if tree is True or not tree:
+            return tree
+        return tree.get(key, tree.get("*"))
+    
+    def _project(self, value, tree):
+        """按投影树裁剪结果（见 _resolve_fields）"""
+        if tree is True:
+            return value
+        if isinstance(value, list):
+            return [self._project(item, tree) for item in value]
+        if not isinstance(value, dict):
+            return value
+        projected = {}
+        for key, item in value.items():
+            subtree = tree.get(key, tree.get("*"))
+            if subtree is not None:
+                projected[key] = self._project(item, subtree)
+        return projected
+    
+    # ========================================
+    # 批量排盘（micro-batch）
+    # ========================================
+    
+    @timed("service.generate_complete_charts")
+    def generate_complete_charts(self, requests):
+        """
+        批量排盘：结果与逐个调用 generate_complete_chart() 一致
+        
+        批内共享：同一经纬度只查一次时区，同一四柱只做一次特征分析，
+        同一日干月支只准备一次参考表（节气表本身已按年缓存 / 查日历表）。
+        
+        Args:
+            requests: [{"birth_date", "birth_time", "longitude", "latitude", "gender",
+                        可选 "hour_unknown" / "lunar" / "is_leap_month" / "fields"}, ...]
+        
+        Returns:
+            与 requests 等长的列表，每项为结果字典；某一项出错时该位置为抛出的异常对象
+            批内四柱相同的结果共享 analysis / reference_tables 中的子对象（按只读使用，
+            需要修改时请先 copy.deepcopy；深拷贝的开销与特征分析本身相当，这里不代为复制）
+        """
+        timezone_cache = {}
+        analysis_cache = {}
+        reference_cache = {}
+        results = []
+        
+        for request in requests:
+            try:
+                fields = request.get("fields")
+                if request.get("hour_unknown"):
+                    results.append(self.generate_complete_chart(
+                        request["birth_date"], request.get("birth_time"),
+                        request["longitude"], request["latitude"], request["gender"],
+                        hour_unknown=True,
+                        lunar=request.get("lunar", False),
+                        is_leap_month=request.get("is_leap_month", False),
+                        fields=fields
+                    ))
+                    continue
+                
+                cached = self._snapshot_chart(
+                    request["birth_date"], request.get("birth_time"),
+                    request["longitude"], request["latitude"], request["gender"],
+                    lunar=request.get("lunar", False), is_leap_month=request.get("is_leap_month", False),
+                    fields=fields
+                )
+                if cached is not None:
+                    results.append(cached)
+                    continue
+                
+                projection = self._resolve_fields(fields)
+                plan = self._plan_stages(projection)
+                fields_key = fields if fields is None or isinstance(fields, str) else tuple(fields)
+                
+                birth_date = request["birth_date"]
+                if request.get("lunar"):
+                    birth_date = self._lunar_to_solar_date(birth_date, request.get("is_leap_month", False))
+                
+                location = (request["longitude"], request["latitude"])
+                if location in timezone_cache:
+                    count("batch.timezone_cache.hit")
+                else:
+                    count("batch.timezone_cache.miss")
+                    timezone_cache[location] = self.time_processor.get_timezone(*location)
+                
+                solar_data = self.time_processor.get_solar_data(
+                    birth_date,
+                    request["birth_time"],
+                    request["longitude"],
+                    request["latitude"],
+                    timezone_str=timezone_cache[location]
+                )
+                chart_data = self.chart_builder.build_chart(solar_data, request["gender"])
+                analysis_result, reference_tables, dayun_info, _ = self._enrich(
+                    chart_data, plan, analysis_cache, reference_cache, fields_key
+                )
+                
+                results.append(self._assemble_final_json(
+                    chart_data,
+                    analysis_result,
+                    reference_tables,
+                    dayun_info,
+                    projection
+                ))
+            except Exception as exc:
+                results.append(exc)
+        
+        return results
+    
+    # ========================================
+    # 农历输入
+    # ========================================
+    
+    def _lunar_to_solar_date(self, lunar_date, is_leap_month=False):
+        """农历 "YYYY-MM-DD" -> 公历 "YYYY-MM-DD"（不合法时抛出 ValueError）"""
+        from calendar_table import get_lunar_month_table
+        
+        year, month, day = (int(part) for part in lunar_date.split("-"))
+        solar_date = get_lunar_month_table().to_solar(year, month, day, is_leap_month)
+        return solar_date.strftime("%Y-%m-%d")
+    
+    def convert_lunar_dates(self, lunar_dates, is_leap_months=None):
+        """
+        批量农历 -> 公历
+        
+        Args:
+            lunar_dates: ["1984-10-13", ...]（农历年月日）
+            is_leap_months: 与 lunar_dates 等长的布尔列表（可选）
+        
+        Returns:
+            ["1984-11-05", ...]，不合法的日期为 None
+        """
+        from calendar_table import get_lunar_month_table
+        import numpy as np
+        
+        parts = [[int(part) for part in item.split("-")] for item in lunar_dates]
+        years, months, days = (list(column) for column in zip(*parts)) if parts else ([], [], [])
+        solar_dates = get_lunar_month_table().to_solar_batch(years, months, days, is_leap_months)
+        return [None if np.isnat(item) else str(item) for item in solar_dates]
+    
+    # ========================================
+    # 时辰未知模式
+    # ========================================
+    
+    def _generate_hour_candidates(self, birth_date, longitude, latitude, gender, projection=None):
+        """
+        时辰未知：一次性生成出生当日（本地钟表时间 00:00-23:59）可能落入的每个时辰的候选命盘
+        
+        共享部分只算一次：时区查找、节气表（按年缓存）、同一四柱的特征分析、
+        同一日干月支的参考表；每个候选只重算时间换算、排盘和大运。
+        
+        本地一天换算成真太阳时后一般不与 00:00-24:00 对齐（如东经 134° 的东北比北京时间早约 37 分钟），
+        因此按分钟二分找出当日本地时间覆盖的每个真太阳时时辰（子时按 23:00-01:00 整段算一个，
+        日柱相同），一般为 13 个：当日开头与结尾的子时分属两天，四柱不同；
+        节气交接（或年柱切换）落在某个时辰内时，该时辰按切换分钟再分为两个候选（time_zhi 相同，月柱不同）。
+        每个候选取其本地时间段的中点排盘，与用 birth_date、该候选的 birth_time 单独调用
+        generate_complete_chart() 的结果一致（projection 为 _resolve_fields() 的结果，同样作用于每个候选）。
+        
+        Returns:
+            {
+                "hour_unknown": True,
+                "candidates": [   // 按本地时间先后排列
+                    {
+                        "time_zhi": "子",
+                        "birth_time": "00:14",                    // 排盘所用的本地钟表时间（均在 birth_date 当日）
+                        "birth_datetime": "1990-01-15 00:14",
+                        "start": "1990-01-15 00:00",              // 本地时间，含
+                        "end": "1990-01-15 00:23",                // 本地时间，不含
+                        "chart": {...}
+                    },
+                    ...
+                ],
+                "shared_sections": ["solar_terms_detail", ...],   // 所有候选完全相同的顶层段
+                "differing_fields": ["analysis.wuxing_count.木.count", ...]  // 有差异的分析字段
+            }
+        """
+        import pytz
+        
+        # 1. 时区只查一次
+        timezone_str = self.time_processor.get_timezone(longitude, latitude)
+        day_start = datetime.strptime(birth_date, "%Y-%m-%d")
+        minute_count = 24 * 60
+        
+        tst_cache = {}
+        
+        def tst_at(minute):
+            """
+            当日第 minute 分钟（本地时间）的 (实际存在的分钟, 物理真太阳时)；
+            夏令时跳过的分钟按其后第一个存在的分钟计，当日剩余分钟都不存在时为 (minute_count, None)
+            """
+            if minute >= minute_count:
+                return minute_count, None
+            if minute not in tst_cache:
+                try:
+                    tst = self.time_processor.to_true_solar_time(
+                        day_start + timedelta(minutes=minute), longitude, timezone_str
+                    )[1]
+                    tst_cache[minute] = (minute, tst)
+                except pytz.NonExistentTimeError:
+                    tst_cache[minute] = tst_at(minute + 1)
+            return tst_cache[minute]
+        
+        def reaches(minute, instant):
+            tst = tst_at(minute)[1]
+            return tst is None or tst >= instant
+        
+        def first_minute_from(instant, guess):
+            """
+            真太阳时不早于 instant 的第一分钟（真太阳时随本地时间单调递增）
+            
+            偏移不变时 guess 即为答案，只需验证两次；当日偏移有变化（UTC 零点的均时差、夏令时）时再二分查找
+            """
+            guess = min(max(guess, 1), minute_count)
+            if reaches(guess, instant) and not reaches(guess - 1, instant):
+                return guess
+            low, high = 0, minute_count
+            while low < high:
+                middle = (low + high) // 2
+                if reaches(middle, instant):
+                    high = middle
+                else:
+                    low = middle + 1
+            return low
+        
+        # 2. 依次找出每个时辰在当日本地时间中的分钟段 [first, end)
+        #    时辰窗口为真太阳时 [奇数点, 奇数点 + 2 小时)，子时 23:00 起
+        segments = []
+        first, tst = tst_at(0)
+        while tst is not None:
+            shifted = tst + timedelta(hours=1)
+            window_end = shifted.replace(hour=shifted.hour // 2 * 2, minute=0, second=0, microsecond=0) + timedelta(hours=1)
+            end = first_minute_from(window_end, first + math.ceil((window_end - tst).total_seconds() / 60))
+            segments.append((BaziReference.EARTHLY_BRANCHES[shifted.hour // 2], first, end))
+            first, tst = tst_at(end)
+        
+        # 3. 节气交接（月柱）或年柱切换落在某个时辰内时，该时辰在切换分钟处再分为两个候选
+        month_cache = {}
+        
+        def month_at(minute):
+            """实际存在的第 minute 分钟的 (命理年份, 月支)"""
+            if minute not in month_cache:
+                solar_terms = self.time_processor.get_solar_data(
+                    birth_date,
+                    (day_start + timedelta(minutes=minute)).strftime("%H:%M"),
+                    longitude,
+                    latitude,
+                    timezone_str=timezone_str
+                )["solar_terms"]
+                month_cache[minute] = (solar_terms["bazi_year_int"], solar_terms["month_zhi"])
+            return month_cache[minute]
+        
+        last_minute = segments[-1][2] - 1
+        while tst_at(last_minute)[0] != last_minute:
+            last_minute -= 1
+        switch_minutes = []
+        low = segments[0][1]
+        while month_at(low) != month_at(last_minute):
+            # 年月随时间单调推进，二分找出与 low 不同的第一分钟
+            high = last_minute
+            while high - low > 1:
+                middle = (low + high) // 2
+                if month_at(tst_at(middle)[0]) == month_at(low):
+                    low = middle
+                else:
+                    high = middle
+            low = tst_at(high)[0]
+            switch_minutes.append(low)
+        
+        for switch in switch_minutes:
+            for position, (time_zhi, first, end) in enumerate(segments):
+                if first < switch < end:
+                    segments[position:position + 1] = [(time_zhi, first, switch), (time_zhi, switch, end)]
+                    break
+        
+        plan = self._plan_stages(projection)
+        analysis_cache = {}
+        reference_cache = {}
+        candidates = []
+        
+        for time_zhi, first, end in segments:
+            # 4. 取分钟段中点（落在夏令时跳过的时段时顺延到其后第一个存在的分钟）
+            local_dt = day_start + timedelta(minutes=tst_at((first + end) // 2)[0])
+            
+            solar_data = self.time_processor.get_solar_data(
+                birth_date,
+                local_dt.strftime("%H:%M"),
+                longitude,
+                latitude,
+                timezone_str=timezone_str
+            )
+            chart_data = self.chart_builder.build_chart(solar_data, gender)
+            
+            # 5. 特征分析只依赖四柱干支，参考表只依赖日干与月支
+            analysis_result, reference_tables, dayun_info, _ = self._enrich(
+                chart_data, plan, analysis_cache, reference_cache
+            )
+            
+            candidates.append({
+                "time_zhi": time_zhi,
+                "birth_time": local_dt.strftime("%H:%M"),
+                "birth_datetime": local_dt.strftime("%Y-%m-%d %H:%M"),
+                "start": (day_start + timedelta(minutes=first)).strftime("%Y-%m-%d %H:%M"),
+                "end": (day_start + timedelta(minutes=end)).strftime("%Y-%m-%d %H:%M"),
+                "chart": copy.deepcopy(self._assemble_final_json(
+                    chart_data,
+                    analysis_result,
+                    reference_tables,
+                    dayun_info,
+                    projection
+                ))
+            })
+        
+        charts = [item["chart"] for item in candidates]
+        return {
+            "hour_unknown": True,
+            "candidates": candidates,
+            "shared_sections": [
+                section for section in charts[0]
+                if all(chart[section] == charts[0][section] for chart in charts[1:])
+            ],
+            "differing_fields": (
+                self._differing_fields([chart["analysis"] for chart in charts], "analysis")
+                if "analysis" in charts[0] else []
+            )
+        }
+    
+    def _differing_fields(self, sections, prefix):
+        """找出多个结构相同的字典中取值不一致的字段路径"""
+        first = sections[0]
+        if not all(isinstance(item, dict) for item in sections):
+            return [] if all(item == first for item in sections) else [prefix]
+        
+        fields = []
+        keys = list(first)
+        for item in sections[1:]:
+            keys.extend(key for key in item if key not in keys)
+        for key in keys:
+            fields.extend(self._differing_fields(
+                [item.get(key) for item in sections],
+                f"{prefix}.{key}"
+            ))
+        return fields
+    
+    @timed("service.prepare_reference_tables")
     def _prepare_reference_tables(self, chart_data):
         """
         准备参考表数据（给LLM查询用）
@@ -109,14 +745,52 @@ class BaziService:
             "tiaohou": tiaohou
         }
     
-    def _assemble_final_json(self, chart_data, analysis_result, reference_tables, dayun_info):
+    @timed("service.assemble_final_json")
+    def _assemble_final_json(self, chart_data, analysis_result, reference_tables, dayun_info, projection=None):
         """
         组装最终JSON（嵌套结构 + 完整调试信息）
         
-        这是给LLM的最终数据格式
+        这是给LLM的最终数据格式；projection 不为 None 时只组装其中请求的段落并裁剪字段
         """
-        pillars = chart_data["pillars"]
-        
+        sections = {
+            # 🆕 增强：完整基础信息（包含调试数据）
+            "basic_info": lambda: self._build_basic_info(chart_data),
+            
+            # 🆕 节气详细信息
+            "solar_terms_detail": lambda: chart_data.get("solar_terms_data", {}),
+            
+            "pillars": lambda: self._enrich_pillars(chart_data["pillars"], analysis_result["shishen_map"]),
+            
+            "analysis": lambda: self._build_analysis_section(analysis_result),
+            
+            "reference_tables": lambda: reference_tables,
+            
+            "dayun": lambda: dayun_info
+        }
+        if projection is None:
+            return {key: build() for key, build in sections.items()}
+        return {
+            key: self._project(build(), projection[key])
+            for key, build in sections.items() if key in projection
+        }
+    
+    def _build_basic_info(self, chart_data):
+        """组装 basic_info 段"""
+        return {
+            # 核心信息
+            "birth_time": chart_data["basic_info"]["birth_time"],
+            "true_solar_time": chart_data["basic_info"]["true_solar_time"],
+            "location": chart_data["basic_info"]["location"],
+            "timezone": chart_data["basic_info"]["timezone"],
+            "gender": chart_data["basic_info"]["gender"],
+            "special_time_marker": chart_data["basic_info"]["special_time_marker"],
+            
+            # 🆕 调试信息
+            "debug_info": chart_data.get("debug_info", {})
+        }
+    
+    def _enrich_pillars(self, pillars, shishen_map):
+        """为四柱添加十神标注"""
         # 为每个柱子添加十神标注
         def enrich_pillar(pillar, position):
             """给柱子添加十神等额外信息"""
@@ -125,7 +799,7 @@ class BaziService:
             # 天干十神
             gan = pillar["gan"]
             gan_key = f"{position}{gan}"
-            enriched["gan_shishen"] = analysis_result["shishen_map"].get(gan_key, "")
+            enriched["gan_shishen"] = shishen_map.get(gan_key, "")
             
             # 🔧 修复：地支藏干十神（从 shishen_map 提取）
             zhi = pillar["zhi"]
@@ -135,58 +809,37 @@ class BaziService:
                 enriched["hidden_stems_detail"].append({
                     "stem": stem,
                     "element": BaziReference.get_stem_element(stem),
-                    "shishen": analysis_result["shishen_map"].get(stem_key, "未知")
+                    "shishen": shishen_map.get(stem_key, "未知")
                 })
             
             return enriched
         
         return {
-            # 🆕 增强：完整基础信息（包含调试数据）
-            "basic_info": {
-                # 核心信息
-                "birth_time": chart_data["basic_info"]["birth_time"],
-                "true_solar_time": chart_data["basic_info"]["true_solar_time"],
-                "location": chart_data["basic_info"]["location"],
-                "timezone": chart_data["basic_info"]["timezone"],
-                "gender": chart_data["basic_info"]["gender"],
-                "special_time_marker": chart_data["basic_info"]["special_time_marker"],
-                
-                # 🆕 调试信息
-                "debug_info": chart_data.get("debug_info", {})
-            },
-            
-            # 🆕 节气详细信息
-            "solar_terms_detail": chart_data.get("solar_terms_data", {}),
-            
-            "pillars": {
-                "year": enrich_pillar(pillars["year"], "年干"),
-                "month": enrich_pillar(pillars["month"], "月干"),
-                "day": enrich_pillar(pillars["day"], "日干"),
-                "time": enrich_pillar(pillars["time"], "时干")
-            },
-            
-            "analysis": {
-                "wuxing_count": analysis_result["wuxing_count"],
-                "root_analysis": analysis_result["root_analysis"],
-                "tougan_check": analysis_result["tougan_check"],
-                "internal_interactions": analysis_result["internal_interactions"],
-                "special_flags": analysis_result["special_flags"],
-                
-                # 🆕 新增确定性计算结果，供LLM作为事实依据
-                "month_siling": analysis_result.get("month_siling"),
-                "wangxiang_stats": analysis_result.get("wangxiang_stats"),
-                "interaction_context": analysis_result.get("interaction_context")
-            },
-            
-            "reference_tables": reference_tables,
-            
-            "dayun": dayun_info
+            "year": enrich_pillar(pillars["year"], "年干"),
+            "month": enrich_pillar(pillars["month"], "月干"),
+            "day": enrich_pillar(pillars["day"], "日干"),
+            "time": enrich_pillar(pillars["time"], "时干")
         }
     
+    def _build_analysis_section(self, analysis_result):
+        """组装 analysis 段"""
+        return {
+            "wuxing_count": analysis_result.get("wuxing_count"),
+            "root_analysis": analysis_result.get("root_analysis"),
+            "tougan_check": analysis_result.get("tougan_check"),
+            "internal_interactions": analysis_result.get("internal_interactions"),
+            "special_flags": analysis_result.get("special_flags"),
+            
+            # 🆕 新增确定性计算结果，供LLM作为事实依据
+            "month_siling": analysis_result.get("month_siling"),
+            "wangxiang_stats": analysis_result.get("wangxiang_stats"),
+            "interaction_context": analysis_result.get("interaction_context")
+        }
     # ========================================
     # 流年分析接口（可选）
     # ========================================
     
+    @timed("service.analyze_specific_year")
     def analyze_specific_year(self, complete_chart, year):
         """
         分析特定流年
@@ -208,4 +861,391 @@ class BaziService:
             chart_data,
             complete_chart["dayun"],
             year
-        )
\ No newline at end of file
+        )
+    
+    # ========================================
+    # 边界敏感度接口（可选）
+    # ========================================
+    
+    def analyze_boundary_sensitivity(self, complete_chart):
+        """
+        分析出生时刻距离各类边界（时辰、子时、交节、司令、大运顺逆）的分钟数
+        
+        Args:
+            complete_chart: generate_complete_chart() 的输出
+        
+        Returns:
+            边界列表及另一侧的备选四柱（见 BoundaryAnalyzer.analyze）
+        """
+        return self._get_boundary_analyzer().analyze(complete_chart)
+    
+    def _get_boundary_analyzer(self):
+        """按需创建边界分析器（与本服务共用时间处理、排盘与大运模块）"""
+        if self.boundary_analyzer is None:
+            with self._lazy_lock:
+                if self.boundary_analyzer is None:
+                    from boundary_analyzer import BoundaryAnalyzer
+                    self.boundary_analyzer = BoundaryAnalyzer(
+                        self.time_processor,
+                        self.chart_builder,
+                        self.timeline_calculator
+                    )
+        return self.boundary_analyzer
+    
+    # ========================================
+    # 出生时间校正接口（可选）
+    # ========================================
+    
+    def rectify_birth_time(self, start_datetime, end_datetime, longitude, latitude, gender):
+        """
+        出生时间校正：按时间顺序列出本地时间窗口内出现的全部不同命盘
+        
+        不逐分钟排盘：由 BoundaryAnalyzer 从窗口起点逐个跳到下一个边界
+        （时辰、子时、交节、司令、元旦），再二分查找边界对应的本地分钟，
+        只在边界附近比较前后两分钟的四柱、司令与子时标记。
+        四柱干支与此前某段相同时沿用其特征分析，日干月支相同时沿用参考表（见 _enrich()）。
+        
+        Args:
+            start_datetime: "YYYY-MM-DD HH:MM"（本地钟表时间，含）
+            end_datetime: "YYYY-MM-DD HH:MM"（本地钟表时间，不含）
+            longitude: 经度
+            latitude: 纬度
+            gender: "男" 或 "女"
+        
+        Returns:
+            {
+                "timezone": "Asia/Shanghai",
+                "charts": [
+                    {
+                        "start": "1984-11-06 06:00",            // 本地时间，含
+                        "end": "1984-11-06 07:06",              // 本地时间，不含
+                        "true_solar_start": "1984-11-06 05:54:12",  // 首分钟的物理真太阳时
+                        "boundary": [],                         // 本段起点越过的边界类型（首段为空）
+                        "pillars": {"year": "甲子", "month": "甲戌", "day": "甲辰", "time": "丁卯"},
+                        "changes": [],                          // 相对上一段的变化项
+                        "reused_sections": [],                  // 沿用此前各段已算出的段落
+                        "chart": {...}                          // 以本段首分钟排出的完整结果
+                    },
+                    ...
+                ]
+            }
+        """
+        start = datetime.strptime(start_datetime, "%Y-%m-%d %H:%M")
+        end = datetime.strptime(end_datetime, "%Y-%m-%d %H:%M")
+        minute_count = int((end - start).total_seconds() // 60)
+        if minute_count <= 0:
+            raise ValueError("end_datetime must be later than start_datetime")
+        
+        timezone_str = self.time_processor.get_timezone(longitude, latitude)
+        analyzer = self._get_boundary_analyzer()
+        
+        tst_cache = {}
+        state_cache = {}
+        
+        def tst_at(minute):
+            """窗口内第 minute 分钟的物理真太阳时"""
+            if minute not in tst_cache:
+                tst_cache[minute] = self.time_processor.to_true_solar_time(
+                    start + timedelta(minutes=minute), longitude, timezone_str
+                )[1]
+            return tst_cache[minute]
+        
+        def state_at(minute):
+            if minute not in state_cache:
+                state_cache[minute] = analyzer.state_at(tst_at(minute), gender)
+            return state_cache[minute]
+        
+        def first_minute_from(instant):
+            """真太阳时不早于 instant 的第一分钟（二分查找）"""
+            low, high = 0, minute_count
+            while low < high:
+                middle = (low + high) // 2
+                if tst_at(middle) >= instant:
+                    high = middle
+                else:
+                    low = middle + 1
+            return low
+        
+        # 1. 边界 -> 命盘实际发生变化的分钟（节气天数有舍入，边界前后各留余量）
+        margin = analyzer.PROBE_MARGIN
+        change_points = {}
+        boundaries = analyzer.iter_boundaries(tst_at(0), tst_at(minute_count - 1) + margin)
+        for instant, boundary_type in boundaries:
+            first = max(first_minute_from(instant - margin), 1)
+            last = min(first_minute_from(instant + margin), minute_count - 1)
+            for minute in range(first, last + 1):
+                if analyzer.changed_fields(state_at(minute - 1), state_at(minute)):
+                    types = change_points.setdefault(minute, [])
+                    types.extend(item for item in boundary_type if item not in types)
+        
+        # 2. 逐段排盘，相邻段共用的部分直接沿用
+        starts = [0] + sorted(change_points)
+        plan = self._plan_stages(None)
+        analysis_cache = {}
+        reference_cache = {}
+        charts = []
+        for position, minute in enumerate(starts):
+            segment_end = starts[position + 1] if position + 1 < len(starts) else minute_count
+            local_dt = start + timedelta(minutes=minute)
+            
+            solar_data = self.time_processor.get_solar_data(
+                local_dt.strftime("%Y-%m-%d"),
+                local_dt.strftime("%H:%M"),
+                longitude,
+                latitude,
+                timezone_str=timezone_str
+            )
+            chart_data = self.chart_builder.build_chart(solar_data, gender)
+            pillars = chart_data["pillars"]
+            analysis_result, reference_tables, dayun_info, reused = self._enrich(
+                chart_data, plan, analysis_cache, reference_cache
+            )
+            
+            state = state_at(minute)
+            changes = []
+            if position > 0:
+                previous_state = state_at(minute - 1)
+                changes = analyzer.describe_changes(
+                    analyzer.changed_fields(previous_state, state), previous_state, state
+                )
+            
+            charts.append({
+                "start": local_dt.strftime("%Y-%m-%d %H:%M"),
+                "end": (start + timedelta(minutes=segment_end)).strftime("%Y-%m-%d %H:%M"),
+                "true_solar_start": tst_at(minute).strftime("%Y-%m-%d %H:%M:%S"),
+                "boundary": change_points.get(minute, []),
+                "pillars": {key: pillars[key]["ganzhi"] for key in ["year", "month", "day", "time"]},
+                "changes": changes,
+                "reused_sections": reused,
+                "chart": copy.deepcopy(self._assemble_final_json(
+                    chart_data,
+                    analysis_result,
+                    reference_tables,
+                    dayun_info
+                ))
+            })
+        
+        return {
+            "timezone": timezone_str,
+            "charts": charts
+        }
+    
+    # ========================================
+    # 增量更新接口（可选）
+    # ========================================
+    
+    # 可修改的输入字段
+    UPDATABLE_FIELDS = ["birth_date", "birth_time", "longitude", "latitude", "gender"]
+    
+    def update_chart(self, previous_result, **changes):
+        """
+        在已有结果上修正输入（性别、出生地等），只重跑受影响的阶段
+        
+        依赖关系：
+        - 出生日期/时间/经纬度 -> 时间处理 -> 排盘 -> （四柱干支变化时）特征分析、参考表
+        - 性别 -> 仅影响 basic_info.gender 与大运（顺逆、起运）
+        - 大运依赖年干、月柱、节气天数与性别，任一变化即重算
+        
+        Args:
+            previous_result: generate_complete_chart() 的完整输出（不支持 fields 投影或 hour_unknown 的结果）
+            **changes: birth_date / birth_time / longitude / latitude / gender 中的任意几项
+        
+        Returns:
+            {
+                "chart": 新的完整结果（结构同 generate_complete_chart）,
+                "recomputed_stages": ["time_processor", "chart_builder", "timeline"],
+                "changed_sections": ["solar_terms_detail", "pillars", "dayun"]
+            }
+        
+        Raises:
+            ValueError: previous_result 不是完整结果，或 changes 含不支持的字段
+        """
+        if not self._is_complete_chart(previous_result):
+            raise ValueError("update_chart requires a complete generate_complete_chart result")
+        unknown = [key for key in changes if key not in self.UPDATABLE_FIELDS]
+        if unknown:
+            raise ValueError(f"Unsupported fields: {unknown}")
+        
+        # 1. 从上次结果还原输入
+        basic = previous_result["basic_info"]
+        debug = basic.get("debug_info", {})
+        birth_date, birth_time = basic["birth_time"].split(" ")
+        inputs = {
+            "birth_date": birth_date,
+            "birth_time": birth_time,
+            "longitude": debug.get("longitude"),
+            "latitude": debug.get("latitude"),
+            "gender": basic["gender"]
+        }
+        changed_inputs = [key for key, value in changes.items() if inputs[key] != value]
+        inputs.update(changes)
+        
+        recomputed = []
+        time_changed = any(key != "gender" for key in changed_inputs)
+        
+        # 2. 时间处理 + 排盘（出生时间或地点变化）
+        if time_changed:
+            solar_data = self.time_processor.get_solar_data(
+                inputs["birth_date"],
+                inputs["birth_time"],
+                inputs["longitude"],
+                inputs["latitude"]
+            )
+            chart_data = self.chart_builder.build_chart(solar_data, inputs["gender"])
+            recomputed.extend(["time_processor", "chart_builder"])
+        else:
+            chart_data = self._chart_data_from_result(previous_result, inputs["gender"])
+        
+        previous_pillars = previous_result["pillars"]
+        ganzhi_changed = any(
+            chart_data["pillars"][key]["ganzhi"] != previous_pillars[key]["ganzhi"]
+            for key in ["year", "month", "day", "time"]
+        )
+        
+        # 3. 特征分析与参考表（只依赖四柱干支）
+        if ganzhi_changed:
+            analysis_result = self.chart_analyzer.analyze(chart_data)
+            reference_tables = self._prepare_reference_tables(chart_data)
+            pillars = self._enrich_pillars(chart_data["pillars"], analysis_result["shishen_map"])
+            analysis = self._build_analysis_section(analysis_result)
+            recomputed.extend(["chart_analyzer", "reference_tables"])
+        else:
+            analysis = copy.deepcopy(previous_result["analysis"])
+            reference_tables = copy.deepcopy(previous_result["reference_tables"])
+            pillars = self._reuse_enrichment(chart_data["pillars"], previous_pillars)
+        
+        # 4. 大运
+        if time_changed or "gender" in changed_inputs:
+            dayun_info = self.timeline_calculator.calculate_dayun(
+                chart_data,
+                chart_data["solar_terms_data"]
+            )
+            recomputed.append("timeline")
+        else:
+            dayun_info = copy.deepcopy(previous_result["dayun"])
+        
+        chart = {
+            "basic_info": self._build_basic_info(chart_data),
+            "solar_terms_detail": chart_data.get("solar_terms_data", {}),
+            "pillars": pillars,
+            "analysis": analysis,
+            "reference_tables": reference_tables,
+            "dayun": dayun_info
+        }
+        
+        return {
+            "chart": chart,
+            "recomputed_stages": recomputed,
+            "changed_sections": [
+                section for section in chart
+                if chart[section] != previous_result.get(section)
+            ]
+        }
+    
+    def _is_complete_chart(self, result):
+        """是否为完整结果：增量更新要从中还原输入并沿用未重算的段落，投影或裁剪过的结果不能使用"""
+        try:
+            basic = result["basic_info"]
+            debug = basic["debug_info"]
+            analysis = result["analysis"]
+            return (
+                all(section in result for section in self.CHART_SECTIONS)
+                and len(basic["birth_time"].split(" ")) == 2
+                and "gender" in basic
+                and debug["longitude"] is not None and debug["latitude"] is not None
+                and "prev_jie" in result["solar_terms_detail"]
+                and all(
+                    {"ganzhi", "gan_shishen", "hidden_stems_detail"} <= set(result["pillars"][key])
+                    for key in ["year", "month", "day", "time"]
+                )
+                and set(self._build_analysis_section({})) <= set(analysis)
+                and all("sources" in item for item in analysis["wuxing_count"].values())
+                and all("note" in item for item in analysis["internal_interactions"])
+                and "dayun_list" in result["dayun"]
+            )
+        except (KeyError, TypeError, AttributeError):
+            return False
+    
+    def _chart_data_from_result(self, result, gender):
+        """由最终JSON还原排盘数据（仅用于时间/地点未变的增量更新）"""
+        basic = copy.deepcopy(result["basic_info"])
+        debug_info = basic.pop("debug_info", {})
+        basic["gender"] = gender
+        return {
+            "basic_info": basic,
+            "pillars": copy.deepcopy(result["pillars"]),
+            "solar_terms_data": copy.deepcopy(result["solar_terms_detail"]),
+            "debug_info": debug_info
+        }
+    
+    def _reuse_enrichment(self, pillars, previous_pillars):
+        """四柱干支未变时，沿用上次的十神标注（司令天数等仍取新值）"""
+        enriched = {}
+        for key in ["year", "month", "day", "time"]:
+            enriched[key] = copy.deepcopy(pillars[key])
+            enriched[key]["gan_shishen"] = previous_pillars[key]["gan_shishen"]
+            enriched[key]["hidden_stems_detail"] = copy.deepcopy(previous_pillars[key]["hidden_stems_detail"])
+        return enriched
+    
+    # ========================================
+    # 八字反查接口（可选）
+    # ========================================
+    
+    def find_birth_windows(self, year_pillar, month_pillar, day_pillar, time_pillar):
+        """
+        由四柱干支反查出生时间区间
+        
+        Args:
+            year_pillar / month_pillar / day_pillar / time_pillar: 干支字符串，如 "甲子"
+        
+        Returns:
+            真太阳时区间列表（见 PillarReverseLookup.find_windows）
+        """
+        if self.reverse_lookup is None:
+            with self._lazy_lock:
+                if self.reverse_lookup is None:
+                    from reverse_lookup import PillarReverseLookup
+                    reverse_lookup = PillarReverseLookup()
+                    reverse_lookup.build_index()
+                    self.reverse_lookup = reverse_lookup
+        
+        return self.reverse_lookup.find_windows(
+            year_pillar,
+            month_pillar,
+            day_pillar,
+            time_pillar
+        )
+    
+    # ========================================
+    # 单次请求剖析（可选）
+    # ========================================
+    
+    def profile_request(self, method_name, *args, request_id=None, **kwargs):
+        """
+        剖析一次调用：对 self.<method_name>(*args, **kwargs) 开启 cProfile 与 tracemalloc，
+        结果按请求 ID 存入 self.request_profiles（见 request_profiler.py）；不经本方法的调用不受影响
+        
+        Args:
+            method_name: 本服务的公开方法名，如 "generate_complete_chart"、"analyze_specific_year"
+            request_id: 请求 ID，默认随机生成（需要在出错后查找记录时请自行指定）
+        
+        Returns:
+            (方法返回值, 请求 ID)；方法抛出异常时照常抛出（剖析记录已保存）
+        
+        Example:
+            chart, request_id = service.profile_request("generate_complete_chart", "1601-02-03", "23:50", 0.0, 89.9, "男")
+            summarize(service.request_profiles.get(request_id))
+        """
+        from request_profiler import ProfileStore, profile_call
+        
+        method = getattr(self, method_name, None) if not method_name.startswith("_") else None
+        if not callable(method) or method_name == "profile_request":
+            raise ValueError(f"Unknown method: {method_name}")
+        
+        if self.request_profiles is None:
+            with self._lazy_lock:
+                if self.request_profiles is None:
+                    self.request_profiles = ProfileStore()
+        
+        result, record = profile_call(method, args, kwargs, request_id=request_id, store=self.request_profiles)
+        return result, record["request_id"]
@@ -1,8 +1,11 @@
 from datetime import datetime, timedelta
 import math
-from timezonefinder import TimezoneFinder
-import pytz
-from lunar_python import Solar
+import threading
+
+from instrumentation import count, timed
+
+# timezonefinder / pytz / lunar_python / 日历表（numpy）均在首次用到时才导入，
+# import 本模块（及 bazi_service）不承担这些依赖的加载耗时；服务端可用 BaziService.warmup() 提前加载
 
 # Bazi只用"节"划分月份，"气"只用于参考（本系统算法主要用节）
 # 映射表：节气名称 -> 月支
@@ -15,8 +18,33 @@ JIE_ZHI_MAP = {
 
 class BaziTimeProcessor:
     def __init__(self):
-        # 初始化时区查找器，这是一个比较耗时的操作，建议单例模式或初始化一次
-        self.tf = TimezoneFinder()
+        # 时区查找器在首次查询时构建（耗时操作，之后复用；加锁保证多线程下只构建一次）
+        self._tf = None
+        self._tf_lock = threading.Lock()
+        # 已解析的时区（由预热快照载入，命中时无需构建时区查找器）
+        self._resolved_timezones = {}
+        # 按公历年缓存的"节"列表（节气表与经纬度无关，可在请求间共享）
+        # 不加锁：多个线程同时未命中时各自计算同一年的相同结果，后写入者覆盖，列表写入后不再修改
+        self._jie_cache = {}
+
+    @property
+    def tf(self):
+        """时区查找器（首次访问时导入 timezonefinder 并构建）"""
+        if self._tf is None:
+            with self._tf_lock:
+                if self._tf is None:
+                    from timezonefinder import TimezoneFinder
+                    self._tf = TimezoneFinder()
+        return self._tf
+
+    def warmup(self):
+        """预先导入 pytz、lunar_python 并构建时区查找器、加载日历表"""
+        import pytz
+        import lunar_python
+        from calendar_table import get_calendar_table
+
+        self.tf
+        get_calendar_table()
 
     def _get_equation_of_time(self, dt):
         """[内部方法] 计算均时差"""
@@ -24,79 +52,130 @@ class BaziTimeProcessor:
         b = 2 * math.pi * (day_of_year - 81) / 365.0
         return 9.87 * math.sin(2 * b) - 7.53 * math.cos(b) - 1.5 * math.sin(b)
 
-    def _calculate_solar_terms_info(self, true_solar_time):
-        """
-        计算节气详细信息，为1.6(排盘)、1.14(司令)、3.1(大运)做准备
-        """
-        # 1. 初始化 Solar 对象
-        solar = Solar.fromYmdHms(
-            true_solar_time.year,
-            true_solar_time.month,
-            true_solar_time.day,
-            true_solar_time.hour,
-            true_solar_time.minute,
-            true_solar_time.second
-        )
-        
-        # 2. 获取当年及前一年的所有节气（防止年初边界问题）
-        check_years = [true_solar_time.year - 1, true_solar_time.year, true_solar_time.year + 1]
-        all_jie_list = []
+    def _get_year_jie(self, year):
+        """[内部方法] 获取某公历年内的12个"节"（带缓存）"""
+        jie_list = self._jie_cache.get(year)
+        if jie_list is not None:
+            count("time_processor.jie_cache.hit")
+        else:
+            from lunar_python import Solar
+
+            count("time_processor.jie_cache.miss")
+            count("lunar_python.calls")
 
-        for y in check_years:
             # lunar_python 获取一年的节气表 (构造该年6月1日来获取整年表)
-            temp_solar = Solar.fromYmdHms(y, 6, 1, 0, 0, 0)
+            temp_solar = Solar.fromYmdHms(year, 6, 1, 0, 0, 0)
             jie_qi_table = temp_solar.getLunar().getJieQiTable()
             
+            jie_list = []
             for name, solar_obj in jie_qi_table.items():
                 if name in JIE_ZHI_MAP:
                     dt = datetime.strptime(solar_obj.toYmdHms(), "%Y-%m-%d %H:%M:%S")
-                    all_jie_list.append({
+                    jie_list.append({
                         "name": name,
                         "datetime": dt,
                         "zhi": JIE_ZHI_MAP[name],
-                        "year_belong": y
+                        "year_belong": year
                     })
+            self._jie_cache[year] = jie_list
+        return jie_list
+
+    def _find_jie_bounds(self, true_solar_time):
+        """[内部方法] 由 lunar_python 节气表找出夹住该时刻的前后两个"节"（日历表范围外使用）"""
+        # 获取当年及前后一年的所有节气（防止年初边界问题）
+        check_years = [true_solar_time.year - 1, true_solar_time.year, true_solar_time.year + 1]
+        all_jie_list = []
+
+        for y in check_years:
+            all_jie_list.extend(self._get_year_jie(y))
         
         # 按时间排序
         all_jie_list.sort(key=lambda x: x["datetime"])
         
-        # 3. 核心查找逻辑：找到出生时间夹在中间的两个"节"
-        prev_jie = None
-        next_jie = None
-        
         for i in range(len(all_jie_list) - 1):
             if all_jie_list[i]["datetime"] <= true_solar_time < all_jie_list[i+1]["datetime"]:
-                prev_jie = all_jie_list[i]
-                next_jie = all_jie_list[i+1]
-                break
+                return all_jie_list[i], all_jie_list[i+1]
+        return None, None
+
+    @timed("time_processor.get_timezone")
+    def get_timezone(self, longitude, latitude):
+        """根据经纬度获取时区名称（海洋或无法识别区域兜底为UTC）"""
+        if self._resolved_timezones:
+            timezone_str = self._resolved_timezones.get((longitude, latitude))
+            if timezone_str is not None:
+                count("time_processor.timezone_cache.hit")
+                return timezone_str
+        count("time_processor.timezone_finder.lookups")
+        timezone_str = self.tf.timezone_at(lng=longitude, lat=latitude)
+        if not timezone_str:
+            # 海洋或无法识别区域，兜底默认为UTC（或者你可以报错）
+            timezone_str = 'UTC' 
+        return timezone_str
+
+    def calculate_solar_terms_info(self, true_solar_time):
+        """
+        计算节气详细信息，为1.6(排盘)、1.14(司令)、3.1(大运)做准备
+        """
+        from calendar_table import get_calendar_table
+
+        # 1-2. 找到出生时间夹在中间的两个"节"（1600-2400年直接查预计算日历表）
+        table = get_calendar_table()
+        bounds = table.jie_bounds(true_solar_time) if table is not None else None
+        if bounds is not None:
+            count("calendar_table.jie_bounds.hit")
+            prev_jie, next_jie = bounds
+        else:
+            count("calendar_table.jie_bounds.miss")
+            prev_jie, next_jie = self._find_jie_bounds(true_solar_time)
                 
         # 容错处理
         if not prev_jie:
             return {"error": "Date out of range"}
 
-        # 4. 计算立春时刻（用于年柱判定）
-        bazi_year_int = true_solar_time.year
-        
-        # 特殊情况修正：公历1月/2月出生，但月令是小寒(丑月)，说明还没到立春，年柱-1
-        if prev_jie["name"] == "小寒" and true_solar_time.month <= 2:
-            bazi_year_int = true_solar_time.year - 1
+        # 3. 计算立春时刻（用于年柱判定）
+        bazi_year_int = self.bazi_year_int(true_solar_time, prev_jie["name"])
             
         # 获取当年的立春时间
         try:
-            lichun_node = next(item for item in all_jie_list if item["name"] == "立春" and item["year_belong"] == bazi_year_int)
-            is_after_lichun = true_solar_time >= lichun_node["datetime"]
-            lichun_dt_str = lichun_node["datetime"].strftime("%Y-%m-%d %H:%M:%S")
+            lichun_dt = table.lichun(bazi_year_int) if bounds is not None else None
+            if lichun_dt is None:
+                lichun_dt = next(item for item in self._get_year_jie(bazi_year_int) if item["name"] == "立春")["datetime"]
         except StopIteration:
             # 极罕见的边界情况，此时立春可能在数组范围外（需要扩大check_years，一般不会发生）
+            lichun_dt = None
+
+        return self.build_solar_terms_info(true_solar_time, prev_jie, next_jie, lichun_dt)
+
+    @staticmethod
+    def bazi_year_int(true_solar_time, prev_jie_name):
+        """命理年份：公历1月/2月出生且月令为小寒(丑月)时，尚未立春，年份-1"""
+        if prev_jie_name == "小寒" and true_solar_time.month <= 2:
+            return true_solar_time.year - 1
+        return true_solar_time.year
+
+    def build_solar_terms_info(self, true_solar_time, prev_jie, next_jie, lichun_dt):
+        """
+        由出生时刻、前后两个"节"与立春时刻组装节气详细信息
+        （calculate_solar_terms_info() 与 ChartCodec 解码共用）
+
+        Args:
+            true_solar_time: 物理真太阳时
+            prev_jie / next_jie: {"name", "datetime", "zhi"}
+            lichun_dt: 命理年份的立春时刻；查找失败时为 None（lichun_datetime 记为 "Error"）
+        """
+        if lichun_dt is not None:
+            is_after_lichun = true_solar_time >= lichun_dt
+            lichun_dt_str = lichun_dt.strftime("%Y-%m-%d %H:%M:%S")
+        else:
             lichun_dt_str = "Error"
             is_after_lichun = False
 
-        # 5. 计算时间差 (天)
+        # 4. 计算时间差 (天)
         diff_to_prev = (true_solar_time - prev_jie["datetime"]).total_seconds() / 86400
         diff_to_next = (next_jie["datetime"] - true_solar_time).total_seconds() / 86400
         
         return {
-            "bazi_year_int": bazi_year_int,
+            "bazi_year_int": self.bazi_year_int(true_solar_time, prev_jie["name"]),
             "month_zhi": prev_jie["zhi"],
             "is_after_lichun": is_after_lichun,
             "lichun_datetime": lichun_dt_str,
@@ -112,7 +191,40 @@ class BaziTimeProcessor:
             "days_to_next_jie": round(diff_to_next, 4)
         }
 
-    def get_solar_data(self, birth_date_str, birth_time_str, longitude, latitude):
+    def to_true_solar_time(self, local_dt_naive, longitude, timezone_str):
+        """
+        本地钟表时间 -> 物理真太阳时（不查节气，时辰未知、出生时间校正等按分钟扫描时使用）
+
+        本地时间不存在（夏令时跳过的时段）时抛出 pytz.NonExistentTimeError
+
+        Returns:
+            (local_dt_aware, tst_naive, eot_offset, geo_offset)
+        """
+        import pytz
+
+        # 转化为带时区的对象 (自动处理夏令时)
+        local_tz = pytz.timezone(timezone_str)
+        try:
+            local_dt_aware = local_tz.localize(local_dt_naive, is_dst=None)
+        except pytz.AmbiguousTimeError:
+            local_dt_aware = local_tz.localize(local_dt_naive, is_dst=False)
+
+        # 转为 UTC 标准时间
+        utc_dt = local_dt_aware.astimezone(pytz.utc)
+
+        # 经度时差: 经度 * 4分钟
+        geo_offset = longitude * 4.0
+        # 均时差
+        eot_offset = self._get_equation_of_time(utc_dt)
+        
+        # 得到真太阳时 (物理上的真实太阳时间)
+        true_solar_time = utc_dt + timedelta(minutes=geo_offset + eot_offset)
+        # 去掉时区信息，变成单纯的“年月日时分”，方便后续判断
+        tst_naive = true_solar_time.replace(tzinfo=None) # True Solar Time (Naive)
+        return local_dt_aware, tst_naive, eot_offset, geo_offset
+
+    @timed("time_processor.get_solar_data")
+    def get_solar_data(self, birth_date_str, birth_time_str, longitude, latitude, timezone_str=None):
         """
         核心方法：获取排盘所需的完整时间数据
         
@@ -126,6 +238,7 @@ class BaziTimeProcessor:
             birth_time_str: "HH:MM"
             longitude: 经度
             latitude: 纬度
+            timezone_str: 已知时区名称（可选，批量计算同一地点时复用，跳过时区查找）
             
         Returns:
             dict: 包含所有计算结果的字典，可直接存入数据库或传给下游排盘模块。
@@ -172,31 +285,13 @@ class BaziTimeProcessor:
         local_dt_naive = datetime.strptime(f"{birth_date_str} {birth_time_str}", "%Y-%m-%d %H:%M")
         
         # 2. 自动获取时区 (解决全球通用问题)
-        timezone_str = self.tf.timezone_at(lng=longitude, lat=latitude)
-        if not timezone_str:
-            # 海洋或无法识别区域，兜底默认为UTC（或者你可以报错）
-            timezone_str = 'UTC' 
+        if timezone_str is None:
+            timezone_str = self.get_timezone(longitude, latitude)
             
-        # 3. 转化为带时区的对象 (自动处理夏令时)
-        local_tz = pytz.timezone(timezone_str)
-        try:
-            local_dt_aware = local_tz.localize(local_dt_naive, is_dst=None)
-        except pytz.AmbiguousTimeError:
-            local_dt_aware = local_tz.localize(local_dt_naive, is_dst=False)
-
-        # 4. 转为 UTC 标准时间
-        utc_dt = local_dt_aware.astimezone(pytz.utc)
-
-        # 5. 计算真太阳时
-        # 经度时差: 经度 * 4分钟
-        geo_offset = longitude * 4.0
-        # 均时差
-        eot_offset = self._get_equation_of_time(utc_dt)
-        
-        # 得到真太阳时 (物理上的真实太阳时间)
-        true_solar_time = utc_dt + timedelta(minutes=geo_offset + eot_offset)
-        # 去掉时区信息，变成单纯的“年月日时分”，方便后续判断
-        tst_naive = true_solar_time.replace(tzinfo=None) # True Solar Time (Naive)
+        # 3-5. 夏令时 -> UTC -> 真太阳时
+        local_dt_aware, tst_naive, eot_offset, geo_offset = self.to_true_solar_time(
+            local_dt_naive, longitude, timezone_str
+        )
 
         # ---------------------------------------------------------
         # 第二步：命理逻辑处理 
@@ -217,7 +312,7 @@ class BaziTimeProcessor:
         # 2.2 年柱/月柱计算 (严格基于真太阳时查节气)
         # 注意：传入的是 tst_naive (物理真太阳时)，而不是换日后的 bazi_time
         # 因为立春交节时刻是天文时刻，不随子时换日而改变
-        solar_terms_data = self._calculate_solar_terms_info(tst_naive)
+        solar_terms_data = self.calculate_solar_terms_info(tst_naive)
 
         # ---------------------------------------------------------
         # 第三步：返回结构化数据 (数据库存储格式)
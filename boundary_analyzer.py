@@ -0,0 +1,215 @@
+# boundary_analyzer.py
+"""
+边界敏感度分析器
+负责直接由真太阳时与节气数据，计算出生时刻距离"任一柱、司令或大运顺逆发生变化"的最近时刻，
+并给出边界另一侧的备选结果（不做 ±N 分钟的反复排盘）
+"""
+
+from datetime import datetime, timedelta
+
+from bazi_reference import BaziReference
+
+
+class BoundaryAnalyzer:
+    """
+    边界敏感度分析器
+
+    候选边界全部解析得出：
+    - 时辰：奇数整点（23:00 同时是晚子时换日）
+    - 早晚子时：00:00（子时内标记变化）
+    - 节：上一个/下一个"节"的交节时刻（月柱，立春还涉及年柱与大运顺逆）
+    - 司令：上一个"节" + SILING_TABLE 累计天数
+    - 元旦：命理年份判定依赖公历年份（与 BaziTimeProcessor 保持一致）
+    每个边界只在两侧各求值一次，用于列出另一侧的四柱、司令与大运顺逆。
+    """
+
+    # 边界前一侧的取样余量
+    PROBE_MARGIN = timedelta(minutes=1)
+
+    def __init__(self, time_processor, chart_builder, timeline_calculator):
+        self.time_processor = time_processor
+        self.chart_builder = chart_builder
+        self.timeline_calculator = timeline_calculator
+
+    def analyze(self, complete_chart):
+        """
+        分析边界敏感度
+
+        Args:
+            complete_chart: generate_complete_chart() 的输出
+
+        Returns:
+            {
+                "true_solar_time": "1984-11-06 01:50:32",     // 物理真太阳时（晚子时未换日）
+                "nearest_boundary_minutes": 50.53,
+                "boundaries": [
+                    {
+                        "type": ["时辰"],
+                        "datetime": "1984-11-06 01:00:00",
+                        "side": "before",                     // before=出生前 | after=出生后
+                        "minutes": 50.53,
+                        "changes": [{"field": "time", "from": "乙丑", "to": "甲子"}, ...],
+                        "alternative": {
+                            "pillars": {"year": "甲子", "month": "甲戌", "day": "甲辰", "time": "甲子"},
+                            "siling": {"stem": "丁", "period": "余气"},
+                            "dayun_direction": "顺排",
+                            "special_time_marker": "早子时"
+                        }
+                    },
+                    ...
+                ]
+            }
+            boundaries 按距离升序，只列出确有变化的边界
+        """
+        basic = complete_chart["basic_info"]
+        solar_terms = complete_chart["solar_terms_detail"]
+        gender = basic["gender"]
+
+        tst = datetime.strptime(basic["true_solar_time"], "%Y-%m-%d %H:%M:%S")
+        if basic.get("special_time_marker") == "晚子时":
+            tst -= timedelta(days=1)
+
+        boundaries = []
+        for instant, boundary_type in self._candidate_boundaries(tst, solar_terms):
+            side = "before" if instant <= tst else "after"
+            # 边界两侧各取一刻：near 为靠近出生时刻的一侧，far 为另一侧
+            # （节气天数保留4位小数，约8.6秒，边界前一侧须留出余量）
+            just_before = self.state_at(instant - self.PROBE_MARGIN, gender)
+            just_after = self.state_at(instant, gender)
+            near, far = (just_after, just_before) if side == "before" else (just_before, just_after)
+
+            changes = self.changed_fields(near, far)
+            if not changes:
+                continue
+            boundaries.append({
+                "type": boundary_type,
+                "datetime": instant.strftime("%Y-%m-%d %H:%M:%S"),
+                "side": side,
+                "minutes": round(abs((instant - tst).total_seconds()) / 60, 2),
+                "changes": self.describe_changes(changes, near, far),
+                "alternative": far["detail"]
+            })
+
+        boundaries.sort(key=lambda item: item["minutes"])
+        return {
+            "true_solar_time": tst.strftime("%Y-%m-%d %H:%M:%S"),
+            "nearest_boundary_minutes": boundaries[0]["minutes"] if boundaries else None,
+            "boundaries": boundaries
+        }
+
+    def iter_boundaries(self, start_tst, end_tst):
+        """
+        依次给出 (start_tst, end_tst] 内的全部候选边界（物理真太阳时）
+
+        从 start_tst 出发，每次只跳到下一个边界，不逐分钟扫描
+
+        Yields:
+            (datetime, ["时辰", ...])
+        """
+        cursor = start_tst
+        while True:
+            solar_terms = self.time_processor.calculate_solar_terms_info(cursor)
+            upcoming = [
+                (instant, boundary_type)
+                for instant, boundary_type in self._candidate_boundaries(cursor, solar_terms)
+                if instant > cursor
+            ]
+            instant, boundary_type = upcoming[0]
+            if instant > end_tst:
+                return
+            yield instant, boundary_type
+            cursor = instant
+
+    def _candidate_boundaries(self, tst, solar_terms):
+        """解析出各类候选边界 [(时刻, [类型...]), ...]（同一时刻合并类型）"""
+        candidates = {}
+
+        def add(instant, boundary_type):
+            candidates.setdefault(instant, [])
+            if boundary_type not in candidates[instant]:
+                candidates[instant].append(boundary_type)
+
+        # 1. 时辰边界（奇数整点）
+        day_start = datetime(tst.year, tst.month, tst.day)
+        odd_hour = tst.hour if tst.hour % 2 == 1 else tst.hour - 1
+        prev_hour_bound = day_start + timedelta(hours=odd_hour)
+        next_hour_bound = prev_hour_bound + timedelta(hours=2)
+        for instant in (prev_hour_bound, next_hour_bound):
+            add(instant, "子时换日" if instant.hour == 23 else "时辰")
+
+        # 2. 早晚子时（00:00）：只在子时内才有意义
+        if tst.hour == 23:
+            add(day_start + timedelta(days=1), "早晚子时")
+        elif tst.hour == 0:
+            add(day_start, "早晚子时")
+
+        # 3. 节
+        prev_jie = datetime.strptime(solar_terms["prev_jie"]["datetime"], "%Y-%m-%d %H:%M:%S")
+        next_jie = datetime.strptime(solar_terms["next_jie"]["datetime"], "%Y-%m-%d %H:%M:%S")
+        add(prev_jie, "节")
+        add(next_jie, "节")
+
+        # 4. 司令分界：上一个"节" + 累计天数（取出生前后最近的两个）
+        cumulative_days = 0
+        siling_bounds = []
+        for period in BaziReference.SILING_TABLE.get(solar_terms["month_zhi"], []):
+            cumulative_days += period["days"]
+            instant = prev_jie + timedelta(days=cumulative_days)
+            if instant < next_jie:
+                siling_bounds.append(instant)
+        earlier = [b for b in siling_bounds if b <= tst]
+        later = [b for b in siling_bounds if b > tst]
+        if earlier:
+            add(earlier[-1], "司令")
+        if later:
+            add(later[0], "司令")
+
+        # 5. 元旦（命理年份判定依赖公历年份），只看当前节令区间内的
+        for new_year in (datetime(tst.year, 1, 1), datetime(tst.year + 1, 1, 1)):
+            if prev_jie < new_year < next_jie:
+                add(new_year, "元旦")
+
+        return sorted(candidates.items())
+
+    def state_at(self, tst, gender):
+        """在某一物理真太阳时求四柱、司令、大运顺逆与子时标记（出生时间校正也按分钟调用）"""
+        bazi_time = tst + timedelta(days=1) if tst.hour == 23 else tst
+        solar_terms = self.time_processor.calculate_solar_terms_info(tst)
+        pillars = self.chart_builder.build_pillars(bazi_time, solar_terms)
+
+        siling = pillars["month"].get("siling")
+        siling_brief = {"stem": siling["stem"], "period": siling["period"]} if siling else None
+        direction = self.timeline_calculator.determine_direction(pillars["year"]["gan"], gender)
+
+        if tst.hour == 23:
+            marker = "晚子时"
+        elif tst.hour == 0:
+            marker = "早子时"
+        else:
+            marker = "无"
+
+        ganzhi = {key: pillars[key]["ganzhi"] for key in ["year", "month", "day", "time"]}
+        state = dict(ganzhi)
+        state.update({
+            "siling": siling_brief,
+            "dayun_direction": direction,
+            "special_time_marker": marker,
+            "detail": {
+                "pillars": ganzhi,
+                "siling": siling_brief,
+                "dayun_direction": direction,
+                "special_time_marker": marker
+            }
+        })
+        return state
+
+    def changed_fields(self, state_a, state_b):
+        """两个状态（见 state_at）之间取值不同的字段"""
+        return [key for key in state_a if key != "detail" and state_a[key] != state_b[key]]
+
+    def describe_changes(self, changes, near, far):
+        """变化项列表：from 为出生一侧的取值，to 为越过边界后的取值"""
+        return [
+            {"field": key, "from": near[key], "to": far[key]}
+            for key in changes
+        ]
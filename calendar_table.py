@@ -0,0 +1,315 @@
+# calendar_table.py
+"""
+预计算日历表
+负责生成与加载 1600-2400 年逐日的日柱序号、月支和前后"节"的秒数偏移（.npy，可内存映射），
+供 BaziTimeProcessor（节气查找）和 ChartBuilder（日柱）直接查表，超出范围时再回退到 lunar_python；
+以及同一范围内农历年的正月初一、各月大小与闰月表，用于农历生日转公历
+"""
+
+import os
+import threading
+from datetime import date, datetime, timedelta
+
+import numpy as np
+
+from bazi_reference import BaziReference
+from bazi_time_processor import JIE_ZHI_MAP
+
+START_YEAR = 1600
+END_YEAR = 2400
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+TABLE_PATH = os.path.join(DATA_DIR, "calendar_table.npy")
+LUNAR_TABLE_PATH = os.path.join(DATA_DIR, "lunar_month_table.npy")
+
+# 每日一行（10字节），偏移均相对当日 00:00（北京时间，与 lunar_python 节气表一致）
+TABLE_DTYPE = np.dtype([
+    ("day_index", "u1"),          # 日柱六十甲子序号（按公历日期）
+    ("month_zhi", "u1"),          # 当日 00:00 所在月令的月支下标（BaziReference.EARTHLY_BRANCHES）
+    ("prev_jie_seconds", "<u4"),  # 上一个"节"距当日 00:00 的秒数（不晚于 00:00）
+    ("next_jie_seconds", "<u4")   # 下一个"节"距当日 00:00 的秒数（晚于 00:00）
+])
+
+# 月支下标 -> "节"名称（子=大雪 ... 亥=立冬）
+ZHI_JIE_NAMES = [
+    next(name for name, jie_zhi in JIE_ZHI_MAP.items() if jie_zhi == zhi)
+    for zhi in BaziReference.EARTHLY_BRANCHES
+]
+
+# 每个农历年一行（7字节）
+LUNAR_TABLE_DTYPE = np.dtype([
+    ("new_year_day", "<i4"),      # 正月初一距 1970-01-01 的天数
+    ("month_days_mask", "<u2"),   # 第 i 个月（按先后顺序，含闰月）为大月(30天)时第 i 位为1，否则29天
+    ("leap_month", "u1")          # 闰几月，无闰月为0
+])
+
+# 儒略日 -> Unix 纪元日
+_JULIAN_DAY_EPOCH = 2440588
+
+
+def build_calendar_table(start_year=START_YEAR, end_year=END_YEAR):
+    """
+    生成日历表（一次性离线计算，约0.2秒）
+
+    Returns:
+        TABLE_DTYPE 结构化数组，第 i 行对应 date(start_year, 1, 1) + i 天
+    """
+    from jie_calendar import compute_jie_seconds, DAY_INDEX_OFFSET
+
+    # 前后各多算一年，保证首尾日期都有前后两个"节"
+    jie_seconds = compute_jie_seconds(start_year - 1, end_year + 1).ravel()
+    jie_zhi = np.tile((np.arange(12) + 1) % 12, end_year - start_year + 3)
+
+    first_ordinal = date(start_year, 1, 1).toordinal()
+    ordinals = np.arange(first_ordinal, date(end_year, 12, 31).toordinal() + 1, dtype=np.int64)
+    day_start = (ordinals - date(1970, 1, 1).toordinal()) * 86400
+
+    position = np.searchsorted(jie_seconds, day_start, side="right") - 1
+
+    table = np.empty(len(ordinals), dtype=TABLE_DTYPE)
+    table["day_index"] = (ordinals + DAY_INDEX_OFFSET) % 60
+    table["month_zhi"] = jie_zhi[position]
+    table["prev_jie_seconds"] = day_start - jie_seconds[position]
+    table["next_jie_seconds"] = jie_seconds[position + 1] - day_start
+    return table
+
+
+def build_lunar_month_table(start_year=START_YEAR, end_year=END_YEAR):
+    """
+    生成农历月表（一次性离线计算，逐年读取 lunar_python 的月份数据，约3秒）
+
+    Returns:
+        LUNAR_TABLE_DTYPE 结构化数组，第 i 行对应农历 start_year + i 年
+    """
+    from lunar_python import LunarYear
+
+    table = np.zeros(end_year - start_year + 1, dtype=LUNAR_TABLE_DTYPE)
+    for row, year in enumerate(range(start_year, end_year + 1)):
+        lunar_year = LunarYear.fromYear(year)
+        months = lunar_year.getMonthsInYear()
+        mask = 0
+        for position, month in enumerate(months):
+            if month.getDayCount() == 30:
+                mask |= 1 << position
+        table[row]["new_year_day"] = months[0].getFirstJulianDay() - _JULIAN_DAY_EPOCH
+        table[row]["month_days_mask"] = mask
+        table[row]["leap_month"] = lunar_year.getLeapMonth()
+    return table
+
+
+def save_calendar_table(path=TABLE_PATH, lunar_path=LUNAR_TABLE_PATH):
+    """重新生成并保存日历表与农历月表"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    np.save(path, build_calendar_table())
+    np.save(lunar_path, build_lunar_month_table())
+
+
+class CalendarTable:
+    """
+    日历表查询
+
+    表按日期直接寻址，查询只做一次下标计算；
+    出生时刻晚于当日的下一个"节"时改查次日一行。
+    """
+
+    START_DATE = date(START_YEAR, 1, 1)
+
+    def __init__(self, table):
+        self.table = table
+        self.end_date = self.START_DATE + timedelta(days=len(table) - 1)
+
+    @classmethod
+    def load(cls, path=TABLE_PATH, mmap=True):
+        """加载 .npy（默认内存映射，多进程共享同一份页缓存）"""
+        return cls(np.load(path, mmap_mode="r" if mmap else None))
+
+    def _row(self, day):
+        """date -> 行号（超出范围返回 None）"""
+        offset = (day - self.START_DATE).days
+        if 0 <= offset < len(self.table):
+            return offset
+        return None
+
+    def day_jiazi_index(self, day):
+        """
+        日柱六十甲子序号（按公历日期，不含晚子时换日）
+
+        Args:
+            day: date 或 datetime
+
+        Returns:
+            int，超出表范围时返回 None
+        """
+        if isinstance(day, datetime):
+            day = day.date()
+        row = self._row(day)
+        if row is None:
+            return None
+        return int(self.table[row]["day_index"])
+
+    def jie_bounds(self, true_solar_time):
+        """
+        查找夹住某一时刻的前后两个"节"（prev <= t < next）
+
+        Returns:
+            (prev_jie, next_jie)，每项为 {"name", "datetime", "zhi"}；超出表范围时返回 None
+        """
+        day = true_solar_time.date()
+        row = self._row(day)
+        if row is None:
+            return None
+        day_start = datetime(day.year, day.month, day.day)
+        record = self.table[row]
+
+        # 当日已交节：改用次日一行（其"上一个节"即今日所交之节）
+        if true_solar_time >= day_start + timedelta(seconds=int(record["next_jie_seconds"])):
+            row += 1
+            if row >= len(self.table):
+                return None
+            day_start += timedelta(days=1)
+            record = self.table[row]
+
+        zhi_index = int(record["month_zhi"])
+        next_zhi_index = (zhi_index + 1) % 12
+        prev_jie = {
+            "name": ZHI_JIE_NAMES[zhi_index],
+            "datetime": day_start - timedelta(seconds=int(record["prev_jie_seconds"])),
+            "zhi": BaziReference.EARTHLY_BRANCHES[zhi_index]
+        }
+        next_jie = {
+            "name": ZHI_JIE_NAMES[next_zhi_index],
+            "datetime": day_start + timedelta(seconds=int(record["next_jie_seconds"])),
+            "zhi": BaziReference.EARTHLY_BRANCHES[next_zhi_index]
+        }
+        return prev_jie, next_jie
+
+    def lichun(self, year):
+        """某公历年立春的交节时刻（立春总在2月3-5日），超出表范围时返回 None"""
+        bounds = self.jie_bounds(datetime(year, 2, 2))
+        if bounds is None or bounds[1]["name"] != "立春":
+            return None
+        return bounds[1]["datetime"]
+
+
+class LunarMonthTable:
+    """
+    农历转公历
+
+    每行记录正月初一与各月大小，月序号 = 月份 - 1（闰月及其后的月份再 +1），
+    公历日期 = 正月初一 + 该月之前各月天数之和 + (日 - 1)
+    """
+
+    START_YEAR = START_YEAR
+
+    def __init__(self, table):
+        self.table = table
+        self.end_year = self.START_YEAR + len(table) - 1
+
+        # 预先展开每年各月的累计天数 [年, 月序号] -> 该月初一距正月初一的天数
+        bits = (table["month_days_mask"][:, None].astype(np.int64) >> np.arange(13)) & 1
+        month_count = 12 + (table["leap_month"] > 0)
+        lengths = np.where(np.arange(13) < month_count[:, None], 29 + bits, 0)
+        self.month_offsets = np.concatenate(
+            [np.zeros((len(table), 1), dtype=np.int64), np.cumsum(lengths, axis=1)], axis=1
+        )
+
+    @classmethod
+    def load(cls, path=LUNAR_TABLE_PATH):
+        return cls(np.load(path))
+
+    def to_solar(self, year, month, day, is_leap_month=False):
+        """
+        农历 -> 公历
+
+        Args:
+            year: 农历年（1600-2400）
+            month: 农历月（1-12）
+            day: 农历日（1-30）
+            is_leap_month: 是否闰月
+
+        Returns:
+            date
+
+        Raises:
+            ValueError: 年份超出范围、该年无此闰月或该月无此日
+        """
+        result = self.to_solar_batch([year], [month], [day], [is_leap_month])[0]
+        if np.isnat(result):
+            leap_text = "闰" if is_leap_month else ""
+            raise ValueError(f"Invalid lunar date: {year}年{leap_text}{month}月{day}日")
+        return result.astype(object)
+
+    def to_solar_batch(self, years, months, days, is_leap_months=None):
+        """
+        批量农历 -> 公历（向量化）
+
+        Args:
+            years / months / days: 等长的整数序列或数组
+            is_leap_months: 等长的布尔序列（可选，默认全部非闰月）
+
+        Returns:
+            datetime64[D] 数组，不合法的日期为 NaT
+        """
+        years = np.asarray(years, dtype=np.int64)
+        months = np.asarray(months, dtype=np.int64)
+        days = np.asarray(days, dtype=np.int64)
+        if is_leap_months is None:
+            is_leap = np.zeros(len(years), dtype=bool)
+        else:
+            is_leap = np.asarray(is_leap_months, dtype=bool)
+
+        row = years - self.START_YEAR
+        valid = (row >= 0) & (row < len(self.table)) & (months >= 1) & (months <= 12) & (days >= 1)
+        row = np.where(valid, row, 0)
+
+        leap_month = self.table["leap_month"][row].astype(np.int64)
+        valid &= ~is_leap | (leap_month == months)
+        has_leap_before = (leap_month > 0) & ((months > leap_month) | is_leap)
+        position = np.clip(months - 1 + has_leap_before, 0, 12)
+
+        month_start = self.month_offsets[row, position]
+        month_length = self.month_offsets[row, position + 1] - month_start
+        valid &= days <= month_length
+
+        epoch_day = self.table["new_year_day"][row].astype(np.int64) + month_start + days - 1
+        return np.where(valid, epoch_day, np.iinfo(np.int64).min).astype("datetime64[D]")
+
+
+_default_table = None
+_default_loaded = False
+_default_lunar_table = None
+# 多线程首次调用时只加载一次（标志在表赋值之后才置位，其他线程不会读到未加载的表）
+_default_lock = threading.Lock()
+
+
+def get_calendar_table():
+    """
+    获取默认日历表（首次调用时内存映射 data/calendar_table.npy，之后复用）
+
+    Returns:
+        CalendarTable；表文件不存在时返回 None（调用方回退到 lunar_python）
+    """
+    global _default_table, _default_loaded
+    if not _default_loaded:
+        with _default_lock:
+            if not _default_loaded:
+                if os.path.exists(TABLE_PATH):
+                    _default_table = CalendarTable.load()
+                _default_loaded = True
+    return _default_table
+
+
+def get_lunar_month_table():
+    """获取默认农历月表（首次调用时加载 data/lunar_month_table.npy，之后复用）"""
+    global _default_lunar_table
+    if _default_lunar_table is None:
+        with _default_lock:
+            if _default_lunar_table is None:
+                _default_lunar_table = LunarMonthTable.load()
+    return _default_lunar_table
+
+
+if __name__ == "__main__":
+    save_calendar_table()
+    print(f"已生成 {TABLE_PATH}")
+    print(f"已生成 {LUNAR_TABLE_PATH}")
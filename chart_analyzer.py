@@ -5,6 +5,7 @@
 """
 
 from bazi_reference import BaziReference
+from instrumentation import timed
 from interaction_engine import InteractionEngine
 
 class ChartAnalyzer:
@@ -13,19 +14,33 @@ class ChartAnalyzer:
     def __init__(self):
         pass
     
-    def analyze(self, chart_data):
+    # analyze() 结果中的各项（按输出顺序）
+    SECTIONS = [
+        "shishen_map", "wuxing_count", "root_analysis", "tougan_check", "internal_interactions",
+        "special_flags", "month_siling", "wangxiang_stats", "interaction_context"
+    ]
+    
+    @timed("chart_analyzer.analyze")
+    def analyze(self, chart_data, sections=None, with_sources=True, with_notes=True):
         """
         完整分析八字特征
         
         Args:
             chart_data: ChartBuilder.build_chart() 的输出
+            sections: 只计算其中列出的项（见 SECTIONS），默认全部
+            with_sources: 是否生成 wuxing_count 各五行的 sources 列表
+            with_notes: 是否生成 internal_interactions 各项的 note 文字
         
         Returns:
-            分析结果对象
+            分析结果对象（只含 sections 中的项）
         """
+        if sections is None:
+            sections = self.SECTIONS
+        
         pillars = chart_data["pillars"]
         day_gan = pillars["day"]["gan"]
         month_zhi = pillars["month"]["zhi"]
+        need_context = "interaction_context" in sections
         
         # 获取真太阳时和节气数据（用于计算月令分日）
         # days_since_jie 在 bazi_service 中计算并存入 basic_info.solar_terms.days_since_prev_jie
@@ -36,32 +51,37 @@ class ChartAnalyzer:
             days_since_jie = 0
             
         # 1. 计算月令司令 (Deterministic Algorithm)
-        siling_info = BaziReference.get_siling_info(month_zhi, days_since_jie, day_gan)
+        if "month_siling" in sections or need_context:
+            siling_info = BaziReference.get_siling_info(month_zhi, days_since_jie, day_gan)
         
         # 2. 计算旺相休囚死 (Deterministic Table Lookup)
-        season = BaziReference.get_season(month_zhi)
-        wangxiang_stats = {
-            elem: BaziReference.get_wangxiang(season, elem)
-            for elem in ["木", "火", "土", "金", "水"]
-        }
+        if "wangxiang_stats" in sections or need_context:
+            season = BaziReference.get_season(month_zhi)
+            wangxiang_stats = {
+                elem: BaziReference.get_wangxiang(season, elem)
+                for elem in ["木", "火", "土", "金", "水"]
+            }
         
         # 3. 互动上下文定性 (Deterministic Logic)
-        interactions = InteractionEngine.detect_bazi_internal(pillars)
-        interaction_context = self._qualify_interactions(interactions, siling_info, wangxiang_stats)
+        if "internal_interactions" in sections or need_context:
+            interactions = InteractionEngine.detect_bazi_internal(pillars, with_notes=with_notes)
+        if need_context:
+            interaction_context = self._qualify_interactions(interactions, siling_info, wangxiang_stats)
 
-        return {
-            "shishen_map": self._mark_shishen(pillars, day_gan),
-            "wuxing_count": self._count_wuxing(pillars),
-            "root_analysis": self._analyze_roots(pillars, day_gan),
-            "tougan_check": self._check_tougan(pillars, day_gan),
-            "internal_interactions": interactions,
-            "special_flags": self._check_special_flags(pillars, day_gan),
+        steps = {
+            "shishen_map": lambda: self._mark_shishen(pillars, day_gan),
+            "wuxing_count": lambda: self._count_wuxing(pillars, with_sources),
+            "root_analysis": lambda: self._analyze_roots(pillars, day_gan),
+            "tougan_check": lambda: self._check_tougan(pillars, day_gan),
+            "internal_interactions": lambda: interactions,
+            "special_flags": lambda: self._check_special_flags(pillars, day_gan),
             
             # 🆕 新增确定性计算结果，供LLM作为事实依据
-            "month_siling": siling_info,
-            "wangxiang_stats": wangxiang_stats,
-            "interaction_context": interaction_context
+            "month_siling": lambda: siling_info,
+            "wangxiang_stats": lambda: wangxiang_stats,
+            "interaction_context": lambda: interaction_context
         }
+        return {key: steps[key]() for key in self.SECTIONS if key in sections}
         
     def _qualify_interactions(self, interactions, siling_info, wangxiang_stats):
         """
@@ -159,11 +179,12 @@ class ChartAnalyzer:
     # 模块1.12：五行统计
     # ============================================
     
-    def _count_wuxing(self, pillars):
+    def _count_wuxing(self, pillars, with_sources=True):
         """
         统计五行分布
         
         注意：这只是辅助数据，不能直接用于旺衰判断
+        with_sources=False 时不生成 sources 列表
         
         Returns:
             {
@@ -172,11 +193,8 @@ class ChartAnalyzer:
             }
         """
         wuxing_detail = {
-            "木": {"count": 0, "sources": []},
-            "火": {"count": 0, "sources": []},
-            "土": {"count": 0, "sources": []},
-            "金": {"count": 0, "sources": []},
-            "水": {"count": 0, "sources": []}
+            element: {"count": 0, "sources": []} if with_sources else {"count": 0}
+            for element in ["木", "火", "土", "金", "水"]
         }
         
         # 统计天干（每个算1）
@@ -191,7 +209,8 @@ class ChartAnalyzer:
             element = BaziReference.get_stem_element(gan)
             
             wuxing_detail[element]["count"] += 1
-            wuxing_detail[element]["sources"].append(f"{gan}（{position}）")
+            if with_sources:
+                wuxing_detail[element]["sources"].append(f"{gan}（{position}）")
         
         # 统计地支藏干（每个算0.5）
         for position, pillar_key in [
@@ -207,7 +226,8 @@ class ChartAnalyzer:
             for cang_gan in hidden_stems:
                 element = BaziReference.get_stem_element(cang_gan)
                 wuxing_detail[element]["count"] += 0.5
-                wuxing_detail[element]["sources"].append(f"{zhi}藏{cang_gan}")
+                if with_sources:
+                    wuxing_detail[element]["sources"].append(f"{zhi}藏{cang_gan}")
         
         # 计算占比
         total = sum(item["count"] for item in wuxing_detail.values())
@@ -379,8 +399,8 @@ class ChartAnalyzer:
                 "hint": "..."
             }
         """
-        # 获取五行统计
-        wuxing_count_result = self._count_wuxing(pillars)
+        # 获取五行统计（只用数值，不生成 sources）
+        wuxing_count_result = self._count_wuxing(pillars, with_sources=False)
         
         # 提取数值
         wuxing_count = {
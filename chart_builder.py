@@ -5,6 +5,7 @@
 """
 
 from bazi_reference import BaziReference
+from instrumentation import count, timed
 
 class ChartBuilder:
     """四柱排盘构建器"""
@@ -12,6 +13,7 @@ class ChartBuilder:
     def __init__(self):
         pass
     
+    @timed("chart_builder.build_chart")
     def build_chart(self, solar_data, gender):
         """
         构建完整八字
@@ -32,7 +34,7 @@ class ChartBuilder:
         true_solar_time = datetime.strptime(true_solar_time_str, "%Y-%m-%d %H:%M:%S")
         
         # 构建四柱
-        pillars = self._build_pillars(true_solar_time, solar_terms)
+        pillars = self.build_pillars(true_solar_time, solar_terms)
         
         # 返回完整结构（保存所有原始数据）
         return {
@@ -57,7 +59,7 @@ class ChartBuilder:
             }
         }
     
-    def _build_pillars(self, true_solar_time, solar_terms):
+    def build_pillars(self, true_solar_time, solar_terms):
         """
         构建四柱（核心逻辑）
         
@@ -124,7 +126,7 @@ class ChartBuilder:
             "gan": gan,
             "zhi": zhi,
             "ganzhi": ganzhi,
-            "hidden_stems": BaziReference.get_hidden_stems(zhi),
+            "hidden_stems": list(BaziReference.get_hidden_stems(zhi)),
             "nayin": BaziReference.get_nayin(gan, zhi),
             "year_int": bazi_year_int
         }
@@ -145,7 +147,7 @@ class ChartBuilder:
             月柱对象（包含司令信息）
         """
         # 1. 五虎遁推月干
-        month_gan = self._wuhu_dun(year_gan, month_zhi)
+        month_gan = self.wuhu_dun(year_gan, month_zhi)
         
         # 2. 计算司令神（模块1.14）
         # 🆕 传入day_gan参数
@@ -156,7 +158,7 @@ class ChartBuilder:
         )
         
         # 3. 获取藏干
-        hidden_stems = BaziReference.get_hidden_stems(month_zhi)
+        hidden_stems = list(BaziReference.get_hidden_stems(month_zhi))
         
         return {
             "gan": month_gan,
@@ -171,21 +173,31 @@ class ChartBuilder:
         """
         构建日柱
         
-        使用lunar-python库
+        1600-2400年直接查预计算日历表，范围外使用lunar-python库
         """
-        from lunar_python import Solar
-        
-        solar = Solar.fromYmdHms(
-            true_solar_time.year,
-            true_solar_time.month,
-            true_solar_time.day,
-            true_solar_time.hour,
-            true_solar_time.minute,
-            true_solar_time.second
-        )
+        from calendar_table import get_calendar_table
+
+        table = get_calendar_table()
+        day_index = table.day_jiazi_index(true_solar_time) if table is not None else None
         
-        lunar = solar.getLunar()
-        day_gan_zhi = lunar.getDayInGanZhi()
+        if day_index is not None:
+            day_gan_zhi = BaziReference.get_ganzhi_by_index(day_index)
+        else:
+            from lunar_python import Solar
+
+            count("lunar_python.calls")
+            
+            solar = Solar.fromYmdHms(
+                true_solar_time.year,
+                true_solar_time.month,
+                true_solar_time.day,
+                true_solar_time.hour,
+                true_solar_time.minute,
+                true_solar_time.second
+            )
+            
+            lunar = solar.getLunar()
+            day_gan_zhi = lunar.getDayInGanZhi()
         
         gan = day_gan_zhi[0]
         zhi = day_gan_zhi[1]
@@ -194,7 +206,7 @@ class ChartBuilder:
             "gan": gan,
             "zhi": zhi,
             "ganzhi": day_gan_zhi,
-            "hidden_stems": BaziReference.get_hidden_stems(zhi),
+            "hidden_stems": list(BaziReference.get_hidden_stems(zhi)),
             "nayin": BaziReference.get_nayin(gan, zhi)
         }
     
@@ -213,21 +225,21 @@ class ChartBuilder:
         time_zhi = self._hour_to_zhi(hour)
         
         # 2. 五鼠遁推时干
-        time_gan = self._wushu_dun(day_gan, time_zhi)
+        time_gan = self.wushu_dun(day_gan, time_zhi)
         
         return {
             "gan": time_gan,
             "zhi": time_zhi,
             "ganzhi": time_gan + time_zhi,
-            "hidden_stems": BaziReference.get_hidden_stems(time_zhi),
+            "hidden_stems": list(BaziReference.get_hidden_stems(time_zhi)),
             "nayin": BaziReference.get_nayin(time_gan, time_zhi)
         }
     
     # ============================================
-    # 辅助方法（保持不变）
+    # 五虎遁 / 五鼠遁（八字反查等模块也会调用）
     # ============================================
     
-    def _wuhu_dun(self, year_gan, month_zhi):
+    def wuhu_dun(self, year_gan, month_zhi):
         """
         五虎遁月法
         
@@ -257,7 +269,7 @@ class ChartBuilder:
         month_gan_index = (start_gan_index + month_zhi_index) % 10
         return gan_sequence[month_gan_index]
     
-    def _wushu_dun(self, day_gan, time_zhi):
+    def wushu_dun(self, day_gan, time_zhi):
         """
         五鼠遁时法
         
@@ -287,6 +299,10 @@ class ChartBuilder:
         time_gan_index = (start_gan_index + time_zhi_index) % 10
         return gan_sequence[time_gan_index]
     
+    # ============================================
+    # 辅助方法（保持不变）
+    # ============================================
+    
     def _hour_to_zhi(self, hour):
         """
         小时转时支
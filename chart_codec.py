@@ -0,0 +1,291 @@
+# chart_codec.py
+"""
+命盘二进制编码
+负责把 generate_complete_chart() 的完整结果压缩为带版本号的定长结构（约90字节），
+只保存时间处理的结果（真太阳时、节气时刻、时区、经纬度与修正值）和四柱序号；
+解码时经 BaziService 重新排盘，还原为与原结果逐字节一致的 JSON 结构
+
+编码只固定时间处理的结果：解码得到的特征分析、参考表与大运总是按当前代码重新计算，
+分析代码更新后，旧编码解出的是新版分析（与编码时的 JSON 不再逐字节一致）；
+四柱由编码内容确定，解码时与保存的四柱序号核对，不一致（时间处理或排盘算法变化）时报错。
+需要原样保留旧输出时请另存 JSON（如 chart_serializer.dumps），或像 warm_snapshot.py 那样按代码指纹判定失效
+"""
+
+import struct
+from datetime import datetime, timedelta
+
+from bazi_reference import BaziReference
+from calendar_table import ZHI_JIE_NAMES
+from chart_serializer import dumps
+
+MAGIC = b"BZ"
+FORMAT_VERSION = 1
+
+# flags 位
+FLAG_FEMALE = 0x01
+FLAG_DST = 0x02
+FLAG_LONGITUDE_INT = 0x04    # 经纬度输入为整数（JSON 中不带小数点）
+FLAG_LATITUDE_INT = 0x08
+FLAG_RAW_BIRTH_TIME = 0x10   # 原始输入时间不是 "YYYY-MM-DD HH:MM"，按原文保存
+FLAG_RAW_LOCATION = 0x20
+FLAG_LICHUN_ERROR = 0x40     # 立春查找失败（lichun_datetime 为 "Error"）
+
+SPECIAL_TIME_MARKERS = ["无", "早子时", "晚子时"]
+
+# magic, 版本, flags, 子时标记
+HEADER = struct.Struct("<2sBBB")
+# 四柱六十甲子序号 ×4, 物理真太阳时（纪元微秒）, 上一个节 / 下一个节 / 立春相对真太阳时整秒的秒数,
+# 上一个节的月支下标, 原始输入时间（纪元分钟）, 均时差, 经度差修正, 经度, 纬度
+BODY = struct.Struct("<4BqiiiBqdddd")
+
+_EPOCH = datetime(1970, 1, 1)
+_SECOND = timedelta(seconds=1)
+_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+_INPUT_FORMAT = "%Y-%m-%d %H:%M"
+
+
+class ChartCodec:
+    """
+    命盘二进制编解码
+
+    布局：HEADER + BODY + 时区名（1字节长度 + ASCII）
+          + 原文保存的输入时间 / 位置字符串（各2字节长度 + UTF-8，仅在对应 flag 置位时出现）
+    四柱、特征分析、参考表与大运都由时间处理结果确定，不占编码空间；
+    解码时重新排盘后核对四柱序号，排盘算法变化导致结果不同时报错（此时应提升 FORMAT_VERSION）。
+    """
+
+    # encode(verify=True) 重建比对的段落（只做时间处理之后的排盘，不算特征分析、参考表与大运）
+    VERIFY_FIELDS = ["basic_info", "solar_terms_detail"]
+
+    def __init__(self, service=None):
+        self._service = service
+
+    @property
+    def service(self):
+        """解码用的 BaziService（未传入时首次使用再创建）"""
+        if self._service is None:
+            from bazi_service import BaziService
+            self._service = BaziService()
+        return self._service
+
+    def encode(self, chart, verify=True):
+        """
+        命盘 -> 字节
+
+        Args:
+            chart: generate_complete_chart() 的完整结果（不支持 fields 投影或 hour_unknown 的结果）
+            verify: 为True时由编码结果重建基础信息与节气段落，与原命盘逐字节比对
+
+        Returns:
+            bytes
+
+        Raises:
+            ValueError: 结构不完整，或无法无损编码
+        """
+        try:
+            basic = chart["basic_info"]
+            debug = basic["debug_info"]
+            solar_terms = chart["solar_terms_detail"]
+            pillars = chart["pillars"]
+        except (KeyError, TypeError):
+            raise ValueError("Only complete charts can be encoded")
+
+        flags = 0
+        if basic["gender"] == "女":
+            flags |= FLAG_FEMALE
+        elif basic["gender"] != "男":
+            raise ValueError(f"Unsupported gender: {basic['gender']}")
+        if debug["is_dst"]:
+            flags |= FLAG_DST
+        marker = SPECIAL_TIME_MARKERS.index(basic["special_time_marker"])
+
+        # 节气时刻均相对物理真太阳时的整秒（晚子时排盘时间已换到次日）
+        bazi_time = datetime.strptime(basic["true_solar_time"], _TIME_FORMAT)
+        tst = bazi_time - timedelta(days=1) if basic["special_time_marker"] == "晚子时" else bazi_time
+        prev_jie = datetime.strptime(solar_terms["prev_jie"]["datetime"], _TIME_FORMAT)
+        next_jie = datetime.strptime(solar_terms["next_jie"]["datetime"], _TIME_FORMAT)
+        tst_microseconds = (tst - _EPOCH) // timedelta(microseconds=1) + self._find_microsecond(tst, prev_jie, next_jie, solar_terms)
+        lichun_offset = 0
+        if solar_terms["lichun_datetime"] == "Error":
+            flags |= FLAG_LICHUN_ERROR
+        else:
+            lichun_offset = (datetime.strptime(solar_terms["lichun_datetime"], _TIME_FORMAT) - tst) // _SECOND
+
+        birth_minutes = 0
+        raw_birth_time = basic["birth_time"]
+        try:
+            birth_dt = datetime.strptime(raw_birth_time, _INPUT_FORMAT)
+            if birth_dt.strftime(_INPUT_FORMAT) == raw_birth_time:
+                birth_minutes = (birth_dt - _EPOCH) // timedelta(minutes=1)
+                raw_birth_time = None
+        except ValueError:
+            pass
+        if raw_birth_time is not None:
+            flags |= FLAG_RAW_BIRTH_TIME
+
+        longitude, latitude = debug["longitude"], debug["latitude"]
+        if isinstance(longitude, int):
+            flags |= FLAG_LONGITUDE_INT
+        if isinstance(latitude, int):
+            flags |= FLAG_LATITUDE_INT
+        raw_location = basic["location"]
+        if raw_location == f"Lng:{longitude}, Lat:{latitude}":
+            raw_location = None
+        else:
+            flags |= FLAG_RAW_LOCATION
+
+        parts = [
+            HEADER.pack(MAGIC, FORMAT_VERSION, flags, marker),
+            BODY.pack(
+                *self._pillar_indices(pillars),
+                tst_microseconds,
+                (prev_jie - tst) // _SECOND,
+                (next_jie - tst) // _SECOND,
+                lichun_offset,
+                ZHI_JIE_NAMES.index(solar_terms["prev_jie"]["name"]),
+                birth_minutes,
+                debug["equation_of_time"],
+                debug["geo_offset"],
+                longitude,
+                latitude
+            ),
+            self._pack_text(basic["timezone"].encode("ascii"), "B")
+        ]
+        if raw_birth_time is not None:
+            parts.append(self._pack_text(raw_birth_time.encode("utf-8"), "H"))
+        if raw_location is not None:
+            parts.append(self._pack_text(raw_location.encode("utf-8"), "H"))
+        data = b"".join(parts)
+
+        if verify:
+            solar_data, gender, _ = self._unpack(data)
+            rebuilt = self.service.generate_chart_from_solar_data(solar_data, gender, self.VERIFY_FIELDS)
+            if dumps(rebuilt["basic_info"]) != dumps(basic) or dumps(rebuilt["solar_terms_detail"]) != dumps(solar_terms):
+                raise ValueError("Chart cannot be encoded losslessly")
+        return data
+
+    def decode(self, data, fields=None):
+        """
+        字节 -> 命盘
+
+        Args:
+            data: encode() 的输出
+            fields: 字段投影（同 generate_complete_chart 的 fields），只重建需要的段落
+
+        Returns:
+            命盘字典；编码后分析代码未变时与编码前逐字节一致（fields 为 None 时），
+            否则特征分析、参考表与大运为当前代码的结果（见模块说明）
+
+        Raises:
+            ValueError: 不是命盘编码、版本不支持，或排盘结果与编码时不一致
+        """
+        solar_data, gender, pillar_indices = self._unpack(data)
+        chart = self.service.generate_chart_from_solar_data(solar_data, gender, fields)
+        if "pillars" in chart and self._pillar_indices(chart["pillars"]) != pillar_indices:
+            raise ValueError("Pillars differ from the encoded chart (calculation changed since encoding)")
+        return chart
+
+    # ============================================
+    # 内部
+    # ============================================
+
+    @staticmethod
+    def _pillar_indices(pillars):
+        """四柱 -> 六十甲子序号（gan 下标 g、zhi 下标 z 对应 (6g - 5z) mod 60）"""
+        return tuple(
+            (6 * BaziReference.HEAVENLY_STEMS.index(pillars[key]["gan"])
+             - 5 * BaziReference.EARTHLY_BRANCHES.index(pillars[key]["zhi"])) % 60
+            for key in ["year", "month", "day", "time"]
+        )
+
+    @staticmethod
+    def _find_microsecond(tst, prev_jie, next_jie, solar_terms):
+        """
+        还原真太阳时被截去的微秒部分
+
+        命盘中真太阳时只保留到秒，但距前后"节"的天数（4位小数）由带微秒的时刻算出；
+        在该秒内找一个使两个天数都复现的微秒值（先试秒中点与两端，再按毫秒逐个试）
+        """
+        def matches(microsecond):
+            moment = tst + timedelta(microseconds=microsecond)
+            return (round((moment - prev_jie).total_seconds() / 86400, 4) == solar_terms["days_since_prev_jie"]
+                    and round((next_jie - moment).total_seconds() / 86400, 4) == solar_terms["days_to_next_jie"])
+
+        for microsecond in [500000, 0, 999999, *range(0, 1000000, 1000)]:
+            if matches(microsecond):
+                return microsecond
+        raise ValueError("Chart cannot be encoded losslessly")
+
+    @staticmethod
+    def _pack_text(raw, length_format):
+        return struct.pack("<" + length_format, len(raw)) + raw
+
+    @staticmethod
+    def _unpack_text(data, offset, length_format):
+        length_struct = struct.Struct("<" + length_format)
+        (length,) = length_struct.unpack_from(data, offset)
+        offset += length_struct.size
+        return data[offset:offset + length].decode("utf-8"), offset + length
+
+    def _unpack(self, data):
+        """
+        字节 -> (solar_data, gender, 四柱序号)
+
+        solar_data 的键顺序与 BaziTimeProcessor.get_solar_data() 一致，
+        节气段落由节气时刻经 BaziTimeProcessor.build_solar_terms_info() 组装（与排盘时同一份代码）
+        """
+        magic, version, flags, marker = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError("Not an encoded chart")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported chart encoding version: {version}")
+
+        (year_index, month_index, day_index, time_index, tst_microseconds, prev_offset, next_offset, lichun_offset,
+         prev_zhi, birth_minutes, equation_of_time, geo_offset, longitude, latitude) = BODY.unpack_from(data, HEADER.size)
+        offset = HEADER.size + BODY.size
+        timezone_str, offset = self._unpack_text(data, offset, "B")
+        if flags & FLAG_RAW_BIRTH_TIME:
+            original_time, offset = self._unpack_text(data, offset, "H")
+        else:
+            original_time = (_EPOCH + timedelta(minutes=birth_minutes)).strftime(_INPUT_FORMAT)
+        if flags & FLAG_LONGITUDE_INT:
+            longitude = int(longitude)
+        if flags & FLAG_LATITUDE_INT:
+            latitude = int(latitude)
+        if flags & FLAG_RAW_LOCATION:
+            location, offset = self._unpack_text(data, offset, "H")
+        else:
+            location = f"Lng:{longitude}, Lat:{latitude}"
+
+        special_marker = SPECIAL_TIME_MARKERS[marker]
+        tst = _EPOCH + timedelta(microseconds=tst_microseconds)
+        bazi_time = tst + timedelta(days=1) if special_marker == "晚子时" else tst
+        tst_second = tst.replace(microsecond=0)
+        next_zhi = (prev_zhi + 1) % 12
+        prev_jie = {
+            "name": ZHI_JIE_NAMES[prev_zhi],
+            "datetime": tst_second + timedelta(seconds=prev_offset),
+            "zhi": BaziReference.EARTHLY_BRANCHES[prev_zhi]
+        }
+        next_jie = {
+            "name": ZHI_JIE_NAMES[next_zhi],
+            "datetime": tst_second + timedelta(seconds=next_offset),
+            "zhi": BaziReference.EARTHLY_BRANCHES[next_zhi]
+        }
+        lichun_dt = None if flags & FLAG_LICHUN_ERROR else tst_second + timedelta(seconds=lichun_offset)
+
+        solar_data = {
+            "true_solar_time": bazi_time.strftime(_TIME_FORMAT),
+            "original_time": original_time,
+            "location": location,
+            "timezone": timezone_str,
+            "longitude": longitude,
+            "latitude": latitude,
+            "is_dst": bool(flags & FLAG_DST),
+            "equation_of_time": equation_of_time,
+            "geo_offset": geo_offset,
+            "special_time_marker": special_marker,
+            "solar_terms": self.service.time_processor.build_solar_terms_info(tst, prev_jie, next_jie, lichun_dt)
+        }
+        gender = "女" if flags & FLAG_FEMALE else "男"
+        return solar_data, gender, (year_index, month_index, day_index, time_index)
@@ -0,0 +1,72 @@
+# chart_serializer.py
+"""
+命盘序列化
+负责把 generate_complete_chart() 等接口的结果直接写成 UTF-8 JSON 字节：
+紧凑模式用于接口与批量输出，缩进模式用于阅读；安装了 orjson 时优先使用，否则回退到标准库
+"""
+
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+HAS_ORJSON = orjson is not None
+
+# 标准库编码器预先构造一次（json.dumps 带参数调用时每次都会新建编码器）
+_COMPACT_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+_PRETTY_ENCODER = json.JSONEncoder(ensure_ascii=False, indent=2)
+
+
+def dumps(obj, pretty=False, backend=None):
+    """
+    序列化为 UTF-8 JSON 字节
+
+    两种后端输出逐字节一致：
+    - 紧凑模式 == json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    - 缩进模式 == json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    （命盘中只有字符串键、整数与至多4位小数的浮点数；orjson 不支持的对象，
+    如非字符串键，自动改用标准库）
+
+    Args:
+        obj: 命盘字典（或任意可 JSON 序列化的对象）
+        pretty: True 为两空格缩进，False 为紧凑（无多余空白）
+        backend: "orjson" / "json"，默认有 orjson 时用 orjson
+
+    Returns:
+        bytes
+
+    Raises:
+        ValueError: 后端名称不认识，或指定 "orjson" 但未安装
+    """
+    if backend is None:
+        backend = "orjson" if HAS_ORJSON else "json"
+    elif backend not in ("orjson", "json"):
+        raise ValueError(f"Unknown backend: {backend!r} (expected 'orjson' or 'json')")
+    elif backend == "orjson" and not HAS_ORJSON:
+        raise ValueError("backend='orjson' requires the orjson package (pip install orjson)")
+
+    if backend == "orjson":
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else 0)
+        except TypeError:
+            pass
+
+    encoder = _PRETTY_ENCODER if pretty else _COMPACT_ENCODER
+    return encoder.encode(obj).encode("utf-8")
+
+
+def loads(data):
+    """解析 JSON（bytes / str / memoryview），安装了 orjson 时优先使用"""
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = bytes(data)
+    return json.loads(data)
+
+
+def dump(obj, path, pretty=True):
+    """写入 JSON 文件（默认缩进，与 json.dump(..., ensure_ascii=False, indent=2) 的文件内容一致）"""
+    with open(path, "wb") as f:
+        f.write(dumps(obj, pretty=pretty))
@@ -0,0 +1,418 @@
+# chart_space_index.py
+"""
+命盘空间检索
+负责在预计算的"逐日逐时辰"特征索引上，用向量化布尔掩码检索满足条件的出生时间区间
+（例如：1950-2010年间全阳、缺金、原局带六冲的所有出生时间），无需对每个候选跑完整流程
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from bazi_reference import BaziReference
+from interaction_engine import InteractionEngine
+from jie_calendar import JieCalendar, DAY_INDEX_OFFSET
+
+ELEMENTS = ["木", "火", "土", "金", "水"]
+
+# 1970-01-01 的公历日序数（索引内部时间统一用 1970 纪元秒）
+EPOCH = datetime(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+# 五虎遁 / 五鼠遁起始天干序号（按年干/日干序号）
+WUHU_START = np.array(BaziReference.WUHU_START, dtype=np.int64)
+WUSHU_START = np.array(BaziReference.WUSHU_START, dtype=np.int64)
+
+
+def _to_seconds(dt):
+    """naive datetime -> 纪元秒"""
+    return int((dt - EPOCH).total_seconds())
+
+
+def _from_seconds(seconds):
+    """纪元秒 -> naive datetime"""
+    return EPOCH + timedelta(seconds=int(seconds))
+
+
+class FeatureTables:
+    """由 BaziReference / InteractionEngine 派生的小型查找表（保证与标量流程同口径）"""
+
+    def __init__(self):
+        stems = BaziReference.HEAVENLY_STEMS
+        branches = BaziReference.EARTHLY_BRANCHES
+
+        self.stem_is_yang = np.array([s in BaziReference.YANG_STEMS for s in stems])
+        self.stem_is_yin = np.array([s in BaziReference.YIN_STEMS for s in stems])
+
+        # 天干五行计数（每个算1）、地支藏干五行计数（每个算0.5）
+        self.stem_elements = np.zeros((10, 5), dtype=np.float32)
+        for i, stem in enumerate(stems):
+            self.stem_elements[i, ELEMENTS.index(BaziReference.get_stem_element(stem))] = 1
+        self.branch_elements = np.zeros((12, 5), dtype=np.float32)
+        for i, branch in enumerate(branches):
+            for cang_gan in BaziReference.get_hidden_stems(branch):
+                self.branch_elements[i, ELEMENTS.index(BaziReference.get_stem_element(cang_gan))] += 0.5
+
+        # 有效根：与 ChartAnalyzer._analyze_roots 相同的长生状态
+        self.root_table = np.array([
+            [BaziReference.get_changsheng_status(stem, branch) in ["帝旺", "临官", "长生", "冠带"]
+             for branch in branches]
+            for stem in stems
+        ])
+
+        # 地支两两关系
+        self.chong_table = np.array([[InteractionEngine.check_chong(a, b) for b in branches] for a in branches])
+        self.he_table = np.array([[InteractionEngine.check_he(a, b)["is_he"] for b in branches] for a in branches])
+        self.hai_table = np.array([[InteractionEngine.check_hai(a, b)["is_hai"] for b in branches] for a in branches])
+
+        # 刑：以地支位掩码表示
+        self.xing_masks = {}
+        for xing_set, xing_type in InteractionEngine.SANXING.items():
+            self.xing_masks[xing_type] = sum(1 << branches.index(z) for z in xing_set)
+        for xing_set, xing_type in InteractionEngine.LIANG_XING.items():
+            self.xing_masks[xing_type] = sum(1 << branches.index(z) for z in xing_set)
+        self.zi_xing_indices = [branches.index(z) for z in InteractionEngine.ZI_XING]
+
+        self.sanhe_masks = {
+            element: sum(1 << branches.index(z) for z in sanhe_set)
+            for sanhe_set, element in InteractionEngine.SANHE.items()
+        }
+
+
+class Predicate:
+    """
+    可组合的检索条件
+
+    每个条件在索引上求值为一个布尔掩码，支持 & | ~ 组合：
+        Predicate.all_yang() & Predicate.wuxing_missing("金") & Predicate.liuchong()
+    """
+
+    def __init__(self, func, description):
+        self.func = func
+        self.description = description
+
+    def evaluate(self, index):
+        """在 ChartSpaceIndex 上求值，返回与区间一一对应的布尔数组"""
+        return self.func(index)
+
+    def __and__(self, other):
+        return Predicate(lambda idx: self.evaluate(idx) & other.evaluate(idx),
+                         f"({self.description} 且 {other.description})")
+
+    def __or__(self, other):
+        return Predicate(lambda idx: self.evaluate(idx) | other.evaluate(idx),
+                         f"({self.description} 或 {other.description})")
+
+    def __invert__(self):
+        return Predicate(lambda idx: ~self.evaluate(idx), f"非{self.description}")
+
+    def __repr__(self):
+        return f"Predicate({self.description})"
+
+    # ============================================
+    # 特殊标记（对应 ChartAnalyzer._check_special_flags）
+    # ============================================
+
+    @staticmethod
+    def all_yang():
+        """四柱天干全阳"""
+        return Predicate(lambda idx: idx.feature("all_yang"), "全阳")
+
+    @staticmethod
+    def all_yin():
+        """四柱天干全阴"""
+        return Predicate(lambda idx: idx.feature("all_yin"), "全阴")
+
+    @staticmethod
+    def wuxing_missing(element):
+        """缺某一五行（天干与藏干均无）"""
+        position = ELEMENTS.index(element)
+        return Predicate(lambda idx: idx.feature("wuxing_count")[:, position] == 0, f"缺{element}")
+
+    @staticmethod
+    def wuxing_extreme(element=None):
+        """某一五行占比 >= 60%（element 为None时不限五行）"""
+        if element is None:
+            return Predicate(lambda idx: idx.feature("wuxing_extreme") >= 0, "五行偏枯")
+        position = ELEMENTS.index(element)
+        return Predicate(lambda idx: idx.feature("wuxing_extreme") == position, f"{element}偏多")
+
+    @staticmethod
+    def has_no_root():
+        """日主无根"""
+        return Predicate(lambda idx: idx.feature("has_no_root"), "日主无根")
+
+    # ============================================
+    # 刑冲合害（对应 InteractionEngine）
+    # ============================================
+
+    @staticmethod
+    def xing(xing_type=None):
+        """
+        带刑
+
+        Args:
+            xing_type: "无恩之刑" | "恃势之刑" | "无礼之刑" | "自刑"；为None时任意一种
+        """
+        if xing_type is None:
+            return Predicate(lambda idx: idx.feature("any_xing"), "带刑")
+        return Predicate(lambda idx: idx.feature(f"xing:{xing_type}"), xing_type)
+
+    @staticmethod
+    def sanhe(element=None):
+        """带三合局"""
+        if element is None:
+            return Predicate(lambda idx: idx.feature("any_sanhe"), "带三合")
+        return Predicate(lambda idx: idx.feature(f"sanhe:{element}"), f"三合{element}局")
+
+    @staticmethod
+    def liuchong():
+        """原局内有六冲"""
+        return Predicate(lambda idx: idx.feature("liuchong"), "六冲")
+
+    @staticmethod
+    def liuhe():
+        """原局内有六合"""
+        return Predicate(lambda idx: idx.feature("liuhe"), "六合")
+
+    @staticmethod
+    def liuhai():
+        """原局内有六害"""
+        return Predicate(lambda idx: idx.feature("liuhai"), "六害")
+
+    # ============================================
+    # 干支直接条件
+    # ============================================
+
+    @staticmethod
+    def pillar(position, ganzhi):
+        """某一柱为指定干支，position 为 year/month/day/time"""
+        target = BaziReference.get_jiazi_index(ganzhi[0], ganzhi[1])
+        return Predicate(lambda idx: idx.pillars[position] == target, f"{position}={ganzhi}")
+
+    @staticmethod
+    def day_master(gan):
+        """日主为指定天干"""
+        target = BaziReference.HEAVENLY_STEMS.index(gan)
+        return Predicate(lambda idx: idx.pillars["day"] % 10 == target, f"日主{gan}")
+
+
+class ChartSpaceIndex:
+    """
+    命盘空间特征索引
+
+    把 [start_year, end_year] 的真太阳时切分为"四柱恒定"的区间：
+    时辰边界（奇数整点）+ 交节时刻 + 元旦（命理年份判定依赖公历年份），
+    每个区间存四柱六十甲子序号，特征按需向量化计算并缓存。
+    """
+
+    def __init__(self, start_year, end_year, calendar=None):
+        self.start_year = start_year
+        self.end_year = end_year
+        self.calendar = calendar or JieCalendar()
+        self.tables = FeatureTables()
+        self._features = {}
+
+        self.starts, self.ends = self._build_segments()
+        self.pillars = self._build_pillars()
+
+    def __len__(self):
+        return len(self.starts)
+
+    # ============================================
+    # 索引构建
+    # ============================================
+
+    def _jie_arrays(self):
+        """节气时刻（纪元秒）与对应月支序号、是否小寒"""
+        seconds, zhi_indices, is_xiaohan = [], [], []
+        for year in range(self.start_year - 1, self.end_year + 2):
+            for jie in self.calendar.get_year_jie(year):
+                seconds.append(_to_seconds(jie["datetime"]))
+                zhi_indices.append(BaziReference.EARTHLY_BRANCHES.index(jie["zhi"]))
+                is_xiaohan.append(jie["name"] == "小寒")
+        return (
+            np.array(seconds, dtype=np.int64),
+            np.array(zhi_indices, dtype=np.int64),
+            np.array(is_xiaohan, dtype=bool)
+        )
+
+    def _build_segments(self):
+        """生成区间起止（纪元秒）"""
+        range_start = _to_seconds(datetime(self.start_year, 1, 1))
+        range_end = _to_seconds(datetime(self.end_year + 1, 1, 1))
+
+        # 时辰边界：前一日 23:00 起每两小时
+        hour_bounds = np.arange(range_start - 3600, range_end + 7200, 7200, dtype=np.int64)
+
+        self._jie_seconds, self._jie_zhi, self._jie_is_xiaohan = self._jie_arrays()
+        new_years = np.array(
+            [_to_seconds(datetime(y, 1, 1)) for y in range(self.start_year, self.end_year + 2)],
+            dtype=np.int64
+        )
+
+        bounds = np.unique(np.concatenate([hour_bounds, self._jie_seconds, new_years]))
+        bounds = bounds[(bounds >= range_start) & (bounds <= range_end)]
+        return bounds[:-1], bounds[1:]
+
+    def _build_pillars(self):
+        """向量化推算每个区间的四柱序号（与 get_solar_data + ChartBuilder 同口径）"""
+        starts = self.starts
+
+        # 年柱、月柱：按上一个"节"
+        jie_pos = np.searchsorted(self._jie_seconds, starts, side="right") - 1
+        month_zhi = self._jie_zhi[jie_pos]
+        as_datetime = starts.astype("datetime64[s]")
+        calendar_year = as_datetime.astype("datetime64[Y]").astype(np.int64) + 1970
+        calendar_month = as_datetime.astype("datetime64[M]").astype(np.int64) % 12 + 1
+        bazi_year = calendar_year - (self._jie_is_xiaohan[jie_pos] & (calendar_month <= 2))
+
+        year_idx = (bazi_year - 4) % 60
+        month_gan = (WUHU_START[year_idx % 10] + (month_zhi - 2) % 12) % 10
+        month_idx = (6 * month_gan - 5 * month_zhi) % 60
+
+        # 日柱：命理日 = (真太阳时 + 1小时) 的日期（晚子时换日）
+        day_number = (starts + 3600) // 86400 + EPOCH_ORDINAL
+        day_idx = (day_number + DAY_INDEX_OFFSET) % 60
+
+        # 时柱
+        hour = (starts % 86400) // 3600
+        time_zhi = ((hour + 1) // 2) % 12
+        time_gan = (WUSHU_START[day_idx % 10] + time_zhi) % 10
+        time_idx = (6 * time_gan - 5 * time_zhi) % 60
+
+        return {
+            "year": year_idx.astype(np.uint8),
+            "month": month_idx.astype(np.uint8),
+            "day": day_idx.astype(np.uint8),
+            "time": time_idx.astype(np.uint8)
+        }
+
+    # ============================================
+    # 特征（按需计算并缓存）
+    # ============================================
+
+    def feature(self, name):
+        """获取特征数组（首次访问时向量化计算）"""
+        if name not in self._features:
+            self._features[name] = self._compute_feature(name)
+        return self._features[name]
+
+    def _stems(self):
+        return np.stack([self.pillars[k].astype(np.int64) % 10 for k in ["year", "month", "day", "time"]], axis=1)
+
+    def _branches(self):
+        return np.stack([self.pillars[k].astype(np.int64) % 12 for k in ["year", "month", "day", "time"]], axis=1)
+
+    def _branch_pairs(self, table):
+        branches = self._branches()
+        result = np.zeros(len(self), dtype=bool)
+        for i in range(4):
+            for j in range(i + 1, 4):
+                result |= table[branches[:, i], branches[:, j]]
+        return result
+
+    def _compute_feature(self, name):
+        t = self.tables
+
+        if name == "all_yang":
+            return t.stem_is_yang[self._stems()].all(axis=1)
+        if name == "all_yin":
+            return t.stem_is_yin[self._stems()].all(axis=1)
+        if name == "wuxing_count":
+            return t.stem_elements[self._stems()].sum(axis=1) + t.branch_elements[self._branches()].sum(axis=1)
+        if name == "wuxing_extreme":
+            counts = self.feature("wuxing_count")
+            top = counts.argmax(axis=1)
+            ratio = counts.max(axis=1) / counts.sum(axis=1)
+            return np.where(ratio >= 0.6, top, -1)
+        if name == "has_no_root":
+            day_gan = self.pillars["day"].astype(np.int64) % 10
+            return ~t.root_table[day_gan[:, None], self._branches()].any(axis=1)
+        if name == "branch_mask":
+            return np.bitwise_or.reduce(1 << self._branches(), axis=1)
+        if name.startswith("xing:"):
+            xing_type = name.split(":", 1)[1]
+            if xing_type == "自刑":
+                branches = self._branches()
+                result = np.zeros(len(self), dtype=bool)
+                for zhi_index in t.zi_xing_indices:
+                    result |= (branches == zhi_index).sum(axis=1) >= 2
+                return result
+            mask = t.xing_masks[xing_type]
+            return (self.feature("branch_mask") & mask) == mask
+        if name == "any_xing":
+            result = self.feature("xing:自刑").copy()
+            for xing_type in t.xing_masks:
+                result |= self.feature(f"xing:{xing_type}")
+            return result
+        if name.startswith("sanhe:"):
+            mask = t.sanhe_masks[name.split(":", 1)[1]]
+            return (self.feature("branch_mask") & mask) == mask
+        if name == "any_sanhe":
+            result = np.zeros(len(self), dtype=bool)
+            for element in t.sanhe_masks:
+                result |= self.feature(f"sanhe:{element}")
+            return result
+        if name == "liuchong":
+            return self._branch_pairs(t.chong_table)
+        if name == "liuhe":
+            return self._branch_pairs(t.he_table)
+        if name == "liuhai":
+            return self._branch_pairs(t.hai_table)
+
+        raise ValueError(f"Unknown feature: {name}")
+
+    # ============================================
+    # 检索
+    # ============================================
+
+    def search(self, predicate, start=None, end=None, limit=None):
+        """
+        检索满足条件的出生时间区间
+
+        Args:
+            predicate: Predicate 条件
+            start: 起始真太阳时 "YYYY-MM-DD HH:MM:SS"（可选）
+            end: 截止真太阳时（可选，不含）
+            limit: 最多返回条数（可选）
+
+        Returns:
+            [
+                {
+                    "start": "1984-11-06 01:00:00",   // 真太阳时，含
+                    "end": "1984-11-06 03:00:00",     // 真太阳时，不含
+                    "pillars": ["甲子", "甲戌", "庚午", "丁丑"]
+                },
+                ...
+            ]
+        """
+        mask = predicate.evaluate(self).copy()
+        lower = self.starts[0] if len(self) else 0
+        upper = self.ends[-1] if len(self) else 0
+        if start:
+            lower = _to_seconds(datetime.strptime(start, "%Y-%m-%d %H:%M:%S"))
+            mask &= self.ends > lower
+        if end:
+            upper = _to_seconds(datetime.strptime(end, "%Y-%m-%d %H:%M:%S"))
+            mask &= self.starts < upper
+
+        positions = np.flatnonzero(mask)
+        if limit is not None:
+            positions = positions[:limit]
+
+        results = []
+        for pos in positions:
+            results.append({
+                "start": _from_seconds(max(self.starts[pos], lower)).strftime("%Y-%m-%d %H:%M:%S"),
+                "end": _from_seconds(min(self.ends[pos], upper)).strftime("%Y-%m-%d %H:%M:%S"),
+                "pillars": [
+                    BaziReference.get_ganzhi_by_index(int(self.pillars[k][pos]))
+                    for k in ["year", "month", "day", "time"]
+                ]
+            })
+        return results
+
+    def count(self, predicate):
+        """统计满足条件的区间数"""
+        return int(np.count_nonzero(predicate.evaluate(self)))
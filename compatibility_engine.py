@@ -0,0 +1,307 @@
+# compatibility_engine.py
+"""
+批量合婚引擎
+负责在大规模候选池中，以矩阵方式计算两两命盘之间的干支关系，并给出每个命盘的最佳匹配
+"""
+
+import numpy as np
+
+from bazi_reference import BaziReference
+from interaction_engine import InteractionEngine
+
+
+class CompatibilityEngine:
+    """
+    批量合婚引擎
+
+    命盘以紧凑的六十甲子序号数组表示：shape=(N, 4)，列依次为年柱、月柱、日柱、时柱
+    （可用 encode_chart() 从 generate_complete_chart() 的输出转换）。
+
+    两两关系只取决于（日柱序号, 年柱序号），因此先把命盘归并到至多 3600 个类别，
+    在类别层面做矩阵运算，再映射回个体，10万级候选池也能在数秒内完成。
+    """
+
+    # ============================================
+    # 关系位标记（矩阵元素为这些位的按位或）
+    # ============================================
+    REL_DAY_ZHI_LIUHE = 1 << 0
+    REL_DAY_ZHI_LIUCHONG = 1 << 1
+    REL_DAY_ZHI_LIUHAI = 1 << 2
+    REL_DAY_GAN_WUHE = 1 << 3
+    REL_DAY_TIANKE_DICHONG = 1 << 4
+    REL_YEAR_ZHI_LIUHE = 1 << 5
+    REL_YEAR_ZHI_LIUCHONG = 1 << 6
+    REL_YEAR_ZHI_LIUHAI = 1 << 7
+    REL_YEAR_GAN_WUHE = 1 << 8
+
+    RELATION_NAMES = {
+        REL_DAY_ZHI_LIUHE: "日支六合",
+        REL_DAY_ZHI_LIUCHONG: "日支六冲",
+        REL_DAY_ZHI_LIUHAI: "日支六害",
+        REL_DAY_GAN_WUHE: "日干五合",
+        REL_DAY_TIANKE_DICHONG: "日柱天克地冲",
+        REL_YEAR_ZHI_LIUHE: "年支六合",
+        REL_YEAR_ZHI_LIUCHONG: "年支六冲",
+        REL_YEAR_ZHI_LIUHAI: "年支六害",
+        REL_YEAR_GAN_WUHE: "年干五合"
+    }
+
+    # 默认评分权重（合为正，冲害为负）
+    DEFAULT_WEIGHTS = {
+        "日支六合": 2.0,
+        "日支六冲": -2.0,
+        "日支六害": -1.0,
+        "日干五合": 2.0,
+        "日柱天克地冲": -3.0,
+        "年支六合": 1.0,
+        "年支六冲": -1.0,
+        "年支六害": -0.5,
+        "年干五合": 0.5
+    }
+
+    # 列序号
+    YEAR_COL = 0
+    DAY_COL = 2
+
+    def __init__(self, charts, candidates=None, weights=None):
+        """
+        Args:
+            charts: 查询方命盘，shape=(N, 4) 的六十甲子序号数组
+            candidates: 候选方命盘，shape=(M, 4)；为None时在 charts 内部两两匹配（排除自身）
+            weights: 评分权重，键为 RELATION_NAMES 中的名称，缺省使用 DEFAULT_WEIGHTS
+        """
+        self.charts = self._validate(charts)
+        self.same_pool = candidates is None
+        self.candidates = self.charts if self.same_pool else self._validate(candidates)
+
+        self.weights = dict(CompatibilityEngine.DEFAULT_WEIGHTS)
+        if weights:
+            self.weights.update(weights)
+
+        self.day_relation_table, self.year_relation_table = CompatibilityEngine.build_relation_tables()
+        self.day_score_table = self._score_table(self.day_relation_table)
+        self.year_score_table = self._score_table(self.year_relation_table)
+
+    # ============================================
+    # 关系表构建（60 x 60，全部来自 InteractionEngine 的标量判断）
+    # ============================================
+
+    @staticmethod
+    def build_relation_tables():
+        """
+        构建日柱、年柱的 60x60 关系位表
+
+        Returns:
+            (day_table, year_table)，dtype=uint16
+        """
+        cls = CompatibilityEngine
+        day_table = np.zeros((60, 60), dtype=np.uint16)
+        year_table = np.zeros((60, 60), dtype=np.uint16)
+
+        for i in range(60):
+            gz1 = BaziReference.get_ganzhi_by_index(i)
+            pillar1 = {"gan": gz1[0], "zhi": gz1[1]}
+            for j in range(60):
+                gz2 = BaziReference.get_ganzhi_by_index(j)
+                pillar2 = {"gan": gz2[0], "zhi": gz2[1]}
+
+                zhi_flags = 0
+                if InteractionEngine.check_he(pillar1["zhi"], pillar2["zhi"])["is_he"]:
+                    zhi_flags |= 1
+                if InteractionEngine.check_chong(pillar1["zhi"], pillar2["zhi"]):
+                    zhi_flags |= 2
+                if InteractionEngine.check_hai(pillar1["zhi"], pillar2["zhi"])["is_hai"]:
+                    zhi_flags |= 4
+                gan_he = InteractionEngine.check_gan_he(pillar1["gan"], pillar2["gan"])["is_he"]
+
+                day = 0
+                if zhi_flags & 1:
+                    day |= cls.REL_DAY_ZHI_LIUHE
+                if zhi_flags & 2:
+                    day |= cls.REL_DAY_ZHI_LIUCHONG
+                if zhi_flags & 4:
+                    day |= cls.REL_DAY_ZHI_LIUHAI
+                if gan_he:
+                    day |= cls.REL_DAY_GAN_WUHE
+                if InteractionEngine.check_tianke_dichong(pillar1, pillar2)["is_tianke_dichong"]:
+                    day |= cls.REL_DAY_TIANKE_DICHONG
+
+                year = 0
+                if zhi_flags & 1:
+                    year |= cls.REL_YEAR_ZHI_LIUHE
+                if zhi_flags & 2:
+                    year |= cls.REL_YEAR_ZHI_LIUCHONG
+                if zhi_flags & 4:
+                    year |= cls.REL_YEAR_ZHI_LIUHAI
+                if gan_he:
+                    year |= cls.REL_YEAR_GAN_WUHE
+
+                day_table[i, j] = day
+                year_table[i, j] = year
+
+        return day_table, year_table
+
+    def _score_table(self, relation_table):
+        """把关系位表按权重折算为分数表"""
+        scores = np.zeros(relation_table.shape, dtype=np.float32)
+        for bit, name in CompatibilityEngine.RELATION_NAMES.items():
+            weight = self.weights.get(name, 0.0)
+            if weight:
+                scores += np.where(relation_table & bit, np.float32(weight), np.float32(0))
+        return scores
+
+    # ============================================
+    # 对外接口
+    # ============================================
+
+    def relation_matrix(self, rows=None, cols=None):
+        """
+        计算关系位矩阵
+
+        Args:
+            rows: charts 中的行下标（缺省为全部）
+            cols: candidates 中的行下标（缺省为全部）
+
+        Returns:
+            shape=(len(rows), len(cols)) 的 uint16 矩阵
+
+        注意：全量 N x M 矩阵可能非常大，大候选池请配合 iter_relation_blocks() 分块使用
+        """
+        a = self.charts if rows is None else self.charts[np.asarray(rows)]
+        b = self.candidates if cols is None else self.candidates[np.asarray(cols)]
+
+        day = self.day_relation_table[a[:, self.DAY_COL][:, None], b[:, self.DAY_COL][None, :]]
+        year = self.year_relation_table[a[:, self.YEAR_COL][:, None], b[:, self.YEAR_COL][None, :]]
+        return day | year
+
+    def score_matrix(self, rows=None, cols=None):
+        """计算评分矩阵，参数同 relation_matrix()"""
+        a = self.charts if rows is None else self.charts[np.asarray(rows)]
+        b = self.candidates if cols is None else self.candidates[np.asarray(cols)]
+
+        day = self.day_score_table[a[:, self.DAY_COL][:, None], b[:, self.DAY_COL][None, :]]
+        year = self.year_score_table[a[:, self.YEAR_COL][:, None], b[:, self.YEAR_COL][None, :]]
+        return day + year
+
+    def iter_relation_blocks(self, block_size=4096):
+        """
+        分块遍历全量关系矩阵
+
+        Yields:
+            (row_start, col_start, block)，block 为 relation_matrix 的子矩阵
+        """
+        n, m = len(self.charts), len(self.candidates)
+        for row_start in range(0, n, block_size):
+            rows = np.arange(row_start, min(row_start + block_size, n))
+            for col_start in range(0, m, block_size):
+                cols = np.arange(col_start, min(col_start + block_size, m))
+                yield row_start, col_start, self.relation_matrix(rows, cols)
+
+    def top_k(self, k=10):
+        """
+        为每个查询命盘返回评分最高的 k 个候选
+
+        同池匹配时排除自身；同分候选之间的先后顺序是确定的，但不保证按下标排列
+
+        Returns:
+            {
+                "indices": shape=(N, k) 的候选下标（不足时以 -1 填充）,
+                "scores": shape=(N, k) 的分数（不足时为 -inf）,
+                "relations": shape=(N, k) 的关系位（不足时为 0）
+            }
+        """
+        n, m = len(self.charts), len(self.candidates)
+        available = m - 1 if self.same_pool else m
+        k_eff = max(0, min(k, available))
+
+        indices = np.full((n, k), -1, dtype=np.int64)
+        scores = np.full((n, k), -np.inf, dtype=np.float32)
+        relations = np.zeros((n, k), dtype=np.uint16)
+        if n == 0 or k_eff == 0:
+            return {"indices": indices, "scores": scores, "relations": relations}
+
+        # 1. 归类：类别键 = 日柱序号 * 60 + 年柱序号
+        query_keys = self.charts[:, self.DAY_COL] * 60 + self.charts[:, self.YEAR_COL]
+        cand_keys = self.candidates[:, self.DAY_COL] * 60 + self.candidates[:, self.YEAR_COL]
+        query_classes, query_inverse = np.unique(query_keys, return_inverse=True)
+        cand_classes, cand_inverse = np.unique(cand_keys, return_inverse=True)
+
+        cand_counts = np.bincount(cand_inverse, minlength=len(cand_classes))
+        cand_order = np.argsort(cand_inverse, kind="stable")
+        cand_starts = np.concatenate(([0], np.cumsum(cand_counts)[:-1]))
+
+        # 2. 类别层面的评分矩阵与排序
+        q_day, q_year = query_classes // 60, query_classes % 60
+        c_day, c_year = cand_classes // 60, cand_classes % 60
+        class_scores = (
+            self.day_score_table[q_day[:, None], c_day[None, :]]
+            + self.year_score_table[q_year[:, None], c_year[None, :]]
+        )
+        ranked = np.argsort(-class_scores, axis=1, kind="stable")
+
+        # 3. 每个查询类别取足 k+1 个候选（同池时需要为自身预留一个位置）
+        need = k_eff + 1 if self.same_pool else k_eff
+        cumulative = np.cumsum(cand_counts[ranked], axis=1)
+        widths = np.minimum((cumulative < need).sum(axis=1) + 1, len(cand_classes))
+
+        class_candidates = np.full((len(query_classes), need), -1, dtype=np.int64)
+        for q in range(len(query_classes)):
+            members = [
+                cand_order[cand_starts[c]:cand_starts[c] + cand_counts[c]]
+                for c in ranked[q, :widths[q]]
+            ]
+            picked = np.concatenate(members)[:need]
+            class_candidates[q, :len(picked)] = picked
+
+        # 4. 映射回个体并排除自身
+        rows = class_candidates[query_inverse]
+        if self.same_pool:
+            is_self = rows == np.arange(n)[:, None]
+            keep = ~is_self
+            keep[~is_self.any(axis=1), need - 1] = False
+            rows = rows[keep].reshape(n, k_eff)
+
+        indices[:, :k_eff] = rows
+        scores[:, :k_eff] = class_scores[query_inverse[:, None], cand_inverse[rows]]
+
+        day = self.day_relation_table[self.charts[:, self.DAY_COL][:, None], self.candidates[rows, self.DAY_COL]]
+        year = self.year_relation_table[self.charts[:, self.YEAR_COL][:, None], self.candidates[rows, self.YEAR_COL]]
+        relations[:, :k_eff] = day | year
+
+        return {"indices": indices, "scores": scores, "relations": relations}
+
+    # ============================================
+    # 辅助方法
+    # ============================================
+
+    @staticmethod
+    def decode_relations(flags):
+        """把关系位解码为关系名称列表"""
+        return [
+            name for bit, name in CompatibilityEngine.RELATION_NAMES.items()
+            if int(flags) & bit
+        ]
+
+    @staticmethod
+    def encode_chart(complete_chart):
+        """
+        把 generate_complete_chart() 的输出压缩为四柱六十甲子序号
+
+        Returns:
+            [年, 月, 日, 时] 序号列表
+        """
+        pillars = complete_chart["pillars"]
+        return [
+            BaziReference.get_jiazi_index(pillars[key]["gan"], pillars[key]["zhi"])
+            for key in ["year", "month", "day", "time"]
+        ]
+
+    @staticmethod
+    def _validate(charts):
+        """校验并规整命盘数组"""
+        array = np.asarray(charts, dtype=np.int64)
+        if array.ndim != 2 or array.shape[1] != 4:
+            raise ValueError("命盘数组必须为 shape=(N, 4) 的六十甲子序号")
+        if array.size and (array.min() < 0 or array.max() > 59):
+            raise ValueError("六十甲子序号必须在 0-59 之间")
+        return array
@@ -25,9 +25,11 @@ result = service.generate_complete_chart(
 )
 
 # 输出结果（这就是给LLM的数据）
-import json
-print(json.dumps(result, ensure_ascii=False, indent=2))
+# dumps() 返回 UTF-8 字节，pretty=True 与 json.dumps(..., ensure_ascii=False, indent=2) 一致；
+# 接口传输用默认的紧凑模式
+from chart_serializer import dumps
+print(dumps(result, pretty=True).decode("utf-8"))
 
 # 可选：分析特定流年
 liunian_2024 = service.analyze_specific_year(result, 2024)
-print(json.dumps(liunian_2024, ensure_ascii=False, indent=2))
\ No newline at end of file
+print(dumps(liunian_2024, pretty=True).decode("utf-8"))
\ No newline at end of file
@@ -0,0 +1,165 @@
+# fork_launcher.py
+"""
+fork 工作进程启动器
+负责在父进程中一次性完成预加载（BaziService、时区查找器、日历表、预热快照等），
+再以 fork 方式启动进程池：工作进程继承父进程已加载的内存页（写时复制），只读数据不随进程数重复占用；
+并读取 /proc/<pid>/smaps_rollup 报告父进程与各工作进程的 RSS / PSS，确认页面确实共享
+
+大块数据本身已在文件映射中（data/calendar_table.npy 以 mmap_mode="r" 加载，
+timezonefinder 的多边形坐标文件由其内部 mmap），无论 fork 还是 spawn 都经页缓存共享；
+fork 额外共享的是导入的模块、时区查找器的索引结构和各类参考表等 Python 对象
+"""
+
+import gc
+import multiprocessing
+import os
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+
+# smaps_rollup 中读取的字段 -> 报告中的键（单位 kB）
+MEMORY_FIELDS = {
+    "Rss": "rss_kb",
+    "Pss": "pss_kb",
+    "Shared_Clean": "shared_clean_kb",
+    "Shared_Dirty": "shared_dirty_kb",
+    "Private_Clean": "private_clean_kb",
+    "Private_Dirty": "private_dirty_kb"
+}
+
+
+# 进程池 -> (工作进程上报进程号的队列, 已收到的进程号)
+_pool_workers = weakref.WeakKeyDictionary()
+
+
+def fork_available():
+    """当前平台是否支持 fork 启动方式（Linux / macOS 支持，Windows 不支持）"""
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+def create_fork_pool(workers, preload, preload_args=(), keep_frozen=False):
+    """
+    在父进程执行 preload(*preload_args) 后 fork 出进程池
+
+    preload 应把工作进程所需的对象放进模块全局变量（如 http_service._init_worker），
+    fork 后工作进程直接继承，不再各自初始化。fork 前冻结垃圾回收（gc.freeze），
+    工作进程继承冻结状态，回收扫描不会改写这些对象的对象头，共享页不被复制。
+    工作进程全部启动后父进程默认解冻（gc.unfreeze），父进程之后释放的对象照常回收；
+    代价是父进程下一次完整回收时复制它扫描到的共享页（只影响父进程，工作进程仍共享）。
+    不支持 fork 的平台退回普通进程池（preload 作为各工作进程的 initializer）。
+
+    Args:
+        workers: 工作进程数（None 为 CPU 核数）
+        preload: 预加载函数
+        preload_args: preload 的参数
+        keep_frozen: 为True时父进程保持冻结（父进程只做调度、不再产生大量需回收的对象时可减少复制；
+                     此前已分配的对象在 gc.unfreeze() 之前都不会被循环回收）
+
+    Returns:
+        ProcessPoolExecutor（所有工作进程已启动）
+    """
+    workers = workers or os.cpu_count() or 1
+    if not fork_available():
+        return create_process_pool(workers, preload, preload_args)
+
+    preload(*preload_args)
+    gc.collect()
+    gc.freeze()
+
+    executor = create_process_pool(workers, mp_context=multiprocessing.get_context("fork"))
+    # fork 方式下首次提交即启动全部工作进程
+    executor.submit(os.getpid).result()
+    if not keep_frozen:
+        gc.unfreeze()
+    return executor
+
+
+def create_process_pool(workers, initializer=None, initargs=(), mp_context=None):
+    """
+    创建进程池，各工作进程启动时上报自己的进程号（pool_memory() 据此读取内存占用）
+
+    Args:
+        workers: 工作进程数
+        initializer / initargs: 同 ProcessPoolExecutor
+        mp_context: multiprocessing 上下文，默认平台默认启动方式
+
+    Returns:
+        ProcessPoolExecutor
+    """
+    context = mp_context or multiprocessing.get_context()
+    pid_queue = context.SimpleQueue()
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_report_pid,
+                                   initargs=(pid_queue, initializer, initargs))
+    _pool_workers[executor] = (pid_queue, set())
+    return executor
+
+
+def _report_pid(pid_queue, initializer, initargs):
+    """工作进程初始化：先上报进程号，再执行调用方的 initializer"""
+    pid_queue.put(os.getpid())
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def worker_pids(executor):
+    """
+    进程池已启动的工作进程号（升序，含已退出的）
+
+    Returns:
+        列表；不是由 create_process_pool() / create_fork_pool() 创建的进程池返回空列表
+    """
+    record = _pool_workers.get(executor)
+    if record is None:
+        return []
+    pid_queue, pids = record
+    while not pid_queue.empty():
+        pids.add(pid_queue.get())
+    return sorted(pids)
+
+
+def process_memory(pid=None):
+    """
+    进程内存占用（读取 /proc/<pid>/smaps_rollup）
+
+    Args:
+        pid: 进程号，默认当前进程
+
+    Returns:
+        {"rss_kb", "pss_kb", "shared_clean_kb", "shared_dirty_kb", "private_clean_kb", "private_dirty_kb"}；
+        无法读取（非 Linux、进程已退出）时返回 None
+    """
+    path = f"/proc/{pid or 'self'}/smaps_rollup"
+    try:
+        with open(path) as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+
+    usage = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].rstrip(":") in MEMORY_FIELDS:
+            usage[MEMORY_FIELDS[parts[0].rstrip(":")]] = int(parts[1])
+    return usage
+
+
+def pool_memory(executor):
+    """
+    父进程与进程池各工作进程的内存占用
+
+    PSS 把共享页按共享进程数分摊，各进程 PSS 之和即这组进程的实际内存；
+    RSS 明显大于 PSS 说明大部分页面与其他进程共享
+
+    Returns:
+        {"parent": {...}, "workers": {pid: {...}}, "total_pss_kb", "total_rss_kb"}；无法读取时对应项为 None；
+        工作进程见 worker_pids()
+    """
+    parent = process_memory()
+    workers = {pid: process_memory(pid) for pid in worker_pids(executor)}
+    reports = [parent] + list(workers.values())
+    readable = [report for report in reports if report is not None]
+    return {
+        "parent": parent,
+        "workers": workers,
+        "total_pss_kb": sum(report.get("pss_kb", 0) for report in readable) if readable else None,
+        "total_rss_kb": sum(report.get("rss_kb", 0) for report in readable) if readable else None
+    }
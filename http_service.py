@@ -0,0 +1,754 @@
+# http_service.py
+"""
+八字 HTTP 服务
+负责用 asyncio（标准库）对外提供排盘、流年区间、Prompt 三个接口，
+CPU 计算放进预加载了 BaziService 的进程池，事件循环只做收发
+"""
+
+import argparse
+import asyncio
+import bisect
+import json
+import os
+import re
+import shutil
+import tempfile
+from http import HTTPStatus
+
+from bazi_service import normalize_chart_request
+from chart_serializer import dumps
+from fork_launcher import create_fork_pool, create_process_pool, pool_memory
+from metrics_exporter import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from metrics_exporter import MetricsExporter, ServingMetrics, enable_worker_metrics, worker_task_done
+from request_profiler import ProfileStore, new_request_id, summarize
+
+PROMPTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts")
+
+# 单次请求的流年区间上限
+MAX_YEAR_SPAN = 120
+
+JSON_CONTENT_TYPE = "application/json; charset=utf-8"
+
+# 客户端指定的剖析 ID（X-Profile 请求头）；"1" / "true" 或不合规时由服务端生成
+PROFILE_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+# ============================================
+# 工作进程（每个进程预加载一份 BaziService）
+# ============================================
+
+_worker_service = None
+_worker_orchestrator = None
+
+
+def _init_worker(snapshot_path=None, metrics_dir=None):
+    """
+    进程池初始化：构造服务（有预热快照时先载入）并预加载（时区查找器、日历表，预排一盘），加载 Prompt 模板；
+    metrics_dir 非空时开启各步骤埋点，汇总数据写入该目录（见 metrics_exporter.py）
+    """
+    global _worker_service, _worker_orchestrator
+    from bazi_service import BaziService
+    from reasoning_orchestrator import ReasoningOrchestrator
+
+    _worker_service = BaziService()
+    if snapshot_path:
+        _worker_service.load_snapshot(snapshot_path)
+    _worker_service.warmup()
+    _worker_orchestrator = ReasoningOrchestrator(PROMPTS_DIR)
+    if metrics_dir:
+        enable_worker_metrics(metrics_dir)
+
+
+def _worker_ready():
+    """启动检查：确认工作进程已完成初始化"""
+    return os.getpid()
+
+
+def _coalesce_key(task_name, payload):
+    """
+    请求合并键：排盘参数按 normalize_chart_request 规范化（如经纬度统一为浮点数），其余参数（流年区间、step 等）按键排序；
+    参数不合法时返回 None（不合并，照常提交以返回 400）
+    """
+    try:
+        request = normalize_chart_request(payload)
+    except (ValueError, TypeError):
+        return None
+    extras = {key: value for key, value in payload.items() if key not in request}
+    return task_name, dumps(request), json.dumps(extras, sort_keys=True, ensure_ascii=False)
+
+
+def _chart_from_payload(payload):
+    """请求体 -> generate_complete_chart() 结果"""
+    request = normalize_chart_request(payload)
+    return _worker_service.generate_complete_chart(
+        request.pop("birth_date"),
+        request.pop("birth_time"),
+        request.pop("longitude"),
+        request.pop("latitude"),
+        request.pop("gender"),
+        **request
+    )
+
+
+def _task_chart(payload):
+    return _chart_from_payload(payload)
+
+
+def _task_years(payload):
+    start_year = int(payload.get("start_year", 0))
+    end_year = int(payload.get("end_year", 0))
+    if not 0 <= end_year - start_year < MAX_YEAR_SPAN:
+        raise ValueError(f"Year range must cover 1-{MAX_YEAR_SPAN} years")
+
+    chart = _chart_from_payload(dict(payload, hour_unknown=False, fields=None))
+    return {
+        "years": [
+            _worker_service.analyze_specific_year(chart, year)
+            for year in range(start_year, end_year + 1)
+        ]
+    }
+
+
+def _task_prompt(payload):
+    step = payload.get("step")
+    if not step:
+        raise ValueError("Missing fields: ['step']")
+
+    chart = _chart_from_payload(dict(payload, hour_unknown=False, fields="llm"))
+    return {
+        "step": step,
+        "prompt": _worker_orchestrator.get_prompt_for_step(step, chart, payload.get("history"))
+    }
+
+
+WORKER_TASKS = {
+    "chart": _task_chart,
+    "years": _task_years,
+    "prompt": _task_prompt
+}
+
+
+def _run_task(task_name, payload):
+    """
+    在工作进程内执行任务，并直接序列化为紧凑 JSON 字节（省去结果对象回传主进程的 pickle）
+
+    Returns:
+        (HTTP 状态码, 响应体字节)
+    """
+    try:
+        result = WORKER_TASKS[task_name](payload)
+        status = HTTPStatus.OK
+    except (ValueError, KeyError, TypeError) as exc:
+        result = {"error": str(exc)}
+        status = HTTPStatus.BAD_REQUEST
+    worker_task_done()
+    return status, dumps(result)
+
+
+def _run_profiled(task_name, payload, request_id):
+    """
+    在工作进程内剖析一次任务（cProfile + tracemalloc，见 request_profiler.py），剖析记录随响应回传主进程
+
+    Returns:
+        (HTTP 状态码, 响应体字节, 剖析记录)
+    """
+    from request_profiler import profile_call
+
+    (status, body), record = profile_call(_run_task, (task_name, payload), request_id=request_id)
+    return status, body, record
+
+
+def _run_batch(payloads):
+    """
+    在工作进程内批量排盘（generate_complete_charts 共享时区、分析与参考表），结果逐项序列化
+
+    Returns:
+        [(HTTP 状态码, 响应体字节), ...]，与 payloads 等长
+    """
+    responses = [None] * len(payloads)
+    requests = []
+    positions = []
+    for position, payload in enumerate(payloads):
+        try:
+            requests.append(normalize_chart_request(payload))
+            positions.append(position)
+        except (ValueError, TypeError) as exc:
+            responses[position] = (HTTPStatus.BAD_REQUEST, dumps({"error": str(exc)}))
+
+    for position, result in zip(positions, _worker_service.generate_complete_charts(requests)):
+        if isinstance(result, (ValueError, KeyError, TypeError)):
+            responses[position] = (HTTPStatus.BAD_REQUEST, dumps({"error": str(result)}))
+        elif isinstance(result, Exception):
+            responses[position] = (HTTPStatus.INTERNAL_SERVER_ERROR, dumps({"error": repr(result)}))
+        else:
+            responses[position] = (HTTPStatus.OK, dumps(result))
+    worker_task_done()
+    return responses
+
+
+# ============================================
+# 批处理统计
+# ============================================
+
+class BatchStats:
+    """
+    micro-batch 统计：批大小分布、每个请求在批内等待的时间分布
+
+    等待时间 = 请求入队 -> 所在批次提交到进程池
+    """
+
+    WAIT_BUCKETS_MS = [0.5, 1, 2, 5, 10, 20, 50, 100]
+
+    def __init__(self):
+        self.batches = 0
+        self.requests = 0
+        self.size_histogram = {}
+        self.wait_histogram = [0] * (len(self.WAIT_BUCKETS_MS) + 1)
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+
+    def record(self, size, waits_ms):
+        self.batches += 1
+        self.requests += size
+        self.size_histogram[size] = self.size_histogram.get(size, 0) + 1
+        for wait in waits_ms:
+            self.wait_histogram[bisect.bisect_left(self.WAIT_BUCKETS_MS, wait)] += 1
+            self.wait_total_ms += wait
+            self.wait_max_ms = max(self.wait_max_ms, wait)
+
+    def snapshot(self):
+        labels = [f"<={bound}ms" for bound in self.WAIT_BUCKETS_MS] + [f">{self.WAIT_BUCKETS_MS[-1]}ms"]
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_size": round(self.requests / self.batches, 2) if self.batches else 0,
+            "batch_size_histogram": dict(sorted(self.size_histogram.items())),
+            "wait_ms_histogram": dict(zip(labels, self.wait_histogram)),
+            "mean_wait_ms": round(self.wait_total_ms / self.requests, 3) if self.requests else 0,
+            "max_wait_ms": round(self.wait_max_ms, 3)
+        }
+
+
+class CoalesceStats:
+    """
+    请求合并（single-flight）统计
+
+    leaders：实际提交计算的请求；coalesced：等待同键在途计算、共享其结果的请求
+    """
+
+    def __init__(self):
+        self.leaders = 0
+        self.coalesced = 0
+        self.max_group_size = 0
+
+    def snapshot(self, in_flight):
+        total = self.leaders + self.coalesced
+        return {
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": round(self.coalesced / total, 4) if total else 0,
+            "max_group_size": self.max_group_size,
+            "in_flight_keys": in_flight
+        }
+
+
+class _Flight:
+    """一次在途计算：结果 future 与正在等待它的请求数"""
+
+    __slots__ = ("future", "waiters", "group_size")
+
+    def __init__(self, future):
+        self.future = future
+        self.waiters = 0
+        self.group_size = 1
+
+
+# ============================================
+# HTTP 服务
+# ============================================
+
+class BaziHTTPService:
+    """
+    asyncio HTTP 服务（HTTP/1.1，支持 keep-alive）
+
+    路由：
+    - POST /chart    排盘（请求体为 generate_complete_chart 的参数）
+    - POST /years    流年区间（另加 start_year / end_year）
+    - POST /prompt   Prompt 渲染（另加 step / history）
+    - GET  /health   存活检查
+    - GET  /stats    请求计数
+    - GET  /metrics  Prometheus 指标（接口延迟、状态码、批大小、队列深度；stage_metrics=True 时另含各步骤耗时与缓存命中）
+    - GET  /profiles 已保存的剖析记录列表；GET /profiles/<id> 该次请求耗时最多的函数与内存分配位置
+
+    过载保护：
+    - 在途请求（排队 + 计算中）超过 max_pending 时直接返回 503
+    - 单个请求超过 request_timeout 秒返回 504；名额在工作进程真正算完后才释放
+    - 请求头 / 请求体读取超过 header_timeout 秒时断开；Content-Length 不合法返回 400，超过 max_body_bytes 返回 413
+
+    micro-batch（仅 /chart）：
+    - 并发到达的排盘请求攒成一批（最多 batch_size 个，工作进程全忙时首个请求最多等 batch_wait_ms 毫秒），
+      整批交给一个工作进程，批内共享时区、特征分析与参考表，再把结果分发回各请求
+    - batch_size=1 时关闭批处理，逐个提交
+
+    请求合并（single-flight，coalesce=True）：
+    - 参数相同（规范化后）的请求在前一个尚未算完时到达，不再提交，直接等待同一结果（响应体字节共享）
+    - 合并的请求不占在途名额；各自仍按 request_timeout 超时，全部放弃等待时才取消计算
+    - /stats 的 coalescing 段给出合并计数
+
+    预热快照：snapshot_path 指向 warm_snapshot.py 生成的文件时，各工作进程启动时内存映射载入，
+    常见命盘直接由快照返回（快照已失效则忽略）
+
+    fork=True 时由本进程预加载一次再 fork 出工作进程（见 fork_launcher.py），只读数据各进程共享；
+    /stats 的 memory 段给出父进程与各工作进程的 RSS / PSS
+
+    stage_metrics=True 时各工作进程开启埋点（约 3% 开销），数据经临时目录汇总到 /metrics，最多滞后 1 秒
+
+    单次请求剖析：请求头带 X-Profile（值为自定义 ID，或 "1" 由服务端生成）时，该请求单独提交（不攒批、不合并），
+    在工作进程内以 cProfile + tracemalloc 执行，响应头 X-Profile-Id 给出 ID，记录保存在主进程（最近 max_profiles 个）；
+    不带该请求头的请求不受影响
+    """
+
+    def __init__(self, host="127.0.0.1", port=8080, workers=None, max_pending=256,
+                 request_timeout=10.0, header_timeout=5.0, max_body_bytes=64 * 1024,
+                 batch_size=32, batch_wait_ms=2.0, snapshot_path=None, fork=False, coalesce=True,
+                 stage_metrics=False, max_profiles=100):
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self.request_timeout = request_timeout
+        self.header_timeout = header_timeout
+        self.max_body_bytes = max_body_bytes
+        self.snapshot_path = snapshot_path
+        self.fork = fork
+
+        self.batch_size = batch_size
+        self.batch_wait_ms = batch_wait_ms
+        self.batch_stats = BatchStats()
+        self.batch_queue = None
+        self.batch_full = None
+        self.batch_task = None
+        self.batches_in_flight = 0
+
+        self.coalesce = coalesce
+        self.coalesce_stats = CoalesceStats()
+        self.in_flight = {}
+
+        self.stage_metrics = stage_metrics
+        self.metrics_dir = None
+        self.serving_metrics = ServingMetrics("http")
+        self.exporter = MetricsExporter(serving=self.serving_metrics)
+        self.exporter.add_gauge("http_pending_requests", "Requests queued or computing", lambda: self.pending)
+        self.exporter.add_gauge("http_batch_queue_depth", "Chart requests waiting to be batched",
+                                lambda: self.batch_queue.qsize() if self.batch_queue is not None else 0)
+        self.exporter.add_gauge("http_batches_in_flight", "Batches submitted to workers",
+                                lambda: self.batches_in_flight)
+        self.exporter.add_gauge("http_coalesce_in_flight_keys", "Distinct requests being computed",
+                                lambda: len(self.in_flight))
+
+        self.profiles = ProfileStore(max_profiles)
+
+        self.executor = None
+        self.server = None
+        self.connections = set()
+        self.pending = 0
+        self.stats = {
+            "requests": 0,
+            "ok": 0,
+            "client_errors": 0,
+            "rejected": 0,
+            "timeouts": 0,
+            "server_errors": 0
+        }
+
+        self.routes = {
+            ("POST", "/chart"): "chart",
+            ("POST", "/years"): "years",
+            ("POST", "/prompt"): "prompt"
+        }
+        # 按接口统计延迟的路径（其他路径归入 "other"，避免标签基数随请求增长）
+        self.endpoints = {path for _, path in self.routes} | {"/health", "/stats", "/metrics"}
+
+    async def start(self):
+        """启动进程池（等待所有工作进程完成预加载）并开始监听"""
+        if self.stage_metrics:
+            self.metrics_dir = tempfile.mkdtemp(prefix="bazi_metrics_")
+            self.exporter.worker_dir = self.metrics_dir
+        if self.fork:
+            self.executor = create_fork_pool(self.workers, _init_worker, (self.snapshot_path, self.metrics_dir))
+        else:
+            self.executor = create_process_pool(
+                self.workers,
+                initializer=_init_worker,
+                initargs=(self.snapshot_path, self.metrics_dir)
+            )
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*[
+            loop.run_in_executor(self.executor, _worker_ready)
+            for _ in range(self.workers)
+        ])
+        self.batch_queue = asyncio.Queue()
+        self.batch_full = asyncio.Event()
+        self.batch_task = asyncio.create_task(self._batch_loop())
+        self.server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    async def stop(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        # 关闭空闲的 keep-alive 连接，让各连接处理协程正常退出
+        for writer in list(self.connections):
+            writer.close()
+        await asyncio.sleep(0)
+        if self.batch_task is not None:
+            self.batch_task.cancel()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+        if self.metrics_dir is not None:
+            shutil.rmtree(self.metrics_dir, ignore_errors=True)
+
+    # ============================================
+    # 连接与请求处理
+    # ============================================
+
+    async def _handle_connection(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        self.connections.add(writer)
+        try:
+            while True:
+                request = await self._read_request(reader, writer)
+                if request is None:
+                    break
+                method, path, headers, body = request
+                profile_id = self._profile_id(headers)
+                started = loop.time()
+                status, payload = await self._dispatch(method, path, body, profile_id)
+                self.serving_metrics.observe_request(
+                    path if path in self.endpoints else "other", status, loop.time() - started
+                )
+                keep_alive = headers.get("connection", "").lower() != "close"
+                content_type = METRICS_CONTENT_TYPE if path == "/metrics" else JSON_CONTENT_TYPE
+                extra_headers = {"X-Profile-Id": profile_id} if profile_id else None
+                self._write_response(writer, status, payload, keep_alive, content_type, extra_headers)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.connections.discard(writer)
+            writer.close()
+
+    async def _read_request(self, reader, writer):
+        """读取一个请求，返回 (method, path, headers, body)；连接关闭或请求不合法时返回 None"""
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.header_timeout)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError):
+            return None
+
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, path, _ = lines[0].split(" ", 2)
+        except ValueError:
+            return None
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                key, value = line.split(":", 1)
+                headers[key.strip().lower()] = value.strip()
+
+        raw_length = headers.get("content-length", "") or "0"
+        if not (raw_length.isascii() and raw_length.isdigit()):
+            self._write_response(writer, HTTPStatus.BAD_REQUEST, b'{"error": "Invalid Content-Length"}', False)
+            await writer.drain()
+            return None
+        length = int(raw_length)
+        if length > self.max_body_bytes:
+            self._write_response(writer, HTTPStatus.REQUEST_ENTITY_TOO_LARGE, b'{"error": "Request body too large"}', False)
+            await writer.drain()
+            return None
+        try:
+            body = await asyncio.wait_for(reader.readexactly(length), self.header_timeout) if length else b""
+        except asyncio.TimeoutError:
+            return None
+        return method, path.split("?", 1)[0], headers, body
+
+    @staticmethod
+    def _profile_id(headers):
+        """X-Profile 请求头 -> 剖析 ID（没有该请求头时为 None）"""
+        value = headers.get("x-profile")
+        if not value:
+            return None
+        if value.lower() in ("1", "true", "yes") or not PROFILE_ID_PATTERN.match(value):
+            return new_request_id()
+        return value
+
+    async def _dispatch(self, method, path, body, profile_id=None):
+        """路由 -> (状态码, 响应体字节)"""
+        self.stats["requests"] += 1
+
+        if method == "GET" and path == "/health":
+            return HTTPStatus.OK, b'{"status": "ok"}'
+        if method == "GET" and path == "/stats":
+            stats = dict(self.stats, pending=self.pending, max_pending=self.max_pending, workers=self.workers,
+                         batching=self.batch_stats.snapshot(),
+                         coalescing=self.coalesce_stats.snapshot(len(self.in_flight)),
+                         memory=pool_memory(self.executor))
+            return HTTPStatus.OK, json.dumps(stats).encode("utf-8")
+        if method == "GET" and path == "/metrics":
+            return HTTPStatus.OK, self.exporter.render().encode("utf-8")
+        if method == "GET" and path == "/profiles":
+            return HTTPStatus.OK, json.dumps(self.profiles.list()).encode("utf-8")
+        if method == "GET" and path.startswith("/profiles/"):
+            record = self.profiles.get(path[len("/profiles/"):])
+            if record is None:
+                self.stats["client_errors"] += 1
+                return HTTPStatus.NOT_FOUND, b'{"error": "Profile not found"}'
+            return HTTPStatus.OK, json.dumps(summarize(record), ensure_ascii=False).encode("utf-8")
+
+        task_name = self.routes.get((method, path))
+        if task_name is None:
+            self.stats["client_errors"] += 1
+            return HTTPStatus.NOT_FOUND, b'{"error": "Not found"}'
+
+        try:
+            payload = json.loads(body or b"{}")
+            if not isinstance(payload, dict):
+                raise ValueError
+        except ValueError:
+            self.stats["client_errors"] += 1
+            return HTTPStatus.BAD_REQUEST, b'{"error": "Request body must be a JSON object"}'
+
+        if profile_id is not None:
+            return await self._submit_profiled(task_name, payload, profile_id)
+        return await self._submit(task_name, payload)
+
+    async def _submit(self, task_name, payload):
+        """提交到进程池（有界排队 + 超时）；同键请求正在计算时改为等待其结果"""
+        key = _coalesce_key(task_name, payload) if self.coalesce else None
+        flight = self.in_flight.get(key) if key is not None else None
+        if flight is not None and not flight.future.cancelled():
+            self.coalesce_stats.coalesced += 1
+            self.serving_metrics.count("coalesced")
+            flight.group_size += 1
+            self.coalesce_stats.max_group_size = max(self.coalesce_stats.max_group_size, flight.group_size)
+            return await self._await_flight(flight)
+
+        if self.pending >= self.max_pending:
+            self.stats["rejected"] += 1
+            return HTTPStatus.SERVICE_UNAVAILABLE, b'{"error": "Server busy"}'
+
+        self.pending += 1
+        loop = asyncio.get_running_loop()
+        if task_name == "chart" and self.batch_size > 1:
+            # 进入批处理队列，由 _batch_loop 攒批提交；名额在整批算完后释放
+            waiter = loop.create_future()
+            self.batch_queue.put_nowait((payload, waiter, loop.time()))
+            if self.batch_queue.qsize() >= self.batch_size:
+                self.batch_full.set()
+        else:
+            future = self.executor.submit(_run_task, task_name, payload)
+            # 名额在工作进程算完后才释放（超时的请求仍占用计算资源）
+            future.add_done_callback(lambda _: loop.call_soon_threadsafe(self._release))
+            waiter = asyncio.wrap_future(future)
+
+        if key is not None:
+            flight = _Flight(waiter)
+            self.in_flight[key] = flight
+            self.coalesce_stats.leaders += 1
+            self.coalesce_stats.max_group_size = max(self.coalesce_stats.max_group_size, 1)
+            waiter.add_done_callback(lambda _, key=key, flight=flight: self._land(key, flight))
+            return await self._await_flight(flight)
+
+        try:
+            status, response = await asyncio.wait_for(waiter, self.request_timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            self.serving_metrics.count_error("TimeoutError")
+            return HTTPStatus.GATEWAY_TIMEOUT, b'{"error": "Request timed out"}'
+        except Exception as exc:
+            self.stats["server_errors"] += 1
+            self.serving_metrics.count_error(type(exc).__name__)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, json.dumps({"error": repr(exc)}).encode("utf-8")
+
+        self.stats["ok" if status == HTTPStatus.OK else "client_errors"] += 1
+        return status, response
+
+    def _release(self, count=1):
+        self.pending -= count
+
+    async def _submit_profiled(self, task_name, payload, profile_id):
+        """单独提交一次剖析请求（不攒批、不合并；同样受在途上限与超时约束），剖析记录算完即保存（即使请求已超时）"""
+        if self.pending >= self.max_pending:
+            self.stats["rejected"] += 1
+            return HTTPStatus.SERVICE_UNAVAILABLE, b'{"error": "Server busy"}'
+
+        self.pending += 1
+        loop = asyncio.get_running_loop()
+        future = self.executor.submit(_run_profiled, task_name, payload, profile_id)
+        future.add_done_callback(lambda done: loop.call_soon_threadsafe(self._land_profile, done))
+        try:
+            status, response, _ = await asyncio.wait_for(asyncio.wrap_future(future), self.request_timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            self.serving_metrics.count_error("TimeoutError")
+            return HTTPStatus.GATEWAY_TIMEOUT, b'{"error": "Request timed out"}'
+        except Exception as exc:
+            self.stats["server_errors"] += 1
+            self.serving_metrics.count_error(type(exc).__name__)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, json.dumps({"error": repr(exc)}).encode("utf-8")
+
+        self.stats["ok" if status == HTTPStatus.OK else "client_errors"] += 1
+        return status, response
+
+    def _land_profile(self, future):
+        self._release()
+        if not future.cancelled() and future.exception() is None:
+            self.profiles.add(future.result()[2])
+
+    # ============================================
+    # 请求合并（single-flight）
+    # ============================================
+
+    async def _await_flight(self, flight):
+        """
+        等待在途计算的结果（shield：单个请求超时不影响同组其他请求）；
+        同组请求全部超时放弃后取消计算（与不合并时超时即取消的行为一致）
+        """
+        flight.waiters += 1
+        try:
+            status, response = await asyncio.wait_for(asyncio.shield(flight.future), self.request_timeout)
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            self.serving_metrics.count_error("TimeoutError")
+            flight.waiters -= 1
+            if flight.waiters == 0:
+                flight.future.cancel()
+            return HTTPStatus.GATEWAY_TIMEOUT, b'{"error": "Request timed out"}'
+        except Exception as exc:
+            flight.waiters -= 1
+            self.stats["server_errors"] += 1
+            self.serving_metrics.count_error(type(exc).__name__)
+            return HTTPStatus.INTERNAL_SERVER_ERROR, json.dumps({"error": repr(exc)}).encode("utf-8")
+
+        flight.waiters -= 1
+        self.stats["ok" if status == HTTPStatus.OK else "client_errors"] += 1
+        return status, response
+
+    def _land(self, key, flight):
+        """计算结束（完成 / 出错 / 取消）：之后到达的同键请求重新提交"""
+        if self.in_flight.get(key) is flight:
+            del self.in_flight[key]
+
+    # ============================================
+    # micro-batch
+    # ============================================
+
+    async def _batch_loop(self):
+        """
+        攒批：取到首个请求后等到批满或 batch_wait_ms 到期，再整批提交（不等结果即开始攒下一批）
+
+        有空闲工作进程时不等待，直接提交已排队的请求（低负载下不增加延迟）
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.batch_queue.get()]
+            workers_busy = self.batches_in_flight >= self.workers
+            if workers_busy and self.batch_queue.qsize() + 1 < self.batch_size:
+                self.batch_full.clear()
+                try:
+                    await asyncio.wait_for(self.batch_full.wait(), self.batch_wait_ms / 1000)
+                except asyncio.TimeoutError:
+                    pass
+            while len(batch) < self.batch_size and not self.batch_queue.empty():
+                batch.append(self.batch_queue.get_nowait())
+            if self.batch_queue.qsize() < self.batch_size:
+                self.batch_full.clear()
+
+            dispatched_at = loop.time()
+            self.serving_metrics.observe_batch(len(batch))
+            self.batch_stats.record(len(batch), [(dispatched_at - queued_at) * 1000 for _, _, queued_at in batch])
+
+            self.batches_in_flight += 1
+            future = self.executor.submit(_run_batch, [payload for payload, _, _ in batch])
+            future.add_done_callback(
+                lambda done, batch=batch: loop.call_soon_threadsafe(self._complete_batch, batch, done)
+            )
+
+    def _complete_batch(self, batch, future):
+        """整批算完：把各项结果分发回对应请求，并释放名额"""
+        self._release(len(batch))
+        self.batches_in_flight -= 1
+        if future.cancelled():
+            for _, waiter, _ in batch:
+                waiter.cancel()
+            return
+        exc = future.exception()
+        responses = future.result() if exc is None else [exc] * len(batch)
+        for (_, waiter, _), response in zip(batch, responses):
+            # 已超时的请求不再回填
+            if waiter.done():
+                continue
+            if isinstance(response, Exception):
+                waiter.set_exception(response)
+            else:
+                waiter.set_result(response)
+
+    @staticmethod
+    def _write_response(writer, status, body, keep_alive, content_type=JSON_CONTENT_TYPE, extra_headers=None):
+        head = (
+            f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        )
+        for name, value in (extra_headers or {}).items():
+            head += f"{name}: {value}\r\n"
+        if status == HTTPStatus.SERVICE_UNAVAILABLE:
+            head += "Retry-After: 1\r\n"
+        writer.write(head.encode("latin-1") + b"\r\n" + body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="八字 HTTP 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=None, help="工作进程数（默认 CPU 核数）")
+    parser.add_argument("--max-pending", type=int, default=256, help="在途请求上限，超出返回 503")
+    parser.add_argument("--timeout", type=float, default=10.0, help="单个请求超时秒数，超出返回 504")
+    parser.add_argument("--batch-size", type=int, default=32, help="micro-batch 最大批大小（1 为关闭）")
+    parser.add_argument("--batch-wait-ms", type=float, default=2.0, help="micro-batch 最长等待毫秒数")
+    parser.add_argument("--snapshot", default=None, help="预热快照文件（见 warm_snapshot.py，失效时忽略）")
+    parser.add_argument("--fork", action="store_true", help="预加载一次后 fork 工作进程（共享只读数据）")
+    parser.add_argument("--no-coalesce", action="store_true", help="关闭相同请求合并")
+    parser.add_argument("--stage-metrics", action="store_true", help="/metrics 中加入各步骤耗时与缓存命中（约 3%% 开销）")
+    args = parser.parse_args()
+
+    service = BaziHTTPService(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        max_pending=args.max_pending,
+        request_timeout=args.timeout,
+        batch_size=args.batch_size,
+        batch_wait_ms=args.batch_wait_ms,
+        snapshot_path=args.snapshot,
+        fork=args.fork,
+        coalesce=not args.no_coalesce,
+        stage_metrics=args.stage_metrics
+    )
+    print(f"八字 HTTP 服务启动: http://{args.host}:{args.port}（{service.workers} 个工作进程）")
+    try:
+        asyncio.run(service.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
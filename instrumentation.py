@@ -0,0 +1,297 @@
+# instrumentation.py
+"""
+性能埋点
+负责在排盘流水线各步骤（时间处理、排盘、特征分析、大运流年、Prompt 编排）前后发出计时事件，
+并对缓存命中、lunar_python 调用等计数；事件交给注册的钩子处理，内置 MetricsCollector 在内存中汇总直方图
+
+未注册钩子时每个埋点只多一次全局变量判断（见 test_instrumentation.py 的开销测量），生产环境可常驻
+"""
+
+import bisect
+import functools
+import threading
+from contextlib import contextmanager
+from time import perf_counter
+
+# 已注册的钩子（元组整体替换，读取时无需加锁）
+_hooks = ()
+_hooks_lock = threading.Lock()
+
+# 默认直方图分桶上界（秒），10µs ~ 10s
+DEFAULT_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0
+)
+
+
+class InstrumentationHook:
+    """
+    埋点钩子接口（按需覆盖，默认什么也不做）
+
+    钩子在排盘线程内同步调用，应尽快返回且不抛出异常；多线程共用服务时需自行保证线程安全
+    """
+
+    def on_stage_start(self, name):
+        """步骤开始"""
+
+    def on_stage_end(self, name, duration, error=None):
+        """
+        步骤结束
+
+        Args:
+            name: 步骤名，如 "chart_builder.build_chart"
+            duration: 耗时（秒）
+            error: 步骤抛出的异常，正常结束时为 None
+        """
+
+    def on_count(self, name, value):
+        """计数事件，如 ("time_processor.jie_cache.hit", 1)"""
+
+
+def add_hook(hook):
+    """注册钩子（重复注册无效）"""
+    global _hooks
+    with _hooks_lock:
+        if hook not in _hooks:
+            _hooks = _hooks + (hook,)
+
+
+def remove_hook(hook):
+    """注销钩子（未注册时忽略）"""
+    global _hooks
+    with _hooks_lock:
+        _hooks = tuple(item for item in _hooks if item is not hook)
+
+
+def enabled():
+    """是否有已注册的钩子"""
+    return bool(_hooks)
+
+
+def count(name, value=1):
+    """发出计数事件（未注册钩子时直接返回）"""
+    if _hooks:
+        for hook in _hooks:
+            hook.on_count(name, value)
+
+
+def timed(name):
+    """
+    装饰器：把函数的每次调用作为名为 name 的步骤计时
+
+    Example:
+        @timed("chart_builder.build_chart")
+        def build_chart(self, solar_data, gender): ...
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            hooks = _hooks
+            if not hooks:
+                return func(*args, **kwargs)
+
+            for hook in hooks:
+                hook.on_stage_start(name)
+            error = None
+            start = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except BaseException as exc:
+                error = exc
+                raise
+            finally:
+                duration = perf_counter() - start
+                for hook in hooks:
+                    hook.on_stage_end(name, duration, error)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def collecting(collector=None):
+    """
+    在 with 块内注册一个 MetricsCollector，退出时注销
+
+    Example:
+        with collecting() as metrics:
+            service.generate_complete_chart(...)
+        print(metrics.snapshot())
+    """
+    collector = collector if collector is not None else MetricsCollector()
+    add_hook(collector)
+    try:
+        yield collector
+    finally:
+        remove_hook(collector)
+
+
+# ============================================
+# 内存直方图汇总
+# ============================================
+
+class Histogram:
+    """固定分桶直方图（与 Prometheus histogram 相同的累计分桶语义：value <= le），默认按耗时（秒）分桶"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        # 最后一格为 +Inf
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """
+        由分桶估算分位数（桶内线性插值，结果限制在观测到的最小 / 最大值之间）
+
+        Returns:
+            与观测值同单位；无观测时返回 None
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.bucket_counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                value = lower + (upper - lower) * (rank - cumulative) / bucket_count
+                return min(max(value, self.min), self.max)
+            cumulative += bucket_count
+        return self.max
+
+    def merge(self, bucket_counts, count, total, minimum, maximum):
+        """并入另一个同分桶直方图的数据（见 state()）"""
+        for index, bucket_count in enumerate(bucket_counts):
+            self.bucket_counts[index] += bucket_count
+        self.count += count
+        self.sum += total
+        if minimum is not None and (self.min is None or minimum < self.min):
+            self.min = minimum
+        if maximum is not None and (self.max is None or maximum > self.max):
+            self.max = maximum
+
+    def state(self):
+        """[各桶个数, count, sum, min, max]（可 JSON 序列化，供 merge() 还原）"""
+        return [list(self.bucket_counts), self.count, self.sum, self.min, self.max]
+
+    def cumulative_buckets(self):
+        """[(上界, 累计个数), ...]，最后一项上界为 float("inf")"""
+        result = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), self.bucket_counts):
+            cumulative += bucket_count
+            result.append((bound, cumulative))
+        return result
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min,
+            "max": self.max,
+            "mean": self.sum / self.count if self.count else None,
+            "p50": self.quantile(0.5),
+            "p95": self.quantile(0.95),
+            "p99": self.quantile(0.99),
+            "buckets": self.cumulative_buckets()
+        }
+
+
+class MetricsCollector(InstrumentationHook):
+    """
+    内置钩子：按步骤名汇总耗时直方图、出错次数（及按异常类型），按名称累加计数（线程安全）
+
+    state() / merge() 用于跨进程汇总（如各工作进程的数据合并到主进程导出，见 metrics_exporter.py）
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.errors = {}
+        self.error_types = {}
+        self.counters = {}
+
+    def on_stage_end(self, name, duration, error=None):
+        with self._lock:
+            histogram = self.stages.get(name)
+            if histogram is None:
+                histogram = self.stages[name] = Histogram(self.buckets)
+            histogram.observe(duration)
+            if error is not None:
+                self.errors[name] = self.errors.get(name, 0) + 1
+                key = (name, type(error).__name__)
+                self.error_types[key] = self.error_types.get(key, 0) + 1
+
+    def on_count(self, name, value):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+            self.errors = {}
+            self.error_types = {}
+            self.counters = {}
+
+    def state(self):
+        """
+        全部原始数据（可 JSON 序列化）
+
+        Returns:
+            {"buckets", "stages": {步骤名: Histogram.state()}, "error_types": [[步骤名, 异常类型, 次数]], "counters"}
+        """
+        with self._lock:
+            return {
+                "buckets": list(self.buckets),
+                "stages": {name: histogram.state() for name, histogram in self.stages.items()},
+                "error_types": [[name, error_type, value] for (name, error_type), value in self.error_types.items()],
+                "counters": dict(self.counters)
+            }
+
+    def merge(self, state):
+        """
+        并入 state() 的输出
+
+        Raises:
+            ValueError: 分桶与本汇总器不同
+        """
+        if tuple(state["buckets"]) != self.buckets:
+            raise ValueError("Histogram buckets differ")
+        with self._lock:
+            for name, histogram_state in state["stages"].items():
+                histogram = self.stages.get(name)
+                if histogram is None:
+                    histogram = self.stages[name] = Histogram(self.buckets)
+                histogram.merge(*histogram_state)
+            for name, error_type, value in state["error_types"]:
+                self.errors[name] = self.errors.get(name, 0) + value
+                self.error_types[(name, error_type)] = self.error_types.get((name, error_type), 0) + value
+            for name, value in state["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        """
+        当前汇总结果
+
+        Returns:
+            {"stages": {步骤名: Histogram.to_dict()}, "errors": {步骤名: 次数}, "counters": {名称: 累计值}}
+        """
+        with self._lock:
+            return {
+                "stages": {name: self.stages[name].to_dict() for name in sorted(self.stages)},
+                "errors": dict(sorted(self.errors.items())),
+                "counters": dict(sorted(self.counters.items()))
+            }
@@ -4,75 +4,88 @@
 负责判断干支之间的刑冲合害关系
 """
 
+from bazi_reference import freeze
+
 class InteractionEngine:
     """干支关系检测引擎（纯静态方法）"""
     
     # ============================================
     # 地支六冲
     # ============================================
-    LIUCHONG = {
+    LIUCHONG = freeze({
         '子': '午', '午': '子',
         '丑': '未', '未': '丑',
         '寅': '申', '申': '寅',
         '卯': '酉', '酉': '卯',
         '辰': '戌', '戌': '辰',
         '巳': '亥', '亥': '巳'
-    }
+    })
     
     # ============================================
     # 地支六合
     # ============================================
-    LIUHE = {
+    LIUHE = freeze({
         ('子', '丑'): '土',
         ('寅', '亥'): '木',
         ('卯', '戌'): '火',
         ('辰', '酉'): '金',
         ('巳', '申'): '水',
         ('午', '未'): '土'
-    }
+    })
     
     # ============================================
     # 地支三合
     # ============================================
-    SANHE = {
+    SANHE = freeze({
         frozenset(['申', '子', '辰']): '水',
         frozenset(['亥', '卯', '未']): '木',
         frozenset(['寅', '午', '戌']): '火',
         frozenset(['巳', '酉', '丑']): '金'
-    }
+    })
     
     # ============================================
     # 地支三刑
     # ============================================
-    SANXING = {
+    SANXING = freeze({
         frozenset(['寅', '巳', '申']): '无恩之刑',
         frozenset(['丑', '未', '戌']): '恃势之刑'
-    }
+    })
     
     # 子卯刑（无礼之刑）
-    LIANG_XING = {
+    LIANG_XING = freeze({
         frozenset(['子', '卯']): '无礼之刑'
-    }
+    })
     
     # 自刑
-    ZI_XING = ['辰', '午', '酉', '亥']
+    ZI_XING = freeze(['辰', '午', '酉', '亥'])
     
     # ============================================
     # 地支六害
     # ============================================
-    LIUHAI = {
+    LIUHAI = freeze({
         frozenset(['子', '未']): '子未害',
         frozenset(['丑', '午']): '丑午害',
         frozenset(['寅', '巳']): '寅巳害',
         frozenset(['卯', '辰']): '卯辰害',
         frozenset(['申', '亥']): '申亥害',
         frozenset(['酉', '戌']): '酉戌害'
-    }
+    })
+    
+    # ============================================
+    # 天干五合
+    # ============================================
+    TIANGAN_WUHE = freeze({
+        frozenset(['甲', '己']): '土',
+        frozenset(['乙', '庚']): '金',
+        frozenset(['丙', '辛']): '水',
+        frozenset(['丁', '壬']): '木',
+        frozenset(['戊', '癸']): '火'
+    })
     
     # ============================================
     # 天干相克
     # ============================================
-    TIANGAN_KE = {
+    TIANGAN_KE = freeze({
         "甲": ["庚", "辛"],
         "乙": ["庚", "辛"],
         "丙": ["壬", "癸"],
@@ -83,7 +96,7 @@ class InteractionEngine:
         "辛": ["丙", "丁"],
         "壬": ["戊", "己"],
         "癸": ["戊", "己"]
-    }
+    })
     
     # ============================================
     # 核心检测方法
@@ -113,6 +126,19 @@ class InteractionEngine:
                 return {"is_he": True, "hehuan_element": element}
         return {"is_he": False}
     
+    @staticmethod
+    def check_gan_he(gan1, gan2):
+        """
+        检测天干五合
+        
+        Returns:
+            dict: {"is_he": bool, "hehuan_element": str}
+        """
+        element = InteractionEngine.TIANGAN_WUHE.get(frozenset([gan1, gan2]))
+        if element:
+            return {"is_he": True, "hehuan_element": element}
+        return {"is_he": False}
+    
     @staticmethod
     def check_sanhe(zhi_list):
         """
@@ -231,7 +257,7 @@ class InteractionEngine:
         return {"is_tianke_dichong": False}
     
     @staticmethod
-    def detect_bazi_internal(pillars):
+    def detect_bazi_internal(pillars, with_notes=True):
         """
         检测原局内部的刑冲合害
         
@@ -242,12 +268,19 @@ class InteractionEngine:
                 "day": {"gan": "丙", "zhi": "午"},
                 "time": {"gan": "己", "zhi": "亥"}
             }
+            with_notes: 为False时不生成各项的 note 文字
         
         Returns:
             list: 互动关系列表
         """
         interactions = []
         
+        def add(item, note):
+            """note 为生成说明文字的函数，只在需要时调用"""
+            if with_notes:
+                item["note"] = note()
+            interactions.append(item)
+        
         pillar_list = [
             {"name": "年柱", "position": "年支", **pillars["year"]},
             {"name": "月柱", "position": "月支", **pillars["month"]},
@@ -263,15 +296,14 @@ class InteractionEngine:
                 p1, p2 = pillar_list[i], pillar_list[j]
                 
                 if InteractionEngine.check_chong(p1["zhi"], p2["zhi"]):
-                    interactions.append({
+                    add({
                         "type": "六冲",
                         "zhi1": p1["zhi"],
                         "zhi2": p2["zhi"],
                         "position1": p1["position"],
                         "position2": p2["position"],
-                        "involved_pillars": [p1["name"], p2["name"]],
-                        "note": f"{p1['position']}与{p2['position']}相冲"
-                    })
+                        "involved_pillars": [p1["name"], p2["name"]]
+                    }, lambda: f"{p1['position']}与{p2['position']}相冲")
         
         # 2. 检测六合（两两对比）
         for i in range(len(pillar_list)):
@@ -280,50 +312,46 @@ class InteractionEngine:
                 
                 he_result = InteractionEngine.check_he(p1["zhi"], p2["zhi"])
                 if he_result["is_he"]:
-                    interactions.append({
+                    add({
                         "type": "六合",
                         "zhi1": p1["zhi"],
                         "zhi2": p2["zhi"],
                         "position1": p1["position"],
                         "position2": p2["position"],
                         "involved_pillars": [p1["name"], p2["name"]],
-                        "hehuan_element": he_result["hehuan_element"],
-                        "note": f"{p1['position']}与{p2['position']}六合化{he_result['hehuan_element']}"
-                    })
+                        "hehuan_element": he_result["hehuan_element"]
+                    }, lambda: f"{p1['position']}与{p2['position']}六合化{he_result['hehuan_element']}")
         
         # 3. 检测三合
         sanhe_results = InteractionEngine.check_sanhe(zhi_list)
         for sanhe in sanhe_results:
             involved = [p for p in pillar_list if p["zhi"] in sanhe["zhis"]]
-            interactions.append({
+            add({
                 "type": "三合",
                 "zhis": sanhe["zhis"],
                 "involved_pillars": [p["name"] for p in involved],
-                "hehuan_element": sanhe["element"],
-                "note": f"{''.join(sanhe['zhis'])}三合{sanhe['element']}局"
-            })
+                "hehuan_element": sanhe["element"]
+            }, lambda: f"{''.join(sanhe['zhis'])}三合{sanhe['element']}局")
         
         # 4. 检测三刑
         xing_results = InteractionEngine.check_xing(zhi_list)
         for xing in xing_results:
             if xing["type"] == "自刑":
                 involved = [p for p in pillar_list if p["zhi"] == xing["zhi"]]
-                interactions.append({
+                add({
                     "type": "自刑",
                     "zhi": xing["zhi"],
                     "count": xing["count"],
-                    "involved_pillars": [p["name"] for p in involved],
-                    "note": f"{xing['zhi']}出现{xing['count']}次，自刑，主内心矛盾"
-                })
+                    "involved_pillars": [p["name"] for p in involved]
+                }, lambda: f"{xing['zhi']}出现{xing['count']}次，自刑，主内心矛盾")
             else:
                 involved = [p for p in pillar_list if p["zhi"] in xing["zhis"]]
-                interactions.append({
+                add({
                     "type": xing["type"],
                     "zhis": xing["zhis"],
                     "involved_pillars": [p["name"] for p in involved],
-                    "xing_type": xing["xing_type"],
-                    "note": f"{''.join(xing['zhis'])}{'相刑' if xing['type']=='二刑' else '三刑'}（{xing['xing_type']}）"
-                })
+                    "xing_type": xing["xing_type"]
+                }, lambda: f"{''.join(xing['zhis'])}{'相刑' if xing['type']=='二刑' else '三刑'}（{xing['xing_type']}）")
         
         # 5. 检测六害（两两对比）
         for i in range(len(pillar_list)):
@@ -332,15 +360,14 @@ class InteractionEngine:
                 
                 hai_result = InteractionEngine.check_hai(p1["zhi"], p2["zhi"])
                 if hai_result["is_hai"]:
-                    interactions.append({
+                    add({
                         "type": "六害",
                         "zhi1": p1["zhi"],
                         "zhi2": p2["zhi"],
                         "position1": p1["position"],
                         "position2": p2["position"],
                         "involved_pillars": [p1["name"], p2["name"]],
-                        "hai_type": hai_result["hai_type"],
-                        "note": f"{hai_result['hai_type']}，主暗中阻碍"
-                    })
+                        "hai_type": hai_result["hai_type"]
+                    }, lambda: f"{hai_result['hai_type']}，主暗中阻碍")
         
         return interactions
\ No newline at end of file
@@ -0,0 +1,270 @@
+# jie_calendar.py
+"""
+节气日历
+负责提供"节"的精确时刻（按年缓存，或按年份区间向量化批量计算）和日柱的日序数推算，
+供反查、检索、黄历等批量模块共用
+"""
+
+from datetime import datetime, timedelta
+import numpy as np
+from lunar_python import Solar
+from lunar_python.util import ShouXingUtil
+
+from bazi_time_processor import JIE_ZHI_MAP, BaziTimeProcessor
+
+# 月支 -> 节气名称
+ZHI_JIE_MAP = {zhi: name for name, zhi in JIE_ZHI_MAP.items()}
+
+# 日柱序号 = (公历日序数 + DAY_INDEX_OFFSET) % 60，与 lunar_python 的 getDayInGanZhi 一致
+DAY_INDEX_OFFSET = 14
+
+# 公历年内12个"节"的先后顺序（与 get_year_jie 的排序一致）
+JIE_NAMES = ["小寒", "立春", "惊蛰", "清明", "立夏", "芒种", "小暑", "立秋", "白露", "寒露", "立冬", "大雪"]
+
+
+class JieCalendar:
+    """节气日历（按年缓存 lunar_python 的节气表）"""
+
+    def __init__(self):
+        self._year_cache = {}
+
+    def get_year_jie(self, year):
+        """
+        获取某公历年内的12个"节"（小寒 ... 大雪），按时间排序
+
+        Returns:
+            [{"name": "小寒", "datetime": datetime, "zhi": "丑", "year_belong": year}, ...]
+        """
+        jie_list = self._year_cache.get(year)
+        if jie_list is None:
+            # 与 BaziTimeProcessor 相同：构造该年6月1日来获取整年节气表
+            jie_qi_table = Solar.fromYmdHms(year, 6, 1, 0, 0, 0).getLunar().getJieQiTable()
+            jie_list = []
+            for name, solar_obj in jie_qi_table.items():
+                if name in JIE_ZHI_MAP:
+                    jie_list.append({
+                        "name": name,
+                        "datetime": datetime.strptime(solar_obj.toYmdHms(), "%Y-%m-%d %H:%M:%S"),
+                        "zhi": JIE_ZHI_MAP[name],
+                        "year_belong": year
+                    })
+            jie_list.sort(key=lambda x: x["datetime"])
+            self._year_cache[year] = jie_list
+        return jie_list
+
+    def get_jie(self, year, name):
+        """获取某公历年内指定名称的"节" """
+        return next(item for item in self.get_year_jie(year) if item["name"] == name)
+
+    def get_next_jie(self, jie):
+        """获取紧随其后的下一个"节" """
+        year_list = self.get_year_jie(jie["year_belong"])
+        position = year_list.index(jie)
+        if position + 1 < len(year_list):
+            return year_list[position + 1]
+        return self.get_year_jie(jie["year_belong"] + 1)[0]
+
+    def warmup(self, start_year, end_year):
+        """预先加载 [start_year, end_year] 的节气表（由 compute_jie_seconds 一次算出，与逐年查询结果相同）"""
+        missing = [year for year in range(start_year, end_year + 1) if year not in self._year_cache]
+        if not missing:
+            return
+        epoch = datetime(1970, 1, 1)
+        jie_seconds = compute_jie_seconds(missing[0], missing[-1])
+        for year, row in zip(range(missing[0], missing[-1] + 1), jie_seconds.tolist()):
+            if year not in self._year_cache:
+                self._year_cache[year] = [
+                    {
+                        "name": name,
+                        "datetime": epoch + timedelta(seconds=seconds),
+                        "zhi": JIE_ZHI_MAP[name],
+                        "year_belong": year
+                    }
+                    for name, seconds in zip(JIE_NAMES, row)
+                ]
+
+    # ============================================
+    # 日序数推算
+    # ============================================
+
+    @staticmethod
+    def day_jiazi_index(day):
+        """
+        日柱六十甲子序号（按公历日期，不含晚子时换日）
+
+        Args:
+            day: date 或 datetime
+        """
+        return (day.toordinal() + DAY_INDEX_OFFSET) % 60
+
+    @staticmethod
+    def bazi_year_int(true_solar_time, prev_jie_name):
+        """命理年份（同 BaziTimeProcessor.bazi_year_int：公历1月/2月出生且月令为小寒时年份-1）"""
+        return BaziTimeProcessor.bazi_year_int(true_solar_time, prev_jie_name)
+
+    @staticmethod
+    def split_at_new_year(start, end):
+        """把区间 [start, end) 在公历元旦处切开（命理年份判定依赖公历年份）"""
+        pieces = []
+        cursor = start
+        while cursor < end:
+            new_year = datetime(cursor.year + 1, 1, 1)
+            piece_end = min(end, new_year)
+            pieces.append((cursor, piece_end))
+            cursor = piece_end
+        return pieces
+
+
+def hour_zhi_offset(zhi_index):
+    """
+    时支在命理日内的起始偏移（相对命理日 00:00）
+
+    子时从前一日 23:00 起算，其余时支每两小时一个
+    """
+    return timedelta(hours=2 * zhi_index - 1)
+
+
+# ============================================
+# 批量节气计算（NumPy 向量化）
+# ============================================
+#
+# 逐年构造 lunar_python 对象约 6 毫秒/年，生成几百年的日历时成为瓶颈。
+# 以下按 lunar_python（寿星万年历）的同一算法与系数表做向量化计算，
+# 结果精确到秒，与 JieCalendar.get_year_jie 一致。
+#
+# 系数表取自 ShouXingUtil 的私有属性（lunar_python 1.4.x 中名为 __XL0 / __NUT_B / __DT_AT），
+# 不属于公开接口：属性不存在时（lunar_python 改名或换实现）退回逐年的 JieCalendar.get_year_jie。
+
+try:
+    _XL0 = np.array(ShouXingUtil._ShouXingUtil__XL0, dtype=np.float64)
+    _NUT_B = np.array(ShouXingUtil._ShouXingUtil__NUT_B, dtype=np.float64).reshape(-1, 5)
+    _DT_AT = np.array(ShouXingUtil._ShouXingUtil__DT_AT, dtype=np.float64)
+except AttributeError:
+    _XL0 = _NUT_B = _DT_AT = None
+
+# 儒略日 -> Unix 纪元日
+_JULIAN_DAY_EPOCH = 2440588
+
+
+def _earth_longitude(t, n):
+    """地球黄经（ShouXingUtil.eLon 的向量化版本），t 为儒略世纪数"""
+    t = t / 10
+    value = np.zeros_like(t)
+    tn = np.ones_like(t)
+    m0 = _XL0[2] - _XL0[1]
+    for i in range(6):
+        n1 = int(_XL0[1 + i])
+        n2 = int(_XL0[2 + i])
+        n0 = n2 - n1
+        if n0 == 0:
+            continue
+        if n < 0:
+            m = n2
+        else:
+            m = int(3 * n * n0 / m0 + 0.5) + n1
+            if i != 0:
+                m += 3
+            if m > n2:
+                m = n2
+        index = np.arange(n1, m, 3)
+        terms = _XL0[index] * np.cos(_XL0[index + 1] + np.multiply.outer(t, _XL0[index + 2]))
+        value += terms.sum(axis=1) * tn
+        tn = tn * t
+    value /= _XL0[0]
+    t2 = t * t
+    t3 = t2 * t
+    value += (-0.0728 - 2.7702 * t - 1.1019 * t2 - 0.0996 * t3) / ShouXingUtil.SECOND_PER_RAD
+    return value
+
+
+def _sun_longitude(t, n):
+    """太阳视黄经（ShouXingUtil.saLon）"""
+    t2 = t * t
+    a = np.zeros((len(_NUT_B), 1))
+    a[0] = -1.742
+    nutation = ((_NUT_B[:, 3:4] + a * t) * np.sin(
+        _NUT_B[:, 0:1] + _NUT_B[:, 1:2] * t + _NUT_B[:, 2:3] * t2
+    )).sum(axis=0) / 100 / ShouXingUtil.SECOND_PER_RAD
+
+    v = -0.043126 + 628.301955 * t - 0.000002732 * t * t
+    e = 0.016708634 - 0.000042037 * t - 0.0000001267 * t * t
+    aberration = -20.49552 * (1 + e * np.cos(v)) / ShouXingUtil.SECOND_PER_RAD
+
+    return _earth_longitude(t, n) + nutation + aberration + ShouXingUtil.PI
+
+
+def _speed(t):
+    """太阳黄经速度（ShouXingUtil.ev）"""
+    f = 628.307585 * t
+    return (628.332 + 21 * np.sin(1.527 + f) + 0.44 * np.sin(1.48 + f * 2)
+            + 0.129 * np.sin(5.82 + f) * t + 0.00055 * np.sin(4.21 + f) * t * t)
+
+
+def _delta_t(year):
+    """力学时与世界时之差（秒，ShouXingUtil.dtCalc）"""
+    size = len(_DT_AT)
+    y0 = _DT_AT[size - 2]
+    t0 = _DT_AT[size - 1]
+
+    def extrapolate(y):
+        dy = (y - 1820) / 100
+        return -20 + 31 * dy * dy
+
+    bounds = _DT_AT[0:size - 1:5]
+    k = np.clip(np.searchsorted(bounds[1:], year, side="right"), 0, len(bounds) - 2)
+    i = k * 5
+    t1 = (year - _DT_AT[i]) / (_DT_AT[i + 5] - _DT_AT[i]) * 10
+    t2 = t1 * t1
+    t3 = t2 * t1
+    result = _DT_AT[i + 1] + _DT_AT[i + 2] * t1 + _DT_AT[i + 3] * t2 + _DT_AT[i + 4] * t3
+
+    near = extrapolate(year) - (extrapolate(y0) - t0) * (y0 + 100 - year) / 100
+    result = np.where(year >= y0, near, result)
+    return np.where(year > y0 + 100, extrapolate(year), result)
+
+
+def compute_jie_seconds(start_year, end_year):
+    """
+    批量计算 [start_year, end_year] 每年12个"节"的时刻（北京时间）
+
+    Returns:
+        int64 数组，形状 (年数, 12)，列顺序同 JIE_NAMES，值为距 1970-01-01 00:00:00 的秒数
+    """
+    if _XL0 is None:
+        return _jie_seconds_by_year(start_year, end_year)
+
+    years = np.arange(start_year, end_year + 1, dtype=np.float64)
+    # 黄经累计角：2000年小寒（285°）为第19个十五度
+    steps = 19 + 24 * (years[:, None] - 2000) + 2 * np.arange(12)
+    w = (steps * ShouXingUtil.PI / 12).ravel()
+
+    # ShouXingUtil.saLonT：两次牛顿迭代
+    t = (w - 1.75347 - ShouXingUtil.PI) / 628.3319653318
+    t = t + (w - _sun_longitude(t, 10)) / _speed(t)
+    t = t + (w - _sun_longitude(t, -1)) / _speed(t)
+    t = t * 36525
+
+    # ShouXingUtil.qiAccurate：力学时 -> 北京时间
+    julian_day = t - _delta_t(t / 365.2425 + 2000) / ShouXingUtil.SECOND_PER_DAY + ShouXingUtil.ONE_THIRD
+    julian_day += Solar.J2000
+
+    # Solar.fromJulianDay 的取整方式：时、分截断，秒四舍五入
+    day = np.floor(julian_day + 0.5)
+    fraction = (julian_day + 0.5 - day) * 24
+    hour = np.floor(fraction)
+    fraction = (fraction - hour) * 60
+    minute = np.floor(fraction)
+    second = np.round((fraction - minute) * 60)
+
+    seconds = (day - _JULIAN_DAY_EPOCH) * 86400 + hour * 3600 + minute * 60 + second
+    return seconds.astype(np.int64).reshape(len(years), 12)
+
+
+def _jie_seconds_by_year(start_year, end_year):
+    """逐年由 JieCalendar.get_year_jie 取"节"（系数表不可用时的退路，约 6 毫秒/年）"""
+    calendar = JieCalendar()
+    epoch = datetime(1970, 1, 1)
+    return np.array([
+        [int((item["datetime"] - epoch).total_seconds()) for item in calendar.get_year_jie(year)]
+        for year in range(start_year, end_year + 1)
+    ], dtype=np.int64)
@@ -0,0 +1,338 @@
+# metrics_exporter.py
+"""
+Prometheus 指标导出
+负责把排盘流水线的埋点数据（instrumentation.py）与服务层的接口延迟、批大小、队列深度
+渲染为 Prometheus 文本格式（0.0.4）：HTTP 服务挂在 GET /metrics，批量任务结束时写入文件
+
+指标名按模块划分：
+- bazi_<模块>_duration_seconds{stage}     各步骤耗时直方图（模块为 time_processor / chart_builder /
+                                          chart_analyzer / timeline / orchestrator / service），_count 即吞吐计数
+- bazi_<模块>_errors_total{stage, type}   各步骤按异常类型的出错次数
+- bazi_<计数名>_total{result}             缓存命中（result="hit" / "miss"）等计数；bazi_cache_hit_ratio{cache} 为命中率
+- bazi_http_* / bazi_batch_*              服务层：接口延迟、状态码计数、批大小、队列深度
+
+排盘在工作进程内执行：各工作进程把自己的汇总数据定期写入共享目录（worker-<pid>.json，
+与 prometheus_client 的多进程模式同一思路），导出时与主进程数据合并
+"""
+
+import glob
+import json
+import os
+import re
+import threading
+import time
+
+from instrumentation import Histogram, MetricsCollector, add_hook, remove_hook
+
+METRIC_PREFIX = "bazi"
+
+# 步骤名前缀 -> 指标名中的模块名
+STAGE_MODULES = ["time_processor", "chart_builder", "chart_analyzer", "timeline", "orchestrator", "service"]
+
+# 批大小直方图分桶
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def metric_name(*parts):
+    """拼接指标名（非法字符替换为下划线）"""
+    return _INVALID_NAME_CHARS.sub("_", "_".join((METRIC_PREFIX,) + parts))
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if value == float("inf"):
+            return "+Inf"
+        return repr(value)
+    return str(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for key, value in labels.items()
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class _Families:
+    """按指标族收集样本，渲染时每族输出一次 HELP / TYPE"""
+
+    def __init__(self):
+        self.families = {}
+
+    def add(self, name, metric_type, help_text, sample_suffix, labels, value):
+        family = self.families.get(name)
+        if family is None:
+            family = self.families[name] = (metric_type, help_text, [])
+        family[2].append((name + sample_suffix, labels, value))
+
+    def add_histogram(self, name, help_text, labels, histogram):
+        for bound, cumulative in histogram.cumulative_buckets():
+            self.add(name, "histogram", help_text, "_bucket", dict(labels, le=_format_value(float(bound))), cumulative)
+        self.add(name, "histogram", help_text, "_sum", labels, histogram.sum)
+        self.add(name, "histogram", help_text, "_count", labels, histogram.count)
+
+    def render(self):
+        lines = []
+        for name, (metric_type, help_text, samples) in self.families.items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# ============================================
+# 服务层指标（主进程）
+# ============================================
+
+class ServingMetrics:
+    """
+    服务层指标：各接口延迟直方图、按状态码的响应计数、批大小分布与其他计数
+
+    由事件循环 / 批量任务主循环单线程更新（不加锁）
+    """
+
+    def __init__(self, scope="http", batch_metric="batch_size"):
+        self.scope = scope
+        self.batch_metric = batch_metric
+        self.latency = {}
+        self.responses = {}
+        self.batch_sizes = Histogram(SIZE_BUCKETS)
+        self.errors = {}
+        self.counters = {}
+
+    def observe_request(self, endpoint, status, duration):
+        """记录一个请求：接口路径、HTTP 状态码、耗时（秒）"""
+        histogram = self.latency.get(endpoint)
+        if histogram is None:
+            histogram = self.latency[endpoint] = Histogram()
+        histogram.observe(duration)
+        key = (endpoint, int(status))
+        self.responses[key] = self.responses.get(key, 0) + 1
+
+    def observe_batch(self, size):
+        self.batch_sizes.observe(size)
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def count_error(self, error_type):
+        """服务层错误（超时、工作进程异常等），按类型计数"""
+        self.errors[error_type] = self.errors.get(error_type, 0) + 1
+
+    def add_to(self, families):
+        scope = self.scope
+        for endpoint, histogram in sorted(self.latency.items()):
+            families.add_histogram(metric_name(scope, "request_duration_seconds"),
+                                   "Request latency by endpoint", {"endpoint": endpoint}, histogram)
+        for (endpoint, status), value in sorted(self.responses.items()):
+            families.add(metric_name(scope, "requests_total"), "counter", "Requests by endpoint and status", "",
+                         {"endpoint": endpoint, "status": status}, value)
+        if self.batch_sizes.count:
+            families.add_histogram(metric_name(scope, self.batch_metric), "Items per dispatched batch", {},
+                                   self.batch_sizes)
+        for error_type, value in sorted(self.errors.items()):
+            families.add(metric_name(scope, "errors_total"), "counter", "Serving errors by type", "",
+                         {"type": error_type}, value)
+        for name, value in sorted(self.counters.items()):
+            families.add(metric_name(scope, name, "total"), "counter", name, "", {}, value)
+
+
+# ============================================
+# 工作进程
+# ============================================
+
+class WorkerMetrics:
+    """
+    工作进程内的汇总器：注册为埋点钩子，并把汇总数据写入 directory/worker-<pid>.json
+
+    interval > 0 时由后台线程每 interval 秒写一次（数据有变化时）；interval = 0 时每个任务结束即写入
+    （批量任务：块足够大，写文件的开销可忽略，结束时数据完整）
+    """
+
+    def __init__(self, directory, interval=1.0):
+        self.directory = directory
+        self.interval = interval
+        self.collector = MetricsCollector()
+        self._written = None
+        self._thread_pid = None
+        self._flush_lock = threading.Lock()
+
+    def task_done(self):
+        """每个工作进程任务结束时调用"""
+        if self.interval <= 0:
+            self.flush()
+        elif self._thread_pid != os.getpid():
+            # 首个任务时启动写入线程（fork 出的子进程不继承父进程的线程，按进程号判断）
+            self._thread_pid = os.getpid()
+            threading.Thread(target=self._flush_loop, daemon=True).start()
+
+    def reset_after_fork(self):
+        """
+        fork 出的子进程中调用：丢弃从父进程继承的汇总数据（fork 方式的进程池在父进程执行 initializer，
+        否则每个工作进程都会把父进程已记录的数据再上报一遍），锁与写入线程状态也一并重建
+        """
+        remove_hook(self.collector)
+        self.collector = MetricsCollector(self.collector.buckets)
+        add_hook(self.collector)
+        self._written = None
+        self._thread_pid = None
+        self._flush_lock = threading.Lock()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self):
+        """写入当前汇总数据（与上次写入相同时跳过；先写临时文件再替换）"""
+        with self._flush_lock:
+            data = json.dumps(self.collector.state(), separators=(",", ":"))
+            if data == self._written:
+                return
+            path = os.path.join(self.directory, f"worker-{os.getpid()}.json")
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+            self._written = data
+
+
+_worker_metrics = None
+
+
+def enable_worker_metrics(directory, interval=1.0):
+    """在当前（工作）进程开启埋点汇总，数据写入 directory（进程池 initializer 中调用，应在 warmup 之后）"""
+    global _worker_metrics
+    if _worker_metrics is None:
+        _worker_metrics = WorkerMetrics(directory, interval)
+        add_hook(_worker_metrics.collector)
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=_reset_worker_metrics)
+    else:
+        # fork 方式的进程池在本进程执行 initializer，再次创建进程池时沿用汇总器、改写目录
+        _worker_metrics.directory = directory
+        _worker_metrics.interval = interval
+    return _worker_metrics
+
+
+def _reset_worker_metrics():
+    if _worker_metrics is not None:
+        _worker_metrics.reset_after_fork()
+
+
+def worker_task_done():
+    """工作进程任务结束时调用（未开启时直接返回）"""
+    if _worker_metrics is not None:
+        _worker_metrics.task_done()
+
+
+def read_worker_metrics(directory, collector=None):
+    """
+    合并 directory 下各工作进程写入的数据
+
+    Returns:
+        MetricsCollector（传入 collector 时并入其中）
+    """
+    collector = collector if collector is not None else MetricsCollector()
+    for path in sorted(glob.glob(os.path.join(directory, "worker-*.json"))):
+        try:
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            continue
+        collector.merge(state)
+    return collector
+
+
+# ============================================
+# 导出
+# ============================================
+
+class MetricsExporter:
+    """
+    Prometheus 文本格式导出器
+
+    数据来源（均可选）：collector（本进程的 MetricsCollector）、worker_dir（工作进程写入的目录）、
+    serving（ServingMetrics），以及 add_gauge() 注册的回调（渲染时取值，如队列深度）
+
+    Example:
+        exporter = MetricsExporter(collector=metrics)
+        body = exporter.render()              # 挂到任意服务框架的 /metrics，Content-Type 用 CONTENT_TYPE
+        exporter.dump("metrics.prom")         # 批量任务：写入文件（可交给 node_exporter textfile collector）
+    """
+
+    def __init__(self, collector=None, worker_dir=None, serving=None):
+        self.collector = collector
+        self.worker_dir = worker_dir
+        self.serving = serving
+        self.gauges = []
+
+    def add_gauge(self, name, help_text, callback):
+        """注册仪表盘指标：name 不含前缀（如 "http_pending_requests"），callback() 返回当前值"""
+        self.gauges.append((metric_name(name), help_text, callback))
+
+    def collect(self):
+        """本进程与各工作进程的埋点数据合并后的 MetricsCollector"""
+        merged = MetricsCollector()
+        if self.collector is not None:
+            merged.merge(self.collector.state())
+        if self.worker_dir is not None:
+            read_worker_metrics(self.worker_dir, merged)
+        return merged
+
+    def render(self):
+        """Prometheus 文本格式（str）"""
+        families = _Families()
+        merged = self.collect()
+
+        for stage in sorted(merged.stages):
+            module, _, short = stage.partition(".")
+            if module in STAGE_MODULES and short:
+                name, labels = metric_name(module, "duration_seconds"), {"stage": short}
+            else:
+                name, labels = metric_name("stage_duration_seconds"), {"stage": stage}
+            families.add_histogram(name, f"Stage latency ({module})", labels, merged.stages[stage])
+
+        for (stage, error_type), value in sorted(merged.error_types.items()):
+            module, _, short = stage.partition(".")
+            if module in STAGE_MODULES and short:
+                name, labels = metric_name(module, "errors_total"), {"stage": short}
+            else:
+                name, labels = metric_name("stage_errors_total"), {"stage": stage}
+            families.add(name, "counter", f"Stage errors by exception type ({module})", "",
+                         dict(labels, type=error_type), value)
+
+        caches = {}
+        for counter in sorted(merged.counters):
+            value = merged.counters[counter]
+            base, _, result = counter.rpartition(".")
+            if base and result in ("hit", "miss"):
+                families.add(metric_name(base, "total"), "counter", f"{base} lookups", "", {"result": result}, value)
+                caches.setdefault(base, {})[result] = value
+            else:
+                families.add(metric_name(counter, "total"), "counter", counter, "", {}, value)
+        for cache, results in caches.items():
+            total = results.get("hit", 0) + results.get("miss", 0)
+            families.add(metric_name("cache_hit_ratio"), "gauge", "Cache hit ratio", "", {"cache": cache},
+                         results.get("hit", 0) / total if total else 0.0)
+
+        if self.serving is not None:
+            self.serving.add_to(families)
+
+        for name, help_text, callback in self.gauges:
+            families.add(name, "gauge", help_text, "", {}, callback())
+
+        return families.render()
+
+    def dump(self, path):
+        """写入文件（先写临时文件再替换，读取方不会读到半个文件）"""
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(path + ".tmp", path)
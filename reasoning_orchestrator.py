@@ -9,6 +9,8 @@ import os
 import json
 import re
 
+from instrumentation import timed
+
 class ReasoningOrchestrator:
     """推理编排器"""
 
@@ -28,6 +30,7 @@ class ReasoningOrchestrator:
                 with open(os.path.join(self.prompts_dir, filename), "r", encoding="utf-8") as f:
                     self.templates[name] = f.read()
 
+    @timed("orchestrator.render_prompt")
     def render_prompt(self, template_name, data):
         """填充模板中的占位符 {{ variable_name }}"""
         template = self.templates.get(template_name)
@@ -58,6 +61,7 @@ class ReasoningOrchestrator:
                 return None
         return current
 
+    @timed("orchestrator.get_prompt_for_step")
     def get_prompt_for_step(self, step_name, full_bazi_data, history=None):
         """提取特定步骤的 Prompt 并注入上下文"""
         if history is None:
@@ -81,6 +85,7 @@ class ReasoningOrchestrator:
             
         return self.render_prompt(temp_name, view_model)
 
+    @timed("orchestrator.prepare_view_model")
     def _prepare_view_model(self, data, history, liunian_data=None):
         """准备统一的数据模型 (View Model)"""
         # 超强防御性数据解析：处理 data 为 None 或 字段为 null 的情况
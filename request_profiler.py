@@ -0,0 +1,230 @@
+# request_profiler.py
+"""
+单次请求性能剖析
+负责对指定的一次调用开启 cProfile 与 tracemalloc（只覆盖这一次调用），按请求 ID 保存结果，
+并汇总耗时最多的函数与内存分配最多的代码行；用于在生产环境复现某个慢输入（极端纬度、lunar_python 范围边缘的日期等）
+
+未开启剖析的调用不经过本模块，没有任何额外开销
+"""
+
+import cProfile
+import marshal
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import OrderedDict
+
+# 默认保留的分配位置数
+TOP_ALLOCATIONS = 20
+
+# tracemalloc 为进程级开关：按引用计数启停（本模块之外已开启时不关闭）
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+
+# 峰值（reset_peak）与快照都是进程级的：同一进程内的剖析调用逐个进行，互不打乱
+_profile_lock = threading.RLock()
+
+
+def _start_tracemalloc():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_users = 1
+        elif _tracemalloc_users:
+            _tracemalloc_users += 1
+
+
+def _stop_tracemalloc():
+    global _tracemalloc_users
+    with _tracemalloc_lock:
+        if _tracemalloc_users:
+            _tracemalloc_users -= 1
+            if _tracemalloc_users == 0:
+                tracemalloc.stop()
+
+
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+
+def profile_call(func, args=(), kwargs=None, request_id=None, store=None, top_allocations=TOP_ALLOCATIONS):
+    """
+    剖析一次调用
+
+    cProfile 只记录当前线程；tracemalloc 为进程级，同时运行的其他线程（未剖析的调用）的分配也会计入
+    （单线程工作进程中无此问题）。同一进程内的多个剖析调用加锁逐个执行，后到的调用等前一个结束后才开始，
+    因此 peak_kb 不会被另一剖析调用 reset_peak() 清零。
+    分配统计为调用结束时仍存活、且在调用期间分配的内存（即返回值与缓存等留存对象），峰值为调用期间的进程峰值。
+
+    Args:
+        func: 被剖析的函数
+        args / kwargs: 调用参数
+        request_id: 请求 ID，默认随机生成
+        store: ProfileStore（可选），记录存入其中（调用抛出异常时同样存入）
+        top_allocations: 保留的分配位置数
+
+    Returns:
+        (func 的返回值, 剖析记录)，记录格式：
+        {"request_id", "function", "started", "wall_ms", "error", "stats"（pstats 原始数据）,
+         "allocations": [{"site", "size_kb", "count"}], "allocated_kb", "peak_kb"}
+
+    Raises:
+        func 抛出的异常（剖析记录已存入 store）
+    """
+    request_id = request_id or new_request_id()
+    kwargs = kwargs or {}
+    profiler = cProfile.Profile()
+    error = None
+    result = None
+    started = time.time()
+    wall = 0.0
+    base_memory = peak = 0
+    before = after = None
+
+    with _profile_lock:
+        _start_tracemalloc()
+        try:
+            tracemalloc.reset_peak()
+            before = tracemalloc.take_snapshot()
+            base_memory = tracemalloc.get_traced_memory()[0]
+            started = time.time()
+            start = time.perf_counter()
+            try:
+                result = profiler.runcall(func, *args, **kwargs)
+            except Exception as exc:
+                error = exc
+            wall = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            after = tracemalloc.take_snapshot()
+        finally:
+            _stop_tracemalloc()
+
+    ignored = (tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__))
+    differences = after.filter_traces(ignored).compare_to(before.filter_traces(ignored), "lineno")
+    allocations = [
+        {
+            "site": f"{difference.traceback[0].filename}:{difference.traceback[0].lineno}",
+            "size_kb": round(difference.size_diff / 1024, 2),
+            "count": difference.count_diff
+        }
+        for difference in differences[:top_allocations]
+        if difference.size_diff > 0
+    ]
+
+    profiler.create_stats()
+    record = {
+        "request_id": request_id,
+        "function": getattr(func, "__qualname__", repr(func)),
+        "started": started,
+        "wall_ms": round(wall * 1000, 3),
+        "error": f"{type(error).__name__}: {error}" if error is not None else None,
+        "stats": profiler.stats,
+        "allocations": allocations,
+        "allocated_kb": round(sum(difference.size_diff for difference in differences) / 1024, 2),
+        "peak_kb": round((peak - base_memory) / 1024, 2)
+    }
+    if store is not None:
+        store.add(record)
+    if error is not None:
+        raise error
+    return result, record
+
+
+# ============================================
+# 保存与汇总
+# ============================================
+
+class ProfileStore:
+    """
+    按请求 ID 保存剖析记录（线程安全），超过 max_entries 时丢弃最早的记录
+    """
+
+    def __init__(self, max_entries=100):
+        self.max_entries = max_entries
+        self._records = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self._records[record["request_id"]] = record
+            self._records.move_to_end(record["request_id"])
+            while len(self._records) > self.max_entries:
+                self._records.popitem(last=False)
+
+    def get(self, request_id):
+        """按 ID 取记录，不存在时返回 None"""
+        with self._lock:
+            return self._records.get(request_id)
+
+    def list(self):
+        """[{"request_id", "function", "started", "wall_ms", "error"}, ...]，按保存顺序"""
+        with self._lock:
+            return [
+                {key: record[key] for key in ["request_id", "function", "started", "wall_ms", "error"]}
+                for record in self._records.values()
+            ]
+
+    def __len__(self):
+        return len(self._records)
+
+
+def summarize(record, limit=15, sort="cumulative"):
+    """
+    汇总剖析记录
+
+    Args:
+        record: profile_call() 的记录
+        limit: 列出的函数数
+        sort: "cumulative"（含子调用的累计耗时）或 "tottime"（函数自身耗时）
+
+    Returns:
+        {"request_id", "function", "wall_ms", "error", "total_calls",
+         "functions": [{"function", "calls", "primitive_calls", "tottime_ms", "cumtime_ms", "percall_us"}],
+         "allocations", "allocated_kb", "peak_kb"}
+    """
+    if sort not in ("cumulative", "tottime"):
+        raise ValueError(f"Unknown sort key: {sort}")
+    column = 3 if sort == "cumulative" else 2
+    entries = sorted(record["stats"].items(), key=lambda item: item[1][column], reverse=True)
+
+    functions = []
+    for (filename, lineno, name), (primitive_calls, calls, tottime, cumtime, _) in entries[:limit]:
+        location = f"{os.path.basename(filename)}:{lineno}" if filename != "~" else "built-in"
+        functions.append({
+            "function": f"{name} ({location})",
+            "calls": calls,
+            "primitive_calls": primitive_calls,
+            "tottime_ms": round(tottime * 1000, 3),
+            "cumtime_ms": round(cumtime * 1000, 3),
+            "percall_us": round(cumtime / calls * 1e6, 2) if calls else 0.0
+        })
+
+    return {
+        "request_id": record["request_id"],
+        "function": record["function"],
+        "wall_ms": record["wall_ms"],
+        "error": record["error"],
+        "total_calls": sum(value[1] for value in record["stats"].values()),
+        "functions": functions,
+        "allocations": record["allocations"],
+        "allocated_kb": record["allocated_kb"],
+        "peak_kb": record["peak_kb"]
+    }
+
+
+def write_pstats(record, path):
+    """写出 pstats 文件（与 cProfile 的 dump_stats 格式相同，可用 pstats / snakeviz 打开）"""
+    with open(path, "wb") as f:
+        marshal.dump(record["stats"], f)
+
+
+def load_stats(record):
+    """剖析记录 -> pstats.Stats（需要 print_callers 等完整功能时使用）"""
+    stats = pstats.Stats()
+    stats.stats = record["stats"]
+    stats.get_top_level_stats()
+    return stats
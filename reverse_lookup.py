@@ -0,0 +1,150 @@
+# reverse_lookup.py
+"""
+八字反查
+负责由四柱干支反推所有能排出该八字的真太阳时区间（1600-2400年）
+"""
+
+from datetime import datetime, timedelta
+
+from bazi_reference import BaziReference
+from chart_builder import ChartBuilder
+from jie_calendar import JieCalendar, ZHI_JIE_MAP, DAY_INDEX_OFFSET, hour_zhi_offset
+
+
+class PillarReverseLookup:
+    """
+    八字反查器
+
+    不做逐分钟扫描，而是：
+    1. 年柱 -> 候选命理年份（每60年一个）
+    2. 月支 -> 对应"节"的起止时刻（节气表按年缓存）
+    3. 日柱 -> 日序数同余推算出命理日
+    4. 时柱 -> 命理日内的两小时区间（子时含前一日 23:00 的晚子时）
+    """
+
+    MIN_YEAR = 1600
+    MAX_YEAR = 2400
+
+    def __init__(self, calendar=None):
+        self.calendar = calendar or JieCalendar()
+        self.chart_builder = ChartBuilder()
+
+    def build_index(self):
+        """预加载全部年份的节气表（BaziService 首次反查时调用，之后每次查询只需毫秒级）"""
+        self.calendar.warmup(self.MIN_YEAR - 1, self.MAX_YEAR + 1)
+
+    def find_windows(self, year_pillar, month_pillar, day_pillar, time_pillar):
+        """
+        反查出生时间区间
+
+        Args:
+            year_pillar: 年柱干支，如 "甲子"
+            month_pillar: 月柱干支
+            day_pillar: 日柱干支
+            time_pillar: 时柱干支
+
+        Returns:
+            [
+                {
+                    "start": "1984-11-06 01:00:00",   // 真太阳时，含
+                    "end": "1984-11-06 03:00:00",     // 真太阳时，不含
+                    "special_time_marker": "无",      // "无" | "晚子时" | "早子时"
+                    "bazi_year_int": 1984,
+                    "jie": "立冬"
+                },
+                ...
+            ]
+            按时间升序；干支不合法或月干/时干与年干/日干不配时返回空列表
+        """
+        indices = [self._parse(p) for p in (year_pillar, month_pillar, day_pillar, time_pillar)]
+        if None in indices:
+            return []
+        year_idx, month_idx, day_idx, time_idx = indices
+
+        year_gan, month_zhi = year_pillar[0], month_pillar[1]
+        day_gan, time_zhi = day_pillar[0], time_pillar[1]
+
+        # 五虎遁、五鼠遁不配则无解
+        if self.chart_builder.wuhu_dun(year_gan, month_zhi) != month_pillar[0]:
+            return []
+        if self.chart_builder.wushu_dun(day_gan, time_zhi) != time_pillar[0]:
+            return []
+
+        jie_name = ZHI_JIE_MAP[month_zhi]
+        time_zhi_index = BaziReference.EARTHLY_BRANCHES.index(time_zhi)
+
+        range_start = datetime(self.MIN_YEAR, 1, 1)
+        range_end = datetime(self.MAX_YEAR + 1, 1, 1)
+
+        # 年柱序号 -> 公历年份同余类：get_ganzhi(year) 以公元4年为甲子
+        first_year = self.MIN_YEAR + (year_idx - (self.MIN_YEAR - 4)) % 60
+
+        windows = []
+        for bazi_year in range(first_year, self.MAX_YEAR + 1, 60):
+            # 命理年份为 bazi_year 的月令区间只可能落在相邻三个公历年的同名"节"上
+            for jie_year in (bazi_year - 1, bazi_year, bazi_year + 1):
+                jie = self.calendar.get_jie(jie_year, jie_name)
+                next_jie = self.calendar.get_next_jie(jie)
+                for piece_start, piece_end in JieCalendar.split_at_new_year(jie["datetime"], next_jie["datetime"]):
+                    if JieCalendar.bazi_year_int(piece_start, jie["name"]) != bazi_year:
+                        continue
+                    start = max(piece_start, range_start)
+                    end = min(piece_end, range_end)
+                    if start >= end:
+                        continue
+                    windows.extend(
+                        self._day_time_windows(start, end, day_idx, time_zhi_index, bazi_year, jie_name)
+                    )
+
+        windows.sort(key=lambda w: w["start"])
+        return windows
+
+    def _day_time_windows(self, start, end, day_idx, time_zhi_index, bazi_year, jie_name):
+        """在 [start, end) 内按日序数同余枚举命理日，并截取时柱区间"""
+        results = []
+
+        # 命理日 d 覆盖真太阳时 [d-1 23:00, d 23:00)，start 所在命理日为 (start + 1小时) 的日期
+        first_day = (start + timedelta(hours=1)).date()
+        shift = (day_idx - DAY_INDEX_OFFSET - first_day.toordinal()) % 60
+        bazi_day = first_day + timedelta(days=shift)
+
+        while True:
+            day_start = datetime(bazi_day.year, bazi_day.month, bazi_day.day)
+            window_start = day_start + hour_zhi_offset(time_zhi_index)
+            window_end = window_start + timedelta(hours=2)
+            if window_start >= end:
+                break
+
+            if time_zhi_index == 0:
+                # 子时拆为晚子时（前一日23点，日柱已换日）与早子时
+                parts = [
+                    (window_start, day_start, "晚子时"),
+                    (day_start, window_end, "早子时")
+                ]
+            else:
+                parts = [(window_start, window_end, "无")]
+
+            for part_start, part_end, marker in parts:
+                clipped_start = max(part_start, start)
+                clipped_end = min(part_end, end)
+                if clipped_start < clipped_end:
+                    results.append({
+                        "start": clipped_start.strftime("%Y-%m-%d %H:%M:%S"),
+                        "end": clipped_end.strftime("%Y-%m-%d %H:%M:%S"),
+                        "special_time_marker": marker,
+                        "bazi_year_int": bazi_year,
+                        "jie": jie_name
+                    })
+
+            bazi_day += timedelta(days=60)
+
+        return results
+
+    @staticmethod
+    def _parse(ganzhi):
+        """干支字符串 -> 六十甲子序号（不合法时返回None）"""
+        if not isinstance(ganzhi, str) or len(ganzhi) != 2:
+            return None
+        if ganzhi[0] not in BaziReference.HEAVENLY_STEMS or ganzhi[1] not in BaziReference.EARTHLY_BRANCHES:
+            return None
+        return BaziReference.get_jiazi_index(ganzhi[0], ganzhi[1])
@@ -0,0 +1,155 @@
+# test_almanac_generator.py
+"""
+黄历生成测试：向量化节气时刻逐秒对照 JieCalendar.get_year_jie（含系数表不可用时的逐年退路），
+每日干支、所在"节"与交节日对照 lunar_python 的日级结果，司令对照 BaziReference.get_siling_info，
+并检查分块写出的 CSV / JSONL
+"""
+
+import csv
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from lunar_python import Solar
+
+import jie_calendar
+from almanac_generator import JIAZI_NAMES, NO_SILING, AlmanacGenerator
+from bazi_reference import BaziReference
+from jie_calendar import JIE_NAMES, JieCalendar, compute_jie_seconds
+
+
+def expected_day(day):
+    """lunar_python / BaziReference 给出的当日 (年柱, 月柱, 日柱, 所在节, 当日交节, 司令)"""
+    lunar = Solar.fromYmd(day.year, day.month, day.day).getLunar()
+    prev_jie = lunar.getPrevJie(True)
+    jie_solar = prev_jie.getSolar()
+    days_since_jie = (day - date(jie_solar.getYear(), jie_solar.getMonth(), jie_solar.getDay())).days
+    month_zhi = lunar.getMonthInGanZhi()[1]
+    siling = BaziReference.get_siling_info(month_zhi, days_since_jie)
+    return (lunar.getYearInGanZhiByLiChun(), lunar.getMonthInGanZhi(), lunar.getDayInGanZhi(),
+            prev_jie.getName(), lunar.getJie(), siling["stem"] if siling else "")
+
+
+def main():
+    failures = []
+
+    # ====================================
+    # 步骤1: 节气时刻 vs get_year_jie
+    # ====================================
+    print("=" * 70)
+    print(" " * 18 + "步骤1: 节气时刻 vs get_year_jie")
+    print("=" * 70)
+
+    start = time.perf_counter()
+    seconds = compute_jie_seconds(1599, 2401)
+    elapsed = time.perf_counter() - start
+    calendar = JieCalendar()
+    epoch = datetime(1970, 1, 1)
+    mismatches = 0
+    for row, year in enumerate(range(1599, 2402)):
+        jie_list = calendar.get_year_jie(year)
+        names_ok = [item["name"] for item in jie_list] == JIE_NAMES
+        expected = [int((item["datetime"] - epoch).total_seconds()) for item in jie_list]
+        mismatches += not names_ok or seconds[row].tolist() != expected
+    print(f"\n1599-2401 共 {seconds.size} 个节：向量化 {elapsed:.3f} 秒，与 get_year_jie 不一致的年份 {mismatches}")
+    if mismatches:
+        failures.append("节气时刻")
+
+    # 系数表不可用（lunar_python 私有属性改名）时退回逐年计算，结果相同
+    saved = jie_calendar._XL0
+    jie_calendar._XL0 = None
+    try:
+        start = time.perf_counter()
+        fallback = compute_jie_seconds(1980, 2030)
+        elapsed = time.perf_counter() - start
+    finally:
+        jie_calendar._XL0 = saved
+    same = (fallback == compute_jie_seconds(1980, 2030)).all()
+    print(f"逐年退路 1980-2030: {elapsed:.3f} 秒，与向量化一致 {'✓' if same else '✗'}")
+    if not same:
+        failures.append("逐年退路")
+
+    # ====================================
+    # 步骤2: 每日干支 vs lunar_python
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 20 + "步骤2: 每日干支 vs lunar_python")
+    print("=" * 70)
+
+    generator = AlmanacGenerator()
+    start = time.perf_counter()
+    days = generator.build("1601-01-01", "2398-12-31")
+    print(f"\n1601-2398 共 {len(days['date'])} 天，build {time.perf_counter() - start:.3f} 秒")
+
+    random.seed(33)
+    first = date(1601, 1, 1)
+    positions = random.sample(range(len(days["date"])), 1000)
+    # 立春、元旦前后各取连续几天（年柱、月柱切换处）
+    for year in random.sample(range(1602, 2398), 20):
+        for day in [date(year, 1, 1), date(year, 2, 4)]:
+            offset = (day - first).days
+            positions.extend(range(offset - 3, offset + 4))
+    siling_names = dict(enumerate(BaziReference.HEAVENLY_STEMS))
+    siling_names[NO_SILING] = ""
+    errors = 0
+    for position in positions:
+        day = first + timedelta(days=position)
+        got = (
+            JIAZI_NAMES[days["year_index"][position]],
+            JIAZI_NAMES[days["month_index"][position]],
+            JIAZI_NAMES[days["day_index"][position]],
+            JIE_NAMES[days["jie_index"][position]],
+            JIE_NAMES[days["jie_today"][position]] if days["jie_today"][position] >= 0 else "",
+            siling_names[int(days["siling_stem"][position])]
+        )
+        want = expected_day(day)
+        if got != want:
+            errors += 1
+            if errors <= 5:
+                print(f"  ✗ {day}: 黄历 {got} lunar_python {want}")
+    print(f"核对 {len(positions)} 天（含立春、元旦前后 {len(positions) - 1000} 天），不一致 {errors}")
+    if errors:
+        failures.append("每日干支")
+
+    # ====================================
+    # 步骤3: 分块写出
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 24 + "步骤3: 分块写出")
+    print("=" * 70)
+
+    directory = tempfile.mkdtemp()
+    csv_path = os.path.join(directory, "almanac.csv")
+    jsonl_path = os.path.join(directory, "almanac.jsonl")
+    rows = generator.to_rows(generator.build("1999-06-01", "2001-06-30"))
+    csv_count = generator.write_csv(csv_path, "1999-06-01", "2001-06-30", chunk_days=100)
+    jsonl_count = generator.write_jsonl(jsonl_path, "1999-06-01", "2001-06-30", chunk_days=77)
+    with open(csv_path, encoding="utf-8", newline="") as f:
+        csv_rows = list(csv.reader(f))
+    with open(jsonl_path, encoding="utf-8") as f:
+        jsonl_rows = [[item[field] for field in AlmanacGenerator.FIELDS] for item in map(json.loads, f)]
+    writes_ok = (csv_count == jsonl_count == len(rows) and csv_rows[0] == AlmanacGenerator.FIELDS
+                 and csv_rows[1:] == rows and jsonl_rows == rows)
+    print(f"\n{len(rows)} 天：CSV（每块 100 天）、JSONL（每块 77 天）与一次生成一致 {'✓' if writes_ok else '✗'}")
+    if not writes_ok:
+        failures.append("分块写出")
+
+    try:
+        generator.build("2000-01-02", "2000-01-01")
+        print("结束早于开始: 未报错 ✗")
+        failures.append("结束早于开始")
+    except ValueError as exc:
+        print(f"结束早于开始: {exc}")
+
+    print("\n" + "=" * 70)
+    print(" " * 24 + ("✓ 所有测试完成！" if not failures else f"✗ 失败: {failures}"))
+    print("=" * 70)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
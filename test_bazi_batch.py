@@ -0,0 +1,219 @@
+# test_bazi_batch.py
+"""
+批量排盘命令行测试：按序 / 按完成顺序的输出与本进程逐个排盘逐字节一致，失败项进入错误文件；
+运行中途 SIGKILL 整个进程组后 --resume 续跑，结果与不中断的运行相同（不丢行、不重复）
+"""
+
+import csv
+import json
+import os
+import random
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+from bazi_service import BaziService, normalize_chart_request
+from chart_serializer import dumps
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "bazi_batch.py")
+
+
+def make_records(count, seed):
+    """随机出生资料，每 97 行混入一条缺字段、一条日期不合法的记录"""
+    rng = random.Random(seed)
+    records = []
+    for offset in range(count):
+        record = {
+            "id": f"r{offset}",
+            "birth_date": f"{rng.randint(1900, 2050)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "birth_time": f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+            "longitude": round(rng.uniform(-180, 180), 3),
+            "latitude": round(rng.uniform(-60, 60), 3),
+            "gender": rng.choice(["男", "女"])
+        }
+        if offset % 97 == 13:
+            del record["gender"]
+        elif offset % 97 == 50:
+            record["birth_date"] = "2001-02-30"
+        records.append(record)
+    return records
+
+
+def write_jsonl(path, records, broken_line=None):
+    """写出 JSONL；broken_line 为 (位置, 文本) 时在该位置插入一行无法解析的内容"""
+    with open(path, "w", encoding="utf-8") as f:
+        for offset, record in enumerate(records):
+            if broken_line is not None and offset == broken_line[0]:
+                f.write(broken_line[1] + "\n")
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def expected_lines(service, records):
+    """本进程逐个排盘得到的 {offset: 输出行}，以及应当失败的 offset 集合"""
+    lines = {}
+    failed = set()
+    for offset, record in enumerate(records):
+        try:
+            request = normalize_chart_request(record)
+            chart = service.generate_complete_chart(
+                request.pop("birth_date"), request.pop("birth_time"), request.pop("longitude"),
+                request.pop("latitude"), request.pop("gender"), **request
+            )
+        except (ValueError, TypeError, KeyError):
+            failed.add(offset)
+            continue
+        lines[offset] = dumps({"offset": offset, "id": record["id"], "chart": chart}) + b"\n"
+    return lines, failed
+
+
+def run_cli(*args):
+    return subprocess.run([sys.executable, SCRIPT, *args], capture_output=True, text=True, check=True).stdout
+
+
+def read_lines(path):
+    with open(path, "rb") as f:
+        return f.read().splitlines(keepends=True)
+
+
+def error_offsets(path):
+    return sorted(json.loads(line)["offset"] for line in read_lines(path))
+
+
+def kill_midway(args, checkpoint_path, min_offset):
+    """启动命令行，断点越过 min_offset 后 SIGKILL 整个进程组（含工作进程），返回被杀时的断点"""
+    process = subprocess.Popen([sys.executable, SCRIPT, *args], stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL, start_new_session=True)
+    state = None
+    try:
+        while process.poll() is None:
+            try:
+                with open(checkpoint_path, encoding="utf-8") as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = None
+            if state is not None and state["next_offset"] >= min_offset:
+                os.killpg(process.pid, signal.SIGKILL)
+                break
+            time.sleep(0.01)
+    finally:
+        process.wait()
+    return process.returncode, state
+
+
+def main():
+    # 命盘中个别列表（如三合的地支）按集合遍历顺序排列，随字符串哈希种子变化；
+    # 固定种子后重新执行，命令行子进程继承同一种子，输出才能与本进程逐字节比较
+    if os.environ.get("PYTHONHASHSEED") != "0":
+        os.execve(sys.executable, [sys.executable, *sys.argv], dict(os.environ, PYTHONHASHSEED="0"))
+
+    service = BaziService()
+    failures = []
+    directory = tempfile.mkdtemp(prefix="bazi_batch_test_")
+
+    records = make_records(1200, seed=38)
+    input_path = os.path.join(directory, "births.jsonl")
+    # 第 600 行前插入一行坏 JSON：它自身占 offset 600，之后的记录 offset 顺延
+    write_jsonl(input_path, records, broken_line=(600, "{not json"))
+    records = records[:600] + [None] + records[600:]
+    expected, failed = expected_lines(service, [record or {} for record in records])
+    failed.add(600)
+    expected.pop(600, None)
+    ordered_bytes = b"".join(expected[offset] for offset in sorted(expected))
+
+    try:
+        # ====================================
+        # 步骤1: 按序 / 按完成顺序
+        # ====================================
+        print("=" * 70)
+        print(" " * 22 + "步骤1: 按序 / 按完成顺序")
+        print("=" * 70)
+
+        output_path = os.path.join(directory, "ordered.jsonl")
+        print("\n" + run_cli(input_path, "-o", output_path, "--workers", "2", "--chunk-size", "16").strip())
+        with open(output_path, "rb") as f:
+            ordered_ok = f.read() == ordered_bytes
+        errors_ok = error_offsets(output_path + ".errors.jsonl") == sorted(failed)
+        print(f"按序输出与逐个排盘逐字节一致 {'✓' if ordered_ok else '✗'}，"
+              f"错误文件 {len(failed)} 行（含坏 JSON、缺字段、日期不合法）{'✓' if errors_ok else '✗'}")
+        if not ordered_ok or not errors_ok:
+            failures.append("按序")
+
+        output_path = os.path.join(directory, "unordered.jsonl")
+        print("\n" + run_cli(input_path, "-o", output_path, "--workers", "2", "--chunk-size", "16",
+                             "--unordered").strip())
+        lines = read_lines(output_path)
+        unordered_ok = sorted(lines) == sorted(expected.values()) and len(set(lines)) == len(lines)
+        errors_ok = error_offsets(output_path + ".errors.jsonl") == sorted(failed)
+        print(f"按完成顺序输出（排序后）与逐个排盘一致、无重复 {'✓' if unordered_ok else '✗'}，"
+              f"错误文件 {'✓' if errors_ok else '✗'}")
+        if not unordered_ok or not errors_ok:
+            failures.append("按完成顺序")
+
+        # CSV 输入（同样的记录，不含坏 JSON 行）
+        csv_path = os.path.join(directory, "births.csv")
+        csv_records = [record for record in records[:300] if record is not None]
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=["id", "birth_date", "birth_time", "longitude", "latitude", "gender"])
+            writer.writeheader()
+            writer.writerows(csv_records)
+        output_path = os.path.join(directory, "csv.jsonl")
+        run_cli(csv_path, "-o", output_path, "--workers", "2")
+        with open(output_path, "rb") as f:
+            csv_ok = f.read() == b"".join(expected[offset] for offset in sorted(expected) if offset < 300)
+        print(f"CSV 输入（300 行）与 JSONL 结果一致 {'✓' if csv_ok else '✗'}")
+        if not csv_ok:
+            failures.append("CSV 输入")
+
+        # ====================================
+        # 步骤2: SIGKILL 后续跑
+        # ====================================
+        print("\n" + "=" * 70)
+        print(" " * 22 + "步骤2: SIGKILL 后续跑")
+        print("=" * 70)
+
+        for mode in (["--chunk-size", "16"], ["--chunk-size", "16", "--unordered"]):
+            label = "按完成顺序" if "--unordered" in mode else "按序"
+            output_path = os.path.join(directory, f"resume_{len(mode)}.jsonl")
+            checkpoint_path = output_path + ".checkpoint"
+            args = [input_path, "-o", output_path, "--workers", "2", *mode]
+            kills = []
+            for min_offset in (200, 700):
+                returncode, state = kill_midway(args + (["--resume"] if kills else []), checkpoint_path, min_offset)
+                kills.append((returncode, state and state["next_offset"]))
+            summary = run_cli(*args, "--resume").strip()
+
+            lines = read_lines(output_path)
+            if "--unordered" in mode:
+                resumed_ok = sorted(lines) == sorted(expected.values()) and len(set(lines)) == len(lines)
+            else:
+                resumed_ok = b"".join(lines) == ordered_bytes
+            errors = error_offsets(output_path + ".errors.jsonl")
+            errors_ok = errors == sorted(failed)
+            killed = all(returncode == -signal.SIGKILL for returncode, _ in kills)
+            print(f"\n{label}: 两次 SIGKILL（断点 {[offset for _, offset in kills]}）后续跑：{summary}")
+            print(f"  被杀 {'✓' if killed else '✗'}，输出 {len(lines)} 行不丢不重 {'✓' if resumed_ok else '✗'}，"
+                  f"错误文件 {len(errors)} 行 {'✓' if errors_ok else '✗'}")
+            if not (killed and resumed_ok and errors_ok):
+                failures.append(f"{label}续跑")
+
+        # 已完成的任务再续跑：全部跳过，输出不变
+        summary = run_cli(input_path, "-o", os.path.join(directory, "ordered.jsonl"), "--resume").strip()
+        with open(os.path.join(directory, "ordered.jsonl"), "rb") as f:
+            unchanged = f.read() == ordered_bytes
+        print(f"\n已完成后再续跑: {summary}，输出不变 {'✓' if unchanged else '✗'}")
+        if not unchanged or not summary.startswith("完成 0 条"):
+            failures.append("完成后续跑")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    print("\n" + "=" * 70)
+    print(" " * 24 + ("✓ 所有测试完成！" if not failures else f"✗ 失败: {failures}"))
+    print("=" * 70)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
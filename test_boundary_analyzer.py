@@ -0,0 +1,126 @@
+# test_boundary_analyzer.py
+"""
+边界敏感度测试：在每个边界的另一侧排盘，四柱、司令、大运顺逆与子时标记必须与 alternative 一致；
+出生时刻到最近边界之间取样排盘，结果必须与原命盘相同（没有漏报的边界）
+"""
+
+import random
+import sys
+from datetime import datetime, timedelta
+
+from bazi_service import BaziService
+from test_reverse_lookup import chart_near, physical_tst
+
+KEYS = ["year", "month", "day", "time"]
+
+# 边界两侧的取样距离（chart_near 的真太阳时精度约 ±30 秒，节气天数舍入约 9 秒）
+PROBE_OFFSET = timedelta(minutes=2)
+
+
+def state_of(chart):
+    """命盘中与 BoundaryAnalyzer 的 alternative 同格式的部分"""
+    siling = chart["pillars"]["month"].get("siling")
+    return {
+        "pillars": {key: chart["pillars"][key]["ganzhi"] for key in KEYS},
+        "siling": {"stem": siling["stem"], "period": siling["period"]} if siling else None,
+        "dayun_direction": chart["dayun"]["direction"],
+        "special_time_marker": chart["basic_info"]["special_time_marker"]
+    }
+
+
+def crosses_other_hour(instant, probe_tst):
+    """取样点与边界之间是否隔着另一个时辰边界（奇数整点）或 00:00：远处的节、司令边界不会列出这些边界"""
+    earlier, later = sorted([instant, probe_tst])
+    hour_start = later.replace(minute=0, second=0, microsecond=0)
+    return earlier < hour_start < later and (hour_start.hour % 2 == 1 or hour_start.hour == 0)
+
+
+def random_chart(service, rng):
+    return service.generate_complete_chart(
+        f"{rng.randint(1601, 2398)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+        round(rng.uniform(-180, 180), 3), round(rng.uniform(-55, 60), 3),
+        rng.choice(["男", "女"])
+    )
+
+
+def main():
+    service = BaziService()
+    failures = []
+    rng = random.Random(31)
+    charts = [random_chart(service, rng) for _ in range(150)]
+
+    # ====================================
+    # 步骤1: 边界另一侧 vs 排盘
+    # ====================================
+    print("=" * 70)
+    print(" " * 20 + "步骤1: 边界另一侧 vs 排盘")
+    print("=" * 70)
+
+    checked, skipped, mismatches = {}, 0, 0
+    for chart in charts:
+        gender = chart["basic_info"]["gender"]
+        result = service.analyze_boundary_sensitivity(chart)
+        instants = [datetime.strptime(item["datetime"], "%Y-%m-%d %H:%M:%S") for item in result["boundaries"]]
+        for boundary, instant in zip(result["boundaries"], instants):
+            # 与其他边界相距太近时取样会越过另一个边界，跳过
+            if any(other != instant and abs(other - instant) <= 2 * PROBE_OFFSET for other in instants):
+                skipped += 1
+                continue
+            far_side = instant + PROBE_OFFSET if boundary["side"] == "after" else instant - PROBE_OFFSET
+            probe = chart_near(service, far_side, gender)
+            probe_tst = physical_tst(probe)
+            if (probe_tst >= instant) != (boundary["side"] == "after") or crosses_other_hour(instant, probe_tst):
+                skipped += 1
+                continue
+            label = "+".join(boundary["type"])
+            checked[label] = checked.get(label, 0) + 1
+            if state_of(probe) != boundary["alternative"]:
+                mismatches += 1
+                if mismatches <= 5:
+                    print(f"  ✗ {result['true_solar_time']} {label} {boundary['datetime']}: "
+                          f"alternative {boundary['alternative']} 排盘 {state_of(probe)}")
+    print(f"\n{len(charts)} 个命盘，按边界类型核对: {checked}")
+    print(f"取样越过其他边界而跳过: {skipped}，alternative 与排盘不一致: {mismatches}")
+    if mismatches or not checked:
+        failures.append("边界另一侧")
+
+    # ====================================
+    # 步骤2: 最近边界以内无变化
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 20 + "步骤2: 最近边界以内无变化")
+    print("=" * 70)
+
+    probes = changed = 0
+    for chart in charts[:80]:
+        gender = chart["basic_info"]["gender"]
+        result = service.analyze_boundary_sensitivity(chart)
+        tst = physical_tst(chart)
+        expected = state_of(chart)
+        for side, direction in [("before", -1), ("after", 1)]:
+            distances = [item["minutes"] for item in result["boundaries"] if item["side"] == side]
+            reach = timedelta(minutes=min(distances)) - PROBE_OFFSET if distances else timedelta(days=1)
+            if reach <= timedelta(0):
+                continue
+            for fraction in (0.3, 0.7, 1.0):
+                target = tst + direction * reach * fraction
+                probe = chart_near(service, target, gender)
+                probes += 1
+                if state_of(probe) != expected:
+                    changed += 1
+                    if changed <= 5:
+                        print(f"  ✗ {result['true_solar_time']} -> {physical_tst(probe)}: "
+                              f"{expected} 变为 {state_of(probe)}")
+    print(f"\n取样 {probes} 次，在最近边界以内却发生变化: {changed}")
+    if changed:
+        failures.append("漏报的边界")
+
+    print("\n" + "=" * 70)
+    print(" " * 24 + ("✓ 所有测试完成！" if not failures else f"✗ 失败: {failures}"))
+    print("=" * 70)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+# test_calendar_table.py
+"""
+日历表测试：data/calendar_table.npy 与重新生成的结果一致；随机时刻与交节前后的时刻，
+查表得到的节气信息、日柱与回退到 lunar_python 的结果逐项相同，完整排盘逐字节一致
+"""
+
+import random
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import numpy as np
+
+import calendar_table
+from bazi_reference import BaziReference
+from bazi_service import BaziService
+from bazi_time_processor import JIE_ZHI_MAP
+from chart_serializer import dumps
+from jie_calendar import compute_jie_seconds
+
+EPOCH = datetime(1970, 1, 1)
+
+
+@contextmanager
+def without_table():
+    """临时停用默认日历表：get_calendar_table() 返回 None，调用方回退到 lunar_python"""
+    table = calendar_table.get_calendar_table()
+    calendar_table._default_table = None
+    try:
+        yield
+    finally:
+        calendar_table._default_table = table
+
+
+def random_instants(rng, count):
+    start = datetime(calendar_table.START_YEAR, 1, 1)
+    span = int((datetime(calendar_table.END_YEAR, 12, 31) - start).total_seconds())
+    return [start + timedelta(seconds=rng.randrange(span)) for _ in range(count)]
+
+
+def jie_instants(rng, count):
+    """随机取 count 个"节"，在交节时刻前后各取几个时刻"""
+    seconds = compute_jie_seconds(calendar_table.START_YEAR, calendar_table.END_YEAR).ravel()
+    instants = []
+    for value in rng.sample(seconds.tolist(), count):
+        jie = EPOCH + timedelta(seconds=value)
+        instants.extend(jie + timedelta(seconds=offset) for offset in (-60, -1, 0, 1, 60, 86400))
+    return instants
+
+
+def main():
+    service = BaziService()
+    processor = service.time_processor
+    builder = service.chart_builder
+    failures = []
+    rng = random.Random(34)
+
+    # ====================================
+    # 步骤1: 表文件 vs 重新生成
+    # ====================================
+    print("=" * 70)
+    print(" " * 20 + "步骤1: 表文件 vs 重新生成")
+    print("=" * 70)
+
+    start = time.perf_counter()
+    rebuilt = calendar_table.build_calendar_table()
+    elapsed = time.perf_counter() - start
+    stored = np.load(calendar_table.TABLE_PATH)
+    same_table = stored.dtype == rebuilt.dtype and np.array_equal(stored, rebuilt)
+    print(f"\n{len(stored)} 行：重新生成 {elapsed:.2f} 秒，与 {calendar_table.TABLE_PATH} 一致 "
+          f"{'✓' if same_table else '✗'}")
+    names_ok = ([JIE_ZHI_MAP[name] for name in calendar_table.ZHI_JIE_NAMES]
+                == list(BaziReference.EARTHLY_BRANCHES))
+    print(f"ZHI_JIE_NAMES 与 JIE_ZHI_MAP 一致 {'✓' if names_ok else '✗'}")
+    if not same_table or not names_ok:
+        failures.append("表文件")
+
+    # ====================================
+    # 步骤2: 节气信息 查表 vs lunar_python
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 16 + "步骤2: 节气信息 查表 vs lunar_python")
+    print("=" * 70)
+
+    instants = random_instants(rng, 20000) + jie_instants(rng, 1500)
+    start = time.perf_counter()
+    with_table = [processor.calculate_solar_terms_info(instant) for instant in instants]
+    table_elapsed = time.perf_counter() - start
+    with without_table():
+        start = time.perf_counter()
+        fallback = [processor.calculate_solar_terms_info(instant) for instant in instants]
+        fallback_elapsed = time.perf_counter() - start
+    mismatches = [instant for instant, a, b in zip(instants, with_table, fallback) if a != b]
+    print(f"\n{len(instants)} 个时刻（随机 20000，交节前后 {len(instants) - 20000}）：不一致 {len(mismatches)}")
+    print(f"查表 {table_elapsed / len(instants) * 1e6:.1f} µs/次，"
+          f"lunar_python（节气表已按年缓存）{fallback_elapsed / len(instants) * 1e6:.1f} µs/次")
+    for instant in mismatches[:5]:
+        print(f"  ✗ {instant}")
+    if mismatches:
+        failures.append("节气信息")
+
+    # ====================================
+    # 步骤3: 日柱 查表 vs lunar_python
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 18 + "步骤3: 日柱 查表 vs lunar_python")
+    print("=" * 70)
+
+    instants = random_instants(rng, 1500)
+    instants += [instant.replace(hour=rng.choice([0, 23]), minute=rng.randint(0, 59)) for instant in instants[:300]]
+    with_table = [builder._build_day_pillar(instant) for instant in instants]
+    with without_table():
+        fallback = [builder._build_day_pillar(instant) for instant in instants]
+    day_mismatches = sum(a != b for a, b in zip(with_table, fallback))
+    print(f"\n{len(instants)} 个时刻（含子时前后 300）：不一致 {day_mismatches}")
+    if day_mismatches:
+        failures.append("日柱")
+
+    # ====================================
+    # 步骤4: 完整排盘
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 24 + "步骤4: 完整排盘")
+    print("=" * 70)
+
+    inputs = [
+        (f"{rng.randint(1601, 2398)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+         f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+         round(rng.uniform(-180, 180), 3), round(rng.uniform(-55, 60), 3), rng.choice(["男", "女"]))
+        for _ in range(300)
+    ]
+    start = time.perf_counter()
+    charts = [dumps(service.generate_complete_chart(*args)) for args in inputs]
+    table_elapsed = time.perf_counter() - start
+    with without_table():
+        start = time.perf_counter()
+        fallback = [dumps(service.generate_complete_chart(*args)) for args in inputs]
+        fallback_elapsed = time.perf_counter() - start
+    chart_mismatches = sum(a != b for a, b in zip(charts, fallback))
+    print(f"\n{len(inputs)} 个命盘：逐字节不一致 {chart_mismatches}")
+    print(f"查表 {table_elapsed / len(inputs) * 1000:.2f} ms/盘，lunar_python {fallback_elapsed / len(inputs) * 1000:.2f} ms/盘")
+    if chart_mismatches:
+        failures.append("完整排盘")
+
+    outside = processor.calculate_solar_terms_info(datetime(1599, 6, 1, 12))
+    print(f"表范围外（1599-06-01）回退 lunar_python: prev_jie={outside['prev_jie']['name']}")
+
+    print("\n" + "=" * 70)
+    print(" " * 24 + ("✓ 所有测试完成！" if not failures else f"✗ 失败: {failures}"))
+    print("=" * 70)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+# test_chart_codec.py
+"""
+二进制编码测试：往返无损（与原命盘 JSON 逐字节比对）、体积与编解码速度
+"""
+
+import json
+import random
+import sys
+import time
+
+from bazi_service import BaziService
+from chart_codec import ChartCodec, FORMAT_VERSION, HEADER
+from chart_serializer import dumps, HAS_ORJSON
+
+
+def random_charts(service, count):
+    """随机命盘：含晚子时/早子时、夏令时地区、整数经纬度、非补零的输入时间、农历输入"""
+    random.seed(42)
+    charts = []
+    for index in range(count):
+        year = random.randint(1601, 2399)
+        birth_date = f"{year}-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}"
+        hour, minute = random.randint(0, 23), random.randint(0, 59)
+        birth_time = f"{hour}:{minute:02d}" if index % 10 == 0 else f"{hour:02d}:{minute:02d}"
+        if index % 5 == 0:
+            longitude, latitude = random.randint(-120, 140), random.randint(-40, 55)
+        else:
+            longitude, latitude = round(random.uniform(-180, 180), 4), round(random.uniform(-60, 60), 4)
+        charts.append(service.generate_complete_chart(
+            birth_date, birth_time, longitude, latitude, random.choice(["男", "女"]),
+            lunar=index % 13 == 0
+        ))
+    return charts
+
+
+def timed(function, items, repeat=3):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            function(item)
+    return (time.perf_counter() - start) / (repeat * len(items)) * 1e6
+
+
+def main():
+    service = BaziService()
+    codec = ChartCodec(service)
+    failures = []
+
+    # ====================================
+    # 步骤1: 往返无损
+    # ====================================
+    print("=" * 70)
+    print(" " * 22 + "步骤1: 编码 -> 解码 往返")
+    print("=" * 70)
+
+    charts = random_charts(service, 1000)
+    encoded = [codec.encode(chart) for chart in charts]
+    mismatches = sum(dumps(codec.decode(data)) != dumps(chart) for data, chart in zip(encoded, charts))
+    markers = {}
+    for chart in charts:
+        marker = chart["basic_info"]["special_time_marker"]
+        markers[marker] = markers.get(marker, 0) + 1
+    print(f"\n命盘 {len(charts)} 个（子时标记分布 {markers}），编码版本 {FORMAT_VERSION}")
+    print(f"往返不一致: {mismatches}")
+    if mismatches:
+        failures.append("往返")
+
+    # 小寒至立春之后几天出生：命理年份 -1 与立春前后判定都由节气时刻重新推出
+    rng = random.Random(7)
+    winter_charts = [
+        service.generate_complete_chart(
+            f"{rng.randint(1601, 2399)}-{rng.choice([1, 2]):02d}-{rng.randint(1, 9):02d}",
+            f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+            round(rng.uniform(-180, 180), 4), round(rng.uniform(-60, 60), 4), rng.choice(["男", "女"])
+        )
+        for _ in range(300)
+    ]
+    winter_mismatches = sum(dumps(codec.decode(codec.encode(chart))["solar_terms_detail"])
+                            != dumps(chart["solar_terms_detail"]) for chart in winter_charts)
+    previous_year = sum(chart["solar_terms_detail"]["bazi_year_int"]
+                        < int(chart["basic_info"]["true_solar_time"][:4]) for chart in winter_charts)
+    print(f"小寒至立春前后出生 {len(winter_charts)} 个（命理年份为上一年 {previous_year} 个），"
+          f"解码后节气段落不一致: {winter_mismatches}")
+    if winter_mismatches or not previous_year:
+        failures.append("小寒 / 立春")
+
+    minimal = codec.decode(encoded[0], fields="minimal")
+    basic = charts[0]["basic_info"]
+    expected_minimal = service.generate_complete_chart(
+        *basic["birth_time"].split(" ", 1), basic["debug_info"]["longitude"], basic["debug_info"]["latitude"],
+        basic["gender"], fields="minimal"
+    )
+    minimal_ok = dumps(minimal) == dumps(expected_minimal)
+    print(f"按 fields='minimal' 解码: {list(minimal)}，与直接按 minimal 排盘一致 {'✓' if minimal_ok else '✗'}")
+    if not minimal_ok:
+        failures.append("fields 解码")
+
+    for label, data in [("错误的 magic", b"XX" + encoded[0][2:]),
+                        ("未知版本", encoded[0][:2] + bytes([FORMAT_VERSION + 1]) + encoded[0][3:]),
+                        ("四柱序号与重新排盘不符", encoded[0][:HEADER.size] + bytes([(encoded[0][HEADER.size] + 1) % 60])
+                         + encoded[0][HEADER.size + 1:])]:
+        try:
+            codec.decode(data)
+            print(f"{label}: 未报错 ✗")
+            failures.append(label)
+        except ValueError as exc:
+            print(f"{label}: {exc}")
+
+    # ====================================
+    # 步骤2: 体积
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 27 + "步骤2: 体积")
+    print("=" * 70)
+
+    json_sizes = [len(json.dumps(chart, ensure_ascii=False).encode("utf-8")) for chart in charts]
+    compact_sizes = [len(dumps(chart)) for chart in charts]
+    binary_sizes = [len(data) for data in encoded]
+    print(f"\n平均每个命盘:")
+    print(f"  json.dumps(ensure_ascii=False)  {sum(json_sizes) / len(charts):8.0f} 字节")
+    print(f"  dumps 紧凑                        {sum(compact_sizes) / len(charts):8.0f} 字节")
+    print(f"  ChartCodec                      {sum(binary_sizes) / len(charts):8.1f} 字节"
+          f"（{min(binary_sizes)}-{max(binary_sizes)}）")
+
+    # ====================================
+    # 步骤3: 编解码速度
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 24 + "步骤3: 编解码速度")
+    print("=" * 70)
+
+    sample_charts = charts[:300]
+    sample_encoded = encoded[:300]
+    sample_json = [dumps(chart) for chart in sample_charts]
+    print(f"\n平均每个命盘（µs）:")
+    print(f"  json       编码 {timed(lambda chart: json.dumps(chart, ensure_ascii=False).encode('utf-8'), sample_charts):8.1f}"
+          f"   解码 {timed(json.loads, sample_json):8.1f}")
+    if HAS_ORJSON:
+        import orjson
+        print(f"  orjson     编码 {timed(orjson.dumps, sample_charts):8.1f}   解码 {timed(orjson.loads, sample_json):8.1f}")
+    print(f"  ChartCodec 编码 {timed(codec.encode, sample_charts):8.1f}   解码 {timed(codec.decode, sample_encoded):8.1f}"
+          f"（含重新排盘）")
+    print(f"  ChartCodec 编码（verify=False） {timed(lambda chart: codec.encode(chart, verify=False), sample_charts):8.1f}"
+          f"   解码 fields='minimal' {timed(lambda data: codec.decode(data, fields='minimal'), sample_encoded):8.1f}")
+
+    print("\n" + "=" * 70)
+    print(" " * 24 + ("✓ 所有测试完成！" if not failures else f"✗ 失败: {failures}"))
+    print("=" * 70)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
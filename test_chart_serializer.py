@@ -0,0 +1,118 @@
+# test_chart_serializer.py
+"""
+序列化测试：chart_serializer 与标准库 json 输出逐字节对照，并比较耗时
+"""
+
+import json
+import random
+import sys
+import time
+
+from bazi_service import BaziService
+from chart_serializer import dumps, HAS_ORJSON
+
+
+def reference_bytes(obj, pretty):
+    """现有输出：json.dumps(..., ensure_ascii=False, indent=2) / 紧凑分隔符"""
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def main():
+    service = BaziService()
+    backends = ["json", "orjson"] if HAS_ORJSON else ["json"]
+    failures = []
+
+    # ====================================
+    # 步骤1: 随机命盘（含时辰未知、农历输入、流年）逐字节对照
+    # ====================================
+    print("=" * 70)
+    print(" " * 20 + "步骤1: 命盘输出逐字节对照")
+    print("=" * 70)
+
+    random.seed(2025)
+    objects = []
+    for index in range(400):
+        birth_date = f"{random.randint(1900, 2050)}-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}"
+        birth_time = f"{random.randint(0, 23):02d}:{random.randint(0, 59):02d}"
+        longitude = round(random.uniform(-180, 180), 3)
+        latitude = round(random.uniform(-60, 60), 3)
+        gender = random.choice(["男", "女"])
+        chart = service.generate_complete_chart(
+            birth_date, birth_time, longitude, latitude, gender,
+            hour_unknown=index % 40 == 0,
+            lunar=index % 7 == 0
+        )
+        objects.append(chart)
+        if index % 20 == 1:
+            objects.append(service.analyze_specific_year(chart, random.randint(1950, 2080)))
+
+    # 边界对象：空容器、转义字符、非字符串键（orjson 不支持时回退标准库）
+    objects.extend([
+        {},
+        [],
+        {"a": [], "b": {}, "c": None, "d": True, "e": 0.5, "f": -3},
+        {"text": "引号\"反斜杠\\换行\n制表\t", "emoji": "🆕", "control": "\u0001"},
+        {1: "整数键", "2": "字符串键"}
+    ])
+
+    mismatches = 0
+    for obj in objects:
+        for pretty in (False, True):
+            expected = reference_bytes(obj, pretty)
+            for backend in backends:
+                if dumps(obj, pretty=pretty, backend=backend) != expected:
+                    mismatches += 1
+
+    print(f"\n对象 {len(objects)} 个 × 紧凑/缩进 × 后端 {backends}")
+    print(f"不一致: {mismatches}")
+    if mismatches:
+        failures.append("逐字节对照")
+
+    # 指定的后端不可用时给出明确的 ValueError
+    for backend in ["xml"] + ([] if HAS_ORJSON else ["orjson"]):
+        try:
+            dumps({}, backend=backend)
+            print(f"backend={backend!r}: 未报错 ✗")
+            failures.append(f"backend={backend}")
+        except ValueError as exc:
+            print(f"backend={backend!r}: {exc}")
+
+    # ====================================
+    # 步骤2: 耗时对比
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 25 + "步骤2: 耗时对比")
+    print("=" * 70)
+
+    charts = [obj for obj in objects if isinstance(obj, dict) and "pillars" in obj]
+    cases = [
+        ("json.dumps(ensure_ascii=False)", lambda chart: json.dumps(chart, ensure_ascii=False).encode("utf-8")),
+        ("json.dumps(indent=2)", lambda chart: json.dumps(chart, ensure_ascii=False, indent=2).encode("utf-8"))
+    ]
+    for backend in backends:
+        cases.append((f"dumps 紧凑 [{backend}]", lambda chart, b=backend: dumps(chart, backend=b)))
+        cases.append((f"dumps 缩进 [{backend}]", lambda chart, b=backend: dumps(chart, pretty=True, backend=b)))
+
+    print(f"\n{len(charts)} 个命盘，平均每个:")
+    for name, function in cases:
+        start = time.perf_counter()
+        for _ in range(3):
+            for chart in charts:
+                function(chart)
+        elapsed = (time.perf_counter() - start) / (3 * len(charts))
+        print(f"  {name:<32} {elapsed * 1e6:8.1f} µs")
+
+    size_default = sum(len(json.dumps(chart, ensure_ascii=False).encode("utf-8")) for chart in charts)
+    size_compact = sum(len(dumps(chart)) for chart in charts)
+    print(f"\n紧凑模式体积: {size_compact / size_default:.1%}（相对 json.dumps 默认分隔符）")
+
+    print("\n" + "=" * 70)
+    print(" " * 24 + ("✓ 所有测试完成！" if not failures else f"✗ 失败: {failures}"))
+    print("=" * 70)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
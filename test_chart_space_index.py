@@ -0,0 +1,179 @@
+# test_chart_space_index.py
+"""
+命盘空间检索测试：索引区间的四柱与特征逐一对照 generate_complete_chart 的四柱、
+special_flags、五行计数与刑冲合害，并检查条件组合与 search 的区间截取
+"""
+
+import random
+import sys
+import time
+from datetime import datetime
+
+from bazi_reference import BaziReference
+from bazi_service import BaziService
+from chart_space_index import ELEMENTS, ChartSpaceIndex, Predicate, _from_seconds
+from test_reverse_lookup import chart_near, physical_tst, pillars_of
+
+KEYS = ["year", "month", "day", "time"]
+XING_TYPES = ["无恩之刑", "恃势之刑", "无礼之刑", "自刑"]
+
+
+def index_pillars(index, pos):
+    return tuple(BaziReference.get_ganzhi_by_index(int(index.pillars[key][pos])) for key in KEYS)
+
+
+def index_features(index, pos):
+    """索引中第 pos 个区间的特征（与 chart_features 同格式）"""
+    counts = index.feature("wuxing_count")[pos]
+    extreme = int(index.feature("wuxing_extreme")[pos])
+    return {
+        "all_yang": bool(index.feature("all_yang")[pos]),
+        "all_yin": bool(index.feature("all_yin")[pos]),
+        "has_no_root": bool(index.feature("has_no_root")[pos]),
+        "wuxing_count": [float(value) for value in counts],
+        "wuxing_missing": [ELEMENTS[i] for i in range(5) if counts[i] == 0],
+        "wuxing_extreme": ELEMENTS[extreme] if extreme >= 0 else None,
+        "xing": sorted(name for name in XING_TYPES if index.feature(f"xing:{name}")[pos]),
+        "sanhe": sorted(element for element in ELEMENTS
+                        if element in index.tables.sanhe_masks and index.feature(f"sanhe:{element}")[pos]),
+        "liuchong": bool(index.feature("liuchong")[pos]),
+        "liuhe": bool(index.feature("liuhe")[pos]),
+        "liuhai": bool(index.feature("liuhai")[pos])
+    }
+
+
+def chart_features(chart):
+    """完整命盘的同名特征（取自 analysis）"""
+    analysis = chart["analysis"]
+    flags = analysis["special_flags"]
+    interactions = analysis["internal_interactions"]
+    types = {item["type"] for item in interactions}
+    return {
+        "all_yang": flags["all_yang"],
+        "all_yin": flags["all_yin"],
+        "has_no_root": flags["has_no_root"],
+        "wuxing_count": [float(analysis["wuxing_count"][element]["count"]) for element in ELEMENTS],
+        "wuxing_missing": flags["wuxing_missing"],
+        "wuxing_extreme": flags["wuxing_extreme"]["element"] if flags["wuxing_extreme"] else None,
+        "xing": sorted({item["xing_type"] for item in interactions if item["type"] in ("三刑", "二刑")}
+                       | ({"自刑"} if "自刑" in types else set())),
+        "sanhe": sorted(item["hehuan_element"] for item in interactions if item["type"] == "三合"),
+        "liuchong": "六冲" in types,
+        "liuhe": "六合" in types,
+        "liuhai": "六害" in types
+    }
+
+
+def main():
+    service = BaziService()
+    failures = []
+
+    # ====================================
+    # 步骤1: 区间四柱与特征 vs 完整排盘
+    # ====================================
+    print("=" * 70)
+    print(" " * 16 + "步骤1: 区间四柱与特征 vs 完整排盘")
+    print("=" * 70)
+
+    start = time.perf_counter()
+    index = ChartSpaceIndex(1980, 1989)
+    print(f"\n1980-1989 索引: {len(index)} 个区间，构建 {time.perf_counter() - start:.2f} 秒")
+
+    gaps = int((index.starts[1:] != index.ends[:-1]).sum())
+    print(f"区间首尾不相接: {gaps}")
+    if gaps:
+        failures.append("区间不连续")
+
+    random.seed(28)
+    candidates = [pos for pos in range(len(index)) if index.ends[pos] - index.starts[pos] >= 600]
+    # 交节、元旦切出的短区间全部取样，其余随机取样
+    short = [pos for pos in candidates if index.ends[pos] - index.starts[pos] < 7200]
+    sample = short[:60] + random.sample(candidates, 300)
+
+    checked = pillar_errors = feature_errors = 0
+    for pos in sample:
+        segment_start, segment_end = _from_seconds(index.starts[pos]), _from_seconds(index.ends[pos])
+        chart = chart_near(service, segment_start + (segment_end - segment_start) / 2)
+        tst = physical_tst(chart)
+        if not segment_start <= tst < segment_end:
+            continue
+        checked += 1
+        expected = index_pillars(index, pos)
+        if pillars_of(chart) != expected:
+            pillar_errors += 1
+            print(f"  ✗ 四柱 {tst}: 索引 {expected} 排盘 {pillars_of(chart)}")
+            continue
+        got, want = index_features(index, pos), chart_features(chart)
+        if got != want:
+            feature_errors += 1
+            diff = {key: (got[key], want[key]) for key in got if got[key] != want[key]}
+            print(f"  ✗ 特征 {tst} {expected}: {diff}")
+    print(f"取样 {checked} 个区间（交节 / 元旦短区间 {len(short[:60])} 个）：四柱不一致 {pillar_errors}，"
+          f"特征不一致 {feature_errors}")
+    if pillar_errors or feature_errors:
+        failures.append("区间四柱与特征")
+
+    # ====================================
+    # 步骤2: 条件组合与 search
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 22 + "步骤2: 条件组合与 search")
+    print("=" * 70)
+
+    a = Predicate.all_yang()
+    b = Predicate.wuxing_missing("金")
+    c = Predicate.liuchong()
+    algebra = {
+        "a|b = a+b-a&b": index.count(a | b) == index.count(a) + index.count(b) - index.count(a & b),
+        "~a = 总数-a": index.count(~a) == len(index) - index.count(a),
+        "xing() = 各类刑之或": index.count(Predicate.xing()) == index.count(
+            Predicate.xing("无恩之刑") | Predicate.xing("恃势之刑") | Predicate.xing("无礼之刑") | Predicate.xing("自刑"))
+    }
+    print()
+    for label, ok in algebra.items():
+        print(f"{label}: {'✓' if ok else '✗'}")
+        if not ok:
+            failures.append(label)
+
+    predicate = a & b & c
+    windows = index.search(predicate)
+    print(f"\n{predicate}: {len(windows)} 个区间，例 {windows[:1]}")
+    if not windows:
+        failures.append("search 无结果")
+    search_errors = 0
+    for window in random.sample(windows, min(40, len(windows))):
+        window_start = datetime.strptime(window["start"], "%Y-%m-%d %H:%M:%S")
+        window_end = datetime.strptime(window["end"], "%Y-%m-%d %H:%M:%S")
+        chart = chart_near(service, window_start + (window_end - window_start) / 2)
+        if not window_start <= physical_tst(chart) < window_end:
+            continue
+        features = chart_features(chart)
+        ok = (list(pillars_of(chart)) == window["pillars"] and features["all_yang"]
+              and "金" in features["wuxing_missing"] and features["liuchong"])
+        search_errors += not ok
+    print(f"抽查区间中点排盘，不满足条件: {search_errors}")
+
+    # 以某个结果区间的中点为起点截取：第一个结果应从该中点开始
+    middle = windows[len(windows) // 2]
+    window_start = datetime.strptime(middle["start"], "%Y-%m-%d %H:%M:%S")
+    window_end = datetime.strptime(middle["end"], "%Y-%m-%d %H:%M:%S")
+    lower = (window_start + (window_end - window_start) / 2).strftime("%Y-%m-%d %H:%M:%S")
+    upper = f"{window_start.year + 2}-01-01 00:00:00"
+    clipped = index.search(predicate, start=lower, end=upper, limit=5)
+    clip_ok = (
+        0 < len(clipped) <= 5
+        and clipped[0]["start"] == lower and clipped[0]["end"] == middle["end"]
+        and all(lower <= item["start"] < item["end"] <= upper for item in clipped)
+    )
+    print(f"start / end / limit 截取: {len(clipped)} 个区间 {'✓' if clip_ok else '✗'}")
+    if search_errors or not clip_ok:
+        failures.append("search")
+
+    print("\n" + "=" * 70)
+    print(" " * 24 + ("✓ 所有测试完成！" if not failures else f"✗ 失败: {failures}"))
+    print("=" * 70)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
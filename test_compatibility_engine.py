@@ -0,0 +1,186 @@
+# test_compatibility_engine.py
+"""
+批量合婚引擎测试：关系矩阵、评分矩阵与 top_k 逐对对照 InteractionEngine 的标量判断
+（命盘来自 generate_complete_chart），并测量 10 万候选池的耗时
+"""
+
+import random
+import sys
+import time
+
+import numpy as np
+
+from bazi_reference import BaziReference
+from bazi_service import BaziService
+from compatibility_engine import CompatibilityEngine
+from interaction_engine import InteractionEngine
+
+
+def random_charts(service, count, seed):
+    random.seed(seed)
+    return [
+        service.generate_complete_chart(
+            f"{random.randint(1901, 2099)}-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}",
+            f"{random.randint(0, 23):02d}:{random.randint(0, 59):02d}",
+            round(random.uniform(73, 135), 3), round(random.uniform(18, 53), 3),
+            random.choice(["男", "女"])
+        )
+        for _ in range(count)
+    ]
+
+
+def scalar_relations(chart1, chart2):
+    """两个完整命盘之间的关系名称（逐项调用 InteractionEngine）"""
+    names = []
+    for label, key in [("日", "day"), ("年", "year")]:
+        pillar1, pillar2 = chart1["pillars"][key], chart2["pillars"][key]
+        if InteractionEngine.check_he(pillar1["zhi"], pillar2["zhi"])["is_he"]:
+            names.append(f"{label}支六合")
+        if InteractionEngine.check_chong(pillar1["zhi"], pillar2["zhi"]):
+            names.append(f"{label}支六冲")
+        if InteractionEngine.check_hai(pillar1["zhi"], pillar2["zhi"])["is_hai"]:
+            names.append(f"{label}支六害")
+        if InteractionEngine.check_gan_he(pillar1["gan"], pillar2["gan"])["is_he"]:
+            names.append(f"{label}干五合")
+        if key == "day" and InteractionEngine.check_tianke_dichong(pillar1, pillar2)["is_tianke_dichong"]:
+            names.append("日柱天克地冲")
+    return set(names)
+
+
+def check_top_k(engine, k):
+    """top_k 与逐行全量排序对照：分数序列一致、下标有效且不含自身 / 重复，返回不一致行数"""
+    result = engine.top_k(k)
+    scores = engine.score_matrix()
+    bad_rows = 0
+    for row in range(len(engine.charts)):
+        row_scores = scores[row].astype(np.float64)
+        if engine.same_pool:
+            row_scores[row] = -np.inf
+        available = len(engine.candidates) - (1 if engine.same_pool else 0)
+        expected = np.sort(row_scores)[::-1][:min(k, available)]
+
+        indices = result["indices"][row]
+        valid = indices[indices >= 0]
+        ok = (
+            len(valid) == len(expected)
+            and len(set(valid.tolist())) == len(valid)
+            and not (engine.same_pool and row in valid)
+            and np.allclose(result["scores"][row][:len(valid)], expected)
+            and np.allclose(scores[row][valid], expected)
+            and (result["relations"][row][:len(valid)] == engine.relation_matrix([row], valid)[0]).all()
+        )
+        bad_rows += not ok
+    return bad_rows
+
+
+def main():
+    service = BaziService()
+    failures = []
+
+    # ====================================
+    # 步骤1: 关系矩阵 vs 标量判断
+    # ====================================
+    print("=" * 70)
+    print(" " * 18 + "步骤1: 关系矩阵 vs InteractionEngine")
+    print("=" * 70)
+
+    charts = random_charts(service, 150, seed=26)
+    candidates = random_charts(service, 120, seed=27)
+    chart_array = np.array([CompatibilityEngine.encode_chart(chart) for chart in charts])
+    candidate_array = np.array([CompatibilityEngine.encode_chart(chart) for chart in candidates])
+
+    encode_errors = sum(
+        [chart["pillars"][key]["ganzhi"] for key in ["year", "month", "day", "time"]]
+        != [BaziReference.get_ganzhi_by_index(int(index)) for index in row]
+        for chart, row in zip(charts, chart_array)
+    )
+    print(f"\nencode_chart 与四柱干支不一致: {encode_errors}")
+
+    engine = CompatibilityEngine(chart_array, candidate_array)
+    relations = engine.relation_matrix()
+    scores = engine.score_matrix()
+    relation_errors = score_errors = 0
+    counts = {}
+    for i, chart1 in enumerate(charts):
+        for j, chart2 in enumerate(candidates):
+            names = CompatibilityEngine.decode_relations(relations[i, j])
+            relation_errors += set(names) != scalar_relations(chart1, chart2)
+            expected_score = sum(engine.weights[name] for name in names)
+            score_errors += not np.isclose(scores[i, j], expected_score)
+            for name in names:
+                counts[name] = counts.get(name, 0) + 1
+    print(f"{len(charts)} x {len(candidates)} 对：关系不一致 {relation_errors}，评分不一致 {score_errors}")
+    print(f"关系分布: {counts}")
+
+    blocks = np.zeros_like(relations)
+    for row_start, col_start, block in engine.iter_relation_blocks(block_size=64):
+        blocks[row_start:row_start + block.shape[0], col_start:col_start + block.shape[1]] = block
+    block_errors = int((blocks != relations).sum())
+    print(f"iter_relation_blocks 拼回全量矩阵不一致: {block_errors}")
+
+    if encode_errors or relation_errors or score_errors or block_errors:
+        failures.append("关系矩阵")
+
+    # ====================================
+    # 步骤2: top_k vs 全量排序
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 22 + "步骤2: top_k vs 全量排序")
+    print("=" * 70)
+
+    weighted = CompatibilityEngine(chart_array, weights={"年干五合": 0.0, "日支六害": -4.0})
+    cases = [
+        ("跨池 k=10", engine, 10),
+        ("同池 k=10", CompatibilityEngine(chart_array), 10),
+        ("同池 k=池大小", CompatibilityEngine(chart_array[:20]), 25),
+        ("同池 自定义权重", weighted, 7),
+        ("跨池 k>候选数", CompatibilityEngine(chart_array[:5], candidate_array[:3]), 6)
+    ]
+    print()
+    for label, case_engine, k in cases:
+        bad_rows = check_top_k(case_engine, k)
+        print(f"{label}: 不一致行 {bad_rows} / {len(case_engine.charts)}")
+        if bad_rows:
+            failures.append(f"top_k {label}")
+
+    for label, data in [("列数错误", [[0, 1, 2]]), ("序号越界", [[0, 1, 2, 60]])]:
+        try:
+            CompatibilityEngine(data)
+            print(f"{label}: 未报错 ✗")
+            failures.append(label)
+        except ValueError as exc:
+            print(f"{label}: {exc}")
+
+    # ====================================
+    # 步骤3: 10 万候选池
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 24 + "步骤3: 10 万候选池")
+    print("=" * 70)
+
+    rng = np.random.default_rng(0)
+    pool = rng.integers(0, 60, size=(100000, 4))
+    start = time.perf_counter()
+    pool_engine = CompatibilityEngine(pool)
+    result = pool_engine.top_k(10)
+    elapsed = time.perf_counter() - start
+    sample = rng.choice(len(pool), size=50, replace=False)
+    sample_engine = CompatibilityEngine(pool[sample], pool)
+    sample_scores = sample_engine.score_matrix()
+    sample_errors = 0
+    for position, row in enumerate(sample):
+        row_scores = sample_scores[position].astype(np.float64)
+        row_scores[row] = -np.inf
+        sample_errors += not np.allclose(result["scores"][row], np.sort(row_scores)[::-1][:10])
+    print(f"\n同池 top_k(10): {elapsed:.2f} 秒；抽查 {len(sample)} 行与全量排序不一致 {sample_errors}")
+    if sample_errors:
+        failures.append("10 万候选池")
+
+    print("\n" + "=" * 70)
+    print(" " * 24 + ("✓ 所有测试完成！" if not failures else f"✗ 失败: {failures}"))
+    print("=" * 70)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+# test_field_projection.py
+"""
+字段投影测试：fields 参数（预设、手写路径、随机抽取的路径组合）只计算请求段落的结果，
+必须与先排完整命盘再按路径裁剪的结果逐字节一致；覆盖单盘、批量与时辰未知三个入口
+"""
+
+import random
+import sys
+import time
+
+from bazi_service import BaziService
+from chart_serializer import dumps
+
+FIELD_SPECS = [
+    ["pillars"],
+    ["dayun.dayun_list"],
+    ["analysis.wuxing_count.*.count"],
+    ["analysis.wuxing_count.*.sources"],
+    ["analysis.wuxing_count.木"],
+    ["analysis.internal_interactions.note"],
+    ["analysis.internal_interactions.type", "analysis.internal_interactions.zhis"],
+    ["analysis.month_siling", "pillars.day"],
+    ["analysis"],
+    ["analysis.*"],
+    ["basic_info.true_solar_time", "solar_terms_detail"],
+    ["reference_tables.*"],
+    ["pillars.*.ganzhi", "dayun"],
+    ["dayun", "dayun.dayun_list"],
+    ["dayun.dayun_list", "dayun"],
+    ["basic_info", "solar_terms_detail", "pillars", "analysis", "reference_tables", "dayun"]
+]
+
+
+def project(value, paths):
+    """
+    按字段路径裁剪（独立于 BaziService 的投影树实现）：
+    某条路径已走完时整段保留；"*" 匹配任意键；列表按元素逐个裁剪
+    """
+    if any(not path for path in paths):
+        return value
+    if isinstance(value, list):
+        return [project(item, paths) for item in value]
+    if not isinstance(value, dict):
+        return value
+    projected = {}
+    for key, item in value.items():
+        rest = [path[1:] for path in paths if path[0] in (key, "*")]
+        if rest:
+            projected[key] = project(item, rest)
+    return projected
+
+
+def expand(fields):
+    """预设名 -> 字段路径列表，每条路径拆成各级键"""
+    if isinstance(fields, str):
+        fields = BaziService.FIELD_PROFILES[fields]
+    return [path.split(".") for path in fields]
+
+
+def key_paths(value, prefix="", depth=3):
+    """完整命盘中深度不超过 depth 的全部字段路径（列表元素的键算作同一路径）"""
+    paths = []
+    if isinstance(value, list):
+        for item in value[:1]:
+            paths.extend(key_paths(item, prefix, depth))
+        return paths
+    if not isinstance(value, dict) or depth == 0:
+        return paths
+    for key, item in value.items():
+        path = f"{prefix}.{key}" if prefix else key
+        paths.append(path)
+        paths.extend(key_paths(item, path, depth - 1))
+    return paths
+
+
+def random_input(rng):
+    return (f"{rng.randint(1901, 2099)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+            round(rng.uniform(-180, 180), 3), round(rng.uniform(-55, 60), 3), rng.choice(["男", "女"]))
+
+
+def main():
+    service = BaziService()
+    failures = []
+    rng = random.Random(41)
+    inputs = [random_input(rng) for _ in range(60)]
+    full_charts = [service.generate_complete_chart(*args) for args in inputs]
+    all_paths = sorted({path for chart in full_charts for path in key_paths(chart)})
+    specs = list(BaziService.FIELD_PROFILES) + FIELD_SPECS
+    specs += [rng.sample(all_paths, rng.randint(1, 6)) for _ in range(60)]
+
+    # ====================================
+    # 步骤1: 单盘 投影 vs 完整命盘裁剪
+    # ====================================
+    print("=" * 70)
+    print(" " * 16 + "步骤1: 单盘 投影 vs 完整命盘裁剪")
+    print("=" * 70)
+
+    mismatches = 0
+    for fields in specs:
+        for args, full in zip(inputs[:20], full_charts[:20]):
+            got = dumps(service.generate_complete_chart(*args, fields=fields))
+            if got != dumps(project(full, expand(fields))):
+                mismatches += 1
+                if mismatches <= 5:
+                    print(f"  ✗ {args} fields={fields}")
+    print(f"\n{len(specs)} 种字段组合（预设 {len(BaziService.FIELD_PROFILES)}、手写 {len(FIELD_SPECS)}、随机 60）"
+          f"× 20 盘：不一致 {mismatches}")
+    if mismatches:
+        failures.append("单盘")
+
+    # ====================================
+    # 步骤2: 批量与时辰未知
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 22 + "步骤2: 批量与时辰未知")
+    print("=" * 70)
+
+    requests = []
+    expected = []
+    for args, full in zip(inputs, full_charts):
+        fields = rng.choice(specs)
+        requests.append(dict(zip(["birth_date", "birth_time", "longitude", "latitude", "gender"], args),
+                             fields=fields))
+        expected.append(dumps(project(full, expand(fields))))
+    batch_mismatches = sum(dumps(result) != want
+                           for result, want in zip(service.generate_complete_charts(requests), expected))
+    print(f"\ngenerate_complete_charts 混合 {len(requests)} 个请求（各带不同 fields）：不一致 {batch_mismatches}")
+    if batch_mismatches:
+        failures.append("批量")
+
+    candidate_mismatches = 0
+    for args in inputs[:6]:
+        birth_date, _, longitude, latitude, gender = args
+        full = service.generate_complete_chart(birth_date, None, longitude, latitude, gender, hour_unknown=True)
+        for fields in ["minimal", ["pillars.time", "analysis.month_siling"]]:
+            result = service.generate_complete_chart(birth_date, None, longitude, latitude, gender,
+                                                     hour_unknown=True, fields=fields)
+            want = [dict(candidate, chart=project(candidate["chart"], expand(fields)))
+                    for candidate in full["candidates"]]
+            # shared_sections / differing_fields 按裁剪后的候选命盘统计
+            charts = [candidate["chart"] for candidate in want]
+            shared = [section for section in charts[0] if all(chart[section] == charts[0][section] for chart in charts)]
+            candidate_mismatches += (dumps(result["candidates"]) != dumps(want)
+                                     or result["shared_sections"] != shared
+                                     or not set(result["differing_fields"]) <= set(full["differing_fields"]))
+    print(f"时辰未知 6 天 × 2 种字段组合（每个候选命盘各自裁剪，共享段落按裁剪后统计）：不一致 {candidate_mismatches}")
+    if candidate_mismatches:
+        failures.append("时辰未知")
+
+    # ====================================
+    # 步骤3: 耗时与不合法参数
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 22 + "步骤3: 耗时与不合法参数")
+    print("=" * 70)
+
+    print()
+    for fields in [None] + list(BaziService.FIELD_PROFILES):
+        start = time.perf_counter()
+        for args in inputs:
+            service.generate_complete_chart(*args, fields=fields)
+        elapsed = (time.perf_counter() - start) / len(inputs)
+        size = sum(len(dumps(service.generate_complete_chart(*args, fields=fields))) for args in inputs[:10])
+        print(f"  fields={str(fields):<10} {elapsed * 1000:6.2f} ms/盘  输出 {size // 10} 字节/盘")
+
+    for fields in ["nonexistent", ["no_such_section"]]:
+        try:
+            service.generate_complete_chart(*inputs[0], fields=fields)
+            print(f"  fields={fields}: 未报错 ✗")
+            failures.append(f"fields={fields}")
+        except ValueError as exc:
+            print(f"  fields={fields}: {exc}")
+
+    print("\n" + "=" * 70)
+    print(" " * 24 + ("✓ 所有测试完成！" if not failures else f"✗ 失败: {failures}"))
+    print("=" * 70)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# test_fork_launcher.py
+"""
+fork 启动器测试：同样 4 个工作进程，对比各自初始化（initializer）与预加载后 fork 的
+各进程 RSS / PSS（启动后与处理一批命盘后各测一次），并检查结果与本进程排盘一致
+"""
+
+import gc
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+from bazi_batch import create_pool, iter_charts
+from bazi_service import BaziService
+from chart_serializer import dumps
+from fork_launcher import create_fork_pool, fork_available, pool_memory, process_memory, worker_pids
+from metrics_exporter import enable_worker_metrics, read_worker_metrics
+
+
+def random_requests(count):
+    random.seed(11)
+    return [
+        {
+            "birth_date": f"{random.randint(1900, 2050)}-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}",
+            "birth_time": f"{random.randint(0, 23):02d}:{random.randint(0, 59):02d}",
+            "longitude": round(random.uniform(-180, 180), 3),
+            "latitude": round(random.uniform(-60, 60), 3),
+            "gender": random.choice(["男", "女"])
+        }
+        for _ in range(count)
+    ]
+
+
+def run(executor, requests, expected=None):
+    """排一批命盘（结果不保留，避免父进程内存干扰对比），返回与 expected 不一致的个数"""
+    mismatches = 0
+    for index, chart in iter_charts(requests, executor=executor):
+        if expected is not None and index < len(expected) and dumps(chart) != expected[index]:
+            mismatches += 1
+    return mismatches
+
+
+def print_memory(label, report):
+    print(f"\n{label}:")
+    parent = report["parent"]
+    print(f"  父进程        RSS {parent['rss_kb'] / 1024:7.1f} MB   PSS {parent['pss_kb'] / 1024:7.1f} MB")
+    for pid, usage in report["workers"].items():
+        private = (usage["private_clean_kb"] + usage["private_dirty_kb"]) / 1024
+        print(f"  工作进程 {pid:<6} RSS {usage['rss_kb'] / 1024:7.1f} MB   PSS {usage['pss_kb'] / 1024:7.1f} MB"
+              f"   独占 {private:6.1f} MB")
+    print(f"  合计 PSS {report['total_pss_kb'] / 1024:.1f} MB")
+
+
+def main():
+    if process_memory() is None:
+        print("无法读取 /proc/<pid>/smaps_rollup（仅支持 Linux），跳过")
+        return
+    if not fork_available():
+        print("当前平台不支持 fork，跳过")
+        return
+
+    workers = 4
+    failures = []
+    requests = random_requests(2000)
+    expected = [dumps(chart) for chart in BaziService().generate_complete_charts(requests[:200])]
+
+    # ====================================
+    # 步骤1: 各工作进程自行初始化
+    # ====================================
+    print("=" * 70)
+    print(" " * 18 + "步骤1: 各工作进程自行初始化")
+    print("=" * 70)
+
+    with create_pool(workers) as executor:
+        list(iter_charts(requests[:workers], executor=executor, chunk_size=1))
+        report = pool_memory(executor)
+        print_memory("启动后", report)
+        if len(report["workers"]) != workers:
+            failures.append("自行初始化的工作进程号")
+        run(executor, requests)
+        print_memory("处理 2000 个命盘后", pool_memory(executor))
+
+    # ====================================
+    # 步骤2: 预加载后 fork
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 22 + "步骤2: 预加载后 fork")
+    print("=" * 70)
+
+    with create_pool(workers, fork=True) as executor:
+        frozen_after_start = gc.get_freeze_count()
+        report = pool_memory(executor)
+        print_memory("启动后", report)
+        served = {executor.submit(os.getpid).result() for _ in range(workers * 4)}
+        if len(report["workers"]) != workers or not served <= set(report["workers"]):
+            failures.append("fork 工作进程号")
+        mismatches = run(executor, requests, expected)
+        print_memory("处理 2000 个命盘后", pool_memory(executor))
+        worker_frozen = min(executor.submit(gc.get_freeze_count).result() for _ in range(workers))
+
+    print(f"\n结果与本进程排盘不一致: {mismatches}（比对前 {len(expected)} 个）")
+    print(f"启动后父进程冻结对象 {frozen_after_start}（应已解冻），工作进程冻结对象 {worker_frozen}（继承自 fork 前）")
+
+    if mismatches:
+        failures.append("结果不一致")
+    if frozen_after_start != 0 or worker_frozen == 0:
+        failures.append("gc 冻结状态")
+
+    with create_fork_pool(1, lambda: None, keep_frozen=True):
+        kept = gc.get_freeze_count()
+    gc.unfreeze()
+    print(f"keep_frozen=True: 父进程冻结对象 {kept}")
+    if kept == 0:
+        failures.append("keep_frozen")
+
+    # ====================================
+    # 步骤3: fork 后工作进程的埋点数据
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 18 + "步骤3: fork 后工作进程的埋点数据")
+    print("=" * 70)
+
+    # 父进程已开启汇总并记录过数据（如此前创建过带埋点的进程池）：fork 出的工作进程应从零开始
+    metrics_dir = tempfile.mkdtemp(prefix="bazi_fork_metrics_")
+    enable_worker_metrics(metrics_dir, interval=0)
+    BaziService().generate_complete_chart(**requests[0])
+    with create_pool(2, fork=True, metrics_dir=metrics_dir) as executor:
+        pids = worker_pids(executor)
+        run(executor, requests[:100])
+    collector = read_worker_metrics(metrics_dir)
+    built = collector.stages["chart_builder.build_chart"].count
+    shutil.rmtree(metrics_dir)
+    print(f"\n工作进程 {pids} 合计 build_chart {built} 次（应为 100，不含父进程在 fork 前记录的数据，如预加载时 warmup 预排的一盘）")
+    if built != 100:
+        failures.append("工作进程埋点")
+
+    print("\n" + "=" * 70)
+    print(" " * 24 + ("✓ 所有测试完成！" if not failures else f"✗ 失败: {failures}"))
+    print("=" * 70)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
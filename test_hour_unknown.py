@@ -0,0 +1,154 @@
+# test_hour_unknown.py
+"""
+时辰未知测试：候选命盘都在出生当日（本地时间），与用同一时间单独调用 generate_complete_chart 逐字节一致；
+当日每一分钟的四柱都与其所在候选一致（东西两端经度、夏令时切换日、交节日）
+"""
+
+import random
+import sys
+from datetime import datetime, timedelta
+
+import pytz
+
+from bazi_service import BaziService
+from chart_serializer import dumps
+
+KEYS = ["year", "month", "day", "time"]
+
+EDGE_CASES = {
+    "东端（佳木斯附近，比北京时间早约 37 分钟）": ("1990-01-15", 134.2, 47.7),
+    "西端（喀什，比北京时间晚约 3 小时）": ("1990-01-15", 73.5, 39.5),
+    "夏令时开始（纽约，02:00-02:59 不存在）": ("2021-03-14", -74.0, 40.7),
+    "夏令时结束（纽约，01:00-01:59 重复；立冬交节落在午时内）": ("2021-11-07", -74.0, 40.7),
+    "北京时间夏令时开始": ("1988-04-17", 116.4, 39.9),
+    "立春（年柱、月柱同时切换）": ("2024-02-04", 116.4, 39.9)
+}
+
+
+def check_candidates(service, birth_date, longitude, latitude, gender, fields=None):
+    """候选的日期与本地时间段、以及与单独排盘的一致性，返回问题列表"""
+    result = service.generate_complete_chart(birth_date, None, longitude, latitude, gender,
+                                             hour_unknown=True, fields=fields)
+    candidates = result["candidates"]
+    next_day = (datetime.strptime(birth_date, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+    problems = []
+    if candidates[0]["start"] != f"{birth_date} 00:00" or candidates[-1]["end"] != f"{next_day} 00:00":
+        problems.append("本地时间段未覆盖全天")
+    for previous, candidate in zip(candidates, candidates[1:]):
+        if previous["end"] != candidate["start"]:
+            problems.append(f"时间段不相接 {previous['end']} {candidate['start']}")
+    for candidate in candidates:
+        if candidate["birth_datetime"] != f"{birth_date} {candidate['birth_time']}":
+            problems.append(f"birth_datetime 不在出生当日: {candidate['birth_datetime']}")
+        if not candidate["start"] <= candidate["birth_datetime"] < candidate["end"]:
+            problems.append(f"排盘时间不在时间段内: {candidate['birth_datetime']}")
+        expected = service.generate_complete_chart(birth_date, candidate["birth_time"], longitude, latitude,
+                                                   gender, fields=fields)
+        if dumps(candidate["chart"]) != dumps(expected):
+            problems.append(f"与单独排盘不一致: {candidate['birth_datetime']}")
+        if "pillars" in expected and expected["pillars"]["time"]["zhi"] != candidate["time_zhi"]:
+            problems.append(f"time_zhi 不符: {candidate['time_zhi']}")
+    return result, problems
+
+
+def check_every_minute(service, candidates, birth_date, longitude, latitude):
+    """当日每一分钟（夏令时跳过的除外）排出的四柱必须与其所在候选相同，返回 (检查分钟数, 不一致列表)"""
+    timezone_str = service.time_processor.get_timezone(longitude, latitude)
+    day_start = datetime.strptime(birth_date, "%Y-%m-%d")
+    checked, mismatches = 0, []
+    for minute in range(24 * 60):
+        local = day_start + timedelta(minutes=minute)
+        text = local.strftime("%Y-%m-%d %H:%M")
+        try:
+            solar_data = service.time_processor.get_solar_data(birth_date, local.strftime("%H:%M"),
+                                                               longitude, latitude, timezone_str=timezone_str)
+        except pytz.NonExistentTimeError:
+            continue
+        pillars = service.chart_builder.build_chart(solar_data, "男")["pillars"]
+        candidate = next(item for item in candidates if item["start"] <= text < item["end"])
+        checked += 1
+        if tuple(pillars[key]["ganzhi"] for key in KEYS) != tuple(candidate["chart"]["pillars"][key]["ganzhi"]
+                                                                   for key in KEYS):
+            mismatches.append(text)
+    return checked, mismatches
+
+
+def main():
+    service = BaziService()
+    failures = []
+
+    # ====================================
+    # 步骤1: 东西两端、夏令时切换日与交节日
+    # ====================================
+    print("=" * 70)
+    print(" " * 14 + "步骤1: 东西两端、夏令时切换日与交节日")
+    print("=" * 70)
+
+    for label, (birth_date, longitude, latitude) in EDGE_CASES.items():
+        result, problems = check_candidates(service, birth_date, longitude, latitude, "女")
+        candidates = result["candidates"]
+        checked, mismatches = check_every_minute(service, candidates, birth_date, longitude, latitude)
+        print(f"\n{label} {birth_date} ({longitude}, {latitude}): {len(candidates)} 个候选")
+        print("  " + "  ".join(f"{item['time_zhi']}{item['birth_time']}" for item in candidates))
+        print(f"  首尾: {candidates[0]['start']} ~ {candidates[-1]['end']}，"
+              f"逐分钟 {checked} 分钟，四柱与所在候选不一致 {len(mismatches)}")
+        for problem in problems[:5]:
+            print(f"  ✗ {problem}")
+        if problems or mismatches:
+            failures.append(label)
+
+    # 东端的当日 23 点之后必须仍有候选（而不是落到前一天）
+    candidates = service.generate_complete_chart("1990-01-15", None, 134.2, 47.7, "女",
+                                                 hour_unknown=True)["candidates"]
+    late = [item for item in candidates if item["end"] > "1990-01-15 23:00"]
+    print(f"\n东端 23:00 之后的候选: {[(item['time_zhi'], item['birth_datetime']) for item in late]}")
+    if not late:
+        failures.append("东端当日 23 点")
+
+    # ====================================
+    # 步骤2: 随机日期与地点
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 22 + "步骤2: 随机日期与地点")
+    print("=" * 70)
+
+    random.seed(30)
+    counts = {}
+    bad = 0
+    for _ in range(40):
+        birth_date = f"{random.randint(1601, 2398)}-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}"
+        longitude, latitude = round(random.uniform(-180, 180), 3), round(random.uniform(-55, 60), 3)
+        result, problems = check_candidates(service, birth_date, longitude, latitude, random.choice(["男", "女"]))
+        counts[len(result["candidates"])] = counts.get(len(result["candidates"]), 0) + 1
+        if problems:
+            bad += 1
+            print(f"  ✗ {birth_date} ({longitude}, {latitude}): {problems[:3]}")
+    print(f"\n40 组：候选数分布 {dict(sorted(counts.items()))}，有问题 {bad}")
+    if bad:
+        failures.append("随机日期与地点")
+
+    # ====================================
+    # 步骤3: 字段投影
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 24 + "步骤3: 字段投影")
+    print("=" * 70)
+
+    print()
+    for fields in ["minimal", ["pillars", "analysis.wuxing_count.*.count"]]:
+        result, problems = check_candidates(service, "1990-01-15", 134.2, 47.7, "男", fields=fields)
+        print(f"fields={fields}: {len(result['candidates'])} 个候选，"
+              f"shared_sections={result['shared_sections']} {'✓' if not problems else '✗'}")
+        for problem in problems[:5]:
+            print(f"  ✗ {problem}")
+        if problems:
+            failures.append(f"fields={fields}")
+
+    print("\n" + "=" * 70)
+    print(" " * 24 + ("✓ 所有测试完成！" if not failures else f"✗ 失败: {failures}"))
+    print("=" * 70)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
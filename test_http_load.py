@@ -0,0 +1,250 @@
+# test_http_load.py
+"""
+HTTP 服务压测：在本机启动 BaziHTTPService，并发发送排盘请求，统计吞吐、延迟与过载保护
+"""
+
+import asyncio
+import json
+import random
+import sys
+import time
+from http import HTTPStatus
+
+from http_service import BaziHTTPService
+
+
+async def _request(host, port, method, path, payload=None, connection=None):
+    """发送一个请求，返回 (状态码, 响应体, 连接)；connection 为 (reader, writer) 时复用"""
+    if connection is None:
+        connection = await asyncio.open_connection(host, port)
+    reader, writer = connection
+    body = json.dumps(payload or {}, ensure_ascii=False).encode("utf-8")
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ")[1])
+    length = next(int(line.split(":")[1]) for line in lines if line.lower().startswith("content-length"))
+    response = await reader.readexactly(length)
+    return status, response, connection
+
+
+def _random_payload(rng):
+    return {
+        "birth_date": f"{rng.randint(1940, 2010)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "birth_time": f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+        "longitude": round(rng.uniform(100, 125), 2),
+        "latitude": round(rng.uniform(20, 45), 2),
+        "gender": rng.choice(["男", "女"])
+    }
+
+
+async def _load(host, port, total, concurrency):
+    """concurrency 个 keep-alive 连接共发 total 个排盘请求"""
+    rng = random.Random(7)
+    payloads = [_random_payload(rng) for _ in range(total)]
+    latencies = []
+    statuses = {}
+
+    async def client(indices):
+        connection = None
+        for index in indices:
+            started = time.perf_counter()
+            status, _, connection = await _request(host, port, "POST", "/chart", payloads[index], connection)
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+        connection[1].close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*[client(range(i, total, concurrency)) for i in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 2),
+        "rps": round(total / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)] * 1000, 1),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 1),
+        "statuses": statuses
+    }
+
+
+async def _burst(host, port, payload, count, rounds):
+    """rounds 轮、每轮 count 个相同请求同时到达（各自新建连接），返回状态码分布、不同响应体个数与耗时"""
+    statuses = {}
+    bodies = set()
+    started = time.perf_counter()
+    for _ in range(rounds):
+        results = await asyncio.gather(*[_request(host, port, "POST", "/chart", payload) for _ in range(count)])
+        for status, response, connection in results:
+            connection[1].close()
+            statuses[status] = statuses.get(status, 0) + 1
+            bodies.add(response)
+    return {"statuses": statuses, "distinct_bodies": len(bodies), "seconds": round(time.perf_counter() - started, 3)}
+
+
+async def _raw_request(host, port, data):
+    """发送原始字节，返回响应状态码；服务端未响应就断开时返回 None"""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(data)
+        await writer.drain()
+        head = await reader.readuntil(b"\r\n\r\n")
+        return int(head.split(b" ")[1])
+    except asyncio.IncompleteReadError:
+        return None
+    finally:
+        writer.close()
+
+
+async def main_async():
+    # ====================================
+    # 步骤1: 启动本机服务
+    # ====================================
+    print("=" * 70)
+    print(" " * 24 + "步骤1: 启动本机服务")
+    print("=" * 70)
+    service = BaziHTTPService(port=0, workers=4, max_pending=64, request_timeout=10.0)
+    await service.start()
+    host, port = service.host, service.port
+    failures = []
+    print(f"\n监听 {host}:{port}，{service.workers} 个工作进程")
+
+    try:
+        # ====================================
+        # 步骤2: 功能检查
+        # ====================================
+        print("\n" + "=" * 70)
+        print(" " * 26 + "步骤2: 功能检查")
+        print("=" * 70)
+        payload = {"birth_date": "1984-11-06", "birth_time": "03:00", "longitude": 98.588, "latitude": 24.43, "gender": "男"}
+        checks = [
+            ("POST", "/chart", payload),
+            ("POST", "/years", dict(payload, start_year=2024, end_year=2026)),
+            ("POST", "/prompt", dict(payload, step="pattern")),
+            ("POST", "/chart", {"birth_date": "1984-11-06"}),
+            ("GET", "/missing", None),
+            ("GET", "/health", None)
+        ]
+        for method, path, body in checks:
+            status, response, connection = await _request(host, port, method, path, body)
+            connection[1].close()
+            print(f"  {method:4} {path:9} -> {status}  {response[:60].decode('utf-8', 'replace')}...")
+
+        # ====================================
+        # 步骤3: 压测
+        # ====================================
+        print("\n" + "=" * 70)
+        print(" " * 28 + "步骤3: 压测")
+        print("=" * 70)
+        for batch_size in (1, 32):
+            service.batch_size = batch_size
+            for concurrency in (8, 32):
+                result = await _load(host, port, 2000, concurrency)
+                print(f"\n  batch_size={batch_size}: {result}")
+
+        # 批处理与逐个处理的响应应逐字节一致
+        service.batch_size = 1
+        _, single, connection = await _request(host, port, "POST", "/chart", payload)
+        connection[1].close()
+        service.batch_size = 32
+        _, batched, connection = await _request(host, port, "POST", "/chart", payload)
+        connection[1].close()
+        print(f"\n  批处理响应与逐个处理一致: {single == batched}")
+
+        status, response, connection = await _request(host, port, "GET", "/stats")
+        connection[1].close()
+        print(f"  批处理统计: {json.loads(response)['batching']}")
+
+        # ====================================
+        # 步骤4: 相同请求合并（single-flight）
+        # ====================================
+        print("\n" + "=" * 70)
+        print(" " * 18 + "步骤4: 相同请求合并（single-flight）")
+        print("=" * 70)
+        for coalesce in (False, True):
+            service.coalesce = coalesce
+            before = service.coalesce_stats.coalesced
+            result = await _burst(host, port, payload, 64, 20)
+            print(f"\n  coalesce={coalesce}: 64 个相同请求 × 20 轮 {result}，"
+                  f"合并 {service.coalesce_stats.coalesced - before} 个")
+        print(f"  合并统计: {service.coalesce_stats.snapshot(len(service.in_flight))}")
+
+        # 经纬度写成字符串、字段顺序不同的请求规范化后同键
+        variants = [dict(payload, longitude="98.588"), {key: payload[key] for key in reversed(list(payload))}]
+        results = await asyncio.gather(*[_request(host, port, "POST", "/chart", body) for body in variants * 8])
+        for _, _, connection in results:
+            connection[1].close()
+        print(f"  写法不同的相同请求响应一致: {len({response for _, response, _ in results}) == 1}")
+
+        # ====================================
+        # 步骤5: 过载保护（在途上限 + 超时）
+        # ====================================
+        print("\n" + "=" * 70)
+        print(" " * 20 + "步骤5: 过载保护（503 / 504）")
+        print("=" * 70)
+        service.max_pending = 8
+        result = await _load(host, port, 400, 64)
+        print(f"\n  在途上限 8、并发 64: {result['statuses']}")
+
+        service.max_pending = 64
+        service.request_timeout = 0.0005
+        result = await _load(host, port, 200, 8)
+        print(f"  超时 0.5ms: {result['statuses']}")
+
+        status, response, connection = await _request(host, port, "GET", "/stats")
+        connection[1].close()
+        print(f"\n  /stats: {response.decode('utf-8')}")
+
+        # ====================================
+        # 步骤6: 不合法的请求
+        # ====================================
+        print("\n" + "=" * 70)
+        print(" " * 24 + "步骤6: 不合法的请求")
+        print("=" * 70)
+        service.header_timeout = 0.5
+        cases = [
+            ("Content-Length 非数字", b"abc", HTTPStatus.BAD_REQUEST),
+            ("Content-Length 为负数", b"-5", HTTPStatus.BAD_REQUEST),
+            ("请求体过大", str(service.max_body_bytes + 1).encode(), HTTPStatus.REQUEST_ENTITY_TOO_LARGE),
+            ("请求体不完整（读取超时后断开）", b"100", None)
+        ]
+        print()
+        for label, length, expected in cases:
+            data = b"POST /chart HTTP/1.1\r\nHost: test\r\nContent-Length: " + length + b"\r\n\r\n{}"
+            started = time.perf_counter()
+            status = await asyncio.wait_for(_raw_request(host, port, data), 5.0)
+            ok = status == expected
+            print(f"  {label}: {status}（{time.perf_counter() - started:.2f} 秒）{'✓' if ok else '✗'}")
+            if not ok:
+                failures.append(label)
+        service.header_timeout = 5.0
+
+        # 服务仍正常
+        status, _, connection = await _request(host, port, "GET", "/health")
+        connection[1].close()
+        print(f"  之后 /health: {status}")
+        if status != HTTPStatus.OK:
+            failures.append("/health")
+    finally:
+        await service.stop()
+
+    print("\n" + "=" * 70)
+    print(" " * 24 + ("✓ 所有测试完成！" if not failures else f"✗ 失败: {failures}"))
+    print("=" * 70)
+    return failures
+
+
+def main():
+    sys.exit(1 if asyncio.run(main_async()) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+# test_instrumentation.py
+"""
+性能埋点测试：收集排盘、流年分析、Prompt 编排各步骤的耗时直方图与计数，
+检查开启埋点不改变结果、钩子事件成对且记录出错步骤，并测量关闭 / 开启埋点的开销
+"""
+
+import random
+import sys
+import time
+import timeit
+
+import instrumentation
+from bazi_service import BaziService
+from chart_serializer import dumps
+from instrumentation import InstrumentationHook, collecting, timed
+from reasoning_orchestrator import ReasoningOrchestrator
+
+
+def random_requests(count, seed=3):
+    rng = random.Random(seed)
+    return [
+        {
+            "birth_date": f"{rng.randint(1550, 2050)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "birth_time": f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+            "longitude": round(rng.uniform(-180, 180), 3),
+            "latitude": round(rng.uniform(-60, 60), 3),
+            "gender": rng.choice(["男", "女"])
+        }
+        for _ in range(count)
+    ]
+
+
+def per_chart_time(service, requests, repeat=5):
+    """逐个排盘的最短平均耗时（秒）"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for request in requests:
+            service.generate_complete_chart(**request)
+        elapsed = (time.perf_counter() - start) / len(requests)
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+class EventRecorder(InstrumentationHook):
+    """记录事件顺序的钩子"""
+
+    def __init__(self):
+        self.events = []
+
+    def on_stage_start(self, name):
+        self.events.append(("start", name))
+
+    def on_stage_end(self, name, duration, error=None):
+        self.events.append(("end", name, type(error).__name__ if error else None))
+
+
+# 单个命盘依次经过的计时步骤
+CHART_STAGES = [
+    "service.generate_complete_chart",
+    "time_processor.get_solar_data",
+    "time_processor.get_timezone",
+    "chart_builder.build_chart",
+    "chart_analyzer.analyze",
+    "service.prepare_reference_tables",
+    "timeline.calculate_dayun",
+    "service.assemble_final_json"
+]
+
+
+def main():
+    service = BaziService().warmup()
+    failures = []
+    orchestrator = ReasoningOrchestrator()
+    requests = random_requests(500)
+    expected = [dumps(service.generate_complete_chart(**request)) for request in requests]
+
+    # ====================================
+    # 步骤1: 各步骤耗时与计数
+    # ====================================
+    print("=" * 70)
+    print(" " * 22 + "步骤1: 各步骤耗时与计数")
+    print("=" * 70)
+
+    with collecting() as metrics:
+        charts = [service.generate_complete_chart(**request) for request in requests]
+        service.generate_complete_charts(requests[:100])
+        for chart in charts[:50]:
+            service.analyze_specific_year(chart, 2025)
+            orchestrator.get_prompt_for_step("strength", chart)
+    same = [dumps(chart) for chart in charts] == expected
+    print(f"\n开启埋点后结果与未开启一致: {same}")
+    if not same:
+        failures.append("开启埋点后结果")
+
+    report = metrics.snapshot()
+    print(f"\n{'步骤':<36}{'次数':>6}{'平均µs':>9}{'p50µs':>9}{'p95µs':>9}{'p99µs':>9}")
+    for name, stats in report["stages"].items():
+        print(f"{name:<36}{stats['count']:>6}{stats['mean'] * 1e6:>9.1f}{stats['p50'] * 1e6:>9.1f}"
+              f"{stats['p95'] * 1e6:>9.1f}{stats['p99'] * 1e6:>9.1f}")
+    print("\n计数:")
+    for name, value in report["counters"].items():
+        print(f"  {name:<40}{value:>6}")
+
+    # 500 个单盘 + 100 个批量：每个命盘各经过一次取时间 / 排盘 / 分析 / 大运 / 组装；
+    # 批量中的参考表按键缓存，未命中时才重新准备
+    stages = {name: stats["count"] for name, stats in report["stages"].items()}
+    counters = report["counters"]
+    reference_misses = counters.get("batch.reference_cache.miss", 0)
+    expected_stages = {
+        "service.generate_complete_chart": 500,
+        "service.generate_complete_charts": 1,
+        "time_processor.get_solar_data": 600,
+        "time_processor.get_timezone": 600,
+        "chart_builder.build_chart": 600,
+        "chart_analyzer.analyze": 600,
+        "timeline.calculate_dayun": 600,
+        "service.assemble_final_json": 600,
+        "service.prepare_reference_tables": 500 + reference_misses,
+        "service.analyze_specific_year": 50,
+        "timeline.analyze_liunian": 50,
+        "orchestrator.get_prompt_for_step": 50,
+        "orchestrator.prepare_view_model": 50,
+        "orchestrator.render_prompt": 50
+    }
+    pairs = {
+        "batch.timezone_cache": 100,
+        "batch.analysis_cache": 100,
+        "batch.reference_cache": 100,
+        "calendar_table.jie_bounds": 600
+    }
+    counter_names = {"time_processor.timezone_finder.lookups", "lunar_python.calls"}
+    counter_names |= {f"{prefix}.{outcome}" for prefix in [*pairs, "time_processor.jie_cache"]
+                      for outcome in ("hit", "miss")}
+    counters_ok = (set(counters) <= counter_names
+                   and counters.get("time_processor.timezone_finder.lookups") == 600
+                   and all(counters.get(f"{prefix}.hit", 0) + counters.get(f"{prefix}.miss", 0) == total
+                           for prefix, total in pairs.items()))
+    print(f"\n步骤名称与次数符合预期: {stages == expected_stages}，计数名称与合计符合预期: {counters_ok}")
+    if stages != expected_stages:
+        failures.append("步骤次数")
+    if not counters_ok:
+        failures.append("计数")
+
+    # ====================================
+    # 步骤2: 钩子事件
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 26 + "步骤2: 钩子事件")
+    print("=" * 70)
+
+    recorder = EventRecorder()
+    instrumentation.add_hook(recorder)
+    instrumentation.add_hook(recorder)
+    with collecting() as metrics:
+        service.generate_complete_chart(**requests[0])
+        try:
+            orchestrator.get_prompt_for_step("unknown", charts[0])
+        except ValueError:
+            pass
+    instrumentation.remove_hook(recorder)
+
+    depth = 0
+    balanced = True
+    for event in recorder.events:
+        depth += 1 if event[0] == "start" else -1
+        balanced = balanced and depth >= 0
+    print(f"\n重复注册只生效一次、开始 / 结束成对: {balanced and depth == 0}（{len(recorder.events)} 个事件）")
+    if not balanced or depth != 0:
+        failures.append("钩子事件成对")
+    print("单个命盘的步骤顺序:")
+    for event in recorder.events:
+        if event[0] == "start":
+            print(f"  {event[1]}")
+        if event[1] == "service.generate_complete_chart" and event[0] == "end":
+            break
+    chart_starts = [event[1] for event in recorder.events if event[0] == "start"][:len(CHART_STAGES)]
+    if chart_starts != CHART_STAGES:
+        failures.append("步骤顺序")
+    errors = metrics.snapshot()["errors"]
+    print(f"出错步骤: {errors}，最后事件 {recorder.events[-1]}")
+    if errors != {"orchestrator.get_prompt_for_step": 1} \
+            or recorder.events[-1] != ("end", "orchestrator.get_prompt_for_step", "ValueError"):
+        failures.append("出错步骤")
+    print(f"注销后无钩子: {not instrumentation.enabled()}")
+    if instrumentation.enabled():
+        failures.append("注销钩子")
+
+    # ====================================
+    # 步骤3: 开销
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 28 + "步骤3: 开销")
+    print("=" * 70)
+
+    def plain():
+        return None
+
+    wrapped = timed("test.noop")(plain)
+    calls = 1_000_000
+    plain_ns = min(timeit.repeat(plain, number=calls, repeat=5)) / calls * 1e9
+    wrapped_ns = min(timeit.repeat(wrapped, number=calls, repeat=5)) / calls * 1e9
+    counter_ns = min(timeit.repeat(lambda: instrumentation.count("test"), number=calls, repeat=5)) / calls * 1e9 \
+        - plain_ns
+
+    with collecting() as metrics:
+        service.generate_complete_chart(**requests[0])
+    report = metrics.snapshot()
+    stage_calls = sum(stats["count"] for stats in report["stages"].values())
+    counter_calls = sum(report["counters"].values())
+
+    disabled = per_chart_time(service, requests)
+    estimate = stage_calls * (wrapped_ns - plain_ns) + counter_calls * counter_ns
+    with collecting():
+        enabled = per_chart_time(service, requests)
+
+    print(f"\n关闭时每个计时埋点额外 {wrapped_ns - plain_ns:.0f} ns，每个计数埋点额外 {counter_ns:.0f} ns")
+    print(f"每个命盘 {stage_calls} 个计时埋点、{counter_calls} 个计数埋点")
+    print(f"关闭埋点: {disabled * 1e6:.1f} µs/盘，其中埋点约 {estimate / 1000:.2f} µs"
+          f"（{estimate / (disabled * 1e9) * 100:.2f}%）")
+    print(f"开启 MetricsCollector: {enabled * 1e6:.1f} µs/盘（+{(enabled / disabled - 1) * 100:.1f}%）")
+    if stage_calls != len(CHART_STAGES):
+        failures.append("单盘计时埋点数")
+
+    print("\n" + "=" * 70)
+    print(" " * 24 + ("✓ 所有测试完成！" if not failures else f"✗ 失败: {failures}"))
+    print("=" * 70)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+# test_iter_charts.py
+"""
+iter_charts 测试：按序 / 按完成顺序的结果与本进程逐个排盘逐字节一致，出错项以异常对象返回；
+背压：已从输入读取但尚未交给消费者的项不超过 workers * 2 块，消费者停下时不再读取输入；
+无限输入提前停止后进程池可继续复用
+"""
+
+import itertools
+import random
+import sys
+import time
+
+from bazi_batch import create_pool, iter_charts
+from bazi_service import BaziService
+from chart_serializer import dumps
+from test_fork_launcher import random_requests
+
+WORKERS = 2
+CHUNK_SIZE = 8
+
+
+class CountingInput:
+    """包装输入迭代器，记录已被读取的项数"""
+
+    def __init__(self, items):
+        self.items = iter(items)
+        self.pulled = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        item = next(self.items)
+        self.pulled += 1
+        return item
+
+
+def main():
+    service = BaziService()
+    failures = []
+    requests = random_requests(400)
+    # 混入出错的项：日期不合法、缺字段
+    requests[37] = dict(requests[37], birth_date="2001-02-30")
+    requests[205] = {key: value for key, value in requests[205].items() if key != "gender"}
+    expected = {}
+    for index, request in enumerate(requests):
+        try:
+            expected[index] = dumps(service.generate_complete_chart(**request))
+        except (ValueError, KeyError, TypeError):
+            expected[index] = None
+
+    with create_pool(WORKERS) as pool:
+        # ====================================
+        # 步骤1: 按序 / 按完成顺序 vs 逐个排盘
+        # ====================================
+        print("=" * 70)
+        print(" " * 16 + "步骤1: 按序 / 按完成顺序 vs 逐个排盘")
+        print("=" * 70)
+
+        for ordered in (True, False):
+            started = time.perf_counter()
+            results = list(iter_charts(requests, workers=WORKERS, chunk_size=CHUNK_SIZE, ordered=ordered,
+                                       executor=pool))
+            elapsed = time.perf_counter() - started
+            indices = [index for index, _ in results]
+            got = {index: None if isinstance(result, Exception) else dumps(result)
+                   for index, result in results}
+            order_ok = indices == list(range(len(requests))) if ordered else sorted(indices) == list(range(len(requests)))
+            same = got == expected
+            print(f"\nordered={ordered}: {len(results)} 项 {elapsed:.2f} 秒，顺序 {'✓' if order_ok else '✗'}，"
+                  f"与逐个排盘一致（含 2 个异常项）{'✓' if same else '✗'}")
+            if not order_ok or not same:
+                failures.append(f"ordered={ordered}")
+
+        # ====================================
+        # 步骤2: 背压
+        # ====================================
+        print("\n" + "=" * 70)
+        print(" " * 28 + "步骤2: 背压")
+        print("=" * 70)
+
+        bound = WORKERS * 2 * CHUNK_SIZE
+        for ordered in (True, False):
+            source = CountingInput(requests)
+            consumed = 0
+            max_ahead = 0
+            paused_pulled = None
+            for _ in iter_charts(source, workers=WORKERS, chunk_size=CHUNK_SIZE, ordered=ordered, executor=pool):
+                consumed += 1
+                max_ahead = max(max_ahead, source.pulled - consumed)
+                if consumed == 50:
+                    # 消费者停下：生成器挂起期间不应再读取输入
+                    before = source.pulled
+                    time.sleep(0.5)
+                    paused_pulled = source.pulled - before
+                elif consumed % 20 == 0:
+                    time.sleep(0.02)
+            ok = max_ahead <= bound and paused_pulled == 0 and consumed == len(requests)
+            print(f"\nordered={ordered}: 读取领先消费最多 {max_ahead} 项（上限 {bound}），"
+                  f"消费者停顿 0.5 秒期间读取 {paused_pulled} 项 {'✓' if ok else '✗'}")
+            if not ok:
+                failures.append(f"背压 ordered={ordered}")
+
+        # ====================================
+        # 步骤3: 无限输入与提前停止
+        # ====================================
+        print("\n" + "=" * 70)
+        print(" " * 20 + "步骤3: 无限输入与提前停止")
+        print("=" * 70)
+
+        rng = random.Random(39)
+        endless = CountingInput(requests[rng.randrange(len(requests))] for _ in itertools.count())
+        charts = iter_charts(endless, workers=WORKERS, chunk_size=CHUNK_SIZE, executor=pool)
+        taken = list(itertools.islice(charts, 300))
+        charts.close()
+        stopped_ok = len(taken) == 300 and endless.pulled <= 300 + bound
+        print(f"\n无限输入取前 300 项后关闭：共读取 {endless.pulled} 项 {'✓' if stopped_ok else '✗'}")
+
+        started = time.perf_counter()
+        reused = list(iter_charts(requests[:40], workers=WORKERS, chunk_size=CHUNK_SIZE, executor=pool))
+        reuse_ok = [dumps(chart) for _, chart in reused[:37]] == [expected[index] for index in range(37)]
+        print(f"关闭后复用进程池：40 项 {time.perf_counter() - started:.2f} 秒，结果一致 {'✓' if reuse_ok else '✗'}")
+        if not stopped_ok or not reuse_ok:
+            failures.append("提前停止")
+
+    print("\n" + "=" * 70)
+    print(" " * 24 + ("✓ 所有测试完成！" if not failures else f"✗ 失败: {failures}"))
+    print("=" * 70)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
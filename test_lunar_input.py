@@ -0,0 +1,111 @@
+# test_lunar_input.py
+"""
+农历输入测试：预计算农历月表与 lunar_python 交叉验证
+"""
+
+import random
+import sys
+
+from lunar_python import Lunar, LunarYear
+
+from bazi_service import BaziService
+from calendar_table import get_lunar_month_table
+
+
+def main():
+    table = get_lunar_month_table()
+    service = BaziService()
+    failures = []
+
+    # ====================================
+    # 步骤1: 随机农历日期（含闰月、不存在的日期）逐一对照 lunar_python
+    # ====================================
+    print("=" * 70)
+    print(" " * 18 + "步骤1: 农历月表 vs lunar_python")
+    print("=" * 70)
+
+    random.seed(2024)
+    cases = []
+    for _ in range(3000):
+        year = random.randrange(table.START_YEAR, table.end_year + 1)
+        month = random.randrange(1, 13)
+        is_leap = LunarYear.fromYear(year).getLeapMonth() == month and random.random() < 0.7
+        day = random.randrange(1, 31)
+        try:
+            expected = Lunar.fromYmd(year, -month if is_leap else month, day).getSolar().toYmd()
+        except Exception:
+            expected = None
+        cases.append((f"{year}-{month:02d}-{day:02d}", is_leap, expected))
+
+    try:
+        converted = service.convert_lunar_dates(
+            [item[0] for item in cases],
+            [item[1] for item in cases]
+        )
+    except Exception as exc:
+        print(f"\nconvert_lunar_dates 抛出异常 ✗ {type(exc).__name__}: {exc}")
+        converted = [None] * len(cases)
+        failures.append("convert_lunar_dates 异常")
+    mismatches = [
+        (lunar_date, is_leap, expected, actual)
+        for (lunar_date, is_leap, expected), actual in zip(cases, converted)
+        if expected != actual
+    ]
+    print(f"\n样本数: {len(cases)}（闰月 {sum(item[1] for item in cases)}，不存在的日期 {sum(item[2] is None for item in cases)}）")
+    print(f"不一致: {len(mismatches)}")
+    for item in mismatches[:10]:
+        print(f"  {item}")
+    if mismatches:
+        failures.append("convert_lunar_dates")
+
+    # 单个日期：to_solar 对存在的日期返回 date，对不存在的日期抛出 ValueError，其他异常均算失败
+    to_solar_errors = []
+    for lunar_date, is_leap, expected in cases[:1000]:
+        year, month, day = map(int, lunar_date.split("-"))
+        try:
+            actual = table.to_solar(year, month, day, is_leap).isoformat()
+        except ValueError:
+            actual = None
+        except Exception as exc:
+            actual = f"{type(exc).__name__}: {exc}"
+        if actual != expected:
+            to_solar_errors.append((lunar_date, is_leap, expected, actual))
+    print(f"to_solar 逐个对照 1000 个: 不一致 {len(to_solar_errors)}")
+    for item in to_solar_errors[:10]:
+        print(f"  {item}")
+    if to_solar_errors:
+        failures.append("to_solar")
+
+    # ====================================
+    # 步骤2: 农历输入排盘与公历输入一致
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 18 + "步骤2: 农历输入 vs 公历输入")
+    print("=" * 70)
+
+    examples = [
+        ("1984-10-13", False, "03:00"),
+        ("2023-02-15", True, "12:30"),   # 闰二月
+        ("2020-04-01", True, "23:20")    # 闰四月，晚子时
+    ]
+    for lunar_date, is_leap, birth_time in examples:
+        solar_date = service.convert_lunar_dates([lunar_date], [is_leap])[0]
+        from_lunar = service.generate_complete_chart(
+            lunar_date, birth_time, 116.4, 39.9, "男", lunar=True, is_leap_month=is_leap
+        )
+        from_solar = service.generate_complete_chart(solar_date, birth_time, 116.4, 39.9, "男")
+        same = from_lunar["pillars"] == from_solar["pillars"] and from_lunar["basic_info"] == from_solar["basic_info"]
+        leap_text = "（闰月）" if is_leap else ""
+        pillars = " ".join(from_lunar["pillars"][key]["ganzhi"] for key in ["year", "month", "day", "time"])
+        print(f"\n农历 {lunar_date}{leap_text} {birth_time} -> 公历 {solar_date}: {pillars} {'✓' if same else '✗'}")
+        if not same:
+            failures.append(f"农历 {lunar_date}")
+
+    print("\n" + "=" * 70)
+    print(" " * 24 + ("✓ 所有测试完成！" if not failures else f"✗ 失败: {failures}"))
+    print("=" * 70)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
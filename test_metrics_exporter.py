@@ -0,0 +1,302 @@
+# test_metrics_exporter.py
+"""
+Prometheus 导出测试：检查文本格式（HELP / TYPE、直方图累计分桶与 _count 一致）、
+各模块指标名、批量任务写出的指标文件，以及 HTTP 服务 /metrics 汇总工作进程数据
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+
+from bazi_batch import BatchRunner
+from bazi_service import BaziService
+from http_service import BaziHTTPService
+from instrumentation import collecting
+from metrics_exporter import MetricsExporter
+from reasoning_orchestrator import ReasoningOrchestrator
+from test_http_load import _request
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*",?)*\})? (\S+)$')
+LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_exposition(text):
+    """
+    解析并校验文本格式
+
+    Returns:
+        ({指标族: 类型}, [(样本名, 标签字典, 值)], [问题描述])
+    """
+    types = {}
+    samples = []
+    problems = []
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, metric_type = line.split(" ", 3)
+            if name in types:
+                problems.append(f"重复的 TYPE: {name}")
+            types[name] = metric_type
+            continue
+        if line.startswith("#") or not line:
+            continue
+        match = SAMPLE.match(line)
+        if match is None:
+            problems.append(f"无法解析: {line}")
+            continue
+        name, labels, value = match.group(1), dict(LABEL.findall(match.group(2) or "")), float(match.group(3))
+        family = re.sub(r"_(bucket|sum|count)$", "", name) if name not in types else name
+        if family not in types:
+            problems.append(f"样本没有 TYPE: {name}")
+        samples.append((name, labels, value))
+
+    histograms = {}
+    for name, labels, value in samples:
+        if name.endswith("_bucket"):
+            key = (name[:-7], tuple(sorted((k, v) for k, v in labels.items() if k != "le")))
+            histograms.setdefault(key, []).append((float(labels["le"]), value))
+    counts = {
+        (name[:-6], tuple(sorted(labels.items()))): value
+        for name, labels, value in samples if name.endswith("_count")
+    }
+    for key, buckets in histograms.items():
+        cumulative = [value for _, value in buckets]
+        if cumulative != sorted(cumulative) or buckets[-1][0] != float("inf"):
+            problems.append(f"分桶不是累计的: {key}")
+        if counts.get(key) != buckets[-1][1]:
+            problems.append(f"+Inf 分桶与 _count 不一致: {key}")
+    return types, samples, problems
+
+
+def sample_value(samples, name, **labels):
+    return sum(value for sample, sample_labels, value in samples
+               if sample == name and all(sample_labels.get(k) == v for k, v in labels.items()))
+
+
+def check_samples(samples, expected, label, failures):
+    """
+    逐条核对样本值（同名同标签的样本求和，即各工作进程合并后的值）；不符时打印并记入 failures
+
+    Args:
+        expected: [(样本名, 标签字典, 期望值)]
+    """
+    wrong = [(name, labels, want, sample_value(samples, name, **labels))
+             for name, labels, want in expected if sample_value(samples, name, **labels) != want]
+    for name, labels, want, got in wrong:
+        print(f"  ✗ {name}{labels} = {got:g}，应为 {want:g}")
+    if wrong:
+        failures.append(label)
+
+
+def stage_counts(prefix, counts):
+    """{步骤: 次数} -> 直方图 _count 样本的期望值"""
+    return [(f"bazi_{prefix}_duration_seconds_count", {"stage": stage}, count) for stage, count in counts.items()]
+
+
+def random_records(count, seed=9):
+    rng = random.Random(seed)
+    return [
+        {
+            "id": index,
+            "birth_date": f"{rng.randint(1580, 2050)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "birth_time": f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+            "longitude": round(rng.uniform(-180, 180), 3),
+            "latitude": round(rng.uniform(-60, 60), 3),
+            "gender": rng.choice(["男", "女"])
+        }
+        for index in range(count)
+    ]
+
+
+def print_families(types, prefix=""):
+    for name, metric_type in types.items():
+        if name.startswith(prefix):
+            print(f"  {name:<52}{metric_type}")
+
+
+async def http_round(records):
+    service = BaziHTTPService(port=0, workers=2, stage_metrics=True)
+    await service.start()
+    try:
+        host, port = service.host, service.port
+        await asyncio.gather(*[_request(host, port, "POST", "/chart", record) for record in records])
+        await _request(host, port, "POST", "/years", dict(records[0], start_year=2020, end_year=2030))
+        await _request(host, port, "POST", "/prompt", dict(records[0], step="strength"))
+        await _request(host, port, "POST", "/prompt", dict(records[0], step="unknown"))
+        await _request(host, port, "POST", "/chart", {"birth_date": "2000-01-01"})
+        await _request(host, port, "GET", "/nowhere")
+        # 工作进程每秒写一次汇总数据
+        await asyncio.sleep(1.5)
+        status, body, connection = await _request(host, port, "GET", "/metrics")
+        connection[1].close()
+        return status, body.decode("utf-8")
+    finally:
+        await service.stop()
+
+
+def main():
+    failures = []
+
+    # ====================================
+    # 步骤1: 本进程埋点导出
+    # ====================================
+    print("=" * 70)
+    print(" " * 22 + "步骤1: 本进程埋点导出")
+    print("=" * 70)
+
+    service = BaziService().warmup()
+    orchestrator = ReasoningOrchestrator()
+    records = random_records(300)
+    with collecting() as metrics:
+        charts = [service.generate_complete_chart(**{k: v for k, v in r.items() if k != "id"}) for r in records]
+        for chart in charts[:20]:
+            service.analyze_specific_year(chart, 2025)
+            orchestrator.get_prompt_for_step("dayun", chart)
+        try:
+            service.generate_complete_chart("2000-13-01", "12:00", 116.4, 39.9, "男")
+        except ValueError:
+            pass
+
+    text = MetricsExporter(collector=metrics).render()
+    types, samples, problems = parse_exposition(text)
+    print(f"\n{len(types)} 个指标族，{len(samples)} 个样本，格式问题 {len(problems)}")
+    print_families(types)
+    print(f"chart_builder.build_chart 次数: "
+          f"{sample_value(samples, 'bazi_chart_builder_duration_seconds_count', stage='build_chart'):.0f}")
+    errors = [(name, labels, value) for name, labels, value in samples if name.endswith('errors_total')]
+    print(f"出错: {[(labels, value) for _, labels, value in errors]}")
+
+    if problems:
+        failures.append("本进程格式")
+    families = {
+        "bazi_chart_analyzer_duration_seconds", "bazi_chart_builder_duration_seconds",
+        "bazi_orchestrator_duration_seconds", "bazi_service_duration_seconds",
+        "bazi_time_processor_duration_seconds", "bazi_timeline_duration_seconds",
+        "bazi_service_errors_total", "bazi_time_processor_errors_total", "bazi_calendar_table_jie_bounds_total",
+        "bazi_lunar_python_calls_total", "bazi_time_processor_jie_cache_total",
+        "bazi_time_processor_timezone_finder_lookups_total", "bazi_cache_hit_ratio"
+    }
+    if set(types) != families:
+        print(f"  ✗ 指标族不符: 多出 {sorted(set(types) - families)}，缺少 {sorted(families - set(types))}")
+        failures.append("本进程指标族")
+    if errors != [("bazi_service_errors_total", {"stage": "generate_complete_chart", "type": "ValueError"}, 1),
+                  ("bazi_time_processor_errors_total", {"stage": "get_solar_data", "type": "ValueError"}, 1)]:
+        failures.append("本进程出错计数")
+    check_samples(samples, [
+        *stage_counts("service", {"generate_complete_chart": 301, "assemble_final_json": 300,
+                                  "prepare_reference_tables": 300, "analyze_specific_year": 20}),
+        *stage_counts("time_processor", {"get_solar_data": 301, "get_timezone": 300}),
+        *stage_counts("chart_builder", {"build_chart": 300}),
+        *stage_counts("chart_analyzer", {"analyze": 300}),
+        *stage_counts("timeline", {"calculate_dayun": 300, "analyze_liunian": 20}),
+        *stage_counts("orchestrator", {"get_prompt_for_step": 20, "prepare_view_model": 20, "render_prompt": 20}),
+        ("bazi_calendar_table_jie_bounds_total", {}, 300),
+        ("bazi_time_processor_timezone_finder_lookups_total", {}, 300)
+    ], "本进程样本值", failures)
+
+    # ====================================
+    # 步骤2: 批量任务写出指标文件
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 20 + "步骤2: 批量任务写出指标文件")
+    print("=" * 70)
+
+    workdir = tempfile.mkdtemp(prefix="bazi_metrics_test_")
+    input_path = os.path.join(workdir, "births.jsonl")
+    metrics_path = os.path.join(workdir, "metrics.prom")
+    with open(input_path, "w", encoding="utf-8") as f:
+        for record in records + [{"id": "bad", "birth_date": "2000-01-01"}]:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    stats = BatchRunner(workers=2, chunk_size=32, metrics_path=metrics_path).run(
+        input_path, os.path.join(workdir, "charts.jsonl"))
+    with open(metrics_path, encoding="utf-8") as f:
+        types, samples, problems = parse_exposition(f.read())
+    built = sample_value(samples, "bazi_chart_builder_duration_seconds_count", stage="build_chart")
+    print(f"\n成功 {stats['succeeded']}，失败 {stats['failed']}；格式问题 {len(problems)}")
+    print(f"各工作进程合并后 build_chart 次数 {built:.0f}（应等于成功数: {built == stats['succeeded']}）")
+    print(f"批大小分布 _count {sample_value(samples, 'bazi_batch_chunk_size_count'):.0f}，"
+          f"日历表命中率 {sample_value(samples, 'bazi_cache_hit_ratio', cache='calendar_table.jie_bounds'):.3f}")
+    print_families(types, "bazi_batch")
+    shutil.rmtree(workdir)
+
+    if problems:
+        failures.append("指标文件格式")
+    # 301 条记录按 32 条一块分成 10 块；计数为两个工作进程之和
+    check_samples(samples, [
+        ("bazi_batch_processed_records", {}, 301),
+        ("bazi_batch_succeeded_records", {}, 300),
+        ("bazi_batch_failed_records", {}, 1),
+        ("bazi_batch_skipped_records", {}, 0),
+        ("bazi_batch_workers", {}, 2),
+        ("bazi_batch_chunk_size_count", {}, 10),
+        ("bazi_batch_chunk_size_sum", {}, 301),
+        *stage_counts("service", {"generate_complete_charts": 10, "assemble_final_json": 300,
+                                  "prepare_reference_tables": sample_value(
+                                      samples, "bazi_batch_reference_cache_total", result="miss")}),
+        *stage_counts("time_processor", {"get_solar_data": 300, "get_timezone": 300}),
+        *stage_counts("chart_builder", {"build_chart": 300}),
+        *stage_counts("chart_analyzer", {"analyze": 300}),
+        *stage_counts("timeline", {"calculate_dayun": 300}),
+        ("bazi_batch_analysis_cache_total", {}, 300),
+        ("bazi_batch_reference_cache_total", {}, 300),
+        ("bazi_batch_timezone_cache_total", {}, 300),
+        ("bazi_calendar_table_jie_bounds_total", {}, 300),
+        ("bazi_time_processor_timezone_finder_lookups_total", {}, 300)
+    ], "指标文件样本值", failures)
+
+    # ====================================
+    # 步骤3: HTTP 服务 /metrics
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 22 + "步骤3: HTTP 服务 /metrics")
+    print("=" * 70)
+
+    status, text = asyncio.run(http_round(records[:60]))
+    types, samples, problems = parse_exposition(text)
+    print(f"\n状态码 {status}，{len(types)} 个指标族，格式问题 {len(problems)}")
+    for name, labels, value in samples:
+        if name in ("bazi_http_requests_total", "bazi_orchestrator_errors_total") or (
+                name.startswith("bazi_http_") and "_bucket" not in name and "duration" not in name):
+            print(f"  {name}{labels} {value:g}")
+    print(f"工作进程 build_chart 次数 "
+          f"{sample_value(samples, 'bazi_chart_builder_duration_seconds_count', stage='build_chart'):.0f}，"
+          f"timeline.analyze_liunian {sample_value(samples, 'bazi_timeline_duration_seconds_count', stage='analyze_liunian'):.0f}")
+
+    if status != 200 or problems:
+        failures.append("/metrics 格式")
+    requests_total = sorted((tuple(sorted(labels.items())), value) for name, labels, value in samples
+                            if name == "bazi_http_requests_total")
+    expected_requests = sorted([
+        ((("endpoint", "/chart"), ("status", "200")), 60),
+        ((("endpoint", "/chart"), ("status", "400")), 1),
+        ((("endpoint", "/years"), ("status", "200")), 1),
+        ((("endpoint", "/prompt"), ("status", "200")), 1),
+        ((("endpoint", "/prompt"), ("status", "400")), 1),
+        ((("endpoint", "other"), ("status", "404")), 1)
+    ])
+    if requests_total != expected_requests:
+        print(f"  ✗ bazi_http_requests_total: {requests_total}")
+        failures.append("/metrics 请求计数")
+    # 60 个 /chart + /years + 两个 /prompt 各排一次盘；计数为两个工作进程之和
+    check_samples(samples, [
+        *stage_counts("chart_builder", {"build_chart": 63}),
+        *stage_counts("timeline", {"analyze_liunian": 11}),
+        ("bazi_orchestrator_errors_total", {"stage": "get_prompt_for_step", "type": "ValueError"}, 1),
+        ("bazi_batch_analysis_cache_total", {}, 60),
+        ("bazi_time_processor_timezone_finder_lookups_total", {}, 63),
+        ("bazi_http_pending_requests", {}, 0),
+        ("bazi_http_batches_in_flight", {}, 0)
+    ], "/metrics 样本值", failures)
+
+    print("\n" + "=" * 70)
+    print(" " * 24 + ("✓ 所有测试完成！" if not failures else f"✗ 失败: {failures}"))
+    print("=" * 70)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
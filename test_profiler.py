@@ -0,0 +1,229 @@
+# test_profiler.py
+"""
+单次请求剖析测试：对慢输入（极端纬度、lunar_python 范围边缘的日期）开启剖析，
+检查结果与未剖析一致、耗时最多的函数与分配位置、出错记录、pstats 文件，以及 HTTP 的 X-Profile 请求头
+"""
+
+import asyncio
+import json
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+
+from bazi_service import BaziService
+from chart_serializer import dumps
+from http_service import BaziHTTPService
+from request_profiler import ProfileStore, load_stats, profile_call, summarize, write_pstats
+
+SLOW_INPUTS = {
+    "极端纬度": ("1990-06-21", "12:00", 25.0, 78.2, "男"),
+    "范围边缘": ("1601-02-03", "23:30", 116.4, 39.9, "女")
+}
+
+
+def print_summary(summary, limit=8):
+    print(f"  请求 {summary['request_id']}  {summary['function']}  {summary['wall_ms']:.1f} ms"
+          f"  函数调用 {summary['total_calls']} 次")
+    print(f"  {'累计 ms':>9} {'自身 ms':>9} {'调用':>7}  函数")
+    for item in summary["functions"][:limit]:
+        print(f"  {item['cumtime_ms']:9.2f} {item['tottime_ms']:9.2f} {item['calls']:7d}  {item['function']}")
+    print(f"  留存分配 {summary['allocated_kb']:.1f} KB，峰值 {summary['peak_kb']:.1f} KB；前 3 个分配位置:")
+    for item in summary["allocations"][:3]:
+        print(f"    {item['size_kb']:8.1f} KB {item['count']:6d} 个  {os.path.basename(item['site'])}")
+
+
+async def _profiled_request(host, port, path, payload, profile):
+    """带 X-Profile 请求头发送请求，返回 (状态码, 响应体, X-Profile-Id)"""
+    reader, writer = await asyncio.open_connection(host, port)
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    writer.write(
+        f"POST {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\nX-Profile: {profile}\r\n"
+        f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    headers = {line.split(":", 1)[0].lower(): line.split(":", 1)[1].strip() for line in lines[1:] if ":" in line}
+    response = await reader.readexactly(int(headers["content-length"]))
+    writer.close()
+    return int(lines[0].split(" ")[1]), response, headers.get("x-profile-id")
+
+
+async def http_round(payload):
+    from test_http_load import _request
+
+    service = BaziHTTPService(port=0, workers=1)
+    await service.start()
+    try:
+        host, port = service.host, service.port
+        plain_status, plain_body, connection = await _request(host, port, "POST", "/chart", payload)
+        connection[1].close()
+        status, body, profile_id = await _profiled_request(host, port, "/chart", payload, "slow-latitude")
+        _, _, generated_id = await _profiled_request(host, port, "/chart", payload, "1")
+        _, listing, connection = await _request(host, port, "GET", "/profiles")
+        _, summary, connection = await _request(host, port, "GET", f"/profiles/{profile_id}", connection=connection)
+        missing_status, _, connection = await _request(host, port, "GET", "/profiles/none", connection=connection)
+        connection[1].close()
+        return {
+            "same_body": (plain_status, plain_body) == (status, body),
+            "profile_id": profile_id,
+            "generated_id": generated_id,
+            "listing": json.loads(listing),
+            "summary": json.loads(summary),
+            "missing_status": missing_status
+        }
+    finally:
+        await service.stop()
+
+
+def main():
+    service = BaziService()
+    failures = []
+    service.generate_complete_chart("2000-01-01", "12:00", 116.4, 39.9, "男")
+
+    # ====================================
+    # 步骤1: 剖析慢输入
+    # ====================================
+    print("=" * 70)
+    print(" " * 24 + "步骤1: 剖析慢输入")
+    print("=" * 70)
+
+    for label, args in SLOW_INPUTS.items():
+        expected = dumps(service.generate_complete_chart(*args))
+        result, request_id = service.profile_request("generate_complete_chart", *args)
+        record = service.request_profiles.get(request_id)
+        print(f"\n{label} {args[:4]}: 结果与未剖析一致: {dumps(result) == expected}")
+        if dumps(result) != expected or record is None:
+            failures.append(label)
+        print_summary(summarize(record))
+
+    print("\n按函数自身耗时排序（范围边缘）:")
+    record = service.request_profiles.list()[-1]
+    summary = summarize(service.request_profiles.get(record["request_id"]), limit=5, sort="tottime")
+    for item in summary["functions"]:
+        print(f"  {item['tottime_ms']:9.2f} ms  {item['function']}")
+
+    # ====================================
+    # 步骤2: 出错记录、保存上限、pstats 文件
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 14 + "步骤2: 出错记录、保存上限、pstats 文件")
+    print("=" * 70)
+
+    try:
+        service.profile_request("generate_complete_chart", "2000-13-01", "12:00", 116.4, 39.9, "男",
+                                request_id="bad-date")
+        failures.append("出错调用未抛出")
+    except ValueError as exc:
+        print(f"\n调用照常抛出: {type(exc).__name__}")
+    error_record = service.request_profiles.get("bad-date")
+    print(f"出错记录: {error_record and error_record['error']}")
+    if not error_record or not error_record["error"]:
+        failures.append("出错记录")
+
+    try:
+        service.profile_request("_lazy_lock")
+        failures.append("私有成员")
+    except ValueError as exc:
+        print(f"私有成员: {exc}")
+
+    store = ProfileStore(max_entries=3)
+    for index in range(5):
+        profile_call(sum, ([index, 1],), request_id=f"r{index}", store=store)
+    kept = [item["request_id"] for item in store.list()]
+    print(f"保存上限 3: 保留 {kept}")
+    if kept != ["r2", "r3", "r4"]:
+        failures.append("保存上限")
+
+    # 两个线程同时剖析：逐个执行，先开始的调用的峰值不被后一个的 reset_peak() 清零
+    def burst(megabytes, hold):
+        data = bytearray(megabytes * 1024 * 1024)
+        del data
+        time.sleep(hold)
+
+    records = {}
+    threads = [threading.Thread(target=lambda: records.update(big=profile_call(burst, (8, 0.3))[1]))]
+    threads.append(threading.Thread(target=lambda: records.update(small=profile_call(burst, (1, 0))[1])))
+    threads[0].start()
+    time.sleep(0.1)
+    threads[1].start()
+    for thread in threads:
+        thread.join()
+    big, small = records["big"], records["small"]
+    serialized = small["started"] >= big["started"] + big["wall_ms"] / 1000
+    print(f"并发剖析: 峰值 {big['peak_kb']:.0f} KB / {small['peak_kb']:.0f} KB（分配 8MB / 1MB），"
+          f"逐个执行 {serialized}")
+    # 后一个调用的 reset_peak() 若清掉了前一个的峰值，大峰值会远小于 8MB；小调用也不应计入大调用的分配
+    if big["peak_kb"] < 8000 or small["peak_kb"] >= 8000 or not serialized:
+        failures.append("并发剖析")
+
+    path = os.path.join(tempfile.mkdtemp(), "slow.pstats")
+    write_pstats(service.request_profiles.get(request_id), path)
+    stats = pstats.Stats(path)
+    loaded_same = len(load_stats(service.request_profiles.get(request_id)).stats) == len(stats.stats)
+    print(f"pstats 文件: {os.path.getsize(path)} 字节，{len(stats.stats)} 个函数，"
+          f"总耗时 {stats.total_tt * 1000:.1f} ms（与 load_stats 一致: {loaded_same}）")
+    if not stats.stats or not loaded_same:
+        failures.append("pstats 文件")
+
+    # ====================================
+    # 步骤3: 未剖析的调用
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 22 + "步骤3: 未剖析的调用")
+    print("=" * 70)
+
+    args = SLOW_INPUTS["极端纬度"]
+    rounds = 300
+    instances = {"从未剖析": BaziService(), "剖析过的实例": service}
+    timings = {label: [] for label in instances}
+    for instance in instances.values():
+        instance.generate_complete_chart(*args)
+    # 两个实例交替测 5 轮，各取最快一轮
+    for _ in range(5):
+        for label, instance in instances.items():
+            start = time.perf_counter()
+            for _ in range(rounds):
+                instance.generate_complete_chart(*args)
+            timings[label].append((time.perf_counter() - start) / rounds * 1000)
+    best = {label: min(values) for label, values in timings.items()}
+    print()
+    for label, value in best.items():
+        print(f"{label}: {value:.3f} ms/盘")
+    print(f"差异: {(best['剖析过的实例'] / best['从未剖析'] - 1) * 100:+.1f}%")
+
+    # ====================================
+    # 步骤4: HTTP 服务 X-Profile 请求头
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 16 + "步骤4: HTTP 服务 X-Profile 请求头")
+    print("=" * 70)
+
+    birth_date, birth_time, longitude, latitude, gender = SLOW_INPUTS["极端纬度"]
+    outcome = asyncio.run(http_round({
+        "birth_date": birth_date, "birth_time": birth_time,
+        "longitude": longitude, "latitude": latitude, "gender": gender
+    }))
+    print(f"\n响应与未剖析一致: {outcome['same_body']}")
+    print(f"X-Profile-Id: {outcome['profile_id']}，值为 1 时生成: {outcome['generated_id']}")
+    print(f"GET /profiles: {[item['request_id'] for item in outcome['listing']]}")
+    print(f"GET /profiles/none: {outcome['missing_status']}")
+    print(f"GET /profiles/{outcome['profile_id']}:")
+    print_summary(outcome["summary"], limit=5)
+    listed = [item["request_id"] for item in outcome["listing"]]
+    if not (outcome["same_body"] and outcome["profile_id"] == "slow-latitude" and outcome["generated_id"]
+            and {outcome["profile_id"], outcome["generated_id"]} <= set(listed)
+            and outcome["summary"]["request_id"] == outcome["profile_id"] and outcome["missing_status"] == 404):
+        failures.append("X-Profile")
+
+    print("\n" + "=" * 70)
+    print(" " * 24 + ("✓ 所有测试完成！" if not failures else f"✗ 失败: {failures}"))
+    print("=" * 70)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
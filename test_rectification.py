@@ -0,0 +1,126 @@
+# test_rectification.py
+"""
+出生时间校正测试：窗口内每一分钟单独调用 generate_complete_chart，四柱、司令、大运顺逆与子时标记
+必须与其所在分段相同；每段的命盘与用该段首分钟排盘逐字节一致，changes 与前后两段的差异一致
+"""
+
+import random
+import sys
+from datetime import datetime, timedelta
+
+from bazi_service import BaziService
+from chart_serializer import dumps
+from test_boundary_analyzer import state_of
+
+WINDOWS = {
+    "立春（年柱、月柱、大运顺逆）": ("1984-02-04 20:00", "1984-02-05 03:00", 116.4, 39.9, "女"),
+    "晚子时 / 早子时": ("1984-11-05 22:00", "1984-11-06 02:00", 98.588, 24.43, "男"),
+    "元旦（命理年份依赖公历年份）": ("1999-12-31 21:00", "2000-01-01 03:00", 116.4, 39.9, "男"),
+    "东端经度": ("1990-01-15 22:00", "1990-01-16 01:30", 134.2, 47.7, "女")
+}
+
+
+def flatten_state(state):
+    """state_of 的结果展开为与 BoundaryAnalyzer.state_at 相同的字段"""
+    flat = dict(state["pillars"])
+    flat.update({key: state[key] for key in ["siling", "dayun_direction", "special_time_marker"]})
+    return flat
+
+
+def check_window(service, start_datetime, end_datetime, longitude, latitude, gender):
+    """逐分钟对照一个窗口，返回 (结果, 问题列表)"""
+    result = service.rectify_birth_time(start_datetime, end_datetime, longitude, latitude, gender)
+    segments = result["charts"]
+    problems = []
+    if segments[0]["start"] != start_datetime or segments[-1]["end"] != end_datetime:
+        problems.append("分段未覆盖整个窗口")
+
+    previous_state = None
+    for segment in segments:
+        start = datetime.strptime(segment["start"], "%Y-%m-%d %H:%M")
+        end = datetime.strptime(segment["end"], "%Y-%m-%d %H:%M")
+        first_chart = service.generate_complete_chart(start.strftime("%Y-%m-%d"), start.strftime("%H:%M"),
+                                                      longitude, latitude, gender)
+        if dumps(segment["chart"]) != dumps(first_chart):
+            problems.append(f"{segment['start']} 分段命盘与单独排盘不一致")
+        expected_state = state_of(segment["chart"])
+
+        if previous_state is not None:
+            flat_previous, flat_current = flatten_state(previous_state), flatten_state(expected_state)
+            expected_changes = [{"field": key, "from": flat_previous[key], "to": flat_current[key]}
+                                for key in flat_previous if flat_previous[key] != flat_current[key]]
+            if segment["changes"] != expected_changes or not expected_changes:
+                problems.append(f"{segment['start']} changes 不符: {segment['changes']}")
+        previous_state = expected_state
+
+        minute = start
+        while minute < end:
+            chart = service.generate_complete_chart(minute.strftime("%Y-%m-%d"), minute.strftime("%H:%M"),
+                                                    longitude, latitude, gender)
+            if state_of(chart) != expected_state:
+                problems.append(f"{minute:%Y-%m-%d %H:%M} 与所在分段 {segment['start']} 不同")
+            minute += timedelta(minutes=1)
+    return result, problems
+
+
+def main():
+    service = BaziService()
+    failures = []
+
+    # ====================================
+    # 步骤1: 典型窗口逐分钟对照
+    # ====================================
+    print("=" * 70)
+    print(" " * 20 + "步骤1: 典型窗口逐分钟对照")
+    print("=" * 70)
+
+    for label, args in WINDOWS.items():
+        result, problems = check_window(service, *args)
+        print(f"\n{label} {args[0]} ~ {args[1]}: {len(result['charts'])} 段")
+        for segment in result["charts"]:
+            print(f"  {segment['start']} ~ {segment['end']}  {'/'.join(segment['pillars'].values())}  "
+                  f"{segment['boundary']}  沿用 {segment['reused_sections']}")
+        for problem in problems[:5]:
+            print(f"  ✗ {problem}")
+        if problems:
+            failures.append(label)
+
+    # ====================================
+    # 步骤2: 随机窗口
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 24 + "步骤2: 随机窗口")
+    print("=" * 70)
+
+    rng = random.Random(32)
+    segment_count = bad = 0
+    for _ in range(12):
+        start = datetime(rng.randint(1700, 2300), rng.randint(1, 12), rng.randint(1, 28),
+                         rng.randint(0, 23), rng.randint(0, 59))
+        end = start + timedelta(minutes=rng.randint(60, 300))
+        longitude, latitude = round(rng.uniform(73, 135), 3), round(rng.uniform(18, 53), 3)
+        result, problems = check_window(service, start.strftime("%Y-%m-%d %H:%M"), end.strftime("%Y-%m-%d %H:%M"),
+                                        longitude, latitude, rng.choice(["男", "女"]))
+        segment_count += len(result["charts"])
+        if problems:
+            bad += 1
+            print(f"  ✗ {start} ~ {end}: {problems[:3]}")
+    print(f"\n12 个窗口共 {segment_count} 段，有问题的窗口 {bad}")
+    if bad:
+        failures.append("随机窗口")
+
+    try:
+        service.rectify_birth_time("1984-11-06 06:00", "1984-11-06 06:00", 116.4, 39.9, "男")
+        print("空窗口: 未报错 ✗")
+        failures.append("空窗口")
+    except ValueError as exc:
+        print(f"空窗口: {exc}")
+
+    print("\n" + "=" * 70)
+    print(" " * 24 + ("✓ 所有测试完成！" if not failures else f"✗ 失败: {failures}"))
+    print("=" * 70)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# test_reverse_lookup.py
+"""
+八字反查测试：与 generate_complete_chart 双向对照
+- 随机命盘的真太阳时必须落在其四柱反查出的某个区间内（子时标记一致）
+- 在区间起止点两侧与中间取样排盘：真太阳时落在区间内 <=> 四柱与查询一致
+"""
+
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from bazi_service import BaziService
+
+KEYS = ["year", "month", "day", "time"]
+
+# 区间探测使用的出生地（时区 Asia/Shanghai）
+PROBE_LOCATION = (120.0, 30.0)
+
+
+def pillars_of(chart):
+    return tuple(chart["pillars"][key]["ganzhi"] for key in KEYS)
+
+
+def physical_tst(chart):
+    """命盘的物理真太阳时（晚子时的 true_solar_time 已换到次日，这里换回）"""
+    basic = chart["basic_info"]
+    tst = datetime.strptime(basic["true_solar_time"], "%Y-%m-%d %H:%M:%S")
+    return tst - timedelta(days=1) if basic["special_time_marker"] == "晚子时" else tst
+
+
+def containing_window(windows, tst):
+    text = tst.strftime("%Y-%m-%d %H:%M:%S")
+    for window in windows:
+        if window["start"] <= text < window["end"]:
+            return window
+    return None
+
+
+def chart_near(service, target, gender="男"):
+    """排出真太阳时约等于 target 的命盘（先按 target 排一次，再按偏差修正本地时间）"""
+    longitude, latitude = PROBE_LOCATION
+    local = target
+    for _ in range(2):
+        chart = service.generate_complete_chart(local.strftime("%Y-%m-%d"), local.strftime("%H:%M"),
+                                                longitude, latitude, gender)
+        local -= physical_tst(chart) - target
+    return service.generate_complete_chart(local.strftime("%Y-%m-%d"), local.strftime("%H:%M"),
+                                           longitude, latitude, gender)
+
+
+def main():
+    service = BaziService()
+    failures = []
+
+    # ====================================
+    # 步骤1: 命盘 -> 反查区间包含出生时刻
+    # ====================================
+    print("=" * 70)
+    print(" " * 16 + "步骤1: 随机命盘的出生时刻落在反查区间内")
+    print("=" * 70)
+
+    random.seed(27)
+    charts = []
+    for index in range(300):
+        hour = 23 if index % 10 == 0 else random.randint(0, 23)
+        charts.append(service.generate_complete_chart(
+            f"{random.randint(1601, 2398)}-{random.randint(1, 12):02d}-{random.randint(1, 28):02d}",
+            f"{hour:02d}:{random.randint(0, 59):02d}",
+            round(random.uniform(-180, 180), 3), round(random.uniform(-55, 60), 3),
+            random.choice(["男", "女"])
+        ))
+
+    missing = []
+    window_counts = []
+    for chart in charts:
+        windows = service.find_birth_windows(*pillars_of(chart))
+        window_counts.append(len(windows))
+        window = containing_window(windows, physical_tst(chart))
+        marker = chart["basic_info"]["special_time_marker"]
+        if window is None or window["special_time_marker"] != marker:
+            missing.append((pillars_of(chart), chart["basic_info"]["true_solar_time"], marker))
+    print(f"\n命盘 {len(charts)} 个，每个八字 {min(window_counts)}-{max(window_counts)} 个区间")
+    print(f"出生时刻不在区间内（或子时标记不符）: {len(missing)}")
+    for item in missing[:5]:
+        print(f"  {item}")
+    if missing:
+        failures.append("出生时刻不在区间内")
+
+    # ====================================
+    # 步骤2: 区间边界两侧取样
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 20 + "步骤2: 区间边界两侧取样排盘")
+    print("=" * 70)
+
+    probes = inconsistent = inside = 0
+    for chart in charts[:60]:
+        query = pillars_of(chart)
+        windows = service.find_birth_windows(*query)
+        for window in random.sample(windows, min(3, len(windows))):
+            start = datetime.strptime(window["start"], "%Y-%m-%d %H:%M:%S")
+            end = datetime.strptime(window["end"], "%Y-%m-%d %H:%M:%S")
+            targets = [start - timedelta(minutes=3), start + timedelta(minutes=3), start + (end - start) / 2,
+                       end - timedelta(minutes=3), end + timedelta(minutes=3)]
+            for target in targets:
+                probe = chart_near(service, target)
+                in_window = containing_window(windows, physical_tst(probe)) is not None
+                matches = pillars_of(probe) == query
+                probes += 1
+                inside += in_window
+                if in_window != matches:
+                    inconsistent += 1
+                    if inconsistent <= 5:
+                        print(f"  ✗ {query} {probe['basic_info']['true_solar_time']}: "
+                              f"区间内={in_window} 四柱={pillars_of(probe)}")
+    print(f"\n取样 {probes} 次（落在区间内 {inside}），区间判断与排盘结果不一致: {inconsistent}")
+    if inconsistent:
+        failures.append("区间边界")
+
+    # ====================================
+    # 步骤3: 不合法输入与查询耗时
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 20 + "步骤3: 不合法输入与查询耗时")
+    print("=" * 70)
+
+    print()
+    for label, query in [("月干与五虎遁不配", ("甲子", "甲寅", "甲子", "甲子")),
+                         ("时干与五鼠遁不配", ("甲子", "丙寅", "甲子", "丙子")),
+                         ("阴阳不配的干支", ("甲丑", "丙寅", "甲子", "甲子")),
+                         ("非干支字符串", ("甲", "丙寅", "甲子", "甲子"))]:
+        windows = service.find_birth_windows(*query)
+        print(f"{label} {query}: {len(windows)} 个区间")
+        if windows:
+            failures.append(label)
+
+    fresh = BaziService()
+    start = time.perf_counter()
+    fresh.find_birth_windows(*pillars_of(charts[0]))
+    first = time.perf_counter() - start
+    calendar = fresh.reverse_lookup.calendar
+    indexed = all(year in calendar._year_cache
+                  for year in range(fresh.reverse_lookup.MIN_YEAR - 1, fresh.reverse_lookup.MAX_YEAR + 2))
+    start = time.perf_counter()
+    for chart in charts[:100]:
+        fresh.find_birth_windows(*pillars_of(chart))
+    print(f"首次查询（含 build_index）{first * 1000:.1f} ms，已建全部年份的节气表 {'✓' if indexed else '✗'}；"
+          f"之后平均每次查询 {(time.perf_counter() - start) / 100 * 1000:.2f} ms")
+    if not indexed:
+        failures.append("build_index")
+
+    print("\n" + "=" * 70)
+    print(" " * 24 + ("✓ 所有测试完成！" if not failures else f"✗ 失败: {failures}"))
+    print("=" * 70)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# test_startup.py
+"""
+冷启动测试：在全新子进程中测量 import bazi_service、构造 BaziService、首个请求与 warmup() 的耗时，
+并检查导入时是否拉起了重依赖（timezonefinder / pytz / lunar_python / numpy）
+"""
+
+import json
+import statistics
+import subprocess
+import sys
+
+# 冷启动预算（毫秒，取多次子进程测量的中位数）
+IMPORT_BUDGET_MS = 50
+CONSTRUCT_BUDGET_MS = 5
+
+HEAVY_MODULES = ["timezonefinder", "pytz", "lunar_python", "numpy"]
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import bazi_service
+imported = time.perf_counter()
+heavy_import = [name for name in HEAVY_MODULES if name in sys.modules]
+from bazi_reference import BaziReference
+BaziReference.get_shishen("甲", "丙")
+reference = time.perf_counter()
+service = bazi_service.BaziService()
+constructed = time.perf_counter()
+heavy = [name for name in HEAVY_MODULES if name in sys.modules]
+if WARMUP:
+    service.warmup()
+warmed = time.perf_counter()
+service.generate_complete_chart("1990-05-15", "14:30", 121.47, 31.23, "男")
+first = time.perf_counter()
+service.generate_complete_chart("1985-11-02", "08:10", 113.26, 23.13, "女")
+second = time.perf_counter()
+print(json.dumps({
+    "import": imported - start,
+    "reference": reference - imported,
+    "construct": constructed - reference,
+    "heavy_after_import": heavy_import,
+    "heavy_after_construct": heavy,
+    "warmup": warmed - constructed,
+    "first_chart": first - warmed,
+    "second_chart": second - first
+}))
+"""
+
+
+def probe(warmup):
+    code = f"HEAVY_MODULES = {HEAVY_MODULES!r}\nWARMUP = {warmup!r}\n" + PROBE
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+
+def median_ms(runs, key):
+    return statistics.median(run[key] for run in runs) * 1000
+
+
+def main():
+    repeat = 7
+    failures = []
+
+    # ====================================
+    # 步骤1: 不调用 warmup（CLI / 只用参考表的场景）
+    # ====================================
+    print("=" * 70)
+    print(" " * 18 + "步骤1: 冷启动（不调用 warmup）")
+    print("=" * 70)
+
+    runs = [probe(False) for _ in range(repeat)]
+    print(f"\n{repeat} 个子进程，中位数:")
+    print(f"  import bazi_service              {median_ms(runs, 'import'):8.1f} ms（预算 {IMPORT_BUDGET_MS} ms）")
+    print(f"  BaziReference 查表               {median_ms(runs, 'reference'):8.2f} ms")
+    print(f"  BaziService()                    {median_ms(runs, 'construct'):8.2f} ms（预算 {CONSTRUCT_BUDGET_MS} ms）")
+    print(f"  首个命盘（按需加载依赖）         {median_ms(runs, 'first_chart'):8.1f} ms")
+    print(f"  第二个命盘                       {median_ms(runs, 'second_chart'):8.2f} ms")
+    heavy_import = sorted({name for run in runs for name in run["heavy_after_import"]})
+    heavy_construct = sorted({name for run in runs for name in run["heavy_after_construct"]})
+    print(f"  import bazi_service 后已加载的重依赖: {heavy_import or '无'}")
+    print(f"  BaziService() 后已加载的重依赖:      {heavy_construct or '无'}")
+    if heavy_import:
+        failures.append("导入时加载重依赖")
+    if heavy_construct:
+        failures.append("构造时加载重依赖")
+
+    # ====================================
+    # 步骤2: 启动时调用 warmup（服务端）
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 20 + "步骤2: 启动时调用 warmup()")
+    print("=" * 70)
+
+    warm_runs = [probe(True) for _ in range(repeat)]
+    print(f"\n{repeat} 个子进程，中位数:")
+    print(f"  warmup()                         {median_ms(warm_runs, 'warmup'):8.1f} ms")
+    print(f"  首个命盘                         {median_ms(warm_runs, 'first_chart'):8.2f} ms")
+    print(f"  第二个命盘                       {median_ms(warm_runs, 'second_chart'):8.2f} ms")
+
+    if median_ms(runs, "import") > IMPORT_BUDGET_MS:
+        failures.append(f"导入超出预算 {IMPORT_BUDGET_MS} ms")
+    if median_ms(runs, "construct") > CONSTRUCT_BUDGET_MS:
+        failures.append(f"构造超出预算 {CONSTRUCT_BUDGET_MS} ms")
+
+    print("\n" + "=" * 70)
+    print(" " * 24 + ("✓ 所有测试完成！" if not failures else f"✗ 失败: {failures}"))
+    print("=" * 70)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
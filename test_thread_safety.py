@@ -0,0 +1,169 @@
+# test_thread_safety.py
+"""
+多线程测试：多个线程共用一个 BaziService 排盘，检查结果与单线程逐字节一致、
+参考表未被改写、调用方修改输出不影响共享表，并测量 1 ~ N 线程的吞吐
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bazi_reference import BaziReference
+from bazi_service import BaziService
+from chart_serializer import dumps
+from interaction_engine import InteractionEngine
+
+
+def random_requests(count, seed=5):
+    rng = random.Random(seed)
+    return [
+        {
+            "birth_date": f"{rng.randint(1900, 2050)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "birth_time": f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+            "longitude": round(rng.uniform(-180, 180), 3),
+            "latitude": round(rng.uniform(-60, 60), 3),
+            "gender": rng.choice(["男", "女"])
+        }
+        for _ in range(count)
+    ]
+
+
+def table_digest():
+    """两个参考表类中全部表的内容（用于比对是否被改写）"""
+    tables = {}
+    for owner in (BaziReference, InteractionEngine):
+        for name, value in vars(owner).items():
+            if name.isupper():
+                tables[f"{owner.__name__}.{name}"] = repr(value)
+    return tables
+
+
+def run_threads(service, requests, threads):
+    """threads 个线程同时排盘（共用 service），返回 (序列化结果列表, 耗时)"""
+    barrier = threading.Barrier(threads)
+
+    def work(part):
+        barrier.wait()
+        return [dumps(service.generate_complete_chart(**request)) for request in part]
+
+    parts = [requests[i::threads] for i in range(threads)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        outputs = list(executor.map(work, parts))
+    elapsed = time.perf_counter() - start
+
+    results = [None] * len(requests)
+    for offset, output in enumerate(outputs):
+        results[offset::threads] = output
+    return results, elapsed
+
+
+def main():
+    requests = random_requests(1200)
+    before = table_digest()
+    failures = []
+
+    # ====================================
+    # 步骤1: 单线程基准结果
+    # ====================================
+    print("=" * 70)
+    print(" " * 22 + "步骤1: 单线程基准结果")
+    print("=" * 70)
+
+    expected = [dumps(chart) for chart in BaziService().generate_complete_charts(requests)]
+    print(f"\n命盘 {len(expected)} 个")
+
+    # ====================================
+    # 步骤2: 多线程共用一个服务（冷启动，懒加载同时触发）
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 10 + "步骤2: 多线程共用一个服务（冷启动，懒加载同时触发）")
+    print("=" * 70)
+
+    threads = 16
+    service = BaziService()
+    results, _ = run_threads(service, requests, threads)
+    mismatches = sum(result != reference for result, reference in zip(results, expected))
+    print(f"\n{threads} 线程，与单线程不一致: {mismatches}")
+    if mismatches:
+        failures.append("多线程结果")
+
+    # 边界分析、反查等按需组件同时首次调用：各线程拿到的应是同一个对象
+    charts = [service.generate_complete_chart(**request) for request in requests[:threads]]
+
+    def boundary(chart):
+        service.analyze_boundary_sensitivity(chart)
+        return id(service.boundary_analyzer)
+
+    def windows(_):
+        service.find_birth_windows("甲子", "丙寅", "甲子", "甲子")
+        return id(service.reverse_lookup)
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        boundary_ids = set(executor.map(boundary, charts))
+        lookup_ids = set(executor.map(windows, range(threads)))
+    print(f"按需组件只创建一次: 边界分析 {len(boundary_ids) == 1}，反查 {len(lookup_ids) == 1}")
+    if len(boundary_ids) != 1 or len(lookup_ids) != 1:
+        failures.append("按需组件")
+
+    # ====================================
+    # 步骤3: 共享参考表不可改写
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 22 + "步骤3: 共享参考表不可改写")
+    print("=" * 70)
+
+    chart = service.generate_complete_chart(**requests[0])
+    chart["pillars"]["day"]["hidden_stems"].append("甲")
+    chart["pillars"]["year"]["hidden_stems"].clear()
+    unaffected = dumps(service.generate_complete_chart(**requests[0])) == expected[0]
+    print(f"\n修改输出后再排盘与基准一致: {unaffected}")
+    if not unaffected:
+        failures.append("修改输出")
+
+    for label, action in [
+        ("改写藏干表", lambda: BaziReference.HIDDEN_STEMS.__setitem__("子", ["甲"])),
+        ("改写天干序列", lambda: BaziReference.HEAVENLY_STEMS.append("甲")),
+        ("改写六冲表", lambda: InteractionEngine.LIUCHONG.pop("子"))
+    ]:
+        try:
+            action()
+            print(f"{label}: 未报错 ✗")
+            failures.append(label)
+        except (TypeError, AttributeError) as exc:
+            print(f"{label}: {type(exc).__name__}")
+    unchanged = table_digest() == before
+    print(f"参考表内容未变: {unchanged}")
+    if not unchanged:
+        failures.append("参考表内容")
+
+    # ====================================
+    # 步骤4: 线程数与吞吐
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 24 + "步骤4: 线程数与吞吐")
+    print("=" * 70)
+
+    print(f"\nCPU 核数 {os.cpu_count()}（标准 CPython 受 GIL 限制，纯 Python 计算不随线程数加速）")
+    warm = BaziService().warmup()
+    baseline = None
+    for count in (1, 2, 4, 8):
+        results, elapsed = run_threads(warm, requests, count)
+        mismatches = sum(result != reference for result, reference in zip(results, expected))
+        rate = len(requests) / elapsed
+        baseline = baseline or rate
+        print(f"  {count} 线程: {rate:7.0f} 命盘/秒  相对 1 线程 {rate / baseline:4.2f}x  不一致 {mismatches}")
+        if mismatches:
+            failures.append(f"{count} 线程结果")
+
+    print("\n" + "=" * 70)
+    print(" " * 24 + ("✓ 所有测试完成！" if not failures else f"✗ 失败: {failures}"))
+    print("=" * 70)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
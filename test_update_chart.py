@@ -0,0 +1,141 @@
+# test_update_chart.py
+"""
+增量更新测试：update_chart 的结果与用新输入重新调用 generate_complete_chart 逐字节一致，
+重算步骤与变化段落符合依赖关系；投影、时辰未知等不完整结果被拒绝
+"""
+
+import random
+import sys
+
+from bazi_service import BaziService
+from chart_serializer import dumps
+
+
+def random_inputs(rng):
+    return {
+        "birth_date": f"{rng.randint(1601, 2398)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "birth_time": f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+        "longitude": round(rng.uniform(-180, 180), 3),
+        "latitude": round(rng.uniform(-55, 60), 3),
+        "gender": rng.choice(["男", "女"])
+    }
+
+
+def random_changes(rng, inputs):
+    """随机修正：性别、地点微调（四柱多半不变）、地点大改、出生时间、出生日期及其组合"""
+    kind = rng.choice(["gender", "nearby", "location", "time", "date", "mixed"])
+    if kind == "gender":
+        return kind, {"gender": "女" if inputs["gender"] == "男" else "男"}
+    if kind == "nearby":
+        return kind, {"longitude": round(inputs["longitude"] + rng.uniform(-0.2, 0.2), 3)}
+    if kind == "location":
+        return kind, {"longitude": round(rng.uniform(-180, 180), 3), "latitude": round(rng.uniform(-55, 60), 3)}
+    if kind == "time":
+        return kind, {"birth_time": f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}"}
+    if kind == "date":
+        return kind, {"birth_date": random_inputs(rng)["birth_date"]}
+    changes = random_inputs(rng)
+    for key in rng.sample(list(changes), 2):
+        del changes[key]
+    return kind, changes
+
+
+def main():
+    service = BaziService()
+    failures = []
+    rng = random.Random(29)
+
+    # ====================================
+    # 步骤1: 增量更新 vs 重新排盘
+    # ====================================
+    print("=" * 70)
+    print(" " * 20 + "步骤1: 增量更新 vs 重新排盘")
+    print("=" * 70)
+
+    stats = {}
+    mismatches = stage_errors = section_errors = 0
+    for _ in range(600):
+        inputs = random_inputs(rng)
+        previous = service.generate_complete_chart(**inputs)
+        kind, changes = random_changes(rng, inputs)
+        updated = service.update_chart(previous, **changes)
+        expected = service.generate_complete_chart(**dict(inputs, **changes))
+
+        if dumps(updated["chart"]) != dumps(expected):
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"  ✗ {inputs} + {changes}")
+        stages = updated["recomputed_stages"]
+        if kind == "gender" and stages != ["timeline"]:
+            stage_errors += 1
+        ganzhi_changed = any(previous["pillars"][key]["ganzhi"] != expected["pillars"][key]["ganzhi"]
+                             for key in ["year", "month", "day", "time"])
+        if ganzhi_changed != ("chart_analyzer" in stages):
+            stage_errors += 1
+        actual_changes = [section for section in expected if expected[section] != previous[section]]
+        section_errors += updated["changed_sections"] != actual_changes
+
+        entry = stats.setdefault(kind, {"count": 0, "reused_analysis": 0})
+        entry["count"] += 1
+        entry["reused_analysis"] += "chart_analyzer" not in stages
+
+    print()
+    for kind, entry in stats.items():
+        print(f"{kind:9s} {entry['count']:4d} 次，沿用特征分析 {entry['reused_analysis']:4d} 次")
+    print(f"\n结果不一致: {mismatches}，重算步骤不符: {stage_errors}，changed_sections 不符: {section_errors}")
+    if mismatches or stage_errors or section_errors:
+        failures.append("增量更新")
+
+    unchanged = service.update_chart(previous, **{key: inputs[key] for key in ["gender", "longitude"]})
+    print(f"修正值与原值相同: recomputed_stages={unchanged['recomputed_stages']} "
+          f"changed_sections={unchanged['changed_sections']}")
+    if unchanged["recomputed_stages"] or unchanged["changed_sections"]:
+        failures.append("无变化的修正")
+
+    # ====================================
+    # 步骤2: 不完整的结果
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 22 + "步骤2: 不完整的结果")
+    print("=" * 70)
+
+    args = ("1990-01-15", "12:00", 134.2, 47.7, "女")
+    cases = [
+        ("fields='minimal'", service.generate_complete_chart(*args, fields="minimal")),
+        ("fields='standard'", service.generate_complete_chart(*args, fields="standard")),
+        ("fields='llm'（无五行 sources）", service.generate_complete_chart(*args, fields="llm")),
+        ("fields=['basic_info', 'pillars.year']", service.generate_complete_chart(*args, fields=["basic_info", "pillars.year"])),
+        ("hour_unknown=True", service.generate_complete_chart(args[0], None, *args[2:], hour_unknown=True)),
+        ("None", None)
+    ]
+    print()
+    for label, result in cases:
+        try:
+            service.update_chart(result, gender="男")
+            print(f"{label}: 未报错 ✗")
+            failures.append(label)
+        except ValueError as exc:
+            print(f"{label}: {exc}")
+
+    full = service.generate_complete_chart(*args, fields=BaziService.CHART_SECTIONS)
+    same = dumps(service.update_chart(full, gender="男")["chart"]) == dumps(
+        service.generate_complete_chart(*args[:4], "男"))
+    print(f"fields 为全部段落: 与重新排盘一致 {'✓' if same else '✗'}")
+    if not same:
+        failures.append("全部段落的投影")
+
+    try:
+        service.update_chart(full, hour_unknown=True)
+        print("不支持的字段: 未报错 ✗")
+        failures.append("不支持的字段")
+    except ValueError as exc:
+        print(f"不支持的字段: {exc}")
+
+    print("\n" + "=" * 70)
+    print(" " * 24 + ("✓ 所有测试完成！" if not failures else f"✗ 失败: {failures}"))
+    print("=" * 70)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+# test_warm_snapshot.py
+"""
+预热快照测试：由模拟访问日志生成快照，检查命中结果与现算逐字节一致、失效判定，
+并在全新子进程中对比冷启动与载入快照后前 N 个请求的延迟
+"""
+
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+from bazi_service import BaziService
+from chart_serializer import dumps
+from warm_snapshot import WarmSnapshot, build_snapshot, chart_key
+
+CITIES = [
+    (116.4074, 39.9042), (121.4737, 31.2304), (113.2644, 23.1291), (114.0579, 22.5431),
+    (104.0665, 30.5723), (120.1551, 30.2741), (108.9398, 34.3416), (118.7969, 32.0603),
+    (114.3054, 30.5931), (106.5516, 29.563), (117.2008, 39.0842), (126.6424, 45.7567),
+    (101.7123, 3.1569), (103.8198, 1.3521), (-122.4194, 37.7749), (-73.9352, 40.7306),
+    (-0.1276, 51.5072), (139.6917, 35.6895), (151.2093, -33.8688), (121.5654, 25.033)
+]
+
+PROBE = """
+import json, sys, time
+REQUESTS = json.load(sys.stdin)
+start = time.perf_counter()
+from bazi_service import BaziService
+service = BaziService()
+loaded = service.load_snapshot(SNAPSHOT) if SNAPSHOT else False
+booted = time.perf_counter()
+latencies = []
+for request in REQUESTS:
+    begin = time.perf_counter()
+    service.generate_complete_chart(**request)
+    latencies.append(time.perf_counter() - begin)
+print(json.dumps({
+    "boot": booted - start,
+    "loaded": loaded,
+    "latencies": latencies,
+    "timezone_finder_built": service.time_processor._tf is not None,
+    "hits": service.snapshot.hits if service.snapshot else 0
+}))
+"""
+
+
+def request_log(size, distinct, seed, sample_seed):
+    """按 Zipf 分布重复的请求记录（少数命盘被反复请求；seed 决定命盘集合，sample_seed 决定抽样）"""
+    rng = random.Random(seed)
+    pool = []
+    for _ in range(distinct):
+        longitude, latitude = rng.choice(CITIES)
+        pool.append({
+            "birth_date": f"{rng.randint(1950, 2015)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+            "birth_time": f"{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}",
+            "longitude": longitude,
+            "latitude": latitude,
+            "gender": rng.choice(["男", "女"])
+        })
+    weights = [1 / (rank + 1) ** 1.1 for rank in range(distinct)]
+    return random.Random(sample_seed).choices(pool, weights=weights, k=size)
+
+
+def probe(snapshot_path, requests):
+    code = f"SNAPSHOT = {snapshot_path!r}\n" + PROBE
+    output = subprocess.run([sys.executable, "-c", code], input=json.dumps(requests),
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+
+def summary(result):
+    latencies = sorted(result["latencies"])
+    p99 = latencies[int(len(latencies) * 0.99)]
+    return (f"启动 {result['boot'] * 1000:7.1f} ms  首个请求 {result['latencies'][0] * 1000:7.1f} ms  "
+            f"p50 {statistics.median(latencies) * 1e6:6.0f} µs  p99 {p99 * 1e6:7.0f} µs  "
+            f"合计 {sum(latencies) * 1000:7.1f} ms")
+
+
+def main():
+    service = BaziService()
+    failures = []
+    workdir = tempfile.mkdtemp(prefix="bazi_snapshot_")
+    path = os.path.join(workdir, "warm.snapshot")
+
+    # ====================================
+    # 步骤1: 生成快照
+    # ====================================
+    print("=" * 70)
+    print(" " * 24 + "步骤1: 生成快照")
+    print("=" * 70)
+
+    log = request_log(20000, 3000, seed=7, sample_seed=1)
+    stats = build_snapshot(service, log, path, max_charts=500)
+    print(f"\n访问日志 {len(log)} 条（不同命盘 {len(set(chart_key(**r) for r in log))} 个）")
+    print(f"快照: 命盘 {stats['charts']}，时区 {stats['timezones']}，节气年 {stats['jie_years']}，"
+          f"{stats['bytes'] / 1024:.0f} KB")
+
+    # ====================================
+    # 步骤2: 命中结果与现算一致、失效判定
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 16 + "步骤2: 命中结果与现算一致、失效判定")
+    print("=" * 70)
+
+    warm = BaziService()
+    loaded = warm.load_snapshot(path)
+    print(f"\n载入: {loaded}")
+    if not loaded:
+        failures.append("载入快照")
+    distinct = list({chart_key(**r): r for r in log}.values())
+    mismatches = sum(dumps(warm.generate_complete_chart(**r)) != dumps(service.generate_complete_chart(**r))
+                     for r in distinct)
+    batch_mismatches = sum(dumps(a) != dumps(b) for a, b in zip(
+        warm.generate_complete_charts(distinct[:500]), service.generate_complete_charts(distinct[:500])))
+    print(f"逐个排盘与现算不一致: {mismatches}（{len(distinct)} 个，命中 {warm.snapshot.hits}）")
+    print(f"批量排盘与现算不一致: {batch_mismatches}")
+    if mismatches or batch_mismatches or not warm.snapshot.hits:
+        failures.append("命中结果")
+
+    hit = dict(distinct[0])
+    hit["longitude"] = int(hit["longitude"])
+    distinct_keys = chart_key(**hit) != chart_key(**distinct[0])
+    print(f"整数经度与浮点经度使用不同的键: {distinct_keys}")
+    if not distinct_keys:
+        failures.append("整数经度")
+
+    chart = warm.generate_complete_chart(**distinct[0])
+    chart["pillars"] = None
+    isolated = warm.generate_complete_chart(**distinct[0])["pillars"] is not None
+    print(f"修改命中结果不影响快照: {isolated}")
+    if not isolated:
+        failures.append("修改命中结果")
+
+    truncated = os.path.join(workdir, "truncated.snapshot")
+    with open(path, "rb") as source, open(truncated, "wb") as target:
+        target.write(source.read(20))
+    for label, action in [
+        ("指纹不符（代码 / 数据已变化）", lambda: WarmSnapshot.open(path, fingerprint=bytes(32))),
+        ("截断的文件", lambda: WarmSnapshot.open(truncated)),
+        ("不存在的文件", lambda: WarmSnapshot.open(os.path.join(workdir, "missing")))
+    ]:
+        try:
+            action()
+            print(f"{label}: 未报错 ✗")
+            failures.append(label)
+        except (OSError, ValueError) as exc:
+            print(f"{label}: {type(exc).__name__}: {exc}")
+    truncated_loaded = BaziService().load_snapshot(truncated)
+    print(f"load_snapshot(截断的文件): {truncated_loaded}")
+    if truncated_loaded:
+        failures.append("load_snapshot(截断的文件)")
+
+    # ====================================
+    # 步骤3: 重启后前 N 个请求的延迟
+    # ====================================
+    print("\n" + "=" * 70)
+    print(" " * 20 + "步骤3: 重启后前 2000 个请求")
+    print("=" * 70)
+
+    traffic = request_log(2000, 3000, seed=7, sample_seed=2)
+    cold = probe(None, traffic)
+    warm_result = probe(path, traffic)
+    print(f"\n冷启动   {summary(cold)}")
+    print(f"载入快照 {summary(warm_result)}")
+    print(f"快照命中 {warm_result['hits']}/{len(traffic)}，"
+          f"构建了时区查找器: 冷启动 {cold['timezone_finder_built']} / 载入快照 {warm_result['timezone_finder_built']}")
+    if not warm_result["loaded"] or not warm_result["hits"]:
+        failures.append("子进程载入快照")
+
+    warm.snapshot.close()
+    shutil.rmtree(workdir)
+
+    print("\n" + "=" * 70)
+    print(" " * 24 + ("✓ 所有测试完成！" if not failures else f"✗ 失败: {failures}"))
+    print("=" * 70)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,7 @@
 """
 
 from bazi_reference import BaziReference
+from instrumentation import timed
 from interaction_engine import InteractionEngine
 
 class TimelineCalculator:
@@ -13,6 +14,7 @@ class TimelineCalculator:
     def __init__(self):
         pass
     
+    @timed("timeline.calculate_dayun")
     def calculate_dayun(self, chart_data, solar_terms_data):
         """
         计算大运
@@ -37,7 +39,7 @@ class TimelineCalculator:
         month_zhi = pillars["month"]["zhi"]
         
         # 1. 判断顺逆
-        direction = self._determine_direction(year_gan, gender)
+        direction = self.determine_direction(year_gan, gender)
         
         # 2. 计算起运岁数
         qiyun_info = self._calculate_qiyun_age(
@@ -61,7 +63,7 @@ class TimelineCalculator:
             "dayun_list": dayun_list
         }
     
-    def _determine_direction(self, year_gan, gender):
+    def determine_direction(self, year_gan, gender):
         """
         确定大运顺逆
         
@@ -178,6 +180,7 @@ class TimelineCalculator:
     # 流年分析（预留接口）
     # ============================================
     
+    @timed("timeline.analyze_liunian")
     def analyze_liunian(self, chart_data, dayun_info, year):
         """
         分析特定流年
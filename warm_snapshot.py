@@ -0,0 +1,272 @@
+# warm_snapshot.py
+"""
+预热快照
+负责把工作进程的热状态写成单个文件：已解析的时区、按年缓存的"节"表和最常请求的命盘结果；
+新工作进程启动时内存映射该文件即可直接命中（命盘正文按需从映射区解析，多个进程共享页缓存），
+代码或数据文件（日历表、时区库、lunar_python 版本）变化后快照自动失效
+"""
+
+import argparse
+import hashlib
+import importlib.util
+import json
+import mmap
+import os
+import struct
+import time
+from collections import Counter
+from datetime import datetime
+
+from chart_serializer import dumps, loads
+
+MAGIC = b"BZWARM"
+FORMAT_VERSION = 1
+
+# 魔数、格式版本、指纹（sha256）、元数据长度
+HEADER = struct.Struct("<6sH32sI")
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 影响命盘结果的代码与数据文件（任一变化都使快照失效）
+FINGERPRINT_MODULES = [
+    "bazi_service.py", "bazi_time_processor.py", "chart_builder.py", "chart_analyzer.py",
+    "interaction_engine.py", "timeline_calculator.py", "bazi_reference.py", "calendar_table.py",
+    "warm_snapshot.py"
+]
+FINGERPRINT_DATA = [os.path.join("data", "calendar_table.npy"), os.path.join("data", "lunar_month_table.npy")]
+FINGERPRINT_PACKAGES = ["pytz", "timezonefinder", "lunar_python"]
+
+_KEY_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def chart_key(birth_date, birth_time, longitude, latitude, gender, hour_unknown=False,
+              lunar=False, is_leap_month=False, fields=None):
+    """
+    命盘请求 -> 快照键（紧凑 JSON 字符串）
+
+    经纬度保留原始类型：整数与浮点数在命盘 basic_info 中的输出不同，不能共用结果
+    """
+    if fields is not None and not isinstance(fields, str):
+        fields = list(fields)
+    return _KEY_ENCODER.encode([
+        birth_date, birth_time, longitude, latitude, gender,
+        bool(hour_unknown), bool(lunar), bool(is_leap_month), fields
+    ])
+
+
+def _package_version(name):
+    """已安装包的 dist-info 目录名（含版本号）；不导入包本身，也不加载 importlib.metadata（约 60ms）"""
+    spec = importlib.util.find_spec(name)
+    if spec is None or spec.origin is None:
+        return f"{name}-?"
+    site_dir = os.path.dirname(os.path.dirname(spec.origin))
+    prefix = name.lower() + "-"
+    for entry in sorted(os.listdir(site_dir)):
+        if entry.lower().startswith(prefix) and entry.endswith((".dist-info", ".egg-info")):
+            return entry
+    return f"{name}-?"
+
+
+def compute_fingerprint():
+    """代码、数据文件与依赖库版本的 sha256 摘要"""
+    digest = hashlib.sha256()
+    digest.update(MAGIC + struct.pack("<H", FORMAT_VERSION))
+    for name in FINGERPRINT_MODULES + FINGERPRINT_DATA:
+        digest.update(name.encode("utf-8"))
+        with open(os.path.join(BASE_DIR, name), "rb") as f:
+            digest.update(hashlib.sha256(f.read()).digest())
+    for package in FINGERPRINT_PACKAGES:
+        digest.update(_package_version(package).encode("utf-8"))
+    return digest.digest()
+
+
+class WarmSnapshot:
+    """
+    已打开的预热快照
+
+    元数据（时区、"节"表、命盘索引）在打开时解析；命盘正文留在内存映射区，
+    get_chart() 命中时才解析，每次返回新对象（调用方可自由修改）
+    """
+
+    def __init__(self, buffer, metadata, body_offset, file=None):
+        self._buffer = buffer
+        self._file = file
+        self.metadata = metadata
+        self._body_offset = body_offset
+        self._charts = {key: (offset, length) for key, offset, length, _ in metadata["charts"]}
+        self.hits = 0
+
+    @classmethod
+    def open(cls, path, fingerprint=None):
+        """
+        内存映射并校验快照
+
+        Args:
+            path: 快照文件
+            fingerprint: 期望的指纹，默认按当前代码与数据计算
+
+        Raises:
+            ValueError: 不是快照文件、格式版本不支持或已失效（代码 / 数据变化）
+        """
+        if fingerprint is None:
+            fingerprint = compute_fingerprint()
+
+        file = open(path, "rb")
+        try:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            file.close()
+            raise ValueError("Not a warm snapshot")
+
+        try:
+            if len(buffer) < HEADER.size:
+                raise ValueError("Not a warm snapshot")
+            magic, version, stored_fingerprint, metadata_length = HEADER.unpack_from(buffer, 0)
+            if magic != MAGIC:
+                raise ValueError("Not a warm snapshot")
+            if version != FORMAT_VERSION:
+                raise ValueError(f"Unsupported snapshot version: {version}")
+            if stored_fingerprint != fingerprint:
+                raise ValueError("Snapshot is stale (code or data changed since it was written)")
+            metadata = json.loads(buffer[HEADER.size:HEADER.size + metadata_length].decode("utf-8"))
+        except ValueError:
+            buffer.close()
+            file.close()
+            raise
+
+        return cls(buffer, metadata, HEADER.size + metadata_length, file)
+
+    def close(self):
+        self._buffer.close()
+        if self._file is not None:
+            self._file.close()
+
+    def __len__(self):
+        return len(self._charts)
+
+    def get_chart(self, key):
+        """按 chart_key() 取命盘结果，未收录时返回 None"""
+        entry = self._charts.get(key)
+        if entry is None:
+            return None
+        offset, length = entry
+        start = self._body_offset + offset
+        self.hits += 1
+        return loads(memoryview(self._buffer)[start:start + length])
+
+    def install(self, service):
+        """把时区与"节"表放入 BaziService 的缓存，并让其排盘时先查快照"""
+        from bazi_time_processor import JIE_ZHI_MAP
+
+        time_processor = service.time_processor
+        for longitude, latitude, timezone_str in self.metadata["timezones"]:
+            time_processor._resolved_timezones[(longitude, latitude)] = timezone_str
+        for year, items in self.metadata["jie_years"].items():
+            year = int(year)
+            time_processor._jie_cache[year] = [
+                {
+                    "name": name,
+                    "datetime": datetime.strptime(text, "%Y-%m-%d %H:%M:%S"),
+                    "zhi": JIE_ZHI_MAP[name],
+                    "year_belong": year
+                }
+                for name, text in items
+            ]
+        service.snapshot = self
+
+
+def build_snapshot(service, requests, path, max_charts=1000):
+    """
+    由请求记录生成快照
+
+    Args:
+        service: BaziService（用于排盘与时区查找；其"节"表缓存一并写入）
+        requests: generate_complete_charts() 格式的请求字典序列（如访问日志），
+                  按出现次数取前 max_charts 个命盘写入；所有出现过的经纬度都解析时区
+        path: 输出文件（先写临时文件再替换）
+        max_charts: 收录的命盘数上限
+
+    Returns:
+        {"charts", "timezones", "jie_years", "bytes"}
+    """
+    counts = Counter()
+    first_request = {}
+    locations = {}
+    for request in requests:
+        key = chart_key(**request)
+        counts[key] += 1
+        first_request.setdefault(key, request)
+        locations[(request["longitude"], request["latitude"])] = None
+
+    keys = [key for key, _ in counts.most_common(max_charts)]
+    results = service.generate_complete_charts([first_request[key] for key in keys])
+
+    chart_index = []
+    bodies = []
+    offset = 0
+    for key, result in zip(keys, results):
+        if isinstance(result, Exception):
+            continue
+        body = dumps(result)
+        chart_index.append([key, offset, len(body), counts[key]])
+        bodies.append(body)
+        offset += len(body)
+
+    time_processor = service.time_processor
+    timezones = [
+        [longitude, latitude, time_processor.get_timezone(longitude, latitude)]
+        for longitude, latitude in locations
+    ]
+    jie_years = {
+        str(year): [[item["name"], item["datetime"].strftime("%Y-%m-%d %H:%M:%S")] for item in items]
+        for year, items in sorted(time_processor._jie_cache.items())
+    }
+
+    metadata = dumps({
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "timezones": timezones,
+        "jie_years": jie_years,
+        "charts": chart_index
+    })
+
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, compute_fingerprint(), len(metadata)))
+        f.write(metadata)
+        for body in bodies:
+            f.write(body)
+    os.replace(temp_path, path)
+
+    return {
+        "charts": len(chart_index),
+        "timezones": len(timezones),
+        "jie_years": len(jie_years),
+        "bytes": HEADER.size + len(metadata) + offset
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="bazi-snapshot", description="由请求记录生成预热快照")
+    parser.add_argument("input", help="请求记录（CSV 或 JSONL，字段同 bazi-batch 输入）")
+    parser.add_argument("-o", "--output", required=True, help="快照文件")
+    parser.add_argument("--format", choices=["csv", "jsonl"], default=None, help="输入格式（默认按扩展名）")
+    parser.add_argument("--max-charts", type=int, default=1000, help="收录的最常请求命盘数")
+    args = parser.parse_args()
+
+    from bazi_batch import read_births
+    from bazi_service import BaziService, normalize_chart_request
+
+    requests = []
+    for _, record in read_births(args.input, args.format):
+        try:
+            requests.append(normalize_chart_request(record))
+        except (ValueError, TypeError):
+            continue
+
+    stats = build_snapshot(BaziService(), requests, args.output, args.max_charts)
+    print(f"已生成 {args.output}: 命盘 {stats['charts']}，时区 {stats['timezones']}，"
+          f"节气年 {stats['jie_years']}，{stats['bytes']} 字节")
+
+
+if __name__ == "__main__":
+    main()